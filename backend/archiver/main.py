@@ -0,0 +1,160 @@
+import base64
+import gzip
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+import boto3
+
+# Shared layer (backend/shared)
+from visionquest.compression import unpack_typed_fields
+from visionquest.logs import get_logger
+from visionquest.serialization import items_from_typed
+from visionquest.telemetry import Span, timing_breakdown
+
+try:
+    import pyarrow  # Optional layer: Parquet output. Without it batches are gzip JSONL
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+s3 = boto3.client('s3')
+
+# --- CONFIGURATION ---
+ARCHIVE_BUCKET = os.environ['ARCHIVE_BUCKET']
+ARCHIVE_PREFIX = os.environ.get('ARCHIVE_PREFIX', 'jobs/')
+TTL_PRINCIPAL = "dynamodb.amazonaws.com"  # userIdentity of deletes made by the TTL process
+PACKED_FIELDS = ('answer', 'user_prompt')  # Compressed / overflowed by visionquest.compression
+log = get_logger("archiver")
+
+# One row per expired job. stage_timings is kept whole (JSON) next to the
+# columns analytics queries actually filter and aggregate on.
+COLUMNS = [
+    ("job_id", "string"),
+    ("user_id", "string"),
+    ("chat_id", "string"),
+    ("status", "string"),
+    ("created_at", "int64"),
+    ("expiration_time", "int64"),
+    ("file_name", "string"),
+    ("user_prompt", "string"),
+    ("answer", "string"),
+    ("error_msg", "string"),
+    ("model", "string"),
+    ("pages", "int64"),
+    ("input_tokens", "int64"),
+    ("output_tokens", "int64"),
+    ("total_ms", "int64"),
+    ("cost_usd", "float64"),
+    ("stage_timings", "string"),
+    ("archived_at", "int64"),
+]
+
+
+def lambda_handler(event, context):
+    log.begin(event, context)
+    span = Span("archiver").start()
+
+    images = [r['dynamodb']['OldImage'] for r in event.get('Records', []) if is_ttl_delete(r)]
+    skipped = len(event.get('Records', [])) - len(images)
+    if not images:
+        log.debug("⏭️ No TTL deletions in batch.", skipped=skipped)
+        span.finish()
+        return {"archived": 0, "skipped": skipped}
+
+    rows = [archive_row(image) for image in images]
+    files = []
+    for day, day_rows in partition(rows).items():
+        files.append(write_batch(day, day_rows, span))
+
+    span.add(rows=len(rows))
+    log.info("🗄️ Archived %d expired jobs.", len(rows), files=files, skipped=skipped)
+    span.finish()
+    return {"archived": len(rows), "skipped": skipped, "files": files}
+
+
+def is_ttl_delete(record):
+    """
+    Only TTL expiry is archived. A delete made by a user or an admin (e.g. a
+    data removal request) must not resurface in the archive.
+    """
+    identity = record.get('userIdentity') or {}
+    return (record.get('eventName') == 'REMOVE'
+            and identity.get('type') == 'Service'
+            and identity.get('principalId') == TTL_PRINCIPAL
+            and 'OldImage' in record.get('dynamodb', {}))
+
+
+def archive_row(image):
+    """Stream OldImage (typed) -> one flat archive row."""
+    image = dict(image)
+    for field in PACKED_FIELDS:
+        # Stream records carry Binary as base64 text, unlike the SDK
+        attribute = image.get(field)
+        if attribute and isinstance(attribute.get('B'), str):
+            image[field] = {'B': base64.b64decode(attribute['B'])}
+    item = items_from_typed([unpack_typed_fields(image, PACKED_FIELDS, s3)])[0]
+
+    timings = item.get('stage_timings') or {}
+    processor = timings.get('processor') or {}
+    ocr = timings.get('ocr_worker') or {}
+    breakdown = timing_breakdown(timings) or {}
+    return {
+        "job_id": item.get('job_id'),
+        "user_id": item.get('user_id'),
+        "chat_id": item.get('chat_id'),
+        "status": item.get('status'),
+        "created_at": item.get('created_at'),
+        "expiration_time": item.get('expiration_time'),
+        "file_name": item.get('file_name'),
+        "user_prompt": item.get('user_prompt'),
+        "answer": item.get('answer'),
+        "error_msg": item.get('error_msg'),
+        "model": processor.get('model'),
+        "pages": ocr.get('pages'),
+        "input_tokens": processor.get('input_tokens'),
+        "output_tokens": processor.get('output_tokens'),
+        "total_ms": breakdown.get('total_ms'),
+        "cost_usd": breakdown.get('cost_usd'),
+        "stage_timings": json.dumps(timings, ensure_ascii=False) if timings else None,
+        "archived_at": int(time.time()),
+    }
+
+
+def partition(rows):
+    """Group rows by the UTC day the job was created (Hive-style dt= partitions)."""
+    days = {}
+    for row in rows:
+        created = row.get('created_at') or row['archived_at']
+        day = datetime.fromtimestamp(created, tz=timezone.utc).strftime('%Y-%m-%d')
+        days.setdefault(day, []).append(row)
+    return days
+
+
+def write_batch(day, rows, span):
+    if pyarrow is not None:
+        body, extension = to_parquet(rows), "parquet"
+    else:
+        body, extension = to_jsonl_gz(rows), "jsonl.gz"
+    key = f"{ARCHIVE_PREFIX}dt={day}/part-{int(time.time())}-{uuid.uuid4().hex[:8]}.{extension}"
+    with span.phase("s3_write"):
+        # Raising here fails the batch; the event source mapping retries / bisects it
+        s3.put_object(Bucket=ARCHIVE_BUCKET, Key=key, Body=body)
+    span.add(bytes_written=len(body))
+    return key
+
+
+def to_parquet(rows):
+    schema = pyarrow.schema([(name, getattr(pyarrow, kind)()) for name, kind in COLUMNS])
+    columns = {name: [row.get(name) for row in rows] for name, _ in COLUMNS}
+    table = pyarrow.Table.from_pydict(columns, schema=schema)
+    sink = pyarrow.BufferOutputStream()
+    pyarrow.parquet.write_table(table, sink, compression="zstd")
+    return sink.getvalue().to_pybytes()
+
+
+def to_jsonl_gz(rows):
+    lines = "\n".join(json.dumps({name: row.get(name) for name, _ in COLUMNS}, ensure_ascii=False) for row in rows)
+    return gzip.compress(lines.encode('utf-8'))
@@ -1,68 +1,126 @@
-import json
+import base64
 import boto3
+import json
 import os
-from boto3.dynamodb.conditions import Key
-from decimal import Decimal
+import time
 
-# --- CONFIGURATION ---
-dynamodb = boto3.resource('dynamodb')
-JOBS_TABLE = dynamodb.Table(os.environ['JOBS_TABLE_NAME'])
-CHATS_TABLE = dynamodb.Table(os.environ['CHATS_TABLE_NAME'])
+# Shared layer (backend/shared)
+from visionquest.compression import unpack_typed_fields
+from visionquest.logs import get_logger
+from visionquest.serialization import dumps, items_from_typed
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
+# --- CONFIGURATION ---
+# Low-level client: its typed output ({"N": "12"}) converts straight to JSON
+# values, skipping the resource layer's Decimal round trip
+dynamodb = boto3.client('dynamodb')
+s3 = boto3.client('s3')
+JOBS_TABLE_NAME = os.environ['JOBS_TABLE_NAME']
+CHATS_TABLE_NAME = os.environ['CHATS_TABLE_NAME']
+log = get_logger("history")
+PACKED_FIELDS = ('answer', 'user_prompt')   # Possibly compressed / in S3 (visionquest.compression)
+MAX_PAGE_SIZE = 50
+MAX_PAGE_QUERIES = 5   # Expired jobs are filtered after Limit: top a short page up this many times
 
 def lambda_handler(event, context):
     """
     THE HISTORIAN
     1. GET /history?user_id=...&chat_id=... -> Returns messages for one chat
-    2. GET /history/list?user_id=...       -> Returns list of all user's chats
+       ...&limit=10[&before=<cursor>]     -> One page, newest jobs first:
+                                             {"messages": [...], "before": <cursor of older ones or null>}
+    2. GET /history?user_id=...&action=list_chats -> Returns list of all user's chats
+    The frontend POSTs the same fields as a JSON body; both are accepted.
     """
-    print(event)
+    log.begin(event, context)
     
-    # 1. Parse Query Params
-    params = event.get('queryStringParameters', {})
+    # 1. Parse Query Params (or the POSTed JSON body)
+    params = dict(event.get('queryStringParameters') or {})
+    try:
+        params.update(json.loads(event.get('body') or '{}'))
+    except ValueError:
+        return {"statusCode": 400, "body": "Invalid JSON body"}
     if not params:
         return {"statusCode": 400, "body": "Missing parameters"}
     
     user_id = params.get('user_id')
     chat_id = params.get('chat_id')
     action = params.get('action', 'fetch_messages') # 'fetch_messages' or 'list_chats'
+    log.info("📜 History: %s", action, user_id=user_id, chat_id=chat_id)
 
     try:
         # --- ACTION A: LIST PREVIOUS CHATS ---
         if action == 'list_chats':
-            response = CHATS_TABLE.query(
-                KeyConditionExpression=Key('user_id').eq(user_id)
+            response = dynamodb.query(
+                TableName=CHATS_TABLE_NAME,
+                KeyConditionExpression="user_id = :u",
+                ExpressionAttributeValues={':u': {'S': user_id}}
             )
-            chats = response.get('Items', [])
+            chats = items_from_typed(response.get('Items', []))
             return {
                 "statusCode": 200,
-                "body": json.dumps(chats, cls=DecimalEncoder)
+                "body": dumps(chats, convert=False)
             }
 
         # --- ACTION B: FETCH MESSAGES FOR A CHAT ---
         if chat_id:
             # Query the GSI 'ChatIndex' we just created
-            response = JOBS_TABLE.query(
+            query = dict(
+                TableName=JOBS_TABLE_NAME,
                 IndexName='ChatIndex',
-                KeyConditionExpression=Key('chat_id').eq(chat_id)
+                KeyConditionExpression="chat_id = :c",
+                # TTL deletes lag expiry by up to a couple of days: hide expired jobs
+                FilterExpression="attribute_not_exists(expiration_time) OR expiration_time > :now",
+                ExpressionAttributeValues={':c': {'S': chat_id}, ':now': {'N': str(int(time.time()))}}
             )
-            messages = response.get('Items', [])
+            if params.get('limit'):
+                try:
+                    limit, start_key = int(params['limit']), decode_cursor(params.get('before'))
+                except ValueError:
+                    return {"statusCode": 400, "body": "Invalid limit or cursor"}
+                # Only this page is unpacked (answers may live in S3), not the whole chat
+                items, before = query_page(query, limit, start_key)
+            else:
+                items, before = dynamodb.query(**query).get('Items', []), None
+            items = [unpack_typed_fields(item, PACKED_FIELDS, s3) for item in items]
+            messages = items_from_typed(items)
             
             # Sort by created_at just in case
             messages.sort(key=lambda x: x.get('created_at', 0))
 
+            body = {"messages": messages, "before": before} if params.get('limit') else messages
             return {
                 "statusCode": 200,
-                "body": json.dumps(messages, cls=DecimalEncoder)
+                "body": dumps(body, convert=False)
             }
             
         return {"statusCode": 400, "body": "Invalid Request"}
 
     except Exception as e:
-        print(f"Error: {e}")
-        return {"statusCode": 500, "body": str(e)}
\ No newline at end of file
+        log.error("❌ History Error: %s", e)
+        return {"statusCode": 500, "body": str(e)}
+
+def decode_cursor(cursor):
+    """The `before` cursor is DynamoDB's LastEvaluatedKey as base64 JSON. Raises ValueError."""
+    if not cursor:
+        return None
+    key = json.loads(base64.urlsafe_b64decode(str(cursor).encode('ascii')))
+    if not isinstance(key, dict):
+        raise ValueError("cursor is not a key")
+    return key
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii') if key else None
+
+def query_page(query, limit, start_key=None):
+    """Newest `limit` jobs after start_key, and the cursor of older ones (None: none left)."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = dict(query, ScanIndexForward=False)
+    items = []
+    for _ in range(MAX_PAGE_QUERIES):
+        if start_key:
+            query['ExclusiveStartKey'] = start_key
+        response = dynamodb.query(Limit=limit - len(items), **query)
+        items.extend(response.get('Items', []))
+        start_key = response.get('LastEvaluatedKey')
+        if not start_key or len(items) >= limit:
+            break
+    return items, encode_cursor(start_key)
@@ -4,6 +4,17 @@ import os
 import uuid
 import time
 import base64
+import hashlib
+import math
+import mimetypes
+
+# Shared layer (backend/shared)
+from visionquest.admission import TenantBucket
+from visionquest.compression import OVERFLOW_PREFIX, pack
+from visionquest.logs import get_logger
+from visionquest.retention import completed_expiration, pending_expiration
+from visionquest.scheduler import tier_of
+from visionquest.telemetry import Span, to_dynamodb
 
 s3 = boto3.client('s3')
 dynamodb = boto3.resource('dynamodb')
@@ -12,9 +23,19 @@ dynamodb = boto3.resource('dynamodb')
 BUCKET_NAME = os.environ.get('s3_bucket_name')
 JOBS_TABLE_NAME = os.environ.get('JOBS_TABLE_NAME')
 jobs_table = dynamodb.Table(JOBS_TABLE_NAME)
+chats_table = dynamodb.Table(os.environ.get('CHATS_TABLE_NAME'))
+CHAT_TITLE_CHARS = 40  # Sidebar label: the chat's first question, truncated
+# Scheduling tier by API route, never by the request body: a client can't jump the queue.
+# Batch callers post to /ingest/bulk; the chat (and anything unknown) is interactive.
+ROUTE_TIERS = {'POST /ingest': 'interactive', 'POST /ingest/bulk': 'bulk'}
+# Per-tenant upload rate (TENANT_RATE_PER_MINUTE / TENANT_BURST)
+tenant_bucket = TenantBucket(dynamodb.Table(os.environ.get('ADMISSION_TABLE_NAME')))
+log = get_logger("ingest")
 
 def lambda_handler(event, context):
-    print("📥 Ingest: Received Request")
+    log.begin(event, context)
+    log.info("📥 Ingest: Received Request")
+    span = Span("ingest").start()
     
     try:
         # 1. Parse Input
@@ -23,32 +44,76 @@ def lambda_handler(event, context):
         chat_id = body.get('chat_id', 'default')
         file_name = body.get('file_name', 'upload.pdf')
         file_content_b64 = body.get('file_content') # Base64 string
-        user_prompt = body.get('question', 'Analyze this.')
+        question = (body.get('question') or '').strip()
+        user_prompt = question or 'Analyze this.'
+        tier = tier_of(ROUTE_TIERS.get(event.get('routeKey')))  # Body 'tier' is ignored
 
-        if not file_content_b64:
+        # A question alone is a follow-up about the chat's earlier document (visionquest.memory)
+        if not file_content_b64 and not question:
             return {
                 "statusCode": 400,
-                "body": json.dumps({"error": "No file content"})
+                "body": json.dumps({"error": "No file content or question"})
+            }
+        if not file_content_b64:
+            file_name = 'question.json'
+            file_bytes, content_hash = None, None
+        else:
+            # Key of the OCR agent's cache: hashed here, never taken from the client. The
+            # frontend's preprocessing is deterministic, so the same document hashes the same.
+            file_bytes = base64.b64decode(file_content_b64)
+            content_hash = hashlib.sha256(file_bytes).hexdigest()
+
+        # 2. Admission: a burst from one tenant is turned away before any work is queued
+        allowed, retry_after = tenant_bucket.take(user_id)
+        if not allowed:
+            retry_after = math.ceil(retry_after)
+            log.warning("🚦 Rate limited tenant %s", user_id, retry_after=retry_after)
+            span.finish("RateLimited")
+            return {
+                "statusCode": 429,
+                "headers": {"Retry-After": str(retry_after)},
+                "body": json.dumps({"error": "Too many uploads, slow down.", "retry_after": retry_after})
             }
 
-        # 2. Generate Ticket (Job ID)
+        # 3. Generate Ticket (Job ID)
         job_id = f"job-{int(time.time())}-{str(uuid.uuid4())[:8]}"
         s3_key = f"{user_id}/{chat_id}/{job_id}/{file_name}"
         
-        print(f"🎫 Created Job ID: {job_id}")
+        log.bind(job_id=job_id, user_id=user_id)
+        log.info("🎫 Created Job ID: %s", job_id)
+        span.job_id = job_id
 
-        # 3. Write "PROCESSING" to DynamoDB (CRITICAL STEP)
-        jobs_table.put_item(Item={
+        # 4. Write "PROCESSING" to DynamoDB (CRITICAL STEP)
+        job_item = {
             'job_id': job_id,
             'user_id': user_id,
             'chat_id': chat_id,
             'status': 'PROCESSING',
             'created_at': int(time.time()),
-            'file_name': file_name
-        })
-        print("✅ DB Entry Created")
+            'file_name': file_name,
+            'tier': tier,  # Kickoff's fair scheduler serves interactive before bulk
+            'stage_timings': {},  # Each stage's span summary is rolled up here
+            'expiration_time': pending_expiration()  # TTL; extended by the processor on completion
+        }
+        if content_hash:
+            job_item['content_hash'] = content_hash
+        jobs_table.put_item(Item=job_item)
+        log.info("✅ DB Entry Created")
+
+        # The sidebar's chat list (history list_chats) reads this table; best effort
+        try:
+            chats_table.update_item(
+                Key={'user_id': user_id, 'chat_id': chat_id},
+                UpdateExpression="SET updated_at = :t, title = if_not_exists(title, :title), "
+                                 "created_at = if_not_exists(created_at, :t), expiration_time = :x",
+                # The chat goes with its last job (TTL, like the job's completed retention)
+                ExpressionAttributeValues={':t': int(time.time()), ':title': user_prompt[:CHAT_TITLE_CHARS],
+                                           ':x': completed_expiration()}
+            )
+        except Exception as e:
+            log.warning("⚠️ Could not update chat list: %s", e)
 
-        # 4. Upload to S3 (This triggers the Kickoff Lambda)
+        # 5. Upload to S3 (This triggers the Kickoff Lambda)
         # We upload a JSON wrapper to preserve the Prompt
         wrapper = {
             "question": user_prompt,
@@ -57,25 +122,41 @@ def lambda_handler(event, context):
             # BUT for the 'Kickoff' logic we wrote earlier, let's stick to the raw file 
             # OR the wrapper. 
             # FIX: We will upload the RAW PDF to S3 so Textract works natively.
-            # We will store the Prompt in DynamoDB (already done in step 3? No, let's add it).
+            # We will store the Prompt in DynamoDB (already done in step 4? No, let's add it).
         }
         
         # Update DB with prompt
         jobs_table.update_item(
             Key={'job_id': job_id},
             UpdateExpression="SET user_prompt = :p",
-            ExpressionAttributeValues={':p': user_prompt}
+            ExpressionAttributeValues={':p': pack(user_prompt, s3, BUCKET_NAME, f"{OVERFLOW_PREFIX}{job_id}/user_prompt")}
         )
 
-        # Decode and Upload Raw PDF (Better for Textract)
-        file_bytes = base64.b64decode(file_content_b64)
-        s3.put_object(
-            Bucket=BUCKET_NAME,
-            Key=s3_key,
-            Body=file_bytes,
-            ContentType='application/pdf'
-        )
-        print(f"🚀 Uploaded to S3: {s3_key}")
+        # Upload Raw PDF (Better for Textract); a follow-up uploads the wrapper itself
+        if file_bytes is None:
+            file_bytes = json.dumps(wrapper, ensure_ascii=False).encode('utf-8')
+        span.add(request_bytes=len(event.get('body') or ''), file_bytes=len(file_bytes))
+        # The OCR agent reuses a previous OCR of the same document (content-sha256)
+        upload_metadata = {'content-sha256': content_hash} if content_hash else {}
+        with span.phase("s3_upload"):
+            s3.put_object(
+                Bucket=BUCKET_NAME,
+                Key=s3_key,
+                Body=file_bytes,
+                ContentType=mimetypes.guess_type(file_name)[0] or 'application/pdf',
+                Metadata=upload_metadata
+            )
+        log.info("🚀 Uploaded to S3: %s", s3_key, file_bytes=len(file_bytes))
+
+        # Timing is best effort: the upload already started the pipeline
+        try:
+            jobs_table.update_item(
+                Key={'job_id': job_id},
+                UpdateExpression="SET stage_timings.ingest = :t",
+                ExpressionAttributeValues={':t': to_dynamodb(span.finish())}
+            )
+        except Exception as e:
+            log.warning("⚠️ Could not record ingest timing: %s", e)
 
         return {
             "statusCode": 200,
@@ -83,7 +164,8 @@ def lambda_handler(event, context):
         }
 
     except Exception as e:
-        print(f"❌ Ingest Failed: {str(e)}")
+        log.error("❌ Ingest Failed: %s", e)
+        span.finish(type(e).__name__)
         return {
             "statusCode": 500,
             "body": json.dumps({"error": str(e)})
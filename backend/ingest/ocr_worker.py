@@ -1,74 +1,323 @@
 import boto3
-import urllib.parse
 import json
+import urllib.parse
 import time
 import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared layer (backend/shared)
+from visionquest.logs import get_logger
+from visionquest.resilience import Retrier, breaker, time_left
+from visionquest.telemetry import Span
+
+try:
+    import fitz  # PyMuPDF (optional layer): enables the native text-layer fast path
+except ImportError:
+    fitz = None
 
 textract = boto3.client('textract')
 s3 = boto3.client('s3')
+log = get_logger("ocr_worker")
+
+# --- CONFIGURATION ---
+MIN_PAGE_CHARS = int(os.environ.get('MIN_PAGE_CHARS', '40'))        # Fewer characters -> treat the page as a scan
+SCANNED_IMAGE_RATIO = 0.6        # Page mostly covered by an image ...
+SCANNED_MAX_CHARS = 200          # ... with only a header/footer of real text -> scan
+MAX_GARBLED_RATIO = 0.1          # Broken font encodings (no ToUnicode) extract as U+FFFD / control chars
+MAX_LOCAL_PDF_BYTES = int(os.environ.get('MAX_LOCAL_PDF_BYTES', str(100 * 1024 * 1024)))
+OCR_SCRATCH_PREFIX = "_ocr_tmp/"  # Image-only page subsets for Textract (kickoff ignores this prefix)
+OCR_CACHE_PREFIX = "_ocr_cache/"  # Results by tenant + content hash, reused for the same document (ditto)
+POLL_SECONDS = float(os.environ.get('OCR_POLL_SECONDS', '2'))
+OCR_CHUNK_PAGES = int(os.environ.get('OCR_CHUNK_PAGES', '20'))    # Pages per parallel Textract job
+OCR_MAX_PARALLEL = int(os.environ.get('OCR_MAX_PARALLEL', '8'))   # Concurrent Textract jobs per document
+TEXTRACT_MAX_RETRIES = 6
+TEXTRACT_PRICE_PER_PAGE = 0.0015  # DetectDocumentText, USD (first 1M pages/month)
+
+# Shared by the parallel chunk threads and kept across warm invocations
+textract_retrier = Retrier(attempts={"throttle": TEXTRACT_MAX_RETRIES + 1, "transient": 3})
+textract_breaker = breaker("textract")
 
 def lambda_handler(event, context):
-    print(f"🧹 OCR Agent Started. Input: {json.dumps(event)}")
-    
+    log.begin(event, context, job_id=event.get('job_id'))
+    log.info("🧹 OCR Agent Started.")
+
     # 1. Unpack Direct Input
     bucket = event.get('bucket')
     key = event.get('key')
-    
+
     if not bucket or not key:
         raise ValueError("Missing 'bucket' or 'key' in input")
 
-    print(f"🔍 Analyzing document: {key}")
+    log.info("🔍 Analyzing document: %s", key)
+    span = Span("ocr_worker", event.get('job_id')).start()
+    textract_retrier.time_left = time_left(context)
+    retries_before = textract_retrier.retries
+
+    # A follow-up question without a document (ingest uploads the question only):
+    # the processor answers from the chat's earlier document
+    if key.lower().endswith('.json'):
+        log.info("💬 No document. Nothing to OCR.")
+        result = dict(build_result(bucket, key, {}, 0, 0), ocr_mode="none")
+        span.add(pages=0, ocr_pages=0).tag(ocr_mode="none")
+        result['timing'] = span.finish()
+        return result
 
     try:
+        # --- PATH 0: SAME DOCUMENT AS AN EARLIER JOB - no OCR at all ---
+        head = s3.head_object(Bucket=bucket, Key=key)
+        cache_key = ocr_cache_key(key, head)
+        result = read_ocr_cache(bucket, cache_key)
+        cached = result is not None
+        if cached:
+            log.info("♻️ Document OCR'd before. Reusing %s", cache_key)
+            result.update(bucket=bucket, key=key, ocr_pages=0, ocr_mode="cached")
+            span.add(pages=result.get('page_count', 1), ocr_pages=0).tag(ocr_mode="cached")
+
         # --- PATH A: IMAGE (JPG/PNG) - Fast & Synchronous ---
-        if key.lower().endswith(('.png', '.jpg', '.jpeg')):
-            response = textract.detect_document_text(
-                Document={'S3Object': {'Bucket': bucket, 'Name': key}}
-            )
-            return extract_text_from_blocks(response['Blocks'], bucket, key)
+        elif key.lower().endswith(('.png', '.jpg', '.jpeg')):
+            with span.phase("textract"):
+                response = call_textract(
+                    textract.detect_document_text,
+                    Document={'S3Object': {'Bucket': bucket, 'Name': key}},
+                    breaker=textract_breaker
+                )
+            result = extract_text_from_blocks(response['Blocks'], bucket, key)
+            span.add(pages=1, ocr_pages=1)
 
-        # --- PATH B: PDF - Async & Polling ---
+        # --- PATH B: PDF - Native text layer first, Textract only for scanned pages ---
         elif key.lower().endswith('.pdf'):
-            # 1. Start the Job
-            start_response = textract.start_document_text_detection(
-                DocumentLocation={'S3Object': {'Bucket': bucket, 'Name': key}}
-            )
-            job_id = start_response['JobId']
-            print(f"⏳ PDF Detected. Async Job Started: {job_id}")
-
-            # 2. Poll for Completion (Wait loop)
-            status = "IN_PROGRESS"
-            while status == "IN_PROGRESS":
-                time.sleep(2) # Wait 2 seconds
-                job_status = textract.get_document_text_detection(JobId=job_id)
-                status = job_status['JobStatus']
-                
-                if status == "FAILED":
-                    raise Exception(f"Textract Job Failed: {job_status}")
-            
-            # 3. Job Done - Get Results
-            print("✅ PDF Processing Complete.")
-            
-            # Note: Pagination logic is needed for massive PDFs, 
-            # but for <50 pages, this usually grabs the bulk.
-            return extract_text_from_blocks(job_status['Blocks'], bucket, key)
+            result = process_pdf(bucket, key, span, head)
+            span.add(pages=result['page_count'], ocr_pages=result['ocr_pages']).tag(ocr_mode=result['ocr_mode'])
 
         else:
             raise ValueError(f"Unsupported file format: {key}")
 
+        if cache_key and not cached:
+            write_ocr_cache(bucket, cache_key, result)
+
+    except Exception as e:
+        log.error("❌ OCR Failed: %s", e)
+        span.add(retries=textract_retrier.retries - retries_before)
+        span.finish(type(e).__name__)
+        raise e
+
+    span.add(text_chars=len(result['extracted_text']), retries=textract_retrier.retries - retries_before,
+             cost_usd=span.metrics.get('ocr_pages', 0) * TEXTRACT_PRICE_PER_PAGE)
+    # Travels in the Step Functions state to the processor, which stores it on the job
+    result['timing'] = span.finish()
+    return result
+
+def ocr_cache_key(key, head):
+    """Cache entry of the uploaded document, per tenant. None if ingest did not tag it with a hash."""
+    content_hash = head.get('Metadata', {}).get('content-sha256')
+    if not content_hash:
+        return None
+    return f"{OCR_CACHE_PREFIX}{key.split('/')[0]}/{content_hash}.json"
+
+def read_ocr_cache(bucket, cache_key):
+    if not cache_key:
+        return None
+    try:
+        return json.loads(s3.get_object(Bucket=bucket, Key=cache_key)['Body'].read())
     except Exception as e:
-        print(f"❌ OCR Failed: {str(e)}")
-        raise e 
+        # NoSuchKey (or AccessDenied without s3:ListBucket): not OCR'd yet
+        log.debug("OCR cache miss: %s", e)
+        return None
+
+def write_ocr_cache(bucket, cache_key, result):
+    """Best effort: a failed write only costs the next upload of this document an OCR."""
+    try:
+        s3.put_object(Bucket=bucket, Key=cache_key, Body=json.dumps(result, ensure_ascii=False).encode('utf-8'),
+                      ContentType='application/json')
+    except Exception as e:
+        log.warning("⚠️ Could not cache OCR result: %s", e)
+
+def process_pdf(bucket, key, span, head=None):
+    """
+    Digitally generated pages are read straight from the PDF text layer
+    (milliseconds); only image-only pages are sent to Textract, split into
+    page ranges that are OCR'd in parallel.
+    """
+    if fitz is None:
+        log.warning("⚠️ PyMuPDF not available. Sending the whole PDF to Textract.")
+        with span.phase("textract"):
+            return textract_pdf(bucket, key)
+
+    head = head or s3.head_object(Bucket=bucket, Key=key)
+    span.add(file_bytes=head['ContentLength'])
+    if head['ContentLength'] > MAX_LOCAL_PDF_BYTES:
+        log.warning("⚠️ PDF too large for local parsing (%d bytes). Using Textract.", head['ContentLength'])
+        with span.phase("textract"):
+            return textract_pdf(bucket, key)
+
+    pdf_bytes = s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+    started = time.time()
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception as e:
+        log.warning("⚠️ PyMuPDF could not open the PDF (%s). Using Textract.", e)
+        with span.phase("textract"):
+            return textract_pdf(bucket, key)
+
+    with doc:
+        page_texts = {}
+        scanned_pages = []
+        with span.phase("native"):
+            for page in doc:
+                text = page.get_text("text", sort=True)
+                if has_usable_text_layer(page, text):
+                    page_texts[page.number] = text.strip()
+                else:
+                    scanned_pages.append(page.number)
+        page_count = doc.page_count
+        log.info("📑 %d page(s): %d native, %d need OCR (%.0f ms)", page_count, len(page_texts),
+                 len(scanned_pages), (time.time() - started) * 1000)
+
+        if scanned_pages:
+            with span.phase("textract"):
+                page_texts.update(ocr_pages(doc, scanned_pages, bucket, key))
+
+    return build_result(bucket, key, page_texts, page_count, len(scanned_pages))
+
+def ocr_pages(doc, page_numbers, bucket, key):
+    """
+    OCRs the given pages (0-based). A small, fully scanned PDF goes to Textract
+    as is; otherwise the pages are split into OCR_CHUNK_PAGES ranges, each
+    uploaded as its own PDF and OCR'd in parallel, so a long filing takes
+    about as long as its slowest chunk.
+    Returns {page index: text}.
+    """
+    if len(page_numbers) == doc.page_count and len(page_numbers) <= OCR_CHUNK_PAGES:
+        return {page - 1: text for page, text in textract_pages(bucket, key).items()}
+
+    # Build the subsets up front: PyMuPDF documents are not thread-safe
+    chunks = [page_numbers[i:i + OCR_CHUNK_PAGES] for i in range(0, len(page_numbers), OCR_CHUNK_PAGES)]
+    subsets = [(chunk, page_subset(doc, chunk)) for chunk in chunks]
+    log.info("🧩 OCR of %d page(s) in %d chunk(s), up to %d in parallel", len(page_numbers), len(chunks), OCR_MAX_PARALLEL)
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, min(OCR_MAX_PARALLEL, len(chunks)))) as pool:
+        results = list(pool.map(lambda item: ocr_chunk(item[0], item[1], bucket, key), subsets))
+    log.info("✅ Parallel OCR finished in %.1fs", time.time() - started)
+
+    page_texts = {}
+    for chunk_texts in results:
+        page_texts.update(chunk_texts)
+    return page_texts
+
+def ocr_chunk(chunk, subset_bytes, bucket, key):
+    """Uploads one page range, OCRs it and maps subset pages back to original page indexes."""
+    subset_key = f"{OCR_SCRATCH_PREFIX}{uuid.uuid4()}-p{chunk[0] + 1}-{os.path.basename(key)}"
+    s3.put_object(Bucket=bucket, Key=subset_key, Body=subset_bytes)
+    try:
+        texts = textract_pages(bucket, subset_key)
+    finally:
+        s3.delete_object(Bucket=bucket, Key=subset_key)
+    # Subset page n (1-based) is original page chunk[n - 1]
+    return {chunk[page - 1]: text for page, text in texts.items()}
+
+def has_usable_text_layer(page, text):
+    """Text-layer coverage check for one page."""
+    stripped = "".join(text.split())
+    if len(stripped) < MIN_PAGE_CHARS:
+        return False
+
+    garbled = sum(1 for ch in stripped if ch == "�" or ord(ch) < 32)
+    if garbled / float(len(stripped)) > MAX_GARBLED_RATIO:
+        return False
+
+    # A full-page scan with a small printed header/footer is still a scan
+    page_area = abs(page.rect) or 1.0
+    image_area = 0.0
+    for info in page.get_image_info():
+        image_area += abs(fitz.Rect(info['bbox']) & page.rect)
+    if image_area / page_area >= SCANNED_IMAGE_RATIO and len(stripped) < SCANNED_MAX_CHARS:
+        return False
+    return True
+
+def page_subset(doc, page_numbers):
+    """PDF bytes holding only the given pages (in order)."""
+    subset = fitz.open()
+    for number in page_numbers:
+        subset.insert_pdf(doc, from_page=number, to_page=number)
+    data = subset.tobytes(garbage=3, deflate=True)
+    subset.close()
+    return data
+
+def textract_pdf(bucket, key, page_count=None):
+    page_texts = textract_pages(bucket, key)
+    page_count = page_count or max(page_texts, default=0)
+    return build_result(bucket, key, {page - 1: text for page, text in page_texts.items()},
+                        page_count, page_count)
+
+def textract_pages(bucket, key):
+    """Async Textract text detection. Returns {page number (1-based): text}."""
+    # 1. Start the Job
+    start_response = call_textract(
+        textract.start_document_text_detection,
+        DocumentLocation={'S3Object': {'Bucket': bucket, 'Name': key}},
+        breaker=textract_breaker
+    )
+    job_id = start_response['JobId']
+    log.info("⏳ PDF Detected. Async Job Started: %s", job_id)
+
+    # 2. Poll for Completion (Wait loop)
+    status = "IN_PROGRESS"
+    while status == "IN_PROGRESS":
+        time.sleep(POLL_SECONDS)
+        job_status = call_textract(textract.get_document_text_detection, JobId=job_id)
+        status = job_status['JobStatus']
+
+        if status == "FAILED":
+            raise Exception(f"Textract Job Failed: {job_status}")
+
+    # 3. Job Done - Collect every result page (1000 blocks per response)
+    log.info("✅ PDF Processing Complete.")
+    blocks = list(job_status['Blocks'])
+    next_token = job_status.get('NextToken')
+    while next_token:
+        job_status = call_textract(textract.get_document_text_detection, JobId=job_id, NextToken=next_token)
+        blocks.extend(job_status['Blocks'])
+        next_token = job_status.get('NextToken')
+
+    lines_by_page = {}
+    for item in blocks:
+        if item['BlockType'] == 'LINE':
+            lines_by_page.setdefault(item.get('Page', 1), []).append(item['Text'])
+    return {page: "\n".join(lines) for page, lines in lines_by_page.items()}
+
+def call_textract(fn, breaker=None, **kwargs):
+    """
+    Textract call with jittered backoff: parallel chunks share the account's
+    TPS limits. New jobs go through the "textract" circuit breaker; polling a
+    job we already started does not, so an open circuit never throws away
+    work in progress.
+    """
+    return textract_retrier.call(fn, breaker=breaker, **kwargs)
+
+def build_result(bucket, key, page_texts, page_count, ocr_pages):
+    """Merges per-page text in page order."""
+    extracted_text = "\n".join(page_texts[number] for number in sorted(page_texts) if page_texts[number])
+    return {
+        "status": "SUCCESS",
+        "bucket": bucket,
+        "key": key,
+        "extracted_text": extracted_text + "\n" if extracted_text else "",
+        "page_count": page_count,
+        "ocr_pages": ocr_pages,
+        "ocr_mode": "native" if not ocr_pages else ("textract" if ocr_pages == page_count else "mixed")
+    }
 
 def extract_text_from_blocks(blocks, bucket, key):
     extracted_text = ""
     for item in blocks:
         if item['BlockType'] == 'LINE':
             extracted_text += item['Text'] + "\n"
-            
+
     return {
         "status": "SUCCESS",
         "bucket": bucket,
         "key": key,
         "extracted_text": extracted_text
-    }
\ No newline at end of file
+    }
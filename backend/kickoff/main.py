@@ -4,22 +4,45 @@ import os
 import urllib.parse
 import time
 
+# Shared layer (backend/shared)
+from visionquest.admission import SlotPool
+from visionquest.compression import OVERFLOW_PREFIX, unpack
+from visionquest.logs import get_logger
+from visionquest.scheduler import FairQueue, tier_of
+from visionquest.telemetry import Span
+
 sfn = boto3.client('stepfunctions')
 s3 = boto3.client('s3')
+dynamodb = boto3.resource('dynamodb')
 
 STATE_MACHINE_ARN = os.environ['STATE_MACHINE_ARN']
+jobs_table = dynamodb.Table(os.environ.get('JOBS_TABLE_NAME'))
+admission_table = dynamodb.Table(os.environ.get('ADMISSION_TABLE_NAME'))
+queue = FairQueue(admission_table)  # Per-tenant lanes, interactive before bulk (visionquest.scheduler)
+slots = SlotPool(admission_table)  # Limit: min(Textract, Bedrock) concurrency (visionquest.admission)
+MAX_DISPATCH_PER_CALL = int(os.environ.get('MAX_DISPATCH_PER_CALL', '25'))
+OCR_SCRATCH_PREFIX = "_ocr_tmp/"  # Must match backend/ingest/ocr_worker.py
+OCR_CACHE_PREFIX = "_ocr_cache/"  # Ditto
+log = get_logger("kickoff")
 
 def lambda_handler(event, context):
-    print("🚀 Kickoff: New file detected.")
+    log.begin(event, context)
+    log.info("🚀 Kickoff: New file detected.")
+    span = Span("kickoff").start()
     
     # 1. Parse S3 Event
     try:
         record = event['Records'][0]
         bucket = record['s3']['bucket']['name']
         key = urllib.parse.unquote_plus(record['s3']['object']['key'])
-        print(f"📂 File: {key} in Bucket: {bucket}")
+        log.info("📂 File: %s in Bucket: %s", key, bucket)
     except Exception as e:
-        print(f"❌ Error parsing event: {e}")
+        log.error("❌ Error parsing event: %s", e)
+        return
+
+    # Page subsets the OCR agent uploads for Textract, its cached results and oversized answers are not new jobs
+    if key.startswith((OCR_SCRATCH_PREFIX, OCR_CACHE_PREFIX, OVERFLOW_PREFIX)):
+        log.debug("⏭️ Internal file. Skipping.")
         return
 
     # 2. Determine File Type & Extract Prompt
@@ -35,16 +58,16 @@ def lambda_handler(event, context):
             # If it's a wrapper, the REAL file might be inside, or this IS the metadata
             # For now, let's assume if it's JSON, the prompt is inside.
             user_prompt = data.get('question', user_prompt)
-            print(f"📝 Found JSON wrapper. Prompt: {user_prompt}")
+            log.info("📝 Found JSON wrapper.", prompt=user_prompt)
             
         elif key.lower().endswith('.pdf'):
-            print("Tb Detected Raw PDF. Using default prompt.")
+            log.info("📄 Detected Raw PDF. Using default prompt.")
             
         else:
-            print(f"⚠️ Unknown file type: {key}. Proceeding anyway.")
+            log.warning("⚠️ Unknown file type: %s. Proceeding anyway.", key)
 
     except Exception as e:
-        print(f"⚠️ Warning: Could not read file content for prompt. Using default. Error: {e}")
+        log.warning("⚠️ Could not read file content for prompt. Using default. Error: %s", e)
 
     # 3. Generate Job ID (Unique)
     # If key is "user/chat/job/file.pdf", split it. If just "file.pdf", make one up.
@@ -53,27 +76,149 @@ def lambda_handler(event, context):
         job_id = parts[2]
     else:
         job_id = f"job-{int(time.time())}"
+    span.job_id = job_id
+    log.bind(job_id=job_id)
+    span.add(file_bytes=record['s3']['object'].get('size'))
+
+    # Ingest keeps the question on the job: raw uploads (PDF, images) carry none
+    job = job_record(job_id)
+    if job is not None and job.get('user_prompt'):
+        try:
+            user_prompt = unpack(job['user_prompt'], s3)
+        except Exception as e:
+            log.warning("⚠️ Could not read the question. Using %r. Error: %s", user_prompt, e)
 
-    # 4. Start Orchestrator
+    # 4. Queue the job, then start whatever fits under the concurrency limit
     try:
+        # The span rides along to the processor, which rolls every stage up
+        # onto the job record
         input_payload = {
             "bucket": bucket,
             "key": key,
             "job_details": {
                 "job_id": job_id,
-                "user_prompt": user_prompt
+                "user_prompt": user_prompt,
+                # The processor reads the chat's earlier turns (visionquest.memory)
+                "user_id": parts[0] if len(parts) > 2 else None,
+                "chat_id": parts[1] if len(parts) > 2 else None,
+                "stage_timings": {"kickoff": span.finish()}
             }
         }
-        
-        print(f"🚀 Starting Execution for Job: {job_id}")
-        sfn.start_execution(
-            stateMachineArn=STATE_MACHINE_ARN,
-            name=f"{job_id}-{int(time.time())}", # Ensure unique execution name
-            input=json.dumps(input_payload)
+
+        tenant = parts[0] if len(parts) > 2 else "anonymous"
+        tier = tier_of(job.get('tier')) if job is not None else 'bulk'
+        lane, seq = queue.enqueue(tier, tenant, job_id, input_payload)
+        mark_queued(job_id, lane, seq)
+        log.info("📥 Queued Job: %s", job_id, lane=lane, seq=seq)
+
+    except Exception as e:
+        log.error("❌ FAILED to queue job: %s", e)
+        raise e
+
+    # The job is queued: raising now would make S3 retry this event and queue it
+    # again under a new seq (a second execution). Release Slot and the 1-minute
+    # sweep dispatch whatever is left.
+    try:
+        started = dispatch()
+    except Exception as e:
+        log.warning("⚠️ Dispatch failed, the next sweep retries: %s", e)
+        started = 0
+    return {"status": "QUEUED", "job_id": job_id, "started": started}
+
+
+def dispatch_handler(event, context):
+    """
+    Frees capacity and starts queued jobs. Invoked by the state machine's
+    "Release Slot" step ({"slot": token}) and every minute by EventBridge.
+    """
+    log.begin(event, context)
+    released = []
+    if event.get('slot'):
+        if slots.release(event['slot']):
+            released.append(event['slot'])
+    else:
+        # Scheduled sweep: executions that timed out / were aborted never reached Release Slot
+        released = slots.reclaim_expired()
+        if released:
+            log.warning("♻️ Reclaimed %d expired slots.", len(released))
+        queue.prune()
+    started = dispatch()
+    return {"released": len(released), "started": started}
+
+
+def dispatch(limit=MAX_DISPATCH_PER_CALL):
+    """Starts queued jobs while slots are free. Returns the number started."""
+    started = 0
+    while started < limit:
+        state = queue.state()
+        if not queue.has_backlog(state):
+            break
+        token = slots.acquire()
+        if token is None:
+            log.info("⏸️ At concurrency limit.", **slots.usage())
+            break
+        claimed = queue.claim(state)
+        if claimed is None:
+            slots.release(token)
+            break
+        job_id, payload = claimed["job_id"], claimed["payload"]
+        payload["admission"] = {"slot": token, "lane": claimed["lane"], "seq": claimed["seq"]}
+        try:
+            log.info("🚀 Starting Execution for Job: %s", job_id)
+            sfn.start_execution(
+                stateMachineArn=STATE_MACHINE_ARN,
+                name=f"{job_id}-{claimed['seq']}",  # Unique and stable if this start is retried
+                input=json.dumps(payload)
+            )
+        except Exception as e:
+            if (getattr(e, 'response', None) or {}).get('Error', {}).get('Code') != 'ExecutionAlreadyExists':
+                slots.release(token)
+                queue.enqueue(claimed["tier"], claimed["tenant"], job_id,
+                              {k: v for k, v in payload.items() if k != 'admission'})
+                log.error("❌ FAILED to start Step Function: %s", e, job_id=job_id)
+                raise
+            slots.release(token)  # Already running under its own slot
+            continue
+        mark_dispatched(job_id)
+        started += 1
+    return started
+
+
+def job_record(job_id):
+    """
+    Tier and question as recorded by ingest. None for files dropped straight
+    into S3: they are treated as bulk.
+    """
+    try:
+        return jobs_table.get_item(Key={'job_id': job_id}, ProjectionExpression='tier, user_prompt').get('Item')
+    except Exception as e:
+        log.warning("⚠️ Could not read job record: %s", e)
+        return None
+
+
+def mark_queued(job_id, lane, seq):
+    """Status shows the queue position. Uploads that bypassed ingest have no job record."""
+    try:
+        jobs_table.update_item(
+            Key={'job_id': job_id},
+            UpdateExpression="SET #s = :s, queue_lane = :l, queue_seq = :q",
+            # Another dispatcher may already have started it
+            ConditionExpression="attribute_exists(job_id) AND attribute_not_exists(dispatched_at)",
+            ExpressionAttributeNames={'#s': 'status'},
+            ExpressionAttributeValues={':s': 'QUEUED', ':l': lane, ':q': seq}
+        )
+    except Exception as e:
+        log.debug("No job record to mark queued: %s", e)
+
+
+def mark_dispatched(job_id):
+    try:
+        jobs_table.update_item(
+            Key={'job_id': job_id},
+            UpdateExpression="SET #s = :s, dispatched_at = :t REMOVE queue_lane, queue_seq",
+            ConditionExpression="attribute_exists(job_id)",
+            ExpressionAttributeNames={'#s': 'status'},
+            ExpressionAttributeValues={':s': 'PROCESSING', ':t': int(time.time())}
         )
-        print("✅ State Machine Triggered!")
-        return {"status": "SUCCESS", "job_id": job_id}
-        
     except Exception as e:
-        print(f"❌ FAILED to start Step Function: {str(e)}")
-        raise e
\ No newline at end of file
+        log.debug("Job not marked processing: %s", e)
\ No newline at end of file
@@ -1,16 +1,67 @@
 import json
 import boto3
 import os
+import time
+
+# Shared layer (backend/shared)
+from visionquest.compression import OVERFLOW_PREFIX, pack
+from visionquest.context import estimate_tokens
+from visionquest.model_router import ModelRouter, claude_catalog, classify_question, load_catalog
+from visionquest.logs import get_logger
+from visionquest.memory import SUMMARY_MAX_TOKENS, ChatMemory, render_conversation
+from visionquest.resilience import Retrier, ServiceError, breaker, time_left
+from visionquest.retention import completed_expiration
+from visionquest.telemetry import Span, to_dynamodb
+from visionquest.warm_cache import PromptTemplate
 
 dynamodb = boto3.resource('dynamodb')
 bedrock = boto3.client('bedrock-runtime')
+s3 = boto3.client('s3')
 
 JOBS_TABLE_NAME = os.environ.get('JOBS_TABLE_NAME')
-MODEL_ARN = os.environ.get('MODEL_ARN')
+BUCKET_NAME = os.environ.get('s3_bucket_name')       # Overflow for answers too big for the item
+MODEL_ARN = os.environ.get('MODEL_ARN')              # Large model (default for audits / long docs)
+SMALL_MODEL_ARN = os.environ.get('SMALL_MODEL_ARN')  # Optional cheaper model for short questions
+LATENCY_SLO_MS = int(os.environ.get('LATENCY_SLO_MS', '20000'))
+SFN_RETRY_ATTEMPTS = int(os.environ.get('SFN_RETRY_ATTEMPTS', '0'))  # Step Functions retries of ServiceError
 jobs_table = dynamodb.Table(JOBS_TABLE_NAME)
+log = get_logger("processor")
+# Earlier turns (ChatIndex), rolling summary and document per chat (visionquest.memory)
+memory = ChatMemory(jobs_table, dynamodb.Table(os.environ.get('CHATS_TABLE_NAME')), s3, BUCKET_NAME, log=log)
+
+# Built once per container (visionquest.warm_cache)
+PROMPT_TEMPLATE = PromptTemplate("""
+    You are an expert AI Data Analyst for Saudi SMEs.
+    {conversation}User Question: {user_prompt}
+
+    Document Context:
+    {extracted_text}
+
+    Provide a professional, concise answer in Arabic (unless asked otherwise).
+""")
+SUMMARY_TEMPLATE = PromptTemplate("""
+    Update the running summary of a conversation between a user and an AI Data Analyst.
+    Keep figures, names, decisions and open questions; drop greetings and repetition.
+    Reply with the updated summary only, in the conversation's language, in at most {max_words} words.
+
+    Current summary:
+    {summary}
+
+    New turns:
+    {turns}
+""")
+
+# Lives across warm invocations, so routing stats and circuit breakers accumulate per container
+model_router = ModelRouter(load_catalog(claude_catalog(MODEL_ARN, SMALL_MODEL_ARN)), breakers=breaker)
+# One quick retry on a throttled model, then the router falls back to the next one
+bedrock_retrier = Retrier(attempts={"throttle": 2, "transient": 3})
 
 def lambda_handler(event, context):
-    print("🧠 Brain Activated.")
+    log.begin(event, context)
+    log.info("🧠 Brain Activated.")
+    span = Span("processor").start()
+    bedrock_retrier.time_left = time_left(context)
+    retries_before = bedrock_retrier.retries
     
     # 1. Unpack Input (From OCR Step)
     # The Step Function passes the output of OCR as 'ocr_result'
@@ -26,20 +77,22 @@ def lambda_handler(event, context):
         if not job_id:
             raise ValueError("Job ID missing from event payload")
 
-        print(f"⚙️ Processing Job: {job_id}")
+        log.bind(job_id=job_id)
+        log.info("⚙️ Processing Job: %s", job_id)
+        span.job_id = job_id
 
-        # 2. Construct Prompt
-        final_prompt = f"""
-        You are an expert AI Data Analyst for Saudi SMEs.
-        User Question: {user_prompt}
-        
-        Document Context:
-        {extracted_text}
-        
-        Provide a professional, concise answer in Arabic (unless asked otherwise).
-        """
+        # 2. Conversation memory: earlier turns, and the chat's document for a follow-up without one
+        conversation, reused_document = load_memory(job_details, extracted_text, span)
+        if reused_document is not None:
+            extracted_text = reused_document
 
-        # 3. Call Bedrock (Claude 3.5 Sonnet)
+        # 3. Construct Prompt
+        prompt_started = time.perf_counter()
+        final_prompt = PROMPT_TEMPLATE.render(conversation=conversation, user_prompt=user_prompt,
+                                              extracted_text=extracted_text)
+        span.add(prompt_ms=(time.perf_counter() - prompt_started) * 1000.0, prompt_chars=len(final_prompt))
+
+        # 4. Call Bedrock (Claude, model picked by the router)
         payload = {
             "anthropic_version": "bedrock-2023-05-31",
             "max_tokens": 2000,
@@ -47,33 +100,157 @@ def lambda_handler(event, context):
                 {"role": "user", "content": [{"type": "text", "text": final_prompt}]}
             ]
         }
+        body = json.dumps(payload)  # Once, not per retry / fallback attempt
+
+        def call_model(model):
+            with span.phase("bedrock"):
+                response = bedrock_retrier.call(
+                    bedrock.invoke_model,
+                    modelId=model.model_id,
+                    body=body
+                )
+                result = json.loads(response['body'].read().decode('utf-8'))
+            usage = result.get('usage', {})
+            input_tokens, output_tokens = usage.get('input_tokens', 0), usage.get('output_tokens', 0)
+            span.add(input_tokens=input_tokens, output_tokens=output_tokens,
+                     cost_usd=model.expected_cost(input_tokens, output_tokens))
+            return result['content'][0]['text'], usage
 
-        response = bedrock.invoke_model(
-            modelId=MODEL_ARN,
-            body=json.dumps(payload)
+        candidates = model_router.route(
+            modality="text",
+            input_tokens=estimate_tokens(final_prompt),
+            question_class=classify_question(user_prompt),
+            latency_slo_ms=LATENCY_SLO_MS,
+            output_tokens=2000
         )
-        
-        result = json.loads(response['body'].read().decode('utf-8'))
-        ai_answer = result['content'][0]['text']
+        try:
+            ai_answer, model = model_router.invoke(candidates, call_model)
+        finally:
+            span.add(retries=bedrock_retrier.retries - retries_before)
+        log.info("🤖 Answered by %s", model.name)
+        span.tag(model=model.name)
+
+        # 5. The Scribe (Write to DB)
+        log.info("✅ Analysis complete. Saving to DynamoDB...")
+        # Long answers are stored compressed (or in S3 past the item limit); status unpacks them
+        stored_answer = pack(ai_answer, s3, BUCKET_NAME, f"{OVERFLOW_PREFIX}{job_id}/answer")
+        timings = collect_timings(job_details, ocr_result, span.finish())
+        save_job(job_id, "SET #s = :s, answer = :a, expiration_time = :x",
+                 {':s': 'SUCCESS', ':a': stored_answer, ':x': completed_expiration()}, timings)
+
+        # A new document becomes the chat's context for follow-up questions
+        if extracted_text.strip() and reused_document is None and job_details.get('chat_id'):
+            try:
+                memory.save_document(job_details.get('user_id'), job_details['chat_id'], job_id, extracted_text)
+            except Exception as e:
+                log.warning("⚠️ Could not keep the document for follow-ups: %s", e)
 
-        # 4. The Scribe (Write to DB)
-        print("✅ Analysis complete. Saving to DynamoDB...")
+        return {"status": "SUCCESS", "job_id": job_id}
+
+    except Exception as e:
+        attempt = event.get('attempt', SFN_RETRY_ATTEMPTS)
+        if isinstance(e, ServiceError) and attempt < SFN_RETRY_ATTEMPTS:
+            # Throttled / transient after our own retries: the state machine retries later, job stays PROCESSING
+            log.warning("🔁 %s. Step Functions will retry (attempt %s).", e, attempt + 1)
+            span.finish(type(e).__name__)
+            raise
+        log.error("❌ Processor Error: %s", e)
+        if 'job_id' in locals() and job_id:
+            timings = collect_timings(event.get('job_details', {}), event.get('ocr_result', {}),
+                                      span.finish(type(e).__name__))
+            save_job(job_id, "SET #s = :s, error_msg = :e, expiration_time = :x",
+                     {':s': 'FAILED', ':e': str(e), ':x': completed_expiration()}, timings)
+        raise e
+
+def load_memory(job_details, extracted_text, span):
+    """
+    (prompt section with the earlier conversation, the chat's document text
+    if this job has none of its own, else None). Memory is an extra: if it
+    fails, the question is answered on its own.
+    """
+    user_id, chat_id = job_details.get('user_id'), job_details.get('chat_id')
+    if not user_id or not chat_id:
+        return "", None
+    try:
+        with span.phase("memory"):
+            state = memory.load(user_id, chat_id, job_details.get('job_id'))
+            document = None
+            if not extracted_text.strip():
+                document = memory.document(state)
+                span.tag(doc_context="reused" if document else "none")
+            summary, turns = memory.fit(state, user_id, chat_id, lambda s, t: summarize(s, t, span))
+        conversation = render_conversation(summary, turns)
+        span.add(memory_turns=len(turns), memory_tokens=estimate_tokens(conversation))
+        return conversation, document
+    except Exception as e:
+        log.warning("⚠️ Conversation memory unavailable: %s", e)
+        return "", None
+
+def summarize(summary, turns_text, span):
+    """Folds older turns into the chat's rolling summary, on the cheapest suitable model."""
+    prompt = SUMMARY_TEMPLATE.render(summary=summary or "(none yet)", turns=turns_text,
+                                     max_words=SUMMARY_MAX_TOKENS // 2)
+    body = json.dumps({
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": SUMMARY_MAX_TOKENS,
+        "messages": [{"role": "user", "content": [{"type": "text", "text": prompt}]}]
+    })
+
+    def call_model(model):
+        with span.phase("summary"):
+            response = bedrock_retrier.call(bedrock.invoke_model, modelId=model.model_id, body=body)
+            result = json.loads(response['body'].read().decode('utf-8'))
+        usage = result.get('usage', {})
+        input_tokens, output_tokens = usage.get('input_tokens', 0), usage.get('output_tokens', 0)
+        span.add(summary_tokens=input_tokens + output_tokens,
+                 cost_usd=model.expected_cost(input_tokens, output_tokens))
+        return result['content'][0]['text'], usage
+
+    candidates = model_router.route(modality="text", input_tokens=estimate_tokens(prompt),
+                                    question_class="lookup", output_tokens=SUMMARY_MAX_TOKENS)
+    text, model = model_router.invoke(candidates, call_model)
+    log.info("🗜️ Chat summary updated by %s", model.name)
+    return text
+
+def collect_timings(job_details, ocr_result, processor_timing):
+    """Spans handed along the Step Functions state, plus this one."""
+    timings = dict(job_details.get('stage_timings') or {})
+    if ocr_result.get('timing'):
+        timings['ocr_worker'] = ocr_result['timing']
+    timings['processor'] = processor_timing
+    return timings
+
+def save_job(job_id, expression, values, timings):
+    """
+    Final job update plus the stage timings. Files dropped straight into S3
+    have no ingest record (no stage_timings map to set paths in): they get
+    the whole map instead, as update_item creates the item.
+    """
+    try:
         jobs_table.update_item(
             Key={'job_id': job_id},
-            UpdateExpression="SET #s = :s, answer = :a",
+            UpdateExpression=expression + ", " + timing_expression(timings),
+            ExpressionAttributeNames=dict({'#s': 'status'}, **timing_names(timings)),
+            ExpressionAttributeValues=dict(values, **timing_values(timings))
+        )
+    except Exception as e:
+        if (getattr(e, 'response', None) or {}).get('Error', {}).get('Code') != 'ValidationException':
+            raise
+        log.info("No stage_timings on the job record. Writing the whole map.")
+        jobs_table.update_item(
+            Key={'job_id': job_id},
+            UpdateExpression=expression + ", stage_timings = :timings",
             ExpressionAttributeNames={'#s': 'status'},
-            ExpressionAttributeValues={':s': 'SUCCESS', ':a': ai_answer}
+            ExpressionAttributeValues=dict(values, **{':timings': {stage: to_dynamodb(summary)
+                                                                   for stage, summary in timings.items()}})
         )
 
-        return {"status": "SUCCESS", "job_id": job_id}
+def timing_expression(timings):
+    # One path per stage: ingest already wrote stage_timings.ingest
+    return ", ".join(f"stage_timings.#t_{stage} = :t_{stage}" for stage in timings)
 
-    except Exception as e:
-        print(f"❌ Processor Error: {str(e)}")
-        if 'job_id' in locals() and job_id:
-            jobs_table.update_item(
-                Key={'job_id': job_id},
-                UpdateExpression="SET #s = :s, error_msg = :e",
-                ExpressionAttributeNames={'#s': 'status'},
-                ExpressionAttributeValues={':s': 'FAILED', ':e': str(e)}
-            )
-        raise e
\ No newline at end of file
+def timing_names(timings):
+    return {f"#t_{stage}": stage for stage in timings}
+
+def timing_values(timings):
+    return {f":t_{stage}": to_dynamodb(summary) for stage, summary in timings.items()}
\ No newline at end of file
@@ -0,0 +1,4 @@
+"""
+Shared helpers for the VisionQuest Lambdas and local tools.
+Deployed to AWS as a Lambda layer (backend/shared -> /opt/python).
+"""
@@ -0,0 +1,233 @@
+"""
+Admission control for the pipeline, on one DynamoDB table keyed by `pk`.
+Every item is a single key, so each step is one conditional write:
+
+  - TenantBucket ("tenant#<user_id>"): per-tenant upload rate at ingest
+    (stored, unlike ratelimit.TokenBucket which paces one process);
+  - JobQueue ("<name>" + "<name>#<seq>"): FIFO of jobs waiting to start.
+    The "<name>" item holds two counters, `enqueued` (last seq handed out)
+    and `head` (last seq claimed), so a job's position is seq - head.
+    scheduler.FairQueue keeps one per (tier, tenant) lane;
+  - SlotPool ("slots"): jobs in flight, capped below the Textract / Bedrock
+    concurrency quotas. A slot is a random token leased at dispatch and
+    released by the state machine's last step; leases older than the state
+    machine timeout are reclaimed, so a lost release cannot leak capacity.
+
+    bucket = TenantBucket(table, rate_per_second=0.2, burst=10)
+    allowed, retry_after = bucket.take(user_id)
+"""
+import json
+import os
+import time
+import uuid
+from decimal import Decimal
+
+# --- CONFIGURATION ---
+TENANT_RATE_PER_MINUTE = float(os.environ.get("TENANT_RATE_PER_MINUTE", "12"))
+TENANT_BURST = float(os.environ.get("TENANT_BURST", "10"))
+TEXTRACT_MAX_CONCURRENCY = int(os.environ.get("TEXTRACT_MAX_CONCURRENCY", "50"))
+TEXTRACT_JOBS_PER_UPLOAD = int(os.environ.get("OCR_MAX_PARALLEL", "8"))  # ocr_worker fan-out per document
+BEDROCK_MAX_CONCURRENCY = int(os.environ.get("BEDROCK_MAX_CONCURRENCY", "10"))
+SLOT_LEASE_SECONDS = int(os.environ.get("SLOT_LEASE_SECONDS", "1800"))  # >= state machine TimeoutSeconds
+IDLE_EXPIRY_SECONDS = 7 * 86400  # TTL for tenant buckets and queue tombstones
+
+
+def max_inflight():
+    """Jobs that fit at once: each one holds up to OCR_MAX_PARALLEL Textract jobs, then one Bedrock call."""
+    return max(1, min(TEXTRACT_MAX_CONCURRENCY // max(1, TEXTRACT_JOBS_PER_UPLOAD), BEDROCK_MAX_CONCURRENCY))
+
+
+def conditional_failed(error):
+    return (getattr(error, "response", None) or {}).get("Error", {}).get("Code") == "ConditionalCheckFailedException"
+
+
+def ensure_item(table, pk, **attributes):
+    """Creates a singleton item once; concurrent creators are fine."""
+    try:
+        table.put_item(Item=dict(pk=pk, **attributes), ConditionExpression="attribute_not_exists(pk)")
+    except Exception as e:
+        if not conditional_failed(e):
+            raise
+
+
+class TenantBucket:
+    """Refills at rate_per_second up to burst; one token per upload."""
+
+    def __init__(self, table, rate_per_second=None, burst=None, clock=time.time, attempts=3):
+        self.table = table
+        self.rate = rate_per_second if rate_per_second is not None else TENANT_RATE_PER_MINUTE / 60.0
+        self.burst = burst if burst is not None else TENANT_BURST
+        self.clock = clock
+        self.attempts = attempts
+
+    def take(self, tenant, cost=1):
+        """(allowed, retry_after_seconds). Optimistic: retries when another upload raced us."""
+        pk = f"tenant#{tenant}"
+        for _ in range(self.attempts):
+            item = self.table.get_item(Key={"pk": pk}, ConsistentRead=True).get("Item")
+            now = self.clock()
+            if item:
+                elapsed = max(0.0, now - float(item["refilled_at"]))
+                tokens = min(self.burst, float(item["tokens"]) + elapsed * self.rate)
+                condition = {"ConditionExpression": "refilled_at = :prev",
+                             "ExpressionAttributeValues": {":prev": item["refilled_at"]}}
+            else:
+                tokens = self.burst
+                condition = {"ConditionExpression": "attribute_not_exists(pk)"}
+            if tokens < cost:
+                return False, (cost - tokens) / self.rate
+            try:
+                self.table.put_item(Item={
+                    "pk": pk,
+                    "tokens": Decimal(str(round(tokens - cost, 4))),
+                    "refilled_at": Decimal(str(round(now, 3))),
+                    "expiration_time": int(now + IDLE_EXPIRY_SECONDS)
+                }, **condition)
+                return True, 0.0
+            except Exception as e:
+                if not conditional_failed(e):
+                    raise
+        # Heavy contention on one tenant is itself a sign to back off
+        return False, 1.0 / self.rate
+
+
+class SlotPool:
+    """In-flight jobs. Tokens are released idempotently (REMOVE of a map key)."""
+
+    PK = "slots"
+
+    def __init__(self, table, limit=None, lease_seconds=SLOT_LEASE_SECONDS, clock=time.time):
+        self.table = table
+        self.limit = limit if limit is not None else max_inflight()
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+        self._ready = False
+
+    def _init(self):
+        if not self._ready:
+            ensure_item(self.table, self.PK, inflight=0, holders={})
+            self._ready = True
+
+    def acquire(self):
+        """A slot token, or None when the pool is full."""
+        self._init()
+        token = uuid.uuid4().hex
+        try:
+            self.table.update_item(
+                Key={"pk": self.PK},
+                UpdateExpression="SET holders.#t = :now, inflight = inflight + :one",
+                ConditionExpression="inflight < :max",
+                ExpressionAttributeNames={"#t": token},
+                ExpressionAttributeValues={":now": int(self.clock()), ":one": 1, ":max": self.limit}
+            )
+            return token
+        except Exception as e:
+            if conditional_failed(e):
+                return None
+            raise
+
+    def release(self, token):
+        """True if this call freed the slot (False: already released)."""
+        try:
+            self.table.update_item(
+                Key={"pk": self.PK},
+                UpdateExpression="REMOVE holders.#t SET inflight = inflight - :one",
+                ConditionExpression="attribute_exists(holders.#t)",
+                ExpressionAttributeNames={"#t": token},
+                ExpressionAttributeValues={":one": 1}
+            )
+            return True
+        except Exception as e:
+            if conditional_failed(e):
+                return False
+            raise
+
+    def reclaim_expired(self):
+        """Releases leases older than the state machine can run (aborted / timed-out executions)."""
+        self._init()
+        item = self.table.get_item(Key={"pk": self.PK}, ConsistentRead=True).get("Item") or {}
+        cutoff = self.clock() - self.lease_seconds
+        return [token for token, acquired_at in (item.get("holders") or {}).items()
+                if float(acquired_at) < cutoff and self.release(token)]
+
+    def usage(self):
+        item = self.table.get_item(Key={"pk": self.PK}).get("Item") or {}
+        return {"inflight": int(item.get("inflight", 0)), "limit": self.limit}
+
+
+class JobQueue:
+    """FIFO of state machine inputs waiting for a slot (scheduler.FairQueue keeps one per tenant lane)."""
+
+    def __init__(self, table, name="queue", clock=time.time):
+        self.table = table
+        self.name = name
+        self.clock = clock
+        self._ready = False
+
+    def _init(self):
+        if not self._ready:
+            ensure_item(self.table, self.name, enqueued=0, head=0)
+            self._ready = True
+
+    def _increment(self, counter, condition=None):
+        kwargs = {"ConditionExpression": condition} if condition else {}
+        response = self.table.update_item(
+            Key={"pk": self.name}, UpdateExpression=f"SET {counter} = {counter} + :one",
+            ExpressionAttributeValues={":one": 1}, ReturnValues="UPDATED_NEW", **kwargs)
+        return int(response["Attributes"][counter])
+
+    def enqueue(self, job_id, payload):
+        """Appends a job; returns its sequence number."""
+        self._init()
+        while True:
+            seq = self._increment("enqueued")
+            try:
+                self.table.put_item(Item={"pk": f"{self.name}#{seq}", "job_id": job_id, "payload": json.dumps(payload),
+                                          "enqueued_at": int(self.clock())},
+                                    ConditionExpression="attribute_not_exists(pk)")
+                return seq
+            except Exception as e:
+                # A dispatcher already passed this seq and left a tombstone: take the next one
+                if not conditional_failed(e):
+                    raise
+
+    def claim(self):
+        """Next (seq, job_id, payload) to start, or None when the queue is empty."""
+        self._init()
+        while True:
+            try:
+                seq = self._increment("head", condition="head < enqueued")
+            except Exception as e:
+                if conditional_failed(e):
+                    return None
+                raise
+            entry = self._entry(seq)
+            if entry is not None:
+                self.table.delete_item(Key={"pk": f"{self.name}#{seq}"})
+                return seq, entry["job_id"], json.loads(entry["payload"])
+
+    def _entry(self, seq):
+        """The entry for a claimed seq. If its writer has not stored it yet, skip it with a tombstone."""
+        key = {"pk": f"{self.name}#{seq}"}
+        for _ in range(3):
+            entry = self.table.get_item(Key=key, ConsistentRead=True).get("Item")
+            if entry is not None:
+                return entry
+            time.sleep(0.05)
+        try:
+            self.table.put_item(Item=dict(key, tombstone=True, expiration_time=int(self.clock() + IDLE_EXPIRY_SECONDS)),
+                                ConditionExpression="attribute_not_exists(pk)")
+            return None  # The writer's put now fails and it re-enqueues
+        except Exception as e:
+            if not conditional_failed(e):
+                raise
+        return self.table.get_item(Key=key, ConsistentRead=True).get("Item")
+
+    def position(self, seq):
+        """1 = next to start."""
+        item = self.table.get_item(Key={"pk": self.name}).get("Item") or {}
+        return max(1, int(seq) - int(item.get("head", 0)))
+
+    def depth(self):
+        item = self.table.get_item(Key={"pk": self.name}).get("Item") or {}
+        return int(item.get("enqueued", 0)) - int(item.get("head", 0))
@@ -0,0 +1,103 @@
+"""
+Transparent compression for large text attributes on DynamoDB items.
+
+DynamoDB items are capped at 400 KB and every read is billed on the full
+item size, so long answers / prompts are stored compactly:
+  - below COMPRESS_MIN_BYTES: stored as a plain string (readable in the console);
+  - above it: zstd (when the zstandard package is installed) or gzip, stored
+    as Binary. The codec is recognised from the frame's own magic bytes;
+  - still above OVERFLOW_BYTES once compressed: the frame goes to S3 and the
+    attribute holds a pointer map {"s3_bucket", "s3_key", "bytes"}.
+
+Readers call unpack() only on the fields they actually return.
+
+    item["answer"] = pack(answer, s3, bucket, f"{OVERFLOW_PREFIX}{job_id}/answer")
+    answer = unpack(item["answer"], s3)
+"""
+import gzip
+import os
+
+try:
+    import zstandard  # Optional: faster and ~10-20% smaller than gzip on text
+except ImportError:
+    zstandard = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "2048"))
+OVERFLOW_BYTES = int(os.environ.get("OVERFLOW_BYTES", str(256 * 1024)))  # Leaves room for the rest of the item
+OVERFLOW_PREFIX = "_overflow/"   # Data-lake prefix; kickoff ignores it
+ZSTD_LEVEL = 3
+GZIP_LEVEL = 6
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def compress(data):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def decompress(frame):
+    if frame[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed attribute but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(frame)
+    if frame[:2] == GZIP_MAGIC:
+        return gzip.decompress(frame)
+    raise ValueError("Unknown compression frame")
+
+
+def pack(text, s3=None, bucket=None, key=None, min_bytes=None, overflow_bytes=None):
+    """Storable form of a text attribute: str, compressed bytes, or an S3 pointer map."""
+    if text is None:
+        return None
+    min_bytes = COMPRESS_MIN_BYTES if min_bytes is None else min_bytes
+    overflow_bytes = OVERFLOW_BYTES if overflow_bytes is None else overflow_bytes
+    data = text.encode("utf-8")
+    if len(data) < min_bytes:
+        return text
+    frame = compress(data)
+    if len(frame) <= overflow_bytes:
+        return frame
+    if s3 is None or not bucket or not key:
+        raise ValueError(f"Compressed attribute is {len(frame)} bytes; an S3 bucket/key is needed for overflow")
+    s3.put_object(Bucket=bucket, Key=key, Body=frame)
+    return {"s3_bucket": bucket, "s3_key": key, "bytes": len(frame)}
+
+
+def unpack(value, s3=None):
+    """Inverse of pack(). Accepts boto3 Binary as well as bytes."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        if s3 is None:
+            raise ValueError("Attribute overflowed to S3 but no S3 client was given")
+        frame = s3.get_object(Bucket=value["s3_bucket"], Key=value["s3_key"])["Body"].read()
+        return decompress(frame).decode("utf-8")
+    return decompress(bytes(getattr(value, "value", value))).decode("utf-8")
+
+
+def unpack_fields(item, fields, s3=None):
+    """unpack() the given fields of a resource-layer item, in place."""
+    for field in fields:
+        if field in item:
+            item[field] = unpack(item[field], s3)
+    return item
+
+
+def unpack_typed_fields(item, fields, s3=None):
+    """
+    Same for a low-level client item ({"B": ...} / {"M": pointer}), so
+    items_from_typed() sees plain strings.
+    """
+    for field in fields:
+        attribute = item.get(field)
+        if not attribute or "S" in attribute:
+            continue
+        if "B" in attribute:
+            item[field] = {"S": unpack(attribute["B"])}
+        elif "M" in attribute:
+            pointer = {k: list(v.values())[0] for k, v in attribute["M"].items()}
+            item[field] = {"S": unpack(pointer, s3)}
+    return item
@@ -0,0 +1,143 @@
+"""
+Token-aware context assembly for RAG prompts.
+
+Retrieved KB chunks overlap (the KB chunker uses overlapping windows and
+several hits often come from the same page). Instead of concatenating
+everything, assemble_context():
+  1. orders chunks by retrieval score,
+  2. drops near-duplicate chunks and already-covered sentences
+     (word-shingle containment),
+  3. packs what fits into a token budget,
+  4. tags every kept chunk with [n] and returns matching citations.
+"""
+import math
+import os
+import re
+import zlib
+
+from visionquest.text import normalize_text
+
+# --- CONFIGURATION ---
+DEFAULT_TOKEN_BUDGET = 1500
+SHINGLE_SIZE = 4            # words per shingle
+DUPLICATE_THRESHOLD = 0.5   # drop a chunk/sentence when half its shingles are already in the context
+MIN_PARTIAL_TOKENS = 80     # don't bother squeezing in a tiny truncated tail
+TRUNCATION_MARKER = " ..."  # Ends a chunk cut mid-sentence
+
+SENTENCE_BREAK = re.compile(r"(?<=[.!?؟])\s+|\n+")
+
+
+def estimate_tokens(text):
+    """
+    Rough Llama/Claude token count without a tokenizer:
+    ~4 UTF-8 bytes per token (English ~4 chars/token, Arabic ~2 chars/token).
+    """
+    return int(math.ceil(len(text.encode("utf-8")) / 4.0))
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Hashed word n-grams of the normalized text."""
+    words = normalize_text(text).split()
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+
+def covered(part_shingles, seen, threshold):
+    return bool(part_shingles) and len(part_shingles & seen) / float(len(part_shingles)) >= threshold
+
+
+def drop_seen_sentences(text, seen, threshold):
+    """Removes sentences of an overlapping chunk that the context already has."""
+    sentences = [s for s in SENTENCE_BREAK.split(text) if s.strip()]
+    kept = [s for s in sentences if not covered(shingles(s), seen, threshold)]
+    return " ".join(kept).strip()
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cuts text to at most max_tokens, preferring a sentence end, else a word end (+ marker)."""
+    max_bytes = max_tokens * 4
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text
+    cut = encoded[:max_bytes].decode("utf-8", errors="ignore")
+    for mark in (". ", "。", "؟ ", "? ", "\n"):
+        end = cut.rfind(mark)
+        if end > len(cut) // 2:
+            return cut[:end + 1].strip()
+    # The marker counts against the budget too
+    cut = encoded[:max(0, max_bytes - len(TRUNCATION_MARKER))].decode("utf-8", errors="ignore")
+    return cut.rsplit(" ", 1)[0].strip() + TRUNCATION_MARKER
+
+
+def source_name(uri):
+    return os.path.basename(uri) if uri else "unknown"
+
+
+def assemble_context(docs, token_budget=DEFAULT_TOKEN_BUDGET, duplicate_threshold=DUPLICATE_THRESHOLD):
+    """
+    docs: Bedrock-shaped retrieval results.
+    Returns {
+        'text':      "[1] (source.pdf) chunk...\\n[2] ...",
+        'citations': [{'id': 1, 'uri', 'score', 'text'}],   (same order as tags)
+        'tokens':    estimated tokens of 'text',
+        'input_tokens': estimated tokens of all docs joined naively,
+        'dropped_duplicates', 'dropped_budget': counts
+    }
+    """
+    ordered = sorted(docs, key=lambda d: -(d.get("score") or 0.0))
+    seen = set()
+    blocks = []
+    citations = []
+    used = 0
+    dropped_duplicates = 0
+    dropped_budget = 0
+    input_tokens = 0
+
+    for doc in ordered:
+        text = (doc.get("content", {}).get("text") or "").strip()
+        input_tokens += estimate_tokens(text + "\n")
+        if not text:
+            continue
+
+        doc_shingles = shingles(text)
+        if covered(doc_shingles, seen, duplicate_threshold):
+            dropped_duplicates += 1
+            continue
+        if doc_shingles & seen:
+            # Overlapping window: keep only the sentences that are new
+            text = drop_seen_sentences(text, seen, duplicate_threshold)
+            if not text:
+                dropped_duplicates += 1
+                continue
+
+        uri = doc.get("location", {}).get("s3Location", {}).get("uri", "")
+        tag = f"[{len(citations) + 1}] ({source_name(uri)}) "
+        cost = estimate_tokens(tag + text + "\n")
+        if used + cost > token_budget:
+            remaining = token_budget - used - estimate_tokens(tag + "\n")
+            if remaining < MIN_PARTIAL_TOKENS:
+                dropped_budget += 1
+                continue
+            text = truncate_to_tokens(text, remaining)
+            cost = estimate_tokens(tag + text + "\n")
+
+        seen |= shingles(text)  # What was kept: dropped or truncated content may still come from a later chunk
+        used += cost
+        blocks.append(tag + text)
+        citations.append({
+            "id": len(citations) + 1,
+            "uri": uri,
+            "score": doc.get("score"),
+            "text": text
+        })
+
+    context_text = "\n".join(blocks)
+    return {
+        "text": context_text,
+        "citations": citations,
+        "tokens": estimate_tokens(context_text),
+        "input_tokens": input_tokens,
+        "dropped_duplicates": dropped_duplicates,
+        "dropped_budget": dropped_budget
+    }
@@ -0,0 +1,118 @@
+"""
+Hybrid retrieval: vector + BM25 candidates, merged with reciprocal rank
+fusion (RRF), then a cheap local reranker keeps a small, precise context.
+
+The two sources may cut the same documents differently (the Bedrock KB
+chunker vs the local corpus): RRF treats chunks of the same file whose
+word shingles mostly overlap as one result.
+"""
+import hashlib
+
+from visionquest.context import shingles
+from visionquest.lexical import analyze
+from visionquest.retrievers import Retriever
+
+# --- CONFIGURATION ---
+RRF_K = 60               # Standard RRF damping constant (Cormack et al.)
+CANDIDATES_PER_SOURCE = 10
+MIN_RERANK_SCORE = 0.0   # Raise to drop weak tail chunks
+SAME_CHUNK_OVERLAP = 0.5  # Shared shingles / shingles of the shorter chunk: same passage, cut differently
+
+
+def result_key(result):
+    """Identity of a chunk across backends (uri + text)."""
+    uri = result.get("location", {}).get("s3Location", {}).get("uri", "")
+    text = result.get("content", {}).get("text", "")
+    return uri + "#" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def same_passage(a, b, threshold=SAME_CHUNK_OVERLAP):
+    """Shingle sets of two chunks of the same file: does one mostly contain the other?"""
+    return bool(a and b) and len(a & b) / float(min(len(a), len(b))) >= threshold
+
+
+def reciprocal_rank_fusion(result_lists, rrf_k=RRF_K, overlap=SAME_CHUNK_OVERLAP):
+    """
+    Merges ranked lists: score(d) = sum over lists of 1 / (rrf_k + rank).
+    Scores of different backends are not comparable; ranks are.
+    A result is the same d as one from another list when it has the same
+    key, or the same uri and overlapping text (same_passage). The first
+    list's copy is kept. Returns fused results (best first) with
+    'fusion_score' set.
+    """
+    fused = []   # [result, shingles, uri, indexes of the lists it came from]
+    by_key = {}
+    for list_index, results in enumerate(result_lists):
+        for rank, result in enumerate(results, start=1):
+            key = result_key(result)
+            entry = by_key.get(key)
+            if entry is None:
+                uri = result.get("location", {}).get("s3Location", {}).get("uri", "")
+                result_shingles = shingles(result.get("content", {}).get("text", ""))
+                # Overlapping windows within one list stay separate results
+                entry = next((e for e in fused if e[2] == uri and list_index not in e[3]
+                              and same_passage(result_shingles, e[1], overlap)), None)
+                if entry is None:
+                    entry = [dict(result, fusion_score=0.0), result_shingles, uri, set()]
+                    fused.append(entry)
+                by_key[key] = entry
+            entry[0]["fusion_score"] += 1.0 / (rrf_k + rank)
+            entry[3].add(list_index)
+    return sorted((entry[0] for entry in fused), key=lambda r: -r["fusion_score"])
+
+
+def rerank(query, candidates, top_n=3, min_score=MIN_RERANK_SCORE):
+    """
+    Lightweight reranker (no model call):
+      - query term coverage of the chunk
+      - exact matches on numbers (VAT numbers, article numbers, rates)
+      - adjacent query-term pairs found in order (phrase evidence)
+      - the fusion score as a prior
+    """
+    query_terms = analyze(query)
+    if not candidates:
+        return []
+    unique_terms = set(query_terms)
+    numbers = {t for t in unique_terms if t.isdigit()}
+    pairs = set(zip(query_terms, query_terms[1:]))
+    best_fusion = max(c.get("fusion_score", 0.0) for c in candidates) or 1.0
+
+    scored = []
+    for candidate in candidates:
+        terms = analyze(candidate["content"]["text"])
+        term_set = set(terms)
+        coverage = len(unique_terms & term_set) / len(unique_terms) if unique_terms else 0.0
+        number_hits = len(numbers & term_set) / len(numbers) if numbers else 0.0
+        phrase_hits = len(pairs & set(zip(terms, terms[1:]))) / len(pairs) if pairs else 0.0
+        prior = candidate.get("fusion_score", 0.0) / best_fusion
+        score = 0.45 * coverage + 0.25 * number_hits + 0.15 * phrase_hits + 0.15 * prior
+        if numbers and not number_hits:
+            score *= 0.5  # Asked about a specific number, chunk doesn't have it
+        if score >= min_score:
+            scored.append(dict(candidate, score=round(score, 4)))
+    scored.sort(key=lambda r: -r["score"])
+    return scored[:top_n]
+
+
+class HybridRetriever(Retriever):
+    """
+    vector_retriever: any Retriever (Bedrock KB or local index)
+    lexical_retriever: BM25Retriever over the same corpus
+    """
+    name = "hybrid"
+
+    def __init__(self, vector_retriever, lexical_retriever, candidates=CANDIDATES_PER_SOURCE,
+                 use_reranker=True):
+        self.vector_retriever = vector_retriever
+        self.lexical_retriever = lexical_retriever
+        self.candidates = candidates
+        self.use_reranker = use_reranker
+
+    def retrieve(self, query, k=3):
+        fused = reciprocal_rank_fusion([
+            self.vector_retriever.retrieve(query, k=self.candidates),
+            self.lexical_retriever.retrieve(query, k=self.candidates)
+        ])
+        if not self.use_reranker:
+            return fused[:k]
+        return rerank(query, fused, top_n=k)
@@ -0,0 +1,127 @@
+"""
+BM25 lexical retrieval with Arabic-aware normalization and light stemming.
+
+Vector search is good at paraphrases but misses exact tokens: VAT numbers,
+article numbers, Arabic legal phrases. BM25 catches those; visionquest.hybrid
+fuses both.
+"""
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+from visionquest.retrievers import Retriever
+from visionquest.text import normalize_text
+
+# --- CONFIGURATION ---
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+STOPWORDS = {
+    # English
+    "a", "an", "the", "is", "are", "was", "be", "of", "to", "in", "on", "for", "and", "or",
+    "what", "which", "who", "how", "when", "does", "do", "it", "this", "that", "with", "by",
+    "as", "at", "from", "i", "my", "we", "our", "can", "should", "must",
+    # Arabic (after normalize_text)
+    "في", "من", "على", "الى", "عن", "ما", "ماذا", "هل", "هي", "هو", "التي", "الذي", "او",
+    "و", "ان", "كيف", "متى", "هذا", "هذه", "مع", "كل", "لا",
+}
+
+# Light10-style affixes (Larkey et al.), longest first
+ARABIC_PREFIXES = ("وال", "بال", "كال", "فال", "لل", "ال")
+ARABIC_SUFFIXES = ("ها", "ان", "ات", "ون", "ين", "يه", "ه", "ي")
+ARABIC_CHAR = re.compile("[؀-ۿ]")
+
+
+def light_stem(token):
+    """Cheap stemmer: Arabic Light10 affix stripping, English plural/-ing/-ed."""
+    if token.isdigit():
+        return token  # VAT / article numbers must match exactly
+    if ARABIC_CHAR.search(token):
+        token = token.replace("ة", "ه")  # ta marbuta -> ha
+        if token.startswith("و") and len(token) > 3:
+            token = token[1:]
+        for prefix in ARABIC_PREFIXES:
+            if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+                token = token[len(prefix):]
+                break
+        for suffix in ARABIC_SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+                token = token[:-len(suffix)]
+        return token
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 5 and token.endswith("ing"):
+        return token[:-3]
+    if len(token) > 4 and token.endswith("ed"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def analyze(text):
+    """normalize -> tokenize -> drop stopwords -> stem."""
+    return [light_stem(t) for t in TOKEN_PATTERN.findall(normalize_text(text)) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """Inverted index (term -> [(doc, tf)]) with Okapi BM25 scoring."""
+
+    def __init__(self, chunks, k1=BM25_K1, b=BM25_B):
+        self.chunks = list(chunks)  # [{'text', 'uri'}]
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+        for doc_id, chunk in enumerate(self.chunks):
+            terms = analyze(chunk["text"])
+            self.doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings[term].append((doc_id, tf))
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        n = len(self.chunks)
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    @classmethod
+    def from_index_dir(cls, path):
+        """Indexes the chunks of a local vector index (same corpus, no numpy)."""
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            return cls(json.load(f)["chunks"])
+
+    def search_ids(self, query, k=10):
+        """Returns [(doc_id, score)] best first."""
+        scores = defaultdict(float)
+        for term in set(analyze(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_length or 1))
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+    def result(self, doc_id, score):
+        chunk = self.chunks[doc_id]
+        return {
+            "content": {"text": chunk["text"]},
+            "location": {"type": "S3", "s3Location": {"uri": chunk.get("uri", "")}},
+            "score": score,
+            "metadata": {"row": doc_id}
+        }
+
+
+class BM25Retriever(Retriever):
+    name = "bm25"
+
+    def __init__(self, index):
+        self.index = index
+
+    def retrieve(self, query, k=3):
+        return [self.index.result(doc_id, score) for doc_id, score in self.index.search_ids(query, k)]
@@ -0,0 +1,189 @@
+"""
+Conversation memory for the processor: a new question is answered with the
+chat's earlier turns and its document, instead of from scratch.
+
+  - Turns (question + answer of the chat's earlier jobs) are read through
+    the Jobs table's ChatIndex (chat_id, created_at);
+  - the newest turns that fit MEMORY_TOKEN_BUDGET go into the prompt as
+    they are. When they no longer fit, the older ones are folded into a
+    rolling summary on the chat's row in the Chats table (summary,
+    summary_until = created_at of the last folded turn). Later jobs only
+    read the turns after summary_until, so the cost per job stays bounded
+    however long the chat gets, and every turn is summarized once;
+  - the chat row also keeps the text of the chat's last document
+    (doc_context, packed like answers). A follow-up question without a
+    file reuses it: no upload, no OCR;
+  - every write moves the row's TTL (expiration_time) to
+    completed_expiration(): the summary and document go when the chat's
+    last job does, before the _overflow/ copy (kept 7 days longer).
+
+    memory = ChatMemory(jobs_table, chats_table, s3, bucket)
+    state = memory.load(user_id, chat_id, job_id)
+    summary, turns = memory.fit(state, user_id, chat_id, summarize)
+    prompt_section = render_conversation(summary, turns)
+"""
+import os
+from collections import namedtuple
+
+from visionquest.compression import OVERFLOW_PREFIX, pack, unpack, unpack_fields
+from visionquest.context import estimate_tokens, truncate_to_tokens
+from visionquest.logs import get_logger
+from visionquest.retention import completed_expiration
+
+# --- CONFIGURATION ---
+MEMORY_TOKEN_BUDGET = int(os.environ.get("MEMORY_TOKEN_BUDGET", "1500"))   # Recent turns, verbatim
+MEMORY_KEEP_RATIO = 0.5     # After a fold, recent turns use half the budget: the next turns don't fold again
+MEMORY_MAX_TURNS = int(os.environ.get("MEMORY_MAX_TURNS", "40"))          # Unsummarized turns read per job
+MEMORY_MAX_QUERIES = 5      # ChatIndex pages per job (other users' jobs in a shared chat_id are filtered out)
+SUMMARY_MAX_TOKENS = int(os.environ.get("SUMMARY_MAX_TOKENS", "400"))
+FALLBACK_QUESTION_TOKENS = 30   # Per folded turn when the summary model is unavailable
+FALLBACK_ANSWER_TOKENS = 60
+
+Turn = namedtuple("Turn", "job_id created_at question answer")
+
+
+def turn_tokens(turn):
+    return estimate_tokens(turn.question) + estimate_tokens(turn.answer)
+
+
+def render_turns(turns):
+    return "\n".join(f"User: {turn.question}\nAssistant: {turn.answer}" for turn in turns)
+
+
+def render_conversation(summary, turns):
+    """Prompt section with the earlier conversation ('' for a chat's first question)."""
+    if not summary and not turns:
+        return ""
+    lines = ["Conversation so far:"]
+    if summary:
+        lines.append(f"(Summary of earlier turns) {summary}")
+    if turns:
+        lines.append(render_turns(turns))
+    return "\n".join(lines) + "\n\n"
+
+
+def extractive_summary(summary, turns, max_tokens=SUMMARY_MAX_TOKENS):
+    """No model needed: each folded turn shortened, oldest lines dropped past max_tokens."""
+    lines = summary.splitlines() if summary else []
+    for turn in turns:
+        lines.append(f"- Q: {truncate_to_tokens(turn.question, FALLBACK_QUESTION_TOKENS)} "
+                     f"A: {truncate_to_tokens(turn.answer, FALLBACK_ANSWER_TOKENS)}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return truncate_to_tokens("\n".join(lines), max_tokens)
+
+
+class ChatMemory:
+    """Turns from the Jobs table (ChatIndex); summary and document on the Chats table row."""
+
+    def __init__(self, jobs_table, chats_table, s3=None, bucket=None, token_budget=MEMORY_TOKEN_BUDGET,
+                 max_turns=MEMORY_MAX_TURNS, log=None):
+        self.jobs_table = jobs_table
+        self.chats_table = chats_table
+        self.s3 = s3
+        self.bucket = bucket
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.log = log or get_logger("memory")  # The caller's logger keeps its job_id on these lines
+
+    def load(self, user_id, chat_id, job_id=None):
+        """
+        The chat's summary and document, and its turns since the summary
+        (oldest first). Only this user's jobs: ChatIndex is keyed on chat_id
+        alone, and clients without one all share chat_id 'default'.
+        """
+        row = self.chats_table.get_item(
+            Key={'user_id': user_id, 'chat_id': chat_id},
+            ProjectionExpression="summary, summary_until, doc_context"
+        ).get('Item') or {}
+        since = int(row.get('summary_until') or 0)
+
+        query = {
+            'IndexName': 'ChatIndex',
+            'KeyConditionExpression': "chat_id = :c AND created_at > :since",
+            'FilterExpression': "user_id = :u",
+            'ExpressionAttributeValues': {':c': chat_id, ':since': since, ':u': user_id},
+            'ProjectionExpression': "job_id, user_id, created_at, user_prompt, answer, #s",
+            'ExpressionAttributeNames': {'#s': 'status'},
+            'ScanIndexForward': False,
+            'Limit': self.max_turns + 1  # The current job is in the index too
+        }
+        items = []
+        # Limit applies before the filter: page until enough of this user's turns
+        for _ in range(MEMORY_MAX_QUERIES):
+            response = self.jobs_table.query(**query)
+            items.extend(item for item in response.get('Items', [])
+                         if item.get('user_id') == user_id and item.get('job_id') != job_id
+                         and item.get('status') == 'SUCCESS')
+            if len(items) >= self.max_turns or not response.get('LastEvaluatedKey'):
+                break
+            query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        turns = []
+        for item in items[:self.max_turns]:
+            item = unpack_fields(item, ('user_prompt', 'answer'), self.s3)
+            turns.append(Turn(item['job_id'], int(item.get('created_at') or 0),
+                              item.get('user_prompt') or "", item.get('answer') or ""))
+        turns.reverse()
+        return {"summary": row.get('summary') or "", "summary_until": since,
+                "doc_context": row.get('doc_context'), "turns": turns}
+
+    def fit(self, state, user_id, chat_id, summarize=None):
+        """
+        (summary, recent turns) within the token budget. Turns that do not fit
+        are folded into the summary with summarize(summary, turns_text) (the
+        extractive fallback if it is None or fails) and the summary is saved.
+        """
+        turns = state['turns']
+        if sum(turn_tokens(turn) for turn in turns) <= self.token_budget:
+            return state['summary'], turns
+
+        keep, used = [], 0
+        for turn in reversed(turns):
+            used += turn_tokens(turn)
+            if used > self.token_budget * MEMORY_KEEP_RATIO:
+                break
+            keep.insert(0, turn)
+        folded = turns[:len(turns) - len(keep)]
+
+        summary = None
+        if summarize is not None:
+            try:
+                summary = truncate_to_tokens(summarize(state['summary'], render_turns(folded)).strip(),
+                                             SUMMARY_MAX_TOKENS)
+            except Exception as e:
+                self.log.warning("⚠️ Summary model failed (%s). Using the extractive summary.", e)
+        summary = summary or extractive_summary(state['summary'], folded)
+        self.save_summary(user_id, chat_id, summary, folded[-1].created_at)
+        return summary, keep
+
+    def save_summary(self, user_id, chat_id, summary, until):
+        """Best effort (a failed save folds the same turns again next time). Last writer wins."""
+        try:
+            self.chats_table.update_item(
+                Key={'user_id': user_id, 'chat_id': chat_id},
+                UpdateExpression="SET summary = :s, summary_until = :u, expiration_time = :x",
+                ExpressionAttributeValues={':s': summary, ':u': until, ':x': completed_expiration()}
+            )
+        except Exception as e:
+            self.log.warning("⚠️ Could not save the chat summary: %s", e)
+
+    def document(self, state):
+        """Text of the chat's last document, or None."""
+        if not state.get('doc_context'):
+            return None
+        try:
+            return unpack(state['doc_context'], self.s3)
+        except Exception as e:
+            # The S3 overflow copy expires with job retention
+            self.log.warning("⚠️ Chat document unavailable: %s", e)
+            return None
+
+    def save_document(self, user_id, chat_id, job_id, text):
+        """Keeps the document text for follow-ups (compressed; in S3 past the item limit)."""
+        packed = pack(text, self.s3, self.bucket, f"{OVERFLOW_PREFIX}{job_id}/doc_context")
+        self.chats_table.update_item(
+            Key={'user_id': user_id, 'chat_id': chat_id},
+            UpdateExpression="SET doc_context = :d, doc_job_id = :j, expiration_time = :x",
+            ExpressionAttributeValues={':d': packed, ':j': job_id, ':x': completed_expiration()}
+        )
@@ -0,0 +1,269 @@
+"""
+Model router: picks the Bedrock model per request from input size,
+modality, question class and a latency SLO, and falls back to the next
+candidate when a model is throttled or times out. With breakers (e.g.
+visionquest.resilience.breaker) a model whose circuit is open is skipped
+without a call, so traffic goes straight to the fallback.
+
+Every call is recorded in per-model latency / token histograms
+(router.stats) so the routing thresholds can be tuned from real data.
+"""
+import json
+import os
+import re
+import threading
+import time
+
+from visionquest.text import normalize_text
+
+# --- CONFIGURATION ---
+# Requests under this many input tokens may go to a small model
+SMALL_MODEL_MAX_INPUT_TOKENS = int(os.environ.get("SMALL_MODEL_MAX_INPUT_TOKENS", "3000"))
+STATS_LOG_EVERY = int(os.environ.get("MODEL_STATS_LOG_EVERY", "50"))  # calls between stats log lines
+
+# Errors worth trying another model for (capacity, not bad input)
+FALLBACK_ERROR_CODES = {
+    "ThrottlingException", "TooManyRequestsException", "ServiceQuotaExceededException",
+    "ModelTimeoutException", "ModelNotReadyException", "ServiceUnavailableException",
+    "InternalServerException", "CircuitOpen",
+}
+FALLBACK_ERROR_TYPES = {"ReadTimeoutError", "ConnectTimeoutError", "EndpointConnectionError", "TimeoutError",
+                        "ThrottledError", "TransientServiceError", "CircuitOpenError"}  # visionquest.resilience
+
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+TOKEN_BUCKETS = (128, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072)
+
+
+class ModelSpec:
+    """One routable model and what we know about it up front."""
+
+    def __init__(self, name, model_id, tier, modalities=("text",), max_input_tokens=8000,
+                 cost_in_per_1k=0.0, cost_out_per_1k=0.0, latency_ms=2000):
+        self.name = name
+        self.model_id = model_id
+        self.tier = tier                      # 'small' or 'large'
+        self.modalities = set(modalities)     # 'text', 'image', 'document'
+        self.max_input_tokens = max_input_tokens
+        self.cost_in_per_1k = cost_in_per_1k
+        self.cost_out_per_1k = cost_out_per_1k
+        self.latency_ms = latency_ms          # Prior, until we have observations
+
+    def expected_cost(self, input_tokens, output_tokens):
+        return input_tokens / 1000.0 * self.cost_in_per_1k + output_tokens / 1000.0 * self.cost_out_per_1k
+
+    def __repr__(self):
+        return f"ModelSpec({self.name})"
+
+
+# --- DEFAULT CATALOGS (on-demand us-east-1 prices, USD per 1k tokens) ---
+def llama_catalog():
+    """Models used by code/ (rag_engine, inspector)."""
+    return [
+        ModelSpec("llama3-8b", "meta.llama3-8b-instruct-v1:0", "small", ("text",), 8000, 0.0003, 0.0006, 1200),
+        ModelSpec("llama3-70b", "meta.llama3-70b-instruct-v1:0", "large", ("text",), 8000, 0.00265, 0.0035, 3500),
+        ModelSpec("llama3.2-11b-vision", "us.meta.llama3-2-11b-instruct-v1:0", "small", ("image",),
+                  128000, 0.00016, 0.00016, 3000),
+        ModelSpec("llama3.2-90b-vision", "us.meta.llama3-2-90b-instruct-v1:0", "large", ("image",),
+                  128000, 0.00072, 0.00072, 7000),
+    ]
+
+
+def claude_catalog(large_model_id, small_model_id=None):
+    """Models used by the backend (processor, terraform/app.py). Claude reads text, images and PDFs."""
+    catalog = [ModelSpec("claude-large", large_model_id, "large", ("text", "image", "document"),
+                         200000, 0.003, 0.015, 9000)]
+    if small_model_id:
+        catalog.append(ModelSpec("claude-small", small_model_id, "small", ("text", "image", "document"),
+                                 200000, 0.0008, 0.004, 3500))
+    return catalog
+
+
+def load_catalog(default_catalog):
+    """MODEL_CATALOG (JSON list of ModelSpec kwargs) overrides the default catalog."""
+    raw = os.environ.get("MODEL_CATALOG")
+    if not raw:
+        return default_catalog
+    return [ModelSpec(**spec) for spec in json.loads(raw)]
+
+
+# --- QUESTION CLASSES ---
+AUDIT_PATTERN = re.compile(r"audit|complian|violation|valid|check|verify|calculat|total|تدقيق|امتثال|مخالف|تحقق|صحيح|مطابق|احسب")
+ANALYSIS_PATTERN = re.compile(r"analy|summar|explain|compare|translat|review|extract|حلل|تحليل|لخص|ملخص|اشرح|قارن|ترجم|استخرج")
+
+
+def classify_question(question):
+    """
+    'audit'    - compliance checks, arithmetic: needs the strongest model
+    'analysis' - summarize/explain/extract over a document
+    'lookup'   - short factual question
+    """
+    text = normalize_text(question or "")
+    if AUDIT_PATTERN.search(text):
+        return "audit"
+    if ANALYSIS_PATTERN.search(text) or len(text.split()) > 40:
+        return "analysis"
+    return "lookup"
+
+
+# --- STATS ---
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.bounds) and value > self.bounds[index]:
+            index += 1
+        self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (coarse but cheap)."""
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for index, count in enumerate(self.counts):
+            running += count
+            if running >= target:
+                return self.bounds[index] if index < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def snapshot(self):
+        labels = [f"le_{b}" for b in self.bounds] + ["inf"]
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 1) if self.count else None,
+            "buckets": dict(zip(labels, self.counts))
+        }
+
+
+class ModelStats:
+    """Per-model latency / token histograms and outcome counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.models = {}
+        self.calls = 0
+
+    def _entry(self, name):
+        if name not in self.models:
+            self.models[name] = {
+                "latency_ms": Histogram(LATENCY_BUCKETS_MS),
+                "input_tokens": Histogram(TOKEN_BUCKETS),
+                "output_tokens": Histogram(TOKEN_BUCKETS),
+                "ok": 0, "fallback_errors": 0, "errors": 0
+            }
+        return self.models[name]
+
+    def record(self, name, latency_ms, outcome, input_tokens=None, output_tokens=None):
+        with self._lock:
+            entry = self._entry(name)
+            entry[outcome] += 1
+            entry["latency_ms"].observe(latency_ms)
+            if input_tokens is not None:
+                entry["input_tokens"].observe(input_tokens)
+            if output_tokens is not None:
+                entry["output_tokens"].observe(output_tokens)
+            self.calls += 1
+            should_log = STATS_LOG_EVERY and self.calls % STATS_LOG_EVERY == 0
+        if should_log:
+            print(json.dumps({"model_stats": self.snapshot()}))
+
+    def p95_latency(self, name):
+        entry = self.models.get(name)
+        return entry["latency_ms"].quantile(0.95) if entry else None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    "ok": e["ok"], "fallback_errors": e["fallback_errors"], "errors": e["errors"],
+                    "latency_ms": e["latency_ms"].snapshot(),
+                    "input_tokens": e["input_tokens"].snapshot(),
+                    "output_tokens": e["output_tokens"].snapshot()
+                }
+                for name, e in self.models.items()
+            }
+
+
+def is_fallback_error(error):
+    """Throttling / timeouts / capacity: another model may well succeed."""
+    code = (getattr(error, "response", None) or {}).get("Error", {}).get("Code")  # Some errors set response = None
+    return code in FALLBACK_ERROR_CODES or type(error).__name__ in FALLBACK_ERROR_TYPES
+
+
+# --- ROUTER ---
+class ModelRouter:
+    def __init__(self, catalog, stats=None, small_max_input_tokens=SMALL_MODEL_MAX_INPUT_TOKENS, breakers=None):
+        self.catalog = list(catalog)
+        self.stats = stats or ModelStats()
+        self.small_max_input_tokens = small_max_input_tokens
+        self.breakers = breakers   # name -> CircuitBreaker, or None for no circuit breaking
+
+    def route(self, modality="text", input_tokens=0, question_class="lookup",
+              latency_slo_ms=None, output_tokens=512):
+        """
+        Returns candidate ModelSpecs, best first (the rest are fallbacks).
+          1. only models that accept the modality and the input size
+          2. preferred tier: small for short lookups/analysis, large for
+             audits and long inputs
+          3. models whose observed p95 (or prior) breaks the SLO go last
+          4. cheapest first within the same preference
+        """
+        eligible = [m for m in self.catalog
+                    if modality in m.modalities and input_tokens <= m.max_input_tokens]
+        if not eligible:
+            raise ValueError(f"No model accepts modality={modality} with {input_tokens} input tokens")
+
+        wants_small = question_class != "audit" and input_tokens <= self.small_max_input_tokens
+
+        def sort_key(model):
+            observed = self.stats.p95_latency(model.name)
+            latency = observed if observed is not None else model.latency_ms
+            too_slow = latency_slo_ms is not None and latency > latency_slo_ms
+            preferred = (model.tier == "small") == wants_small
+            return (too_slow, not preferred, model.expected_cost(input_tokens, output_tokens))
+
+        return sorted(eligible, key=sort_key)
+
+    def invoke(self, candidates, call_fn):
+        """
+        Calls call_fn(model) on each candidate until one succeeds.
+        call_fn returns (result, usage) where usage may carry
+        'input_tokens' / 'output_tokens'. Falls through to the next model
+        only on throttling/timeouts; other errors are raised immediately.
+        Models whose breaker is open are skipped. Returns (result, model).
+        """
+        last_error = None
+        for model in candidates:
+            breaker = self.breakers(f"bedrock:{model.name}") if self.breakers else None
+            if breaker is not None and not breaker.allow():
+                print(f"⚡ {model.name} circuit open. Skipping...")
+                last_error = breaker.open_error()
+                continue
+            started = time.perf_counter()
+            try:
+                result, usage = call_fn(model)
+            except Exception as e:
+                elapsed_ms = (time.perf_counter() - started) * 1000.0
+                if breaker is not None:
+                    breaker.record(e)
+                if is_fallback_error(e):
+                    self.stats.record(model.name, elapsed_ms, "fallback_errors")
+                    print(f"⚠️ {model.name} unavailable ({type(e).__name__}). Falling back...")
+                    last_error = e
+                    continue
+                self.stats.record(model.name, elapsed_ms, "errors")
+                raise
+            if breaker is not None:
+                breaker.success()
+            usage = usage or {}
+            self.stats.record(model.name, (time.perf_counter() - started) * 1000.0, "ok",
+                              usage.get("input_tokens"), usage.get("output_tokens"))
+            return result, model
+        raise last_error
@@ -0,0 +1,87 @@
+"""
+Client-side rate limiting for Bedrock calls.
+
+TokenBucket paces requests to a target rate and adapts to the service:
+a throttling error halves the rate (and pauses the bucket), each success
+creeps it back up towards the configured ceiling (AIMD), so concurrent
+workers settle just under the account's real quota instead of hammering it.
+"""
+import random
+import threading
+import time
+
+from visionquest.model_router import FALLBACK_ERROR_CODES
+
+# --- CONFIGURATION ---
+THROTTLE_ERROR_CODES = {"ThrottlingException", "TooManyRequestsException", "ServiceQuotaExceededException"}
+MIN_RATE_FRACTION = 0.1     # Never slow below 10% of the configured rate
+RECOVERY_STEP = 0.05        # Fraction of the ceiling regained per success
+THROTTLE_PAUSE_SECONDS = 1.0
+
+
+def is_throttle_error(error):
+    code = (getattr(error, "response", None) or {}).get("Error", {}).get("Code")
+    return code in THROTTLE_ERROR_CODES
+
+
+def is_retryable_error(error):
+    """Throttling plus transient capacity/timeouts (same set the router falls back on)."""
+    code = (getattr(error, "response", None) or {}).get("Error", {}).get("Code")
+    return code in FALLBACK_ERROR_CODES or "Timeout" in type(error).__name__
+
+
+def backoff_delay(attempt, base=0.5, cap=20.0, rng=random):
+    """'Full jitter' exponential backoff: uniform(0, min(cap, base * 2^attempt))."""
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens/second, bursts up to `capacity`.
+    acquire() blocks until a token is available (or `timeout` passes).
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.capacity
+        self.throttles = 0
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self._updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def acquire(self, tokens=1.0, timeout=None):
+        """Returns True once `tokens` were taken, False on timeout."""
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._refill(now)
+                if now >= self._paused_until and self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = max(self._paused_until - now, (tokens - self.tokens) / self.rate)
+            if deadline is not None:
+                if self.clock() + wait > deadline:
+                    return False
+            self.sleep(wait)
+
+    def throttled(self):
+        """The service pushed back: halve the rate and pause briefly."""
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2.0)
+            self.tokens = 0.0
+            self._paused_until = max(self._paused_until, self.clock() + THROTTLE_PAUSE_SECONDS)
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_STEP)
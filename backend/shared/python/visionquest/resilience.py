@@ -0,0 +1,260 @@
+"""
+Shared resilience layer for AWS service calls (Bedrock, Textract).
+
+  - classify(error): "throttle", "transient" or "permanent";
+  - Retrier: exponential backoff with full jitter, attempt limits per error
+    kind, and a RetryBudget so retries stay a small fraction of traffic
+    while a service struggles (no retry storms);
+  - CircuitBreaker: one per model / service. Opens when most recent calls
+    failed with throttle / transient errors, fails fast while open and lets
+    one probe through after a cool-down. ModelRouter(breakers=breaker)
+    skips a model whose breaker is open, i.e. routes to the fallback model.
+
+When retries run out the error is re-raised as ThrottledError or
+TransientServiceError (CircuitOpenError when failing fast). Step Functions
+retries on those names only; permanent errors (bad input, access denied)
+go straight to Catch instead of re-running the step.
+
+    retrier = Retrier(attempts={"throttle": 4, "transient": 3})
+    response = retrier.call(textract.start_document_text_detection, breaker=breaker("textract"), **kwargs)
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from visionquest.model_router import FALLBACK_ERROR_CODES, FALLBACK_ERROR_TYPES
+from visionquest.ratelimit import THROTTLE_ERROR_CODES, backoff_delay
+
+# --- CONFIGURATION ---
+THROTTLE, TRANSIENT, PERMANENT = "throttle", "transient", "permanent"
+THROTTLE_CODES = THROTTLE_ERROR_CODES | {
+    "ProvisionedThroughputExceededException", "LimitExceededException",  # Textract
+    "RequestLimitExceeded", "SlowDown",
+}
+TRANSIENT_CODES = (FALLBACK_ERROR_CODES - THROTTLE_ERROR_CODES - {"CircuitOpen"}) | {
+    "InternalServerError", "InternalFailure", "ServiceUnavailable", "RequestTimeout",
+    "RequestTimeoutException", "ModelStreamErrorException",
+}
+TRANSIENT_TYPES = FALLBACK_ERROR_TYPES | {"ConnectionClosedError", "ConnectionError"}
+
+RETRY_BASE_SECONDS = float(os.environ.get("RETRY_BASE_SECONDS", "0.25"))
+RETRY_CAP_SECONDS = float(os.environ.get("RETRY_CAP_SECONDS", "10"))
+THROTTLE_BACKOFF_FACTOR = 4.0       # Throttles back off from 1 s, transient errors from 0.25 s
+RETRY_BUDGET_RATIO = float(os.environ.get("RETRY_BUDGET_RATIO", "0.2"))   # Retries <= 20% of calls ...
+RETRY_BUDGET_RESERVE = float(os.environ.get("RETRY_BUDGET_RESERVE", "10"))  # ... plus this many in reserve
+BREAKER_WINDOW = int(os.environ.get("BREAKER_WINDOW", "20"))               # Recent outcomes considered
+BREAKER_MIN_CALLS = int(os.environ.get("BREAKER_MIN_CALLS", "5"))
+BREAKER_FAILURE_RATIO = float(os.environ.get("BREAKER_FAILURE_RATIO", "0.5"))
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get("BREAKER_COOLDOWN_SECONDS", "30"))
+
+
+def error_code(error):
+    return (getattr(error, "response", None) or {}).get("Error", {}).get("Code")
+
+
+def classify(error):
+    if isinstance(error, ServiceError):
+        return error.kind
+    code = error_code(error)
+    if code in THROTTLE_CODES:
+        return THROTTLE
+    if code in TRANSIENT_CODES or type(error).__name__ in TRANSIENT_TYPES:
+        return TRANSIENT
+    status = (getattr(error, "response", None) or {}).get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+    if status == 429:
+        return THROTTLE
+    if status >= 500:
+        return TRANSIENT
+    return PERMANENT
+
+
+# --- ERRORS (their class names are what Step Functions matches on) ---
+class ServiceError(Exception):
+    """A retryable failure that outlived its retries. Keeps the original error code."""
+
+    kind = TRANSIENT
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.response = {"Error": {"Code": code or type(self).__name__, "Message": message}}
+
+
+class ThrottledError(ServiceError):
+    kind = THROTTLE
+
+
+class TransientServiceError(ServiceError):
+    kind = TRANSIENT
+
+
+class CircuitOpenError(ServiceError):
+    kind = THROTTLE
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit for {name} is open (retry in {retry_after:.0f}s)", code="CircuitOpen")
+        self.retry_after = retry_after
+
+
+def give_up(error, kind):
+    cls = ThrottledError if kind == THROTTLE else TransientServiceError
+    return cls(f"{error_code(error) or type(error).__name__}: {error}", code=error_code(error))
+
+
+# --- RETRY BUDGET ---
+class RetryBudget:
+    """Every call deposits `ratio` of a retry (up to `reserve`); every retry spends one."""
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, reserve=RETRY_BUDGET_RESERVE):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.balance = reserve
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.balance = min(self.reserve, self.balance + self.ratio)
+
+    def spend(self):
+        with self._lock:
+            if self.balance >= 1.0:
+                self.balance -= 1.0
+                return True
+            return False
+
+
+# --- CIRCUIT BREAKER ---
+class CircuitBreaker:
+    """closed -> (failure ratio over the window) -> open -> (cool-down) -> half-open -> one probe."""
+
+    def __init__(self, name, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS,
+                 failure_ratio=BREAKER_FAILURE_RATIO, cooldown=BREAKER_COOLDOWN_SECONDS, clock=time.monotonic):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = "closed"
+        self.outcomes = deque(maxlen=window)
+        self.opened_at = 0.0
+        self.opened = 0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and self.clock() - self.opened_at >= self.cooldown:
+                self.state, self._probing = "half_open", False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            if self.state == "closed":
+                return True
+            self.rejected += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "closed"
+                self.outcomes.clear()
+            self.outcomes.append(True)
+
+    def failure(self):
+        with self._lock:
+            if self.state == "half_open":
+                self._open()
+                return
+            self.outcomes.append(False)
+            failures = self.outcomes.count(False)
+            if len(self.outcomes) >= self.min_calls and failures >= self.failure_ratio * len(self.outcomes):
+                self._open()
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = self.clock()
+        self.opened += 1
+        self.outcomes.clear()
+
+    def open_error(self):
+        return CircuitOpenError(self.name, max(0.0, self.cooldown - (self.clock() - self.opened_at)))
+
+    def record(self, error):
+        """Only capacity problems count against the service; a bad request means it answered."""
+        if classify(error) == PERMANENT:
+            self.success()
+        else:
+            self.failure()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(name):
+    """Process-wide breaker per name: it outlives the invocation in a warm Lambda container."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+# --- RETRIER ---
+class Retrier:
+    """Calls fn with retries on throttle / transient errors only."""
+
+    DEFAULT_ATTEMPTS = {THROTTLE: 4, TRANSIENT: 3, PERMANENT: 1}
+
+    def __init__(self, attempts=None, base=RETRY_BASE_SECONDS, cap=RETRY_CAP_SECONDS, budget=None,
+                 sleep=time.sleep, rng=random):
+        self.attempts = dict(self.DEFAULT_ATTEMPTS, **(attempts or {}))
+        self.base = base
+        self.cap = cap
+        self.budget = budget or RetryBudget()
+        self.sleep = sleep
+        self.rng = rng
+        self.time_left = None   # Optional callable: seconds left in this invocation
+        self.retries = 0
+        self.backoff_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def delay(self, kind, attempt):
+        base = self.base * (THROTTLE_BACKOFF_FACTOR if kind == THROTTLE else 1.0)
+        return backoff_delay(attempt, base=base, cap=self.cap, rng=self.rng)
+
+    def call(self, fn, *args, breaker=None, **kwargs):
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow():
+                raise breaker.open_error()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if breaker is not None:
+                    breaker.record(e)
+                kind = classify(e)
+                if kind == PERMANENT:
+                    raise
+                attempt += 1
+                delay = self.delay(kind, attempt - 1)
+                out_of_time = self.time_left is not None and self.time_left() < delay
+                if attempt >= self.attempts[kind] or out_of_time or not self.budget.spend():
+                    raise give_up(e, kind) from e
+                with self._lock:
+                    self.retries += 1
+                    self.backoff_seconds += delay
+                self.sleep(delay)
+                continue
+            if breaker is not None:
+                breaker.success()
+            return result
+
+
+def time_left(context, margin=5.0):
+    """Seconds left in a Lambda invocation minus a margin (None outside Lambda)."""
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+    return lambda: context.get_remaining_time_in_millis() / 1000.0 - margin
@@ -0,0 +1,24 @@
+"""
+How long job records stay in the hot jobs table (DynamoDB TTL on
+expiration_time). Expired items are archived to S3 by backend/archiver.
+"""
+import os
+import time
+
+PENDING_TTL_HOURS = float(os.environ.get("JOB_PENDING_TTL_HOURS", "48"))  # Never finished (crashed / abandoned)
+RETENTION_DAYS = float(os.environ.get("JOB_RETENTION_DAYS", "30"))        # Finished: chat history window
+
+
+def expires_in(seconds, now=None):
+    """Epoch seconds for the TTL attribute."""
+    return int((now if now is not None else time.time()) + seconds)
+
+
+def pending_expiration(now=None):
+    """Set at ingest: a job that never completes still goes away."""
+    return expires_in(PENDING_TTL_HOURS * 3600, now)
+
+
+def completed_expiration(now=None):
+    """Set when the job finishes (either way): keeps it for the history window."""
+    return expires_in(RETENTION_DAYS * 86400, now)
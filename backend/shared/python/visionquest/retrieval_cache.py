@@ -0,0 +1,140 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from visionquest.logs import get_logger
+from visionquest.text import normalize_query
+
+# --- CONFIGURATION ---
+DEFAULT_TTL_SECONDS = 900          # 15 min: regulations change rarely
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_VERSION_CHECK_SECONDS = 60  # How often we ask "was the KB re-synced?"
+
+
+class RetrievalCache:
+    """
+    In-memory LRU + TTL cache for Knowledge Base retrieval results.
+
+    Keys are (kb_id, normalized query, retrieval params), so
+    "What is the VAT rate?" and "what is the vat rate" hit the same entry.
+    Lives at module level, so it survives warm Lambda invocations and
+    Streamlit reruns.
+
+    If `version_fn(kb_id)` is given, it is polled at most every
+    `version_check_seconds`; when the returned token changes (the KB was
+    re-synced), every entry for that KB is dropped.
+
+    Results are copied in and out: a caller that edits the list it got
+    (re-ranking, trimming) can't change what the next caller sees.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES,
+                 version_fn=None, version_check_seconds=DEFAULT_VERSION_CHECK_SECONDS,
+                 clock=time.monotonic, log=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+        self.version_check_seconds = version_check_seconds
+        self.clock = clock
+        self.log = log or get_logger("retrieval_cache")
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, results)
+        self._versions = {}            # kb_id -> (checked_at, token)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(kb_id, query, **params):
+        return (kb_id, normalize_query(query), tuple(sorted(params.items())))
+
+    def get(self, kb_id, query, **params):
+        """Returns cached results or None."""
+        self._check_version(kb_id)
+        key = self.make_key(kb_id, query, **params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+
+    def put(self, kb_id, query, results, **params):
+        key = self.make_key(kb_id, query, **params)
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl_seconds, copy.deepcopy(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, kb_id=None):
+        """Drops every entry (or only those of one KB)."""
+        with self._lock:
+            if kb_id is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == kb_id]:
+                del self._entries[key]
+
+    def _check_version(self, kb_id):
+        if self.version_fn is None:
+            return
+        now = self.clock()
+        checked = self._versions.get(kb_id)
+        if checked and now - checked[0] < self.version_check_seconds:
+            return
+        try:
+            token = self.version_fn(kb_id)
+        except Exception as e:
+            # Never fail a question because the sync check failed
+            self.log.warning("⚠️ KB version check failed: %s", e)
+            return
+        self._versions[kb_id] = (now, token)
+        if checked and checked[1] != token:
+            self.log.info("♻️ Knowledge Base %s re-synced. Clearing retrieval cache.", kb_id)
+            self.invalidate(kb_id)
+
+
+def ingestion_version_fn(bedrock_agent, data_source_id):
+    """
+    Builds a version_fn that returns the id of the latest COMPLETE
+    ingestion job of the KB data source (changes on every re-sync).
+    `bedrock_agent` is a boto3 'bedrock-agent' client (not -runtime).
+    """
+    def version_fn(kb_id):
+        response = bedrock_agent.list_ingestion_jobs(
+            knowledgeBaseId=kb_id,
+            dataSourceId=data_source_id,
+            filters=[{'attribute': 'STATUS', 'operator': 'EQ', 'values': ['COMPLETE']}],
+            sortBy={'attribute': 'STARTED_AT', 'order': 'DESCENDING'},
+            maxResults=1
+        )
+        jobs = response.get('ingestionJobSummaries', [])
+        return jobs[0]['ingestionJobId'] if jobs else None
+    return version_fn
+
+
+def cached_retrieve(client, cache, kb_id, query, number_of_results=None):
+    """
+    bedrock-agent-runtime retrieve() behind the cache.
+    Returns the 'retrievalResults' list. Errors are raised to the caller.
+    """
+    cached = cache.get(kb_id, query, k=number_of_results)
+    if cached is not None:
+        return cached
+
+    request = {
+        'knowledgeBaseId': kb_id,
+        'retrievalQuery': {'text': query}
+    }
+    if number_of_results:
+        request['retrievalConfiguration'] = {
+            'vectorSearchConfiguration': {'numberOfResults': number_of_results}
+        }
+    results = client.retrieve(**request).get('retrievalResults', [])
+    cache.put(kb_id, query, results, k=number_of_results)
+    return results
@@ -0,0 +1,65 @@
+from visionquest.retrieval_cache import cached_retrieve
+
+
+class Retriever:
+    """
+    Interface behind rag_engine.retrieve_from_kb().
+    retrieve() returns results in the Bedrock 'retrievalResults' shape:
+        {'content': {'text': ...}, 'location': {'s3Location': {'uri': ...}}, 'score': ...}
+    so callers never care which backend answered.
+    """
+    name = "base"
+
+    def retrieve(self, query, k=3):
+        raise NotImplementedError
+
+
+class BedrockKBRetriever(Retriever):
+    """The managed Knowledge Base (vector search in OpenSearch Serverless)."""
+    name = "bedrock"
+
+    def __init__(self, client, kb_id, cache=None):
+        self.client = client  # boto3 'bedrock-agent-runtime'
+        self.kb_id = kb_id
+        self.cache = cache
+
+    def retrieve(self, query, k=3):
+        if self.cache is not None:
+            return cached_retrieve(self.client, self.cache, self.kb_id, query, number_of_results=k)
+        response = self.client.retrieve(
+            knowledgeBaseId=self.kb_id,
+            retrievalQuery={'text': query},
+            retrievalConfiguration={
+                'vectorSearchConfiguration': {'numberOfResults': k}
+            }
+        )
+        return response.get('retrievalResults', [])
+
+
+class LocalIndexRetriever(Retriever):
+    """
+    In-process vector index (see visionquest.vector_index).
+    Only the query embedding leaves the process; the search itself is a
+    dot product over a memory-mapped matrix.
+    """
+    name = "local"
+
+    def __init__(self, index, embedder, cache=None, nprobe=None):
+        self.index = index
+        self.embedder = embedder
+        self.cache = cache
+        self.nprobe = nprobe
+
+    def retrieve(self, query, k=3):
+        cache_id = f"local:{self.index.path}"
+        if self.cache is not None:
+            cached = self.cache.get(cache_id, query, k=k)
+            if cached is not None:
+                return cached
+
+        query_vector = self.embedder.embed([query])[0]
+        results = self.index.search(query_vector, k=k, nprobe=self.nprobe)
+
+        if self.cache is not None:
+            self.cache.put(cache_id, query, results, k=k)
+        return results
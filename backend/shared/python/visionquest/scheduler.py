@@ -0,0 +1,270 @@
+"""
+Fair scheduling of queued jobs across tenants, with priority tiers.
+
+Each (tier, user_id) pair is a lane with its own FIFO. Dispatch is
+start-time fair queuing on two levels:
+  1. tiers: the backlogged tier with the lowest virtual time goes first.
+     Serving a job advances the tier by 1 / TIER_WEIGHTS[tier], so with
+     8:1 interactive chat questions get ~8 of every 9 slots while both are
+     backlogged, and bulk audits still make progress;
+  2. tenants within the tier: same rule with TENANT_WEIGHTS (default 1), so
+     a user with 500 queued invoices gets one turn per round like everyone
+     else instead of holding the head of one global queue.
+A lane (or tier) that goes idle and comes back starts at the current
+virtual clock: idle time is not saved up as credit.
+
+The selection logic works on a plain state dict, shared by FairScheduler
+(in memory, for simulations) and FairQueue (the DynamoDB-backed queue
+kickoff dispatches from).
+
+    queue = FairQueue(admission_table)
+    lane, seq = queue.enqueue("interactive", user_id, job_id, payload)
+    entry = queue.claim()   # {"tier", "tenant", "lane", "seq", "job_id", "payload"} or None
+"""
+import json
+import os
+from collections import deque
+from decimal import Decimal
+
+from visionquest.admission import JobQueue, conditional_failed, ensure_item
+
+# --- CONFIGURATION ---
+TIERS = ("interactive", "bulk")   # Highest priority first (breaks ties)
+DEFAULT_TIER = "interactive"
+TIER_WEIGHTS = dict({"interactive": 8.0, "bulk": 1.0}, **json.loads(os.environ.get("TIER_WEIGHTS", "{}")))
+TENANT_WEIGHTS = json.loads(os.environ.get("TENANT_WEIGHTS", "{}"))   # e.g. {"user-42": 2}
+ALL_TIERS = "*"   # Clock key of the tier level
+ENQUEUE_ATTEMPTS = 5   # Re-reads when the sweep removes the lane mid-enqueue
+
+
+def tier_of(value, default=DEFAULT_TIER):
+    return value if value in TIERS else default
+
+
+def lane_of(tier, tenant):
+    return f"{tier}|{tenant}"
+
+
+# --- SELECTION (pure, on a state dict) ---
+def new_state():
+    """lanes: {lane: {tier, tenant, vt, n}}, tiers: {tier: {vt, n}}, clock: {tier or ALL_TIERS: vt}."""
+    return {"lanes": {}, "tiers": {}, "clock": {}}
+
+
+def start_tags(state, tier, lane):
+    """
+    Virtual times a lane and its tier resume from when a job arrives: None
+    if already backlogged (keep its place), else max(own, clock).
+    """
+    lane_info = state["lanes"].get(lane)
+    tier_info = state["tiers"].get(tier)
+    lane_vt = None
+    if not lane_info or float(lane_info["n"]) <= 0:
+        lane_vt = max(float(lane_info["vt"]) if lane_info else 0.0, float(state["clock"].get(tier, 0)))
+    tier_vt = None
+    if not tier_info or float(tier_info["n"]) <= 0:
+        tier_vt = max(float(tier_info["vt"]) if tier_info else 0.0, float(state["clock"].get(ALL_TIERS, 0)))
+    return lane_vt, tier_vt
+
+
+def select(state, exclude=()):
+    """The lane to serve next, or None when nothing is backlogged."""
+    active = [(lane, info) for lane, info in state["lanes"].items()
+              if float(info["n"]) > 0 and lane not in exclude]
+    if not active:
+        return None
+    tiers = {info["tier"] for _, info in active}
+    tier = min(tiers, key=lambda t: (float(state["tiers"].get(t, {}).get("vt", 0)), TIERS.index(t)))
+    lane, _ = min(((lane, info) for lane, info in active if info["tier"] == tier),
+                  key=lambda item: (float(item[1]["vt"]), item[0]))
+    return lane
+
+
+def charges(state, lane, cost=1.0, tier_weights=None, tenant_weights=None):
+    """What serving one job from `lane` adds to the virtual times, and the clocks it sets."""
+    tier_weights = tier_weights or TIER_WEIGHTS
+    tenant_weights = TENANT_WEIGHTS if tenant_weights is None else tenant_weights
+    info = state["lanes"][lane]
+    tier = info["tier"]
+    return {
+        "lane_vt": cost / float(tenant_weights.get(info["tenant"], 1.0)),
+        "tier_vt": cost / float(tier_weights.get(tier, 1.0)),
+        "lane_clock": float(info["vt"]),
+        "tier_clock": float(state["tiers"][tier]["vt"]),
+    }
+
+
+# --- IN MEMORY ---
+class FairScheduler:
+    """Single-process scheduler (simulations, local runs)."""
+
+    def __init__(self, tier_weights=None, tenant_weights=None):
+        self.tier_weights = tier_weights
+        self.tenant_weights = tenant_weights
+        self.state = new_state()
+        self.jobs = {}
+        self.size = 0
+
+    def push(self, tier, tenant, job, cost=1.0):
+        tier = tier_of(tier)
+        lane = lane_of(tier, tenant)
+        lane_vt, tier_vt = start_tags(self.state, tier, lane)
+        lane_info = self.state["lanes"].setdefault(lane, {"tier": tier, "tenant": tenant, "vt": 0.0, "n": 0})
+        tier_info = self.state["tiers"].setdefault(tier, {"vt": 0.0, "n": 0})
+        if lane_vt is not None:
+            lane_info["vt"] = lane_vt
+        if tier_vt is not None:
+            tier_info["vt"] = tier_vt
+        lane_info["n"] += 1
+        tier_info["n"] += 1
+        self.jobs.setdefault(lane, deque()).append((job, cost))
+        self.size += 1
+
+    def pop(self):
+        """(tier, tenant, job) or None."""
+        lane = select(self.state)
+        if lane is None:
+            return None
+        job, cost = self.jobs[lane].popleft()
+        info = self.state["lanes"][lane]
+        delta = charges(self.state, lane, cost, self.tier_weights, self.tenant_weights)
+        self.state["clock"][info["tier"]] = delta["lane_clock"]
+        self.state["clock"][ALL_TIERS] = delta["tier_clock"]
+        info["vt"] += delta["lane_vt"]
+        info["n"] -= 1
+        self.state["tiers"][info["tier"]]["vt"] += delta["tier_vt"]
+        self.state["tiers"][info["tier"]]["n"] -= 1
+        self.size -= 1
+        return info["tier"], info["tenant"], job
+
+    def __len__(self):
+        return self.size
+
+
+# --- DYNAMODB ---
+def _number(value):
+    return Decimal(str(round(value, 6)))
+
+
+class FairQueue:
+    """
+    The same scheduler on the admission table: a "sched" item holds the
+    state dict, each lane is a JobQueue. Every change is an atomic ADD or a
+    conditional SET, so concurrent kickoff / dispatcher invocations need no
+    lock; a race at worst serves a lane one turn early.
+    """
+
+    PK = "sched"
+
+    def __init__(self, table, tier_weights=None, tenant_weights=None):
+        self.table = table
+        self.tier_weights = tier_weights
+        self.tenant_weights = tenant_weights
+        self._ready = False
+        self._lanes = {}
+
+    def _init(self):
+        if not self._ready:
+            ensure_item(self.table, self.PK, lanes={}, tiers={}, clock={})
+            self._ready = True
+
+    def lane_queue(self, lane):
+        if lane not in self._lanes:
+            self._lanes[lane] = JobQueue(self.table, name=f"queue#{lane}")
+        return self._lanes[lane]
+
+    def state(self):
+        self._init()
+        item = self.table.get_item(Key={"pk": self.PK}, ConsistentRead=True).get("Item") or {}
+        return {"lanes": item.get("lanes") or {}, "tiers": item.get("tiers") or {}, "clock": item.get("clock") or {}}
+
+    def _update(self, expression, names, values, condition=None):
+        kwargs = {"ConditionExpression": condition} if condition else {}
+        try:
+            self.table.update_item(Key={"pk": self.PK}, UpdateExpression=expression,
+                                   ExpressionAttributeNames=names, ExpressionAttributeValues=values, **kwargs)
+            return True
+        except Exception as e:
+            if conditional_failed(e):
+                return False
+            raise
+
+    def enqueue(self, tier, tenant, job_id, payload):
+        """Appends to the tenant's lane; returns (lane, seq)."""
+        tier = tier_of(tier)
+        lane = lane_of(tier, tenant)
+        seq = self.lane_queue(lane).enqueue(job_id, payload)
+
+        names = {"#l": lane, "#t": tier}
+        zero = {":zero": 0}
+        for _ in range(ENQUEUE_ATTEMPTS):
+            state = self.state()
+            lane_vt, tier_vt = start_tags(state, tier, lane)
+            if lane not in state["lanes"]:
+                self._update("SET lanes.#l = :new", {"#l": lane},
+                             {":new": {"tier": tier, "tenant": tenant, "vt": _number(lane_vt), "n": 0}},
+                             condition="attribute_not_exists(lanes.#l)")
+            elif lane_vt is not None:
+                # Idle lane: resume at the clock, unless a concurrent enqueue already did
+                self._update("SET lanes.#l.vt = :vt", {"#l": lane}, dict(zero, **{":vt": _number(lane_vt)}),
+                             condition="lanes.#l.n <= :zero")
+            if tier not in state["tiers"]:
+                self._update("SET tiers.#t = :new", {"#t": tier}, {":new": {"vt": _number(tier_vt), "n": 0}},
+                             condition="attribute_not_exists(tiers.#t)")
+            elif tier_vt is not None:
+                self._update("SET tiers.#t.vt = :vt", {"#t": tier}, dict(zero, **{":vt": _number(tier_vt)}),
+                             condition="tiers.#t.n <= :zero")
+            # The sweep (prune) may have removed the idle lane since state(): then re-create it and count again
+            if self._update("ADD lanes.#l.n :one, tiers.#t.n :one", names, {":one": 1},
+                            condition="attribute_exists(lanes.#l) AND attribute_exists(tiers.#t)"):
+                return lane, seq
+        raise RuntimeError(f"Could not count job {job_id} on lane {lane}")
+
+    def has_backlog(self, state=None):
+        return select(state if state is not None else self.state()) is not None
+
+    def claim(self, state=None, attempts=5):
+        """Next job by fair order: {"tier", "tenant", "lane", "seq", "job_id", "payload"} or None."""
+        state = state if state is not None else self.state()
+        tried = set()
+        for _ in range(attempts):
+            lane = select(state, exclude=tried)
+            if lane is None:
+                return None
+            claimed = self.lane_queue(lane).claim()
+            if claimed is None:
+                # Counter ahead of the lane (a concurrent claim not yet charged): try the next lane
+                tried.add(lane)
+                continue
+            seq, job_id, payload = claimed
+            info = state["lanes"][lane]
+            delta = charges(state, lane, 1.0, self.tier_weights, self.tenant_weights)
+            self._update(
+                "ADD lanes.#l.vt :lvt, lanes.#l.n :minus, tiers.#t.vt :tvt, tiers.#t.n :minus "
+                "SET clock.#t = :lclock, clock.#all = :tclock",
+                {"#l": lane, "#t": info["tier"], "#all": ALL_TIERS},
+                {":lvt": _number(delta["lane_vt"]), ":tvt": _number(delta["tier_vt"]), ":minus": -1,
+                 ":lclock": _number(delta["lane_clock"]), ":tclock": _number(delta["tier_clock"])})
+            return {"tier": info["tier"], "tenant": info["tenant"], "lane": lane, "seq": seq,
+                    "job_id": job_id, "payload": payload}
+        return None
+
+    def position(self, lane, seq):
+        """Place within the tenant's own lane (1 = its next job to start)."""
+        return self.lane_queue(lane).position(seq)
+
+    def prune(self):
+        """
+        Scheduled sweep: drops idle lanes so the state item stays small, and
+        zeroes counts left behind by an invocation that died mid-claim.
+        """
+        state = self.state()
+        for lane, info in state["lanes"].items():
+            n = int(info["n"])
+            if n > 0 and self.lane_queue(lane).depth() <= 0:
+                self._update("ADD lanes.#l.n :fix, tiers.#t.n :fix", {"#l": lane, "#t": info["tier"]},
+                             {":fix": -n, ":n": n}, condition="lanes.#l.n = :n")
+                info["n"] = 0
+        idle = [lane for lane, info in state["lanes"].items() if float(info["n"]) <= 0]
+        return [lane for lane in idle
+                if self._update("REMOVE lanes.#l", {"#l": lane}, {":zero": 0}, condition="lanes.#l.n <= :zero")]
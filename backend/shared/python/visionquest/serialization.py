@@ -0,0 +1,103 @@
+"""
+JSON for DynamoDB items, shared by the API Lambdas.
+
+The boto3 resource layer returns every number as a Decimal, and a
+json.JSONEncoder subclass then pays a Python-level default() call per
+Decimal. Instead:
+  - plain() converts an item in one pre-pass (Decimal -> int when whole,
+    float otherwise; sets -> sorted lists; binary -> base64);
+  - from_typed() converts the low-level client's typed output
+    ({"N": "12"}) straight to plain values, never building Decimals;
+  - dumps() uses orjson when it is installed and the stdlib otherwise,
+    with the same compact output from both.
+"""
+import base64
+import json
+from decimal import Decimal
+
+try:
+    import orjson  # Optional: several times faster than the stdlib encoder
+except ImportError:
+    orjson = None
+
+
+def _decimal(value):
+    return int(value) if value == value.to_integral_value() else float(value)
+
+
+def _number(text):
+    """DynamoDB number string -> int when whole, float otherwise."""
+    try:
+        return int(text)
+    except ValueError:
+        number = float(text)
+        return int(number) if number.is_integer() else number
+
+
+def _binary(value):
+    return base64.b64encode(bytes(getattr(value, "value", value))).decode("ascii")
+
+
+def plain(value):
+    """JSON-ready copy of a resource-layer item (or list of items)."""
+    kind = type(value)
+    if kind is str:
+        return value
+    if kind is Decimal:
+        return _decimal(value)
+    if kind is dict:
+        return {k: plain(v) for k, v in value.items()}
+    if kind is list:
+        return [plain(v) for v in value]
+    if kind is int or kind is bool or value is None or kind is float:
+        return value
+    if kind is set:
+        return sorted(plain(v) for v in value)
+    if kind is bytes or kind is bytearray or kind.__name__ == "Binary":
+        return _binary(value)
+    if kind is tuple:
+        return [plain(v) for v in value]
+    return value
+
+
+def from_typed(attribute):
+    """One low-level AttributeValue ({"S": ...}, {"N": ...}, {"M": ...}) -> plain value."""
+    (kind, value), = attribute.items()
+    if kind == "S":
+        return value
+    if kind == "N":
+        return _number(value)
+    if kind == "M":
+        return {k: from_typed(v) for k, v in value.items()}
+    if kind == "L":
+        return [from_typed(v) for v in value]
+    if kind == "BOOL":
+        return value
+    if kind == "NULL":
+        return None
+    if kind == "SS":
+        return sorted(value)
+    if kind == "NS":
+        return sorted(_number(v) for v in value)
+    if kind == "B":
+        return _binary(value)
+    if kind == "BS":
+        return sorted(_binary(v) for v in value)
+    raise ValueError(f"Unknown DynamoDB type: {kind}")
+
+
+def items_from_typed(items):
+    """Items from client.query/scan/get_item -> list of plain dicts."""
+    return [{k: from_typed(v) for k, v in item.items()} for item in items]
+
+
+def dumps(value, convert=True):
+    """
+    JSON string for an API body. convert=False skips the pre-pass for
+    values that are already plain (e.g. from items_from_typed).
+    """
+    if convert:
+        value = plain(value)
+    if orjson is not None:
+        return orjson.dumps(value).decode("utf-8")
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
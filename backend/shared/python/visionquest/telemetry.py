@@ -0,0 +1,180 @@
+"""
+Per-stage timing spans in CloudWatch embedded metric format (EMF).
+
+Each span is logged as one JSON line. CloudWatch turns its numeric fields
+into metrics (dimension: Stage) and keeps job_id as a plain property, so a
+single job can be followed across Lambdas in Logs Insights:
+
+    fields @timestamp, Stage, duration_ms, pages, input_tokens
+    | filter job_id = "job-1718000000-1a2b3c4d" | sort @timestamp
+
+summary() returns the same numbers as a small dict, which the pipeline
+rolls up onto the job record (stage_timings) for the status API.
+
+    with Span("processor", job_id) as span:
+        with span.phase("bedrock"):
+            ...
+        span.add(input_tokens=812, output_tokens=240)
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+NAMESPACE = os.environ.get("METRICS_NAMESPACE", "VisionQuest")
+EMIT_SPANS = os.environ.get("EMIT_SPANS", "1") != "0"
+
+# Metric name suffix -> CloudWatch unit
+UNITS = (("_ms", "Milliseconds"), ("bytes", "Bytes"), ("tokens", "Count"), ("pages", "Count"), ("chars", "Count"))
+
+
+def unit_for(name):
+    for suffix, unit in UNITS:
+        if name.endswith(suffix):
+            return unit
+    return "None"
+
+
+class Span:
+    """Wall-clock time of one stage plus the counters attached to it."""
+
+    def __init__(self, stage, job_id=None, **properties):
+        self.stage = stage
+        self.job_id = job_id
+        self.properties = dict(properties)   # Strings (model, ocr_mode, ...): logged, not metrics
+        self.metrics = {}                     # Numbers (pages, bytes, tokens, *_ms, cost_usd)
+        self.started_at = None                # Epoch ms, to line stages up across Lambdas
+        self.duration_ms = None
+        self.error = None
+        self._started = None
+
+    def start(self):
+        self.started_at = int(time.time() * 1000)
+        self._started = time.perf_counter()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(exc_type.__name__ if exc_type else None)
+        return False
+
+    def add(self, **metrics):
+        """Accumulates counters (tokens over retries, bytes over chunks). None is ignored."""
+        for name, value in metrics.items():
+            if value is not None:
+                self.metrics[name] = self.metrics.get(name, 0) + value
+        return self
+
+    def tag(self, **properties):
+        self.properties.update({k: v for k, v in properties.items() if v is not None})
+        return self
+
+    @contextmanager
+    def phase(self, name):
+        """Times a sub-step into the '<name>_ms' metric."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(**{f"{name}_ms": (time.perf_counter() - started) * 1000.0})
+
+    def finish(self, error=None):
+        """Stops the clock and logs the span once. Returns summary()."""
+        if self.duration_ms is None:
+            self.duration_ms = (time.perf_counter() - self._started) * 1000.0
+            self.error = error
+            if EMIT_SPANS:
+                print(json.dumps(self.emf_record(), ensure_ascii=False, default=str))
+        return self.summary()
+
+    def emf_record(self):
+        metrics = dict(self.metrics, duration_ms=self.duration_ms)
+        record = {
+            "_aws": {
+                "Timestamp": self.started_at,
+                "CloudWatchMetrics": [{
+                    "Namespace": NAMESPACE,
+                    "Dimensions": [["Stage"]],
+                    "Metrics": [{"Name": name, "Unit": unit_for(name)} for name in sorted(metrics)]
+                }]
+            },
+            "Stage": self.stage,
+            "job_id": self.job_id
+        }
+        record.update(self.properties)
+        record.update({name: round(value, 6) for name, value in metrics.items()})
+        if self.error:
+            record["error"] = self.error
+        return record
+
+    def summary(self):
+        """JSON-safe rollup: start (epoch ms), ms, counters, properties."""
+        summary = {"start": self.started_at, "ms": _round("ms", self.duration_ms)}
+        summary.update({name: _round(name, value) for name, value in self.metrics.items()})
+        summary.update(self.properties)
+        if self.error:
+            summary["error"] = self.error
+        return summary
+
+
+def _round(name, value):
+    """Whole milliseconds; other floats (cost) keep six decimals."""
+    if name == "ms" or name.endswith("_ms"):
+        return int(round(value))
+    return round(value, 6) if isinstance(value, float) else value
+
+
+def to_dynamodb(value):
+    """The boto3 resource API rejects floats; convert them to Decimal (recursively)."""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: to_dynamodb(v) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [to_dynamodb(v) for v in value]
+    return value
+
+
+def _number(value):
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    return value
+
+
+def timing_breakdown(stage_timings):
+    """
+    Per-job view of the rolled-up spans: stages in the order they ran, the
+    wait before each one (S3 event delivery, Step Functions transitions)
+    and where the wall-clock time went overall.
+    """
+    stages = []
+    for stage, summary in (stage_timings or {}).items():
+        entry = {k: _number(v) for k, v in summary.items()}
+        if entry.get("start") is None or entry.get("ms") is None:
+            continue
+        entry["stage"] = stage
+        stages.append(entry)
+    if not stages:
+        return None
+    stages.sort(key=lambda s: s["start"])
+
+    previous_end = None
+    for entry in stages:
+        if previous_end is not None:
+            entry["wait_ms"] = max(0, int(entry["start"] - previous_end))
+        previous_end = max(previous_end or 0, entry["start"] + entry["ms"])
+
+    total_ms = int(previous_end - stages[0]["start"])
+    busy_ms = int(sum(entry["ms"] for entry in stages))
+    slowest = max(stages, key=lambda s: s["ms"])
+    return {
+        "stages": stages,
+        "total_ms": total_ms,
+        "busy_ms": busy_ms,
+        "waiting_ms": max(0, total_ms - busy_ms),
+        "slowest_stage": slowest["stage"],
+        "cost_usd": round(sum(float(entry.get("cost_usd", 0)) for entry in stages), 6)
+    }
@@ -0,0 +1,68 @@
+import re
+import unicodedata
+
+# Arabic harakat (fathatan ... sukun), superscript alef and Quranic marks
+ARABIC_DIACRITICS = re.compile("[ؐ-ًؚ-ٰٟۖ-ۭ]")
+TATWEEL = "ـ"
+
+# Letter variants that users type interchangeably
+ARABIC_LETTER_MAP = str.maketrans({
+    "آ": "ا",  # alef madda  -> alef
+    "أ": "ا",  # hamza above -> alef
+    "إ": "ا",  # hamza below -> alef
+    "ٱ": "ا",  # alef wasla  -> alef
+    "ى": "ي",  # alef maqsura -> ya
+})
+
+# Arabic-Indic and Persian digits -> ASCII (VAT numbers, article numbers)
+DIGIT_MAP = str.maketrans(
+    "٠١٢٣٤٥٦٧٨٩"
+    "۰۱۲۳۴۵۶۷۸۹",
+    "01234567890123456789",
+)
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def strip_diacritics(text):
+    """Removes Arabic diacritics and tatweel (kashida) stretching."""
+    return ARABIC_DIACRITICS.sub("", text).replace(TATWEEL, "")
+
+
+def normalize_text(text):
+    """
+    Canonical form for matching Arabic/English text:
+    NFKC, casefold, no diacritics/tatweel, unified alef/ya, ASCII digits,
+    single spaces.
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = strip_diacritics(text)
+    text = text.translate(ARABIC_LETTER_MAP).translate(DIGIT_MAP)
+    return WHITESPACE.sub(" ", text).strip()
+
+
+def normalize_query(query):
+    """
+    normalize_text() plus trailing punctuation removal, so
+    "What is the VAT rate?" and "what is the  VAT rate" share a cache entry.
+    """
+    return normalize_text(query).rstrip(" ?؟!.")
+
+
+def chunk_text(text, max_words=300, overlap=50):
+    """
+    Splits a document into overlapping word windows for indexing.
+    Same ballpark as the Knowledge Base default chunking (~300 tokens).
+    """
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, max_words - overlap)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + max_words]))
+        if start + max_words >= len(words):
+            break
+    return chunks
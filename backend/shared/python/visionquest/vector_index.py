@@ -0,0 +1,267 @@
+"""
+Local embedded vector index (alternative to the managed Knowledge Base).
+
+On-disk layout (one directory):
+    vectors.npy    float32 [n, dim] unit vectors  (or int8 when quantized)
+    scales.npy     float32 [n] per-row scales     (quantized mode only)
+    centroids.npy  float32 [lists, dim]           (IVF mode only)
+    offsets.npy    int64 [lists + 1]              (IVF mode only)
+    meta.json      dim, mode and the chunk texts/uris (row order)
+
+Vectors are loaded with mmap, so opening the index is instant and the OS
+page cache keeps the hot corpus in memory.
+"""
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+from visionquest.text import normalize_text
+
+# --- CONFIGURATION ---
+TITAN_EMBED_MODEL_ID = "amazon.titan-embed-text-v1"  # Same model as the KB (rag.tf)
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 20000  # Rows used to train IVF centroids
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+# --- EMBEDDERS ---
+class TitanEmbedder:
+    """Query/document embeddings from Bedrock Titan (what the KB uses)."""
+
+    def __init__(self, client, model_id=TITAN_EMBED_MODEL_ID):
+        self.client = client  # boto3 'bedrock-runtime'
+        self.model_id = model_id
+
+    def embed(self, texts):
+        vectors = []
+        for text in texts:
+            response = self.client.invoke_model(
+                modelId=self.model_id,
+                body=json.dumps({"inputText": text})
+            )
+            vectors.append(json.loads(response["body"].read())["embedding"])
+        return normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+
+class HashingEmbedder:
+    """
+    Deterministic bag-of-words embedder (signed feature hashing).
+    No network, no model: used for offline tests and reproducible benchmarks.
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = TOKEN_PATTERN.findall(normalize_text(text))
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                digest = int.from_bytes(hashlib.md5(feature.encode("utf-8")).digest()[:8], "little")
+                sign = 1.0 if digest & 1 else -1.0
+                matrix[row, (digest >> 1) % self.dim] += sign
+        return normalize_rows(matrix)
+
+
+def make_embedder(name, bedrock_runtime=None, dim=512):
+    """Query embedder matching the one an index was built with."""
+    if name == "hashing":
+        return HashingEmbedder(dim)
+    return TitanEmbedder(bedrock_runtime)
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+# --- BUILD ---
+def build_index(chunks, vectors, out_dir, ivf_lists=0, quantize=False, embedder="titan", seed=0):
+    """
+    Writes an index directory.
+    chunks:   list of {'text': ..., 'uri': ...} (same order as vectors)
+    vectors:  float array [n, dim] (normalized here)
+    ivf_lists: > 0 enables IVF (k-means coarse quantizer with that many lists)
+    quantize: store int8 rows + per-row scale (4x smaller, slightly lossy)
+    embedder: which embedder produced the vectors ('titan' or 'hashing');
+              queries must be embedded the same way (see make_embedder)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+    chunks = list(chunks)
+
+    mode = "flat"
+    if ivf_lists:
+        mode = "ivf"
+        centroids = train_centroids(vectors, ivf_lists, seed=seed)
+        assignment = assign_lists(vectors, centroids)
+        # Store rows grouped by list, so each list is one contiguous slice
+        order = np.argsort(assignment, kind="stable")
+        vectors = vectors[order]
+        chunks = [chunks[i] for i in order]
+        counts = np.bincount(assignment, minlength=ivf_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        np.save(os.path.join(out_dir, "centroids.npy"), centroids)
+        np.save(os.path.join(out_dir, "offsets.npy"), offsets)
+
+    if quantize:
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        stored = np.round(vectors / scales[:, None]).astype(np.int8)
+        np.save(os.path.join(out_dir, "scales.npy"), scales.astype(np.float32))
+    else:
+        stored = vectors
+    np.save(os.path.join(out_dir, "vectors.npy"), stored)
+
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "dim": int(vectors.shape[1]),
+            "count": len(chunks),
+            "mode": mode,
+            "quantized": bool(quantize),
+            "embedder": embedder,
+            "chunks": chunks
+        }, f, ensure_ascii=False)
+    return out_dir
+
+
+def train_centroids(vectors, n_lists, iterations=KMEANS_ITERATIONS, seed=0):
+    """Spherical k-means on a sample of the corpus."""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > KMEANS_SAMPLE:
+        sample = vectors[rng.choice(len(vectors), KMEANS_SAMPLE, replace=False)]
+    centroids = sample[rng.choice(len(sample), n_lists, replace=len(sample) < n_lists)].copy()
+    for _ in range(iterations):
+        labels = assign_lists(sample, centroids)
+        for i in range(n_lists):
+            members = sample[labels == i]
+            if len(members):
+                centroids[i] = members.sum(axis=0)
+        centroids = normalize_rows(centroids)
+    return centroids
+
+
+def assign_lists(vectors, centroids, batch_size=8192):
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), batch_size):
+        labels[start:start + batch_size] = np.argmax(vectors[start:start + batch_size] @ centroids.T, axis=1)
+    return labels
+
+
+# --- SEARCH ---
+class LocalVectorIndex:
+    """Top-k by (batched) dot product over a memory-mapped matrix."""
+
+    def __init__(self, path, vectors, chunks, scales=None, centroids=None, offsets=None,
+                 embedder="titan", default_nprobe=8):
+        self.path = path
+        self.embedder = embedder
+        self.vectors = vectors
+        self.chunks = chunks
+        self.scales = scales
+        self.centroids = centroids
+        self.offsets = offsets
+        self.default_nprobe = default_nprobe
+
+    @classmethod
+    def load(cls, path, mmap=True, default_nprobe=8):
+        mmap_mode = "r" if mmap else None
+
+        def optional(name):
+            file_path = os.path.join(path, name)
+            return np.load(file_path, mmap_mode=mmap_mode) if os.path.exists(file_path) else None
+
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        # Centroids/offsets are tiny: keep them in RAM
+        centroids = optional("centroids.npy")
+        offsets = optional("offsets.npy")
+        return cls(
+            path,
+            np.load(os.path.join(path, "vectors.npy"), mmap_mode=mmap_mode),
+            meta["chunks"],
+            scales=optional("scales.npy"),
+            centroids=None if centroids is None else np.asarray(centroids),
+            offsets=None if offsets is None else np.asarray(offsets),
+            embedder=meta.get("embedder", "titan"),
+            default_nprobe=default_nprobe
+        )
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def search(self, query_vector, k=3, nprobe=None):
+        """Single query. Returns Bedrock-shaped retrieval results."""
+        ids, scores = self.search_ids(np.asarray(query_vector, dtype=np.float32)[None, :], k=k, nprobe=nprobe)
+        return [self.result(i, s) for i, s in zip(ids[0], scores[0]) if i >= 0]
+
+    def search_ids(self, queries, k=3, nprobe=None):
+        """
+        Batched search: queries [q, dim] -> (ids [q, k], scores [q, k]).
+        Missing slots (k > candidates) are filled with id -1.
+        """
+        queries = normalize_rows(np.asarray(queries, dtype=np.float32))
+        if self.centroids is None:
+            return top_k(self.score_rows(0, len(self), queries), k)
+
+        nprobe = min(nprobe or self.default_nprobe, len(self.centroids))
+        probe_lists = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe]
+        all_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for row, lists in enumerate(probe_lists):
+            candidate_ids = np.concatenate([
+                np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists
+            ])
+            if not len(candidate_ids):
+                continue
+            scores = self.score_ids(candidate_ids, queries[row:row + 1])
+            ids, best = top_k(scores, k)
+            found = ids[0] >= 0
+            all_ids[row, :found.sum()] = candidate_ids[ids[0][found]]
+            all_scores[row, :found.sum()] = best[0][found]
+        return all_ids, all_scores
+
+    def score_rows(self, start, stop, queries):
+        scores = (self.vectors[start:stop] @ queries.T).T.astype(np.float32)
+        if self.scales is not None:
+            scores *= self.scales[start:stop]
+        return scores
+
+    def score_ids(self, ids, queries):
+        scores = (self.vectors[ids] @ queries.T).T.astype(np.float32)
+        if self.scales is not None:
+            scores *= self.scales[ids]
+        return scores
+
+    def result(self, row, score):
+        chunk = self.chunks[int(row)]
+        return {
+            "content": {"text": chunk["text"]},
+            "location": {"type": "S3", "s3Location": {"uri": chunk.get("uri", "")}},
+            "score": float(score),
+            "metadata": {"row": int(row)}
+        }
+
+
+def top_k(scores, k):
+    """Row-wise top-k of a [q, n] score matrix, best first."""
+    n = scores.shape[1]
+    if n == 0:
+        return (np.full((len(scores), k), -1, dtype=np.int64),
+                np.full((len(scores), k), -np.inf, dtype=np.float32))
+    kk = min(k, n)
+    part = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    ids = np.take_along_axis(part, order, axis=1)
+    best = np.take_along_axis(part_scores, order, axis=1)
+    if kk < k:
+        ids = np.pad(ids, ((0, 0), (0, k - kk)), constant_values=-1)
+        best = np.pad(best, ((0, 0), (0, k - kk)), constant_values=-np.inf)
+    return ids, best
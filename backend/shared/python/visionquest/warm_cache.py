@@ -0,0 +1,105 @@
+"""
+Warm state for what every request used to rebuild: prompt templates and
+language assets. Lives at module level, so it survives warm Lambda
+invocations and Streamlit reruns.
+
+Every cache entry remembers the version it was built from (a file's mtime
+or an explicit tag). A lookup with the same version is a dict hit; a new
+version rebuilds the entry. File mtimes are checked at most every
+FILE_CHECK_SECONDS.
+
+    PROMPT = PromptTemplate("User Question: {question}")   # module level
+    prompt = PROMPT.render(question=question)
+    txt = load_json("assets/en.json", default={})
+"""
+import json
+import os
+import string
+import textwrap
+import threading
+import time
+
+# --- CONFIGURATION ---
+FILE_CHECK_SECONDS = float(os.environ.get("WARM_CACHE_FILE_CHECK_SECONDS", "5"))
+
+
+class WarmCache:
+    """key -> (version, value). No TTL: entries only change with their version."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._checked = {}   # file path -> (checked_at, mtime)
+        self._lock = threading.Lock()
+
+    def get(self, key, build, version=None):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+        value = build()
+        with self._lock:
+            self._entries[key] = (version, value)
+            self.misses += 1
+        return value
+
+    def file_version(self, path, check_seconds=FILE_CHECK_SECONDS):
+        """mtime of path (None if missing), re-read from disk at most every check_seconds."""
+        now = self.clock()
+        checked = self._checked.get(path)
+        if checked is not None and now - checked[0] < check_seconds:
+            return checked[1]
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        self._checked[path] = (now, mtime)
+        return mtime
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._checked.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+
+cache = WarmCache()
+
+
+# --- PROMPT TEMPLATES ---
+class PromptTemplate:
+    """
+    A str.format template, dedented once: the indentation of an inline
+    f-string was sent to the model on every call. Build it at module level
+    so it lives as long as the container. Values are inserted as-is (braces
+    in user text are not re-interpreted).
+    """
+
+    def __init__(self, text):
+        self.text = textwrap.dedent(text).strip()
+        self.fields = {field for _, field, _, _ in string.Formatter().parse(self.text) if field}
+
+    def render(self, **values):
+        return self.text.format_map(values)
+
+
+# --- ASSETS ---
+def load_json(path, default=None):
+    """Parsed JSON file, re-read only after its mtime changes. Missing / broken file -> default."""
+    version = cache.file_version(path)
+    if version is None:
+        return default
+
+    def read():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+    return cache.get(("json", path), read, version)
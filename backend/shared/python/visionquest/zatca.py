@@ -0,0 +1,304 @@
+"""
+Deterministic ZATCA invoice pre-check.
+
+Runs before the vision model on the invoice's text layer (PyMuPDF get_text
+or Textract LINE blocks) and, when available, the decoded QR payload:
+  - QR: base64 TLV, tags 1-5 (seller, VAT number, timestamp, total, VAT)
+  - VAT registration number: 15 digits, starts and ends with 3
+  - invoice number and date present
+  - Total = Subtotal + VAT, and the QR totals match the printed ones
+
+precheck() returns COMPLIANT or VIOLATION only when the evidence is
+unambiguous; anything else is AMBIGUOUS and should go to the model.
+"""
+import base64
+import binascii
+import re
+from decimal import Decimal, InvalidOperation
+
+from visionquest.text import normalize_text
+
+# --- CONFIGURATION ---
+AMOUNT_TOLERANCE = Decimal("0.05")   # Rounding slack per invoice (halalas)
+QR_TAGS = {1: "seller_name", 2: "vat_number", 3: "timestamp", 4: "total", 5: "vat_total"}
+
+COMPLIANT = "COMPLIANT"
+VIOLATION = "VIOLATION"
+AMBIGUOUS = "AMBIGUOUS"
+
+# Arabic decimal / thousands separators and percent sign -> ASCII
+SEPARATOR_MAP = str.maketrans({"٫": ".", "٬": ",", "٪": "%"})
+
+VAT_NUMBER = re.compile(r"(?<!\d)3\d{13}3(?!\d)")
+VAT_LABEL = re.compile(r"(?:vat|tax)\s*(?:registration\s*)?(?:no|number|#|id)\b|\btrn\b|الرقم الضريبي|رقم التسجيل الضريبي")
+DIGIT_GROUPING = re.compile(r"(?<=\d)[ -](?=\d)")  # "300 000 000 000 003" style grouping allowed
+INVOICE_NUMBER = re.compile(r"(?:invoice\s*(?:no|number|#)|رقم الفاتور[ةه])\s*[.:#]?\s*([a-z0-9][a-z0-9/_-]*)")
+DATE = re.compile(r"\b(?:\d{4}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]\d{4})\b")
+AMOUNT = re.compile(r"(?<![\d.])(\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d+\.\d{1,2}|\d+)(?![\d%]|\s*%)")
+
+# Checked in order: the first label class found on a line wins
+# (normalize_text keeps ta marbuta, so both spellings are matched)
+SUBTOTAL_LABELS = re.compile(r"sub\s*-?\s*total|total\s*(?:excluding|excl\.?|before)\s*(?:vat|tax)|taxable\s*amount|net\s*amount"
+                             r"|المجموع الفرعي|الاجمالي غير شامل|الاجمالي قبل الضريب[ةه]|المبلغ الخاضع للضريب[ةه]")
+VAT_AMOUNT_LABELS = re.compile(r"\b(?:total\s*)?vat\b(?:\s*amount)?|tax\s*amount|ضريب[ةه] القيم[ةه] المضاف[ةه]|مبلغ الضريب[ةه]|اجمالي الضريب[ةه]")
+INCLUSIVE_HINT = re.compile(r"incl|including|شامل")
+TOTAL_LABELS = re.compile(r"grand\s*total|total\s*(?:amount|due|including|incl)|\btotal\b|amount\s*due"
+                          r"|الاجمالي|المبلغ المستحق|المجموع")
+
+FINDINGS = {
+    "no_text": ("No text layer; the document is a scan.", "لا توجد طبقة نصية؛ المستند ممسوح ضوئياً."),
+    "qr_missing": ("No QR code could be decoded.", "تعذر قراءة رمز الاستجابة السريعة (QR)."),
+    "qr_ok": ("QR code decoded: seller, VAT number, timestamp, total and VAT present.",
+              "تمت قراءة رمز QR: البائع والرقم الضريبي والتاريخ والإجمالي والضريبة موجودة."),
+    "qr_unreadable": ("A QR code was found but it is not a ZATCA TLV payload (tags 1-5).",
+                      "تم العثور على رمز QR لكنه لا يحتوي على بيانات ZATCA (الحقول 1-5)."),
+    "qr_vat_invalid": ("VAT number inside the QR code is not a valid 15-digit number.",
+                       "الرقم الضريبي داخل رمز QR غير صالح."),
+    "qr_vat_mismatch": ("VAT number in the QR code differs from the printed one.",
+                        "الرقم الضريبي في رمز QR يختلف عن الرقم المطبوع."),
+    "qr_total_mismatch": ("Totals in the QR code differ from the printed totals.",
+                          "المبالغ في رمز QR تختلف عن المبالغ المطبوعة."),
+    "vat_ok": ("VAT registration number is valid.", "الرقم الضريبي صالح."),
+    "vat_missing": ("VAT registration number not found.", "لم يتم العثور على الرقم الضريبي."),
+    "invoice_number_ok": ("Invoice number present.", "رقم الفاتورة موجود."),
+    "invoice_number_missing": ("Invoice number not found.", "لم يتم العثور على رقم الفاتورة."),
+    "date_ok": ("Invoice date present.", "تاريخ الفاتورة موجود."),
+    "date_missing": ("Invoice date not found.", "لم يتم العثور على تاريخ الفاتورة."),
+    "totals_ok": ("Total = Subtotal + VAT.", "الإجمالي = المجموع الفرعي + الضريبة."),
+    "totals_mismatch": ("Total does not equal Subtotal + VAT.", "الإجمالي لا يساوي المجموع الفرعي + الضريبة."),
+    "totals_incomplete": ("Could not read subtotal, VAT and total.", "تعذر قراءة المجموع الفرعي والضريبة والإجمالي."),
+}
+
+
+# --- QR (TLV) ---
+def decode_qr_tlv(payload):
+    """
+    ZATCA QR payload (base64 of tag/length/value triplets) -> dict.
+    Tags 1-5 become named fields; phase-2 tags (6+) are kept as raw bytes
+    under their number. Raises ValueError on malformed input.
+    """
+    try:
+        raw = base64.b64decode(payload.strip(), validate=True)
+    except (binascii.Error, ValueError, AttributeError):
+        raise ValueError("QR payload is not base64")
+    fields = {}
+    index = 0
+    while index < len(raw):
+        if index + 2 > len(raw):
+            raise ValueError("Truncated TLV header")
+        tag, length = raw[index], raw[index + 1]
+        value = raw[index + 2:index + 2 + length]
+        if len(value) != length:
+            raise ValueError(f"Truncated TLV value for tag {tag}")
+        index += 2 + length
+        if tag in QR_TAGS:
+            fields[QR_TAGS[tag]] = value.decode("utf-8")
+        else:
+            fields[tag] = value
+    return fields
+
+
+def encode_qr_tlv(fields):
+    """Inverse of decode_qr_tlv for tags 1-5 (handy for fixtures and e-invoice generation)."""
+    raw = b""
+    for tag, name in sorted(QR_TAGS.items()):
+        value = str(fields[name]).encode("utf-8")
+        raw += bytes([tag, len(value)]) + value
+    return base64.b64encode(raw).decode("ascii")
+
+
+def decode_qr_images(images):
+    """
+    Decodes QR codes from image bytes with zxing-cpp or pyzbar, whichever is
+    installed. Returns a list of payload strings, or None when no decoder is
+    available (so callers can tell "no QR" from "couldn't look").
+    """
+    try:
+        import zxingcpp
+        from PIL import Image
+        import io
+
+        def read(data):
+            return [r.text for r in zxingcpp.read_barcodes(Image.open(io.BytesIO(data))) if r.text]
+    except ImportError:
+        try:
+            from pyzbar.pyzbar import decode
+            from PIL import Image
+            import io
+
+            def read(data):
+                return [r.data.decode("utf-8", "ignore") for r in decode(Image.open(io.BytesIO(data)))]
+        except ImportError:
+            return None
+
+    payloads = []
+    for data in images:
+        try:
+            payloads.extend(read(data))
+        except Exception as e:
+            print(f"⚠️ QR decode failed: {e}")
+    return payloads
+
+
+# --- TEXT LAYER ---
+def text_from_textract_blocks(blocks):
+    """Textract Blocks -> text with one LINE per row (what precheck expects)."""
+    return "\n".join(b["Text"] for b in blocks if b.get("BlockType") == "LINE" and b.get("Text"))
+
+
+def to_decimal(number):
+    try:
+        return Decimal(number.replace(",", ""))
+    except InvalidOperation:
+        return None
+
+
+def valid_vat_number(value):
+    digits = re.sub(r"[\s-]", "", normalize_text(value or ""))
+    return bool(VAT_NUMBER.fullmatch(digits))
+
+
+def normalize_lines(text):
+    return [normalize_text(line.translate(SEPARATOR_MAP)) for line in (text or "").splitlines()]
+
+
+def find_vat_numbers(lines):
+    """
+    Every valid VAT number printed on the invoice (seller and, on B2B
+    invoices, buyer), labeled ones first. A label followed by anything else
+    (a phone number, a CR number) is not evidence either way.
+    """
+    labeled, unlabeled = [], []
+    for index, line in enumerate(lines):
+        label = VAT_LABEL.search(line)
+        if label:
+            rest = line[label.end():]
+            if not re.search(r"\d", rest) and index + 1 < len(lines):
+                rest = lines[index + 1]  # Label and value on separate lines
+            labeled.extend(VAT_NUMBER.findall(DIGIT_GROUPING.sub("", rest)))
+        unlabeled.extend(VAT_NUMBER.findall(line.replace(" ", "")))
+    return list(dict.fromkeys(labeled + unlabeled))
+
+
+def last_amount(line):
+    amounts = [to_decimal(m.group(1)) for m in AMOUNT.finditer(line)]
+    amounts = [a for a in amounts if a is not None]
+    return amounts[-1] if amounts else None
+
+
+def find_totals(lines):
+    """{'subtotal', 'vat', 'total'} as Decimals (missing keys when not found). Last occurrence wins."""
+    totals = {}
+    for index, line in enumerate(lines):
+        if SUBTOTAL_LABELS.search(line):
+            key = "subtotal"
+        elif VAT_AMOUNT_LABELS.search(line) and not INCLUSIVE_HINT.search(line) and not VAT_LABEL.search(line):
+            key = "vat"
+        elif TOTAL_LABELS.search(line):
+            key = "total"
+        else:
+            continue
+        amount = last_amount(line)
+        if amount is None and index + 1 < len(lines):
+            amount = last_amount(lines[index + 1])  # Label and value on separate lines
+        if amount is not None:
+            totals[key] = amount
+    return totals
+
+
+# --- PRE-CHECK ---
+def precheck(text_layer, qr_payloads=None):
+    """
+    text_layer:  invoice text (may be empty for scans)
+    qr_payloads: decoded QR strings, [] when a decoder found none,
+                 None when QR decoding wasn't attempted
+    Returns {'status', 'findings': [(code, ok)], 'fields': {...}}.
+    """
+    lines = [line for line in normalize_lines(text_layer) if line]
+    findings = []
+    violations = []
+    unknowns = []
+    fields = {}
+
+    def note(code, ok):
+        findings.append((code, ok))
+        if ok is False:
+            violations.append(code)
+        elif ok is None:
+            unknowns.append(code)
+
+    if not lines:
+        note("no_text", None)
+
+    # QR
+    qr = None
+    if qr_payloads:
+        for payload in qr_payloads:
+            try:
+                decoded = decode_qr_tlv(payload)
+            except ValueError:
+                continue
+            if all(name in decoded for name in QR_TAGS.values()):
+                qr = decoded
+                break
+        if qr is None:
+            note("qr_unreadable", None)  # A URL or payment link: the model checks for the ZATCA code
+        else:
+            fields["qr"] = {k: v for k, v in qr.items() if k in QR_TAGS.values()}
+            note("qr_ok", True)
+            if not valid_vat_number(qr["vat_number"]):
+                note("qr_vat_invalid", False)
+    else:
+        note("qr_missing", None)  # Decoders miss small/blurred codes: let the model look
+
+    # VAT number
+    vat_numbers = find_vat_numbers(lines)
+    fields["vat_number"] = vat_numbers[0] if vat_numbers else None
+    fields["vat_numbers"] = vat_numbers
+    if not vat_numbers:
+        note("vat_missing", None)
+    else:
+        note("vat_ok", True)
+        if qr is not None and re.sub(r"\D", "", qr["vat_number"]) not in vat_numbers:
+            note("qr_vat_mismatch", False)
+
+    # Invoice number / date
+    invoice_match = next((m for m in (INVOICE_NUMBER.search(l) for l in lines) if m), None)
+    fields["invoice_number"] = invoice_match.group(1) if invoice_match else None
+    note("invoice_number_ok" if invoice_match else "invoice_number_missing", True if invoice_match else None)
+    date_match = next((m for m in (DATE.search(l) for l in lines) if m), None)
+    fields["date"] = date_match.group(0) if date_match else (qr or {}).get("timestamp")
+    note("date_ok" if fields["date"] else "date_missing", True if fields["date"] else None)
+
+    # Totals
+    totals = find_totals(lines)
+    fields["totals"] = {k: str(v) for k, v in totals.items()}
+    if all(k in totals for k in ("subtotal", "vat", "total")):
+        consistent = abs(totals["subtotal"] + totals["vat"] - totals["total"]) <= AMOUNT_TOLERANCE
+        note("totals_ok" if consistent else "totals_mismatch", consistent)
+    else:
+        note("totals_incomplete", None)
+    if qr is not None:
+        qr_total, qr_vat = to_decimal(qr["total"]), to_decimal(qr["vat_total"])
+        printed = [(qr_total, totals.get("total")), (qr_vat, totals.get("vat"))]
+        if any(a is None or (b is not None and abs(a - b) > AMOUNT_TOLERANCE) for a, b in printed):
+            note("qr_total_mismatch", False)
+
+    if violations:
+        status = VIOLATION
+    elif unknowns:
+        status = AMBIGUOUS
+    else:
+        status = COMPLIANT
+    return {"status": status, "findings": findings, "fields": fields}
+
+
+def format_report(result, language="English"):
+    """Bulleted report in the same shape the vision model is asked for."""
+    arabic = language.lower().startswith("ar") or language == "العربية"
+    header = "✅ COMPLIANT" if result["status"] == COMPLIANT else "❌ VIOLATION"
+    lines = [f"{header} ({'فحص آلي' if arabic else 'automatic pre-check'})"]
+    for code, ok in result["findings"]:
+        icon = "✅" if ok else ("❌" if ok is False else "⚠️")
+        lines.append(f"- {icon} {FINDINGS[code][1 if arabic else 0]}")
+    return "\n".join(lines)
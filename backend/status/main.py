@@ -1,23 +1,26 @@
 import json
 import boto3
 import os
-from decimal import Decimal
 
-# --- THE TRANSLATOR (Fixes the JSON Error) ---
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            # Convert Decimal to int if it's a whole number, else float
-            return int(obj) if obj % 1 == 0 else float(obj)
-        return super(DecimalEncoder, self).default(obj)
+# Shared layer (backend/shared)
+from visionquest.compression import unpack_fields
+from visionquest.logs import get_logger
+from visionquest.scheduler import FairQueue
+from visionquest.serialization import dumps
+from visionquest.telemetry import timing_breakdown
 
 # --- CONFIGURATION ---
 dynamodb = boto3.resource('dynamodb')
+s3 = boto3.client('s3')
 JOBS_TABLE_NAME = os.environ.get('JOBS_TABLE_NAME')
 jobs_table = dynamodb.Table(JOBS_TABLE_NAME)
+queue = FairQueue(dynamodb.Table(os.environ.get('ADMISSION_TABLE_NAME')))
+PACKED_FIELDS = ('answer', 'user_prompt')   # Possibly compressed / in S3 (visionquest.compression)
+log = get_logger("status")  # Polled every few seconds per job: sample it (LOG_SAMPLE_RATES)
 
 def lambda_handler(event, context):
-    print("📡 Status Check: Received Request")
+    log.begin(event, context)
+    log.info("📡 Status Check: Received Request")
     
     # CORS HEADERS (Critical for Browser Access)
     headers = {
@@ -31,6 +34,7 @@ def lambda_handler(event, context):
         # 1. Parse Input
         body = json.loads(event.get('body', '{}'))
         job_id = body.get('job_id')
+        fields = body.get('fields')  # Optional, e.g. ["status"] while polling
         
         if not job_id:
             return {
@@ -40,8 +44,9 @@ def lambda_handler(event, context):
             }
 
         # 2. Fetch from DynamoDB
-        print(f"🔍 Looking up Job: {job_id}")
-        response = jobs_table.get_item(Key={'job_id': job_id})
+        log.bind(job_id=job_id)
+        log.info("🔍 Looking up Job: %s", job_id)
+        response = jobs_table.get_item(Key={'job_id': job_id}, **projection(fields))
         item = response.get('Item')
 
         if not item:
@@ -51,19 +56,40 @@ def lambda_handler(event, context):
                 "body": json.dumps({"status": "NOT_FOUND"})
             }
 
-        print(f"✅ Status Found: {item.get('status')}")
+        log.info("✅ Status Found: %s", item.get('status'))
 
-        # 3. Return Response (USING THE TRANSLATOR)
+        # Waiting for a pipeline slot (kickoff's dispatcher): 1 = this user's next job to start
+        lane, seq = item.pop('queue_lane', None), item.pop('queue_seq', None)
+        if item.get('status') == 'QUEUED' and lane and seq is not None:
+            item['queue_position'] = queue.position(lane, seq)
+
+        # Only the returned fields are decompressed
+        unpack_fields(item, PACKED_FIELDS, s3)
+
+        # Per-stage spans -> ordered breakdown with the waits between stages
+        timing = timing_breakdown(item.pop('stage_timings', None))
+        if timing:
+            item['timing'] = timing
+
+        # 3. Return Response (Decimals converted in one pre-pass, same output as /history)
         return {
             "statusCode": 200,
             "headers": headers,
-            "body": json.dumps(item, cls=DecimalEncoder) # <--- THE FIX
+            "body": dumps(item)
         }
 
     except Exception as e:
-        print(f"❌ Status Error: {str(e)}")
+        log.error("❌ Status Error: %s", e)
         return {
             "statusCode": 500,
             "headers": headers,
             "body": json.dumps({"error": str(e)})
-        }
\ No newline at end of file
+        }
+
+def projection(fields):
+    """get_item kwargs that read only the requested attributes ('timing' -> stage_timings)."""
+    if not fields:
+        return {}
+    attributes = {'stage_timings' if f == 'timing' else f for f in fields} | {'job_id', 'status', 'queue_lane', 'queue_seq'}
+    names = {f"#f{i}": name for i, name in enumerate(sorted(attributes))}
+    return {"ProjectionExpression": ", ".join(names), "ExpressionAttributeNames": names}
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""
+Batch audit throughput (invoices/min) against a fake vision model with a
+server-side request quota, for several concurrency levels.
+Concurrency 1 is the old one-blocking-call-per-invoice behaviour.
+
+    python benchmarks/bench_batch_audit.py --invoices 60 --concurrency 1 4 8 16 --quota-rps 4
+"""
+import argparse
+import os
+import sys
+
+import bench_utils
+from bench_utils import latency_summary, print_table, write_json
+from bench_rasterize import synthetic_invoice
+from fakes import FakeVisionClient
+
+sys.path.append(os.path.join(bench_utils.REPO_ROOT, "code"))
+from batch_audit import BatchAuditor  # noqa: E402
+from rasterizer import Rasterizer  # noqa: E402
+
+
+def run(args):
+    invoices = [(f"invoice_{i:04d}.pdf", synthetic_invoice(1 + i % args.max_pages, i)) for i in range(args.invoices)]
+    rasterizer = Rasterizer(workers=args.raster_workers)
+    rows = []
+    for concurrency in args.concurrency:
+        client = FakeVisionClient(latency=args.latency, rps_limit=args.quota_rps, error_rate=args.error_rate)
+        auditor = BatchAuditor(client=client, concurrency=concurrency, requests_per_second=args.rps,
+                               burst=args.rps, rasterizer=rasterizer)
+        verdicts = list(auditor.audit(invoices))
+        summary = auditor.summary
+        timings = latency_summary([v["latency_ms"] / 1000.0 for v in verdicts])
+        rows.append({
+            "concurrency": concurrency,
+            "invoices_per_min": summary["invoices_per_min"],
+            "p50_ms": timings["p50_ms"],
+            "p95_ms": timings["p95_ms"],
+            "errors": summary["errors"],
+            "retries": summary["retries"],
+            "client_throttles": summary["throttles"],
+            "server_rejects": client.throttled
+        })
+    rasterizer.close()
+
+    print(f"📊 {args.invoices} invoices, model latency {args.latency}s, quota {args.quota_rps} rps, limiter {args.rps} rps")
+    print_table(rows, list(rows[0].keys()))
+    if args.json:
+        write_json(args.json, {"config": vars(args), "results": rows})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--invoices", type=int, default=60)
+    parser.add_argument("--max-pages", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--latency", type=float, default=1.0, help="Fake model seconds per call")
+    parser.add_argument("--quota-rps", type=float, default=4, help="Fake server-side quota")
+    parser.add_argument("--rps", type=float, default=5, help="Client token bucket rate")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--raster-workers", type=int, default=2)
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
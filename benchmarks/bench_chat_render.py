@@ -0,0 +1,84 @@
+"""
+Per-rerun cost of a long chat in the Streamlit frontend, before and after
+windowed rendering (frontend/app.py RENDER_WINDOW) and the paginated
+history API (api.get_chat_page).
+
+For each chat length, the real app (AppTest, against the fake API of
+bench_frontend.py) opens the chat from the sidebar and then reruns idle:
+  - open:  click the chat: history request(s) + first render. Before: the
+           whole chat was fetched and rebuilt;
+  - rerun: any later interaction. Before: every message was rendered, with
+           its citations' st.json inside a (collapsed) expander.
+
+    python benchmarks/bench_chat_render.py --jobs 10 50 200 --json chat_render.json
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+
+from bench_frontend import FakeApi, export_frontend, fresh_app, load_variant, measure, unload_variant
+from bench_utils import latency_summary, print_table, write_json
+
+
+def bench_chat(name, app_path, server, args):
+    load_variant(app_path)
+    try:
+        at = fresh_app(app_path, args.timeout)
+        at.run()
+        opened = measure(server, lambda: at.sidebar.button[1].click().run())   # The only chat
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].value}")
+        reruns = [measure(server, at.run) for _ in range(args.reruns)]
+        return opened, reruns, len(at.session_state.messages), len(at.chat_message), len(at.json)
+    finally:
+        unload_variant(app_path)
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="vq-chat-render-")
+    rows = []
+    try:
+        for jobs in args.jobs:
+            api_args = argparse.Namespace(handshake_ms=args.handshake_ms, rtt_ms=args.rtt_ms, job_seconds=60.0, chats=1)
+            server = FakeApi(api_args, history_jobs=jobs, citations=args.citations)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                for name, rev in (("before", args.old_rev), ("after", None)):
+                    app_path = export_frontend(rev, os.path.join(workdir, f"{name}-{jobs}"), server.url)
+                    opened, reruns, loaded, rendered, json_blocks = bench_chat(name, app_path, server, args)
+                    latency = latency_summary([seconds for seconds, _, _ in reruns])
+                    rows.append({
+                        "chat_jobs": jobs,
+                        "frontend": name,
+                        "open_ms": round(opened[0] * 1000.0, 1),
+                        "open_requests": opened[1],
+                        "rerun_p50_ms": latency["p50_ms"],
+                        "rerun_p95_ms": latency["p95_ms"],
+                        "messages_loaded": loaded,
+                        "messages_rendered": rendered,
+                        "json_rendered": json_blocks,
+                    })
+            finally:
+                server.shutdown()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"🧪 {args.reruns} reruns per chat, {args.citations} citations per answer, RTT {args.rtt_ms} ms")
+    print_table(rows, list(rows[0].keys()))
+    if args.json:
+        write_json(args.json, {"config": vars(args), "results": rows})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--old-rev", default="3065676", help="Git revision of the 'before' frontend")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[10, 50, 200], help="Chat lengths (question + answer)")
+    parser.add_argument("--citations", type=int, default=5, help="Citations per answer")
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--handshake-ms", type=float, default=60.0)
+    parser.add_argument("--rtt-ms", type=float, default=25.0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="AppTest script timeout")
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
@@ -0,0 +1,81 @@
+"""
+Prompt-token reduction of the context assembler on a fixed question set.
+
+Rebuilds the eval corpus the way the KB chunker does (overlapping windows
+per source document), retrieves the top candidates per question with BM25,
+and compares naive concatenation (the old `+=` loop) with
+assemble_context() under a token budget.
+
+    python benchmarks/bench_context.py --candidates 8 --budget 400
+"""
+import argparse
+import json
+from collections import OrderedDict
+
+import bench_utils  # noqa: F401  (puts visionquest on the path)
+from bench_utils import print_table, write_json
+from eval_retrieval import DEFAULT_DATASET
+
+from visionquest.context import assemble_context, estimate_tokens
+from visionquest.lexical import BM25Index, BM25Retriever
+from visionquest.text import chunk_text
+
+
+def overlapping_corpus(chunks, window, overlap):
+    """Concatenates chunks per source uri and re-chunks with overlap."""
+    documents = OrderedDict()
+    for chunk in chunks:
+        documents.setdefault(chunk["uri"], []).append(chunk["text"])
+    corpus = []
+    for uri, texts in documents.items():
+        for text in chunk_text(" ".join(texts), max_words=window, overlap=overlap):
+            corpus.append({"text": text, "uri": uri})
+    return corpus
+
+
+def run(args):
+    with open(args.dataset, "r", encoding="utf-8") as f:
+        dataset = json.load(f)
+    corpus = overlapping_corpus(dataset["chunks"], args.window, args.overlap)
+    retriever = BM25Retriever(BM25Index(corpus))
+
+    rows = []
+    for item in dataset["questions"]:
+        docs = retriever.retrieve(item["q"], k=args.candidates)
+        naive = "".join(f"{d['content']['text']}\n" for d in docs)
+        context = assemble_context(docs, token_budget=args.budget)
+        rows.append({
+            "question": item["q"][:40],
+            "chunks": len(docs),
+            "kept": len(context["citations"]),
+            "dupes": context["dropped_duplicates"],
+            "naive_tok": estimate_tokens(naive),
+            "assembled_tok": context["tokens"]
+        })
+
+    naive_total = sum(r["naive_tok"] for r in rows)
+    assembled_total = sum(r["assembled_tok"] for r in rows)
+    print(f"📊 {len(corpus)} overlapping chunks (window={args.window}, overlap={args.overlap}), "
+          f"{args.candidates} candidates, budget={args.budget}")
+    print_table(rows, list(rows[0].keys()))
+    reduction = 1 - assembled_total / float(naive_total or 1)
+    print(f"\n🧮 Prompt context tokens: {naive_total} -> {assembled_total} ({reduction:.1%} fewer)")
+    if args.json:
+        write_json(args.json, {
+            "config": vars(args),
+            "naive_tokens": naive_total,
+            "assembled_tokens": assembled_total,
+            "reduction": round(reduction, 4),
+            "questions": rows
+        })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--window", type=int, default=40, help="Words per chunk")
+    parser.add_argument("--overlap", type=int, default=20, help="Words shared by consecutive chunks")
+    parser.add_argument("--candidates", type=int, default=8)
+    parser.add_argument("--budget", type=int, default=400)
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
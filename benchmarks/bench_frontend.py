@@ -0,0 +1,228 @@
+"""
+Rerun latency of the Streamlit frontend (frontend/app.py + api.py), before
+and after the pooled session, cached history and non-blocking job polling.
+
+Drives the real app with streamlit.testing.v1.AppTest against a local fake
+of the API Gateway routes. The fake charges --handshake-ms for every new
+connection (TCP + TLS to API Gateway) and --rtt-ms for every request:
+  - rerun:  an idle rerun (any widget interaction). Before: the chat list
+            request ran on every rerun, on a new connection each time;
+  - submit: upload + question. Before: the script slept in a status loop
+            until the job finished, so the page was frozen for the whole job.
+
+The "before" frontend is read from git (--old-rev) into a temp dir.
+
+    python benchmarks/bench_frontend.py --reruns 30 --json frontend.json
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import bench_utils
+from bench_utils import latency_summary, print_table, write_json
+
+FRONTEND_FILES = ("app.py", "api.py", "auth.py", "preprocess.py")
+DEPLOYED_URL = "https://r79hipbsdc.execute-api.us-east-1.amazonaws.com"
+USER = "dev@visionquest.com"
+
+
+# --- FAKE API ---
+class FakeApi(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, args, history_jobs=1, citations=0):
+        super().__init__(("127.0.0.1", 0), FakeApiHandler)
+        self.args = args
+        self.requests = 0
+        self.connections = 0
+        self.jobs = {}
+        self.chats = [{"user_id": USER, "chat_id": f"chat-{i:03d}", "title": f"Invoice question {i}",
+                       "updated_at": 1700000000 + i} for i in range(args.chats)]
+        # Every chat has the same finished jobs, oldest first
+        self.history = [{"job_id": f"job-h{i:04d}", "user_prompt": f"Question {i}: what is the total?",
+                         "status": "SUCCESS", "answer": f"Answer {i}: the total is 1150.00 SAR incl. VAT.",
+                         "citations": [{"source": f"invoice-{i}.pdf", "page": p + 1, "text": "Total 1150.00 SAR " * 8}
+                                       for p in range(citations)] or None,
+                         "created_at": 1700000000 + i} for i in range(history_jobs)]
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def counters(self):
+        with self._lock:
+            return self.requests, self.connections
+
+    def route(self, path, body):
+        """Same contract as the history / status / ingest Lambdas."""
+        if path == "/ingest":
+            job_id = f"job-{len(self.jobs)}"
+            self.jobs[job_id] = time.monotonic() + self.args.job_seconds
+            return 200, {"job_id": job_id, "message": "Upload successful"}
+        if path == "/status":
+            done = time.monotonic() >= self.jobs.get(body.get("job_id"), 0)
+            if done:
+                return 200, {"status": "SUCCESS", "answer": "Total: 1150.00 SAR", "citations": []}
+            return 200, {"status": "PROCESSING"}
+        if path == "/history":
+            if body.get("action") == "list_chats":
+                return 200, self.chats
+            if body.get("chat_id") and body.get("limit"):
+                # Newest `limit` jobs before the cursor (here: an index into the history)
+                end = int(body.get("before") or len(self.history))
+                start = max(0, end - int(body["limit"]))
+                return 200, {"messages": self.history[start:end], "before": str(start) if start else None}
+            if body.get("chat_id"):
+                return 200, self.history
+            return 400, "Invalid Request"
+        return 404, "Not Found"
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # Keep-alive, like API Gateway
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.connections += 1
+        time.sleep(self.server.args.handshake_ms / 1000.0)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with self.server._lock:
+            self.server.requests += 1
+        time.sleep(self.server.args.rtt_ms / 1000.0)
+        status, payload = self.server.route(self.path, body)
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+# --- FRONTEND VARIANTS ---
+def export_frontend(rev, target, api_url):
+    """frontend/ at a git revision (or the working tree for rev=None), pointed at the fake API."""
+    os.makedirs(target)
+    for name in FRONTEND_FILES:
+        if rev:
+            shown = subprocess.run(["git", "show", f"{rev}:frontend/{name}"], cwd=bench_utils.REPO_ROOT,
+                                   capture_output=True, text=True)
+            if shown.returncode != 0:
+                continue   # Not in the frontend yet at that revision
+            source = shown.stdout
+        else:
+            with open(os.path.join(bench_utils.REPO_ROOT, "frontend", name), encoding="utf-8") as f:
+                source = f.read()
+        with open(os.path.join(target, name), "w", encoding="utf-8") as f:
+            f.write(source.replace(DEPLOYED_URL, api_url))
+    return os.path.join(target, "app.py")
+
+
+def fresh_app(app_path, timeout):
+    """A new browser session; the app's modules (and their st caches) are reloaded per variant."""
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_file(app_path, default_timeout=timeout)
+
+
+def load_variant(app_path):
+    import streamlit as st
+    for name in FRONTEND_FILES:
+        sys.modules.pop(name[:-3], None)
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    sys.path.insert(0, os.path.dirname(app_path))
+
+
+def unload_variant(app_path):
+    sys.path.remove(os.path.dirname(app_path))
+
+
+def measure(server, fn):
+    requests_before, connections_before = server.counters()
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    requests_after, connections_after = server.counters()
+    return elapsed, requests_after - requests_before, connections_after - connections_before
+
+
+def bench_variant(name, app_path, server, args):
+    load_variant(app_path)
+    try:
+        at = fresh_app(app_path, args.timeout)
+        at.run()   # First render: imports, cold caches
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].value}")
+        history_buttons = len(at.sidebar.button) - 2   # New Chat, Log Out
+
+        rerun = [measure(server, at.run) for _ in range(args.reruns)]
+
+        def submit():
+            at.file_uploader[0].set_value(("invoice.pdf", b"%PDF-1.4 bench", "application/pdf"))
+            at.chat_input[0].set_value("What is the invoice total?")
+            at.run()
+        submitted = [measure(server, submit)]
+    finally:
+        unload_variant(app_path)
+
+    rows = []
+    for case, samples in (("rerun", rerun), ("submit", submitted)):
+        latency = latency_summary([s for s, _, _ in samples])
+        rows.append({
+            "frontend": name,
+            "case": case,
+            "p50_ms": latency["p50_ms"],
+            "p95_ms": latency["p95_ms"],
+            "requests_per_run": round(sum(r for _, r, _ in samples) / len(samples), 2),
+            "connections_per_run": round(sum(c for _, _, c in samples) / len(samples), 2),
+            "history_buttons": history_buttons,
+        })
+    return rows
+
+
+def run(args):
+    server = FakeApi(args)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    workdir = tempfile.mkdtemp(prefix="vq-frontend-")
+    rows = []
+    try:
+        variants = [("before", args.old_rev), ("after", None)]
+        for name, rev in variants:
+            app_path = export_frontend(rev, os.path.join(workdir, name), server.url)
+            rows.extend(bench_variant(name, app_path, server, args))
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"🧪 {args.reruns} reruns, handshake {args.handshake_ms} ms, RTT {args.rtt_ms} ms, "
+          f"job takes {args.job_seconds}s, {args.chats} chats")
+    print_table(rows, list(rows[0].keys()))
+    if args.json:
+        write_json(args.json, {"config": vars(args), "results": rows})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--old-rev", default="7cb7a97", help="Git revision of the 'before' frontend")
+    parser.add_argument("--reruns", type=int, default=30)
+    parser.add_argument("--handshake-ms", type=float, default=60.0, help="New connection cost (TCP + TLS)")
+    parser.add_argument("--rtt-ms", type=float, default=25.0, help="Per request round trip")
+    parser.add_argument("--job-seconds", type=float, default=5.0, help="How long the fake job takes")
+    parser.add_argument("--chats", type=int, default=20, help="Chats in the user's history")
+    parser.add_argument("--timeout", type=float, default=120.0, help="AppTest script timeout")
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
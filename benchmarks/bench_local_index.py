@@ -0,0 +1,111 @@
+"""
+Recall vs latency benchmark for the local vector index.
+
+Builds flat / int8 / IVF / IVF+int8 indexes over a synthetic clustered
+corpus (fixed seed, so numbers are reproducible) and compares each one
+to exact float32 search.
+
+    python benchmarks/bench_local_index.py --rows 20000 --dim 1536 --k 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import bench_utils  # noqa: F401  (puts visionquest on the path)
+from bench_utils import latency_summary, print_table, write_json
+
+import numpy as np
+
+from visionquest.vector_index import LocalVectorIndex, build_index, normalize_rows, top_k
+
+
+def synthetic_corpus(rows, dim, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centers = normalize_rows(rng.standard_normal((clusters, dim)).astype(np.float32))
+    labels = rng.integers(0, clusters, rows)
+    # Noise norm ~0.6 around unit-length topic centers (roughly how chunks of
+    # the same regulation sit around each other)
+    noise = 0.6 * rng.standard_normal((rows, dim)).astype(np.float32) / np.sqrt(dim)
+    vectors = centers[labels] + noise
+    return normalize_rows(vectors)
+
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def run(args):
+    vectors = synthetic_corpus(args.rows, args.dim, args.clusters, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    picks = rng.choice(args.rows, args.queries, replace=False)
+    queries = normalize_rows(vectors[picks] + 0.05 * rng.standard_normal((args.queries, args.dim)).astype(np.float32))
+    truth, _ = top_k(queries @ vectors.T, args.k)
+    chunks = [{"text": f"chunk {i}", "uri": f"s3://synthetic/doc-{i // 10}.txt"} for i in range(args.rows)]
+
+    lists = args.lists or int(np.sqrt(args.rows) * 2)
+    configs = [("flat", 0, False, None), ("flat-int8", 0, True, None)]
+    for nprobe in args.nprobe:
+        configs.append((f"ivf{lists}-p{nprobe}", lists, False, nprobe))
+        configs.append((f"ivf{lists}-int8-p{nprobe}", lists, True, nprobe))
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        built = {}
+        for name, ivf_lists, quantize, nprobe in configs:
+            key = (ivf_lists, quantize)
+            if key not in built:
+                path = os.path.join(workdir, f"idx-{ivf_lists}-{int(quantize)}")
+                started = time.perf_counter()
+                build_index(chunks, vectors, path, ivf_lists=ivf_lists, quantize=quantize, seed=args.seed)
+                built[key] = (path, time.perf_counter() - started)
+            path, build_seconds = built[key]
+            index = LocalVectorIndex.load(path)
+            # Row ids are permuted by IVF builds; map back via the chunk text
+            row_to_original = np.array([int(c["text"].split()[1]) for c in index.chunks])
+
+            timings = []
+            found = []
+            for query in queries:
+                started = time.perf_counter()
+                ids, _ = index.search_ids(query[None, :], k=args.k, nprobe=nprobe)
+                timings.append(time.perf_counter() - started)
+                found.append(ids[0])
+
+            started = time.perf_counter()
+            index.search_ids(queries, k=args.k, nprobe=nprobe)
+            batch_seconds = time.perf_counter() - started
+
+            hits = 0
+            for expected, ids in zip(truth, found):
+                got = set(row_to_original[ids[ids >= 0]].tolist())
+                hits += len(got & set(expected.tolist()))
+            summary = latency_summary(timings)
+            rows.append({
+                "index": name,
+                f"recall@{args.k}": round(hits / float(args.k * len(queries)), 4),
+                "p50_ms": summary["p50_ms"],
+                "p95_ms": summary["p95_ms"],
+                "batch_qps": round(len(queries) / batch_seconds, 1),
+                "size_mb": round(directory_bytes(path) / 1e6, 2),
+                "build_s": round(build_seconds, 2)
+            })
+
+    print(f"📊 rows={args.rows} dim={args.dim} queries={args.queries} k={args.k}")
+    print_table(rows, list(rows[0].keys()))
+    if args.json:
+        write_json(args.json, {"config": vars(args), "results": rows})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)  # Titan v1 embedding size
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--lists", type=int, default=0, help="IVF lists (default: 2*sqrt(rows))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
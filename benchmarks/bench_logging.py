@@ -0,0 +1,118 @@
+"""
+Logging overhead per invocation: today's print(json.dumps(event)) vs
+visionquest.logs (levels, lazy formatting, redaction, sampling).
+
+Each scenario replays one handler's log lines for a representative event
+(an ingest upload with a base64 PDF, a terraform/app.py voice+file
+request, a status poll). Output goes to a byte-counting sink, so the
+numbers are the CPU spent formatting plus the bytes CloudWatch would
+ingest.
+
+    python benchmarks/bench_logging.py --upload-mb 2 --iterations 200 --json logging.json
+"""
+import argparse
+import base64
+import contextlib
+import json
+import os
+import random
+import time
+
+import bench_utils  # noqa: F401  (puts visionquest on sys.path)
+from bench_utils import latency_summary, print_table, write_json
+from visionquest.logs import LEVELS, Logger
+
+
+class CountingSink:
+    """stdout stand-in: counts what would be shipped to CloudWatch."""
+
+    def __init__(self):
+        self.bytes = 0
+        self.lines = 0
+
+    def write(self, text):
+        self.bytes += len(text.encode("utf-8"))
+        self.lines += text.count("\n")
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def make_events(upload_mb):
+    blob = base64.b64encode(os.urandom(int(upload_mb * 1024 * 1024))).decode("ascii")
+    audio = base64.b64encode(os.urandom(256 * 1024)).decode("ascii")
+    return {
+        "ingest": {"body": json.dumps({"user_id": "u-1", "chat_id": "c-1", "file_name": "invoice.pdf",
+                                       "file_content": blob, "question": "Check the VAT totals."}),
+                   "headers": {"authorization": "Bearer eyJhbGciOi...", "content-type": "application/json"},
+                   "requestContext": {"http": {"method": "POST", "path": "/ingest"}}},
+        "rag_api": {"body": json.dumps({"question": None, "audio": audio, "file_data": blob,
+                                        "media_type": "application/pdf"}),
+                    "requestContext": {"http": {"method": "POST", "path": "/"}}},
+        "status": {"body": json.dumps({"job_id": "job-1718000000-1a2b3c4d"}),
+                   "requestContext": {"http": {"method": "POST", "path": "/status"}}},
+    }
+
+
+def legacy_invocation(route, event):
+    """What the handlers did: the whole event, then a few f-string lines."""
+    print(f"Received Event: {json.dumps(event)}")
+    print(f"🎫 Created Job ID: job-1718000000-1a2b3c4d ({route})")
+    print("🔍 Looking up Job: job-1718000000-1a2b3c4d")
+    print(f"✅ Status Found: {'PROCESSING'}")
+
+
+def structured_invocation(log, event):
+    log.begin(event)
+    log.bind(job_id="job-1718000000-1a2b3c4d")
+    log.info("🎫 Created Job ID: %s", "job-1718000000-1a2b3c4d")
+    log.info("🔍 Looking up Job: %s", "job-1718000000-1a2b3c4d")
+    log.info("✅ Status Found: %s", "PROCESSING")
+
+
+def measure(fn, iterations):
+    sink = CountingSink()
+    timings = []
+    with contextlib.redirect_stdout(sink):
+        for _ in range(iterations):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+    summary = latency_summary(timings)
+    return {"p50_us": round(summary["p50_ms"] * 1000, 1), "p95_us": round(summary["p95_ms"] * 1000, 1),
+            "bytes_per_call": round(sink.bytes / float(iterations)), "lines_per_call": round(sink.lines / float(iterations), 2)}
+
+
+def run(args):
+    events = make_events(args.upload_mb)
+    modes = {
+        "print (legacy)": None,
+        "logs INFO": dict(level=LEVELS["INFO"], sample_rate=1.0),
+        "logs DEBUG (event redacted)": dict(level=LEVELS["DEBUG"], sample_rate=1.0),
+        f"logs INFO sampled {args.sample_rate}": dict(level=LEVELS["INFO"], sample_rate=args.sample_rate),
+    }
+    rows = []
+    for route, event in events.items():
+        for mode, options in modes.items():
+            if options is None:
+                result = measure(lambda: legacy_invocation(route, event), args.iterations)
+            else:
+                log = Logger(route, rng=random.Random(args.seed), **options)
+                result = measure(lambda: structured_invocation(log, event), args.iterations)
+            rows.append(dict(route=route, mode=mode, **result))
+
+    print(f"🪵 Upload {args.upload_mb} MB, {args.iterations} invocations per row")
+    print_table(rows, list(rows[0].keys()))
+    if args.json:
+        write_json(args.json, {"config": vars(args), "results": rows})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--upload-mb", type=float, default=2.0)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
@@ -0,0 +1,146 @@
+"""
+Multi-turn chat cost, before and after conversation memory
+(visionquest.memory), fully offline.
+
+One chat: the first question comes with a document, the following ones are
+follow-ups. The real handlers run on the fakes of bench_pipeline.Harness:
+  - reupload:     before. No memory: every follow-up re-sends the document
+                  (upload, OCR) and the model sees no earlier turn;
+  - full-history: memory with an unbounded budget. Follow-ups reuse the
+                  chat's document, but every earlier turn goes into the
+                  prompt, so it grows with the chat;
+  - rolling:      memory as deployed. Turns past MEMORY_TOKEN_BUDGET are
+                  folded into the chat's rolling summary.
+Per turn: upload bytes, OCR time, prompt tokens of the answer call and
+summary model calls. Ingest's clock advances --think-seconds per turn (the
+user reading the answer).
+
+    python benchmarks/bench_memory.py --turns 20 --pages 5 --json memory.json
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import time
+
+from bench_pipeline import Harness
+from bench_rasterize import synthetic_invoice
+from bench_utils import print_table, write_json
+
+MODES = ("reupload", "full-history", "rolling")
+QUESTIONS = ["What is the total of line {n}?", "Does the VAT on page {n} add up?",
+             "Which supplier appears most often after item {n}?", "Compare item {n} with the previous answer."]
+
+
+class FakeClock:
+    """time.time() for ingest: created_at / job ids one think time apart."""
+
+    def __init__(self, start, step):
+        self.now, self.step = start, step
+
+    def time(self):
+        self.now += self.step
+        return self.now
+
+
+def harness_args(args):
+    return argparse.Namespace(s3_latency=args.s3_latency, dynamo_latency=args.dynamo_latency, sfn_latency=0.0,
+                              textract_base=1.0, textract_per_page=0.05, bedrock_base=args.bedrock_base,
+                              bedrock_per_token=args.bedrock_per_token, output_tokens=args.output_tokens)
+
+
+def request_body(turn, document, with_document):
+    body = {"user_id": "bench-user", "chat_id": "bench-chat", "question": QUESTIONS[turn % len(QUESTIONS)].format(n=turn + 1)}
+    if with_document:
+        body.update(file_name=document["name"], file_content=base64.b64encode(document["data"]).decode("ascii"))
+    else:
+        body.update(file_name="question.json")   # The key ingest uploads for a question alone
+    return json.dumps(body)
+
+
+def run_chat(mode, document, args):
+    harness = Harness(harness_args(args))
+    harness.ingest.time = FakeClock(time.time(), args.think_seconds)
+    if mode == "full-history":
+        harness.processor.memory.token_budget = 10 ** 9
+        harness.processor.memory.max_turns = args.turns
+
+    turns = []
+    for turn in range(args.turns):
+        body = request_body(turn, document, with_document=turn == 0 or mode == "reupload")
+        started = time.perf_counter()
+        job_id, key = harness.run_ingest(body)
+        state = harness.run_kickoff(job_id, key)
+        if mode == "reupload":
+            state["job_details"].update(user_id=None, chat_id=None)   # The processor as it was: no memory
+        state = harness.run_ocr(state)
+        calls_before = harness.bedrock.calls
+        result = harness.run_processor(state)
+        elapsed = time.perf_counter() - started
+        if result.get("status") != "SUCCESS":
+            raise RuntimeError(f"{mode}, turn {turn + 1}: {result}")
+
+        processor = harness.jobs_table.items[job_id]["stage_timings"]["processor"]
+        turns.append({
+            "turn": turn + 1,
+            "request_kb": round(len(body) / 1024.0, 1),
+            "ocr_ms": state["ocr_result"]["timing"]["ms"],
+            "prompt_tokens": int(processor.get("input_tokens", 0)),
+            "memory_tokens": int(processor.get("memory_tokens", 0)),
+            "summary_calls": harness.bedrock.calls - calls_before - 1,
+            "turn_ms": round(elapsed * 1000.0, 1),
+        })
+    return turns
+
+
+def summarize(mode, turns):
+    prompts = [turn["prompt_tokens"] for turn in turns]
+    follow_ups = turns[1:] or turns
+    return {
+        "mode": mode,
+        "turns": len(turns),
+        "upload_kb": round(sum(turn["request_kb"] for turn in turns), 1),
+        "ocr_ms": sum(turn["ocr_ms"] for turn in turns),
+        "prompt_first": prompts[0],
+        "prompt_last": prompts[-1],
+        "prompt_max": max(prompts),
+        "prompt_total": sum(prompts),
+        "summary_calls": sum(turn["summary_calls"] for turn in turns),
+        "follow_up_ms": round(sum(turn["turn_ms"] for turn in follow_ups) / len(follow_ups), 1),
+    }
+
+
+def run(args):
+    document = {"name": f"invoice_{args.pages}p.pdf", "data": synthetic_invoice(args.pages, args.pages)}
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    per_turn, rows = {}, []
+    with quiet:
+        for mode in MODES:
+            per_turn[mode] = run_chat(mode, document, args)
+            rows.append(summarize(mode, per_turn[mode]))
+
+    print(f"💬 {args.turns} turns on a {args.pages}-page document, {args.output_tokens}-token answers")
+    print_table(rows, list(rows[0].keys()))
+    print()
+    series = [{"turn": turn["turn"], **{mode: per_turn[mode][turn["turn"] - 1]["prompt_tokens"] for mode in MODES}}
+              for turn in per_turn["rolling"]]
+    print("Prompt tokens per turn:")
+    print_table(series, ["turn"] + list(MODES))
+    if args.json:
+        write_json(args.json, {"config": vars(args), "results": rows, "turns": per_turn})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=5, help="Pages of the chat's document")
+    parser.add_argument("--think-seconds", type=float, default=30.0, help="Time between the user's questions")
+    parser.add_argument("--s3-latency", type=float, default=0.03)
+    parser.add_argument("--dynamo-latency", type=float, default=0.008)
+    parser.add_argument("--bedrock-base", type=float, default=0.05)
+    parser.add_argument("--bedrock-per-token", type=float, default=0.0002, help="Seconds per output token")
+    parser.add_argument("--output-tokens", type=int, default=300)
+    parser.add_argument("--verbose", action="store_true", help="Keep the handlers' logs")
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
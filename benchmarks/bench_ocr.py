@@ -0,0 +1,85 @@
+"""
+OCR latency for scanned PDFs: one Textract job for the whole document vs
+page ranges OCR'd in parallel (backend/ingest/ocr_worker.py), against the
+fake Textract in fakes.py (job time grows with page count).
+
+    python benchmarks/bench_ocr.py --pages 300 --chunk-pages 0 20 50 --json ocr.json
+
+--chunk-pages 0 means "no splitting" (the old behaviour).
+"""
+import argparse
+import os
+import sys
+import time
+
+import bench_utils
+from bench_utils import print_table, write_json
+from fakes import FakeS3, FakeTextract
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+sys.path.append(os.path.join(bench_utils.REPO_ROOT, "backend", "ingest"))
+import fitz  # noqa: E402
+import ocr_worker  # noqa: E402
+
+
+def scanned_pdf(page_count, digital_every=0):
+    """Image-only pages (plus a digital page every `digital_every` pages)."""
+    doc = fitz.open()
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 300, 400), 0)
+    pix.clear_with(200)
+    for number in range(page_count):
+        page = doc.new_page(width=595, height=842)
+        if digital_every and number % digital_every == 0:
+            page.insert_text((40, 60), f"Digital page {number + 1}: " + "native text layer " * 10, fontsize=8)
+        else:
+            page.insert_image(page.rect, pixmap=pix)
+    data = doc.tobytes(deflate=True)
+    doc.close()
+    return data
+
+
+def run(args):
+    pdf = scanned_pdf(args.pages, args.digital_every)
+    ocr_worker.POLL_SECONDS = args.poll
+    ocr_worker.OCR_MAX_PARALLEL = args.parallel
+    rows = []
+    for chunk_pages in args.chunk_pages:
+        s3 = FakeS3()
+        s3.put_object(Bucket="bench", Key="filing.pdf", Body=pdf)
+        textract = FakeTextract(s3, base_latency=args.base_latency, per_page=args.per_page, start_tps=args.start_tps)
+        ocr_worker.s3, ocr_worker.textract = s3, textract
+        ocr_worker.OCR_CHUNK_PAGES = chunk_pages or args.pages + 1
+
+        started = time.perf_counter()
+        result = ocr_worker.lambda_handler({"bucket": "bench", "key": "filing.pdf"}, None)
+        elapsed = time.perf_counter() - started
+
+        pages_with_text = len([line for line in result["extracted_text"].splitlines() if line.endswith(" line 1")])
+        rows.append({
+            "chunk_pages": chunk_pages or "whole",
+            "textract_jobs": textract.started_jobs,
+            "ocr_pages": result["ocr_pages"],
+            "pages_merged": pages_with_text,
+            "start_throttles": textract.throttled,
+            "seconds": round(elapsed, 2),
+            "pages_per_sec": round(args.pages / elapsed, 1)
+        })
+
+    print(f"📊 {args.pages} pages, fake Textract {args.base_latency}s + {args.per_page}s/page, {args.parallel} parallel")
+    print_table(rows, list(rows[0].keys()))
+    if args.json:
+        write_json(args.json, {"config": vars(args), "results": rows})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--digital-every", type=int, default=0, help="Make every Nth page digital (mixed PDF)")
+    parser.add_argument("--chunk-pages", type=int, nargs="+", default=[0, 50, 20])
+    parser.add_argument("--parallel", type=int, default=8)
+    parser.add_argument("--base-latency", type=float, default=1.0, help="Fake Textract seconds per job")
+    parser.add_argument("--per-page", type=float, default=0.02, help="Fake Textract seconds per page")
+    parser.add_argument("--start-tps", type=float, default=None, help="Fake StartDocumentTextDetection TPS limit")
+    parser.add_argument("--poll", type=float, default=0.1, help="Status poll interval (seconds)")
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
@@ -0,0 +1,269 @@
+"""
+End-to-end pipeline benchmark, fully offline.
+
+Runs the real handlers in-process:
+    ingest -> kickoff -> ocr_worker -> processor -> status
+with S3, DynamoDB, Step Functions, Textract and Bedrock replaced by the
+stand-ins in fakes.py (with latency injection). The Step Functions hop is
+replayed here with the same Parameters as terraform/step_functions.tf.
+
+Reports throughput, per-stage p50/p95/p99 latency and payload sizes
+(API bodies and Step Functions state, which is capped at 256 KB).
+
+    python benchmarks/bench_pipeline.py --jobs 40 --concurrency 8 --pages 1 5 20 --scanned-every 4
+"""
+import argparse
+import base64
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import bench_utils
+from bench_utils import latency_summary, print_table, write_json
+from fakes import FakeBedrockRuntime, FakeDynamoTable, FakeS3, FakeSFN, FakeTextract, WithLatency
+from visionquest.admission import SlotPool, TenantBucket
+from visionquest.scheduler import FairQueue
+
+BUCKET = "bench-data-lake"
+# Service payload limits: Lambda sync invoke 6 MB, Step Functions state 256 KB
+PAYLOAD_LIMITS = {
+    "ingest_request": 6 * 1024 * 1024,
+    "sfn_input": 256 * 1024,
+    "sfn_state_after_ocr": 256 * 1024,
+    "status_response": 6 * 1024 * 1024,
+}
+STAGES = ("ingest", "kickoff", "ocr", "processor", "status")
+
+os.environ.update({
+    "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "us-east-1"),
+    "s3_bucket_name": BUCKET,
+    "JOBS_TABLE_NAME": "bench-jobs",
+    "CHATS_TABLE_NAME": "bench-chats",
+    "ADMISSION_TABLE_NAME": "bench-admission",
+    "STATE_MACHINE_ARN": "arn:aws:states:us-east-1:000000000000:stateMachine:bench",
+    "MODEL_ARN": "bench-large-model",
+    "SMALL_MODEL_ARN": "bench-small-model",
+    "MODEL_STATS_LOG_EVERY": "0",
+    "OCR_POLL_SECONDS": "0.05",
+})
+
+
+def load_handler(name, relative_path):
+    """Every Lambda is called main.py, so load each under its own module name."""
+    path = os.path.join(bench_utils.REPO_ROOT, relative_path)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Harness:
+    """The handlers wired to one set of fakes."""
+
+    def __init__(self, args):
+        self.s3 = FakeS3()
+        self.jobs_table = FakeDynamoTable("job_id", "bench-jobs", indexes={"ChatIndex": "created_at"})
+        self.admission_table = FakeDynamoTable("pk", "bench-admission")
+        self.chats_table = FakeDynamoTable("chat_id", "bench-chats")  # (user_id, chat_id): chat ids are unique
+        self.sfn = FakeSFN()
+        self.textract = FakeTextract(self.s3, base_latency=args.textract_base, per_page=args.textract_per_page)
+        self.bedrock = FakeBedrockRuntime(base_latency=args.bedrock_base, output_tokens=args.output_tokens,
+                                          per_output_token=args.bedrock_per_token)
+
+        s3 = WithLatency(self.s3, {"put_object": args.s3_latency, "get_object": args.s3_latency,
+                                   "head_object": args.s3_latency / 2})
+        table = WithLatency(self.jobs_table, {"*": args.dynamo_latency})
+        admission = WithLatency(self.admission_table, {"*": args.dynamo_latency})
+        sfn = WithLatency(self.sfn, {"start_execution": args.sfn_latency})
+
+        self.ingest = load_handler("vq_ingest", "backend/ingest/main.py")
+        self.kickoff = load_handler("vq_kickoff", "backend/kickoff/main.py")
+        self.ocr = load_handler("vq_ocr_worker", "backend/ingest/ocr_worker.py")
+        self.processor = load_handler("vq_processor", "backend/processor/main.py")
+        self.status = load_handler("vq_status", "backend/status/main.py")
+
+        self.ingest.s3, self.ingest.jobs_table = s3, table
+        self.ingest.chats_table = WithLatency(self.chats_table, {"*": args.dynamo_latency})
+        self.kickoff.sfn, self.kickoff.s3, self.kickoff.jobs_table = sfn, s3, table
+        self.ocr.s3, self.ocr.textract = s3, self.textract
+        self.processor.jobs_table, self.processor.bedrock, self.processor.s3 = table, self.bedrock, s3
+        memory = self.processor.memory
+        memory.jobs_table, memory.chats_table, memory.s3 = table, self.ingest.chats_table, s3
+        self.status.jobs_table, self.status.s3 = table, s3
+
+        # Admission runs on every job (its DynamoDB round trips count) but never
+        # limits: the benchmark measures the pipeline itself
+        self.ingest.tenant_bucket = TenantBucket(admission, rate_per_second=1e9, burst=1e9)
+        self.kickoff.queue = self.status.queue = FairQueue(admission)
+        self.kickoff.slots = SlotPool(admission, limit=10 ** 9)
+
+    def execution_for(self, job_id, wait=2.0):
+        # A concurrent kickoff's dispatcher may have claimed the job and be starting it
+        deadline = time.monotonic() + wait
+        while True:
+            for execution in reversed(self.sfn.executions):
+                if execution["name"].startswith(job_id):
+                    return json.loads(execution["input"])
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"No execution started for {job_id}")
+            time.sleep(0.01)
+
+    # --- one method per stage (load_generator.py drives them separately) ---
+    def run_ingest(self, body):
+        """API -> ingest. Returns (job_id, s3 key)."""
+        response = self.ingest.lambda_handler({"body": body}, None)
+        if response["statusCode"] != 200:
+            raise RuntimeError(f"Ingest failed: {response['body']}")
+        request = json.loads(body)
+        job_id = json.loads(response["body"])["job_id"]
+        return job_id, f"{request['user_id']}/{request['chat_id']}/{job_id}/{request['file_name']}"
+
+    def run_kickoff(self, job_id, key):
+        """S3 event -> kickoff. Returns the state machine input."""
+        s3_event = {"Records": [{"s3": {"bucket": {"name": BUCKET},
+                                        "object": {"key": urllib.parse.quote_plus(key)}}}]}
+        self.kickoff.lambda_handler(s3_event, None)
+        return self.execution_for(job_id)
+
+    def run_ocr(self, state):
+        """OCR task (Parameters: bucket, key, job_id; ResultPath $.ocr_result)."""
+        state["ocr_result"] = self.ocr.lambda_handler(
+            {"bucket": state["bucket"], "key": state["key"], "job_id": state["job_details"]["job_id"]}, None)
+        return state
+
+    def run_processor(self, state):
+        """Brain task (Parameters: ocr_result, job_details), then the Release Slot step."""
+        try:
+            return self.processor.lambda_handler(
+                {"ocr_result": state["ocr_result"], "job_details": state["job_details"]}, None)
+        finally:
+            self.kickoff.dispatch_handler({"slot": state["admission"]["slot"]}, None)
+
+    def run_status(self, job_id):
+        return self.status.lambda_handler({"body": json.dumps({"job_id": job_id})}, None)
+
+    def run_job(self, index, document):
+        """One upload through every stage. Returns (timings, payload sizes)."""
+        timings, sizes = {}, {}
+
+        def timed(stage, fn, *args):
+            started = time.perf_counter()
+            result = fn(*args)
+            timings[stage] = time.perf_counter() - started
+            return result
+
+        body = ingest_body(index, document)
+        sizes["ingest_request"] = len(body)
+        job_id, key = timed("ingest", self.run_ingest, body)
+
+        state = timed("kickoff", self.run_kickoff, job_id, key)
+        sizes["sfn_input"] = len(json.dumps(state))
+
+        state = timed("ocr", self.run_ocr, state)
+        sizes["sfn_state_after_ocr"] = len(json.dumps(state))
+
+        timed("processor", self.run_processor, state)
+
+        response = timed("status", self.run_status, job_id)
+        sizes["status_response"] = len(response["body"])
+        timings["end_to_end"] = sum(timings[stage] for stage in STAGES)
+        return timings, sizes
+
+
+def ingest_body(index, document):
+    """The JSON the frontend POSTs to /ingest."""
+    return json.dumps({
+        "user_id": f"user-{index % 7}",
+        "chat_id": f"chat-{index}",
+        "file_name": document["name"],
+        "file_content": base64.b64encode(document["data"]).decode("ascii"),
+        "question": "Summarize this document and check the VAT totals."
+    })
+
+
+def make_documents(args):
+    """Synthetic PDFs cycling through page counts; every Nth one is a scan."""
+    from bench_ocr import scanned_pdf
+    from bench_rasterize import synthetic_invoice
+    cache = {}
+    documents = []
+    for index in range(args.jobs):
+        pages = args.pages[index % len(args.pages)]
+        scanned = bool(args.scanned_every) and index % args.scanned_every == args.scanned_every - 1
+        kind = "scanned" if scanned else "digital"
+        if (pages, kind) not in cache:
+            cache[(pages, kind)] = scanned_pdf(pages) if scanned else synthetic_invoice(pages, pages)
+        documents.append({"name": f"doc_{index:04d}_{kind}_{pages}p.pdf", "data": cache[(pages, kind)],
+                          "pages": pages, "kind": kind})
+    return documents
+
+
+def run(args):
+    documents = make_documents(args)
+    harness = Harness(args)
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    started = time.perf_counter()
+    with quiet:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(lambda item: harness.run_job(*item), enumerate(documents)))
+    elapsed = time.perf_counter() - started
+
+    stage_rows = []
+    for stage in STAGES + ("end_to_end",):
+        summary = latency_summary([timings[stage] for timings, _ in results])
+        stage_rows.append({"stage": stage, "p50_ms": summary["p50_ms"], "p95_ms": summary["p95_ms"],
+                           "p99_ms": summary["p99_ms"], "mean_ms": summary["mean_ms"]})
+
+    size_rows = []
+    for name in results[0][1]:
+        values = [sizes[name] for _, sizes in results]
+        size_rows.append({"payload": name, "mean_kb": round(sum(values) / len(values) / 1024.0, 1),
+                          "max_kb": round(max(values) / 1024.0, 1),
+                          "limit_kb": PAYLOAD_LIMITS[name] // 1024,
+                          "over_limit": sum(1 for v in values if v > PAYLOAD_LIMITS[name])})
+
+    throughput = {
+        "jobs": len(results),
+        "seconds": round(elapsed, 2),
+        "jobs_per_min": round(len(results) / elapsed * 60.0, 1),
+        "textract_jobs": harness.textract.started_jobs,
+        "textract_pages": harness.textract.pages_processed,
+        "bedrock_calls": harness.bedrock.calls,
+        "bedrock_input_tokens": harness.bedrock.input_tokens,
+        "dynamodb_calls": harness.jobs_table.calls
+    }
+
+    print(f"📊 {args.jobs} jobs, concurrency {args.concurrency}, pages {args.pages}, scanned every {args.scanned_every}")
+    print_table(stage_rows, list(stage_rows[0].keys()))
+    print()
+    print_table(size_rows, list(size_rows[0].keys()))
+    print()
+    print(json.dumps(throughput, indent=2))
+    if args.json:
+        write_json(args.json, {"config": vars(args), "stages": stage_rows, "payloads": size_rows,
+                               "throughput": throughput})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--scanned-every", type=int, default=4, help="Every Nth document is a scan (0 = none)")
+    parser.add_argument("--s3-latency", type=float, default=0.03)
+    parser.add_argument("--dynamo-latency", type=float, default=0.008)
+    parser.add_argument("--sfn-latency", type=float, default=0.03)
+    parser.add_argument("--textract-base", type=float, default=1.0)
+    parser.add_argument("--textract-per-page", type=float, default=0.05)
+    parser.add_argument("--bedrock-base", type=float, default=0.4)
+    parser.add_argument("--bedrock-per-token", type=float, default=0.002, help="Seconds per output token")
+    parser.add_argument("--output-tokens", type=int, default=300)
+    parser.add_argument("--verbose", action="store_true", help="Keep the handlers' logs")
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
@@ -0,0 +1,171 @@
+"""
+Upload size and time before / after frontend/preprocess.py, plus the OCR
+agent's content-hash cache, fully offline.
+
+Synthetic documents, like the ones mobile users pick:
+  - photo:       a 12 MP phone photo of an invoice (noisy, high JPEG quality);
+  - scanned-pdf: a 3-page PDF of 400 dpi color scans with an invisible OCR
+                 text layer (what scanner apps produce);
+  - digital-pdf: an invoice generated with a text layer only.
+For each: bytes uploaded, the /ingest request (base64 JSON, Lambda limit
+6 MB), upload time on a --uplink-mbps connection, preprocessing time, and
+whether the text the OCR agent reads natively survived.
+
+Then a scan without a text layer is run through the real ocr_worker twice
+(FakeS3 + FakeTextract): the second upload is served from _ocr_cache/.
+
+    python benchmarks/bench_preprocess.py --uplink-mbps 4 --json preprocess.json
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+
+import bench_utils
+from bench_utils import print_table, write_json
+from fakes import FakeS3, FakeTextract
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+sys.path.append(os.path.join(bench_utils.REPO_ROOT, "frontend"))
+sys.path.append(os.path.join(bench_utils.REPO_ROOT, "backend", "ingest"))
+import fitz  # noqa: E402
+import ocr_worker  # noqa: E402
+import preprocess  # noqa: E402
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+
+LAMBDA_PAYLOAD_LIMIT = 6 * 1024 * 1024
+INVOICE_LINES = ["فاتورة ضريبية مبسطة - Simplified Tax Invoice", "Seller: Bench Trading Co.  VAT 300000000000003"] + \
+    [f"Item {i + 1:02d}    Qty {i % 4 + 1}    {100 + 7 * i:.2f} SAR" for i in range(24)] + \
+    ["Subtotal 1000.00 SAR", "VAT 15% 150.00 SAR", "Total incl. VAT 1150.00 SAR"]
+
+
+def invoice_image(width, height, seed):
+    """A page of 'printed' text on slightly uneven paper, with sensor noise."""
+    image = Image.new("L", (width, height), 235)
+    draw = ImageDraw.Draw(image)
+    line_height = height // (len(INVOICE_LINES) + 8)
+    for number, line in enumerate(INVOICE_LINES):
+        draw.text((width // 12, line_height * (number + 3)), line, fill=30)
+    noise = Image.effect_noise((width, height), 18 + seed % 3)
+    image = Image.blend(image, noise, 0.25).filter(ImageFilter.GaussianBlur(0.6))
+    return Image.merge("RGB", (image, image.point(lambda v: v * 0.97), image.point(lambda v: v * 0.92)))
+
+
+def phone_photo(args):
+    buffer = io.BytesIO()
+    invoice_image(4032, 3024, 1).save(buffer, format="JPEG", quality=95)
+    return "invoice_photo.jpg", buffer.getvalue()
+
+
+def scanned_pdf(args, text_layer=True):
+    doc = fitz.open()
+    for number in range(3):
+        page = doc.new_page(width=595, height=842)
+        scan = io.BytesIO()
+        invoice_image(int(8.27 * args.scan_dpi), int(11.69 * args.scan_dpi), number).save(scan, format="JPEG",
+                                                                                           quality=92)
+        page.insert_image(page.rect, stream=scan.getvalue())
+        for line_number, line in enumerate(INVOICE_LINES[1:] if text_layer else []):
+            page.insert_text((50, 80 + 20 * line_number), line, fontsize=9, render_mode=3)  # Invisible OCR layer
+    doc.set_metadata({"title": "Scan", "producer": "Bench Scanner 1.0"})
+    data = doc.tobytes(deflate=True)
+    doc.close()
+    return "scanned_invoice.pdf", data
+
+
+def digital_pdf(args):
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    for line_number, line in enumerate(INVOICE_LINES[1:]):
+        page.insert_text((50, 80 + 20 * line_number), line, fontsize=10)
+    data = doc.tobytes(deflate=True)
+    doc.close()
+    return "digital_invoice.pdf", data
+
+
+def native_text(name, data):
+    if not name.endswith(".pdf"):
+        return None
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        return "".join(page.get_text("text", sort=True) for page in doc)
+
+
+def request_bytes(name, data):
+    """The JSON body the frontend POSTs to /ingest."""
+    import base64
+    return len(json.dumps({"file_content": base64.b64encode(data).decode("ascii"), "file_name": name,
+                           "question": "What is the total?", "user_id": "bench", "chat_id": "bench"}))
+
+
+def upload_rows(args):
+    rows = []
+    for make in (phone_photo, scanned_pdf, digital_pdf):
+        name, data = make(args)
+        started = time.perf_counter()
+        prepared = preprocess.prepare_upload(name, data)
+        prepare_ms = (time.perf_counter() - started) * 1000.0
+        for label, upload_name, upload in (("before", name, data), ("after", prepared.file_name, prepared.data)):
+            body = request_bytes(upload_name, upload)
+            rows.append({
+                "document": name,
+                "frontend": label,
+                "file_kb": round(len(upload) / 1024.0, 1),
+                "request_kb": round(body / 1024.0, 1),
+                "fits_6mb": body <= LAMBDA_PAYLOAD_LIMIT,
+                "upload_s": round(body * 8 / (args.uplink_mbps * 1e6), 2),
+                "prepare_ms": round(prepare_ms, 1) if label == "after" else 0,
+                "text_kept": "" if native_text(name, data) is None else
+                             native_text(name, data) == native_text(upload_name, upload),
+            })
+    return rows
+
+
+def ocr_cache_rows(args):
+    """The same image-only scan uploaded twice by one tenant."""
+    name, data = scanned_pdf(args, text_layer=False)
+    prepared = preprocess.prepare_upload(name, data)
+    s3 = FakeS3()
+    textract = FakeTextract(s3, base_latency=args.textract_base, per_page=args.textract_per_page)
+    ocr_worker.s3, ocr_worker.textract, ocr_worker.POLL_SECONDS = s3, textract, 0.05
+    rows = []
+    for upload in ("first", "repeat"):
+        key = f"bench-user/chat/job-{upload}/{prepared.file_name}"
+        # What ingest tags the upload with: the hash of the bytes it received
+        s3.put_object(Bucket="bench", Key=key, Body=prepared.data,
+                      Metadata={"content-sha256": hashlib.sha256(prepared.data).hexdigest()})
+        jobs_before = textract.started_jobs
+        started = time.perf_counter()
+        result = ocr_worker.lambda_handler({"bucket": "bench", "key": key}, None)
+        rows.append({
+            "upload": upload,
+            "ocr_mode": result["ocr_mode"],
+            "textract_jobs": textract.started_jobs - jobs_before,
+            "ocr_ms": round((time.perf_counter() - started) * 1000.0, 1),
+            "text_chars": len(result["extracted_text"]),
+        })
+    return rows
+
+
+def run(args):
+    uploads = upload_rows(args)
+    cache = ocr_cache_rows(args)
+    print(f"🧪 Uplink {args.uplink_mbps} Mbps, scans at {args.scan_dpi} dpi, "
+          f"max side {preprocess.MAX_IMAGE_SIDE_PX} px, PDF images -> {preprocess.PDF_IMAGE_DPI} dpi")
+    print_table(uploads, list(uploads[0].keys()))
+    print()
+    print_table(cache, list(cache[0].keys()))
+    if args.json:
+        write_json(args.json, {"config": vars(args), "uploads": uploads, "ocr_cache": cache})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uplink-mbps", type=float, default=4.0, help="Mobile upload bandwidth")
+    parser.add_argument("--scan-dpi", type=int, default=400)
+    parser.add_argument("--textract-base", type=float, default=2.0, help="Fake Textract job seconds")
+    parser.add_argument("--textract-per-page", type=float, default=0.5)
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
@@ -0,0 +1,107 @@
+"""
+Rasterization benchmark for the vision inspector: pages/sec and bytes per
+page for the old path (page 0, default 72 dpi PNG) and code/rasterizer.py
+with 1..N worker processes, plus a warm (render cache) pass.
+
+Builds a synthetic multi-page invoice PDF with PyMuPDF (text, a table and
+a QR-like block on the last page), so it runs offline.
+
+    python benchmarks/bench_rasterize.py --pages 12 --docs 6 --workers 1 4 --json raster.json
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import bench_utils
+from bench_utils import print_table, write_json
+
+sys.path.append(os.path.join(bench_utils.REPO_ROOT, "code"))
+import fitz  # noqa: E402
+from rasterizer import Rasterizer, select_pages  # noqa: E402
+
+
+def synthetic_invoice(page_count, seed):
+    """A4 pages of line items; totals and a QR-like block on the last page."""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_number in range(page_count):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((40, 50), f"TAX INVOICE  No. INV-{seed:05d}  page {page_number + 1}/{page_count}", fontsize=14)
+        page.insert_text((40, 72), "VAT No. 300000000000003   Date 2024-05-01", fontsize=10)
+        y = 110
+        while y < 780:
+            qty = rng.randint(1, 20)
+            price = rng.uniform(5, 500)
+            page.insert_text((40, y), f"Item {rng.randint(1000, 9999)}  qty {qty}  @ {price:8.2f}  = {qty * price:10.2f} SAR",
+                             fontsize=9)
+            page.draw_line((40, y + 4), (555, y + 4), color=(0.8, 0.8, 0.8))
+            y += 16
+        if page_number == page_count - 1:
+            page.draw_rect(fitz.Rect(380, 600, 555, 775), color=(0, 0, 0))
+            cell = 7
+            for row in range(25):
+                for col in range(25):
+                    if rng.random() < 0.5:
+                        x0, y0 = 380 + col * cell, 600 + row * cell
+                        page.draw_rect(fitz.Rect(x0, y0, x0 + cell, y0 + cell), color=None, fill=(0, 0, 0))
+            page.insert_text((40, 620), "Subtotal  10,000.00   VAT 15%  1,500.00   TOTAL 11,500.00 SAR", fontsize=11)
+    data = doc.tobytes(deflate=True)
+    doc.close()
+    return data
+
+
+def legacy_render(pdf_bytes):
+    """What inspector.process_file used to do: page 0 at the default 72 dpi."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return [doc.load_page(0).get_pixmap().tobytes("png")]
+
+
+def measure(name, docs, render_fn, pages_per_doc):
+    started = time.perf_counter()
+    sizes = []
+    for pdf_bytes in docs:
+        sizes.extend(len(data) for data in render_fn(pdf_bytes))
+    elapsed = time.perf_counter() - started
+    rendered = len(docs) * pages_per_doc
+    return {
+        "pipeline": name,
+        "pages": rendered,
+        "pages_per_sec": round(rendered / elapsed, 1),
+        "avg_kb_per_page": round(sum(sizes) / float(len(sizes)) / 1024, 1),
+        "max_kb_per_page": round(max(sizes) / 1024.0, 1),
+        "seconds": round(elapsed, 3)
+    }
+
+
+def run(args):
+    docs = [synthetic_invoice(args.pages, seed) for seed in range(args.docs)]
+    selected = len(select_pages(args.pages, max_pages=args.max_pages))
+    rows = [measure("legacy page0 72dpi png", docs, legacy_render, 1)]
+
+    for workers in args.workers:
+        rasterizer = Rasterizer(workers=workers, dpi=args.dpi, byte_budget=args.budget_kb * 1024)
+        render = lambda pdf, r=rasterizer: [p.data for p in r.render(pdf, max_pages=args.max_pages)]
+        if workers > 1:
+            rasterizer.render(synthetic_invoice(args.max_pages + 1, 999))  # Spin up the pool outside the timing
+        rows.append(measure(f"rasterizer {args.dpi}dpi x{workers}", docs, render, selected))
+        rows.append(measure(f"rasterizer x{workers} (cached)", docs, render, selected))
+        rasterizer.close()
+
+    print(f"📊 {args.docs} docs x {args.pages} pages, {selected} rendered per doc, budget {args.budget_kb} KB/page")
+    print_table(rows, list(rows[0].keys()))
+    if args.json:
+        write_json(args.json, {"config": vars(args), "results": rows})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=12, help="Pages per synthetic invoice")
+    parser.add_argument("--docs", type=int, default=6)
+    parser.add_argument("--max-pages", type=int, default=4, help="Pages sent to the vision model per invoice")
+    parser.add_argument("--dpi", type=int, default=110)
+    parser.add_argument("--budget-kb", type=int, default=300)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
@@ -0,0 +1,139 @@
+"""
+Fault-injection benchmark for visionquest.resilience, fully offline.
+
+Runs the real processor handler against FakeBedrockRuntime wrapped in
+fakes.WithFaults, under injected failure scenarios:
+  - healthy:      no faults;
+  - large-outage: the large model throttles every call for a while
+                  (audit questions try it first);
+  - transient:    a share of all calls time out (ModelTimeoutException);
+  - brownout:     both models throttle most calls.
+and two policies:
+  - none:      one attempt per model, no breakers, no Step Functions retry
+               (the processor before visionquest.resilience);
+  - resilient: Retrier + per-model CircuitBreaker, and the state machine's
+               retry on ThrottledError / TransientServiceError /
+               CircuitOpenError (delays scaled by --time-scale).
+
+    python benchmarks/bench_resilience.py --jobs 200 --json resilience.json
+"""
+import argparse
+import os
+import time
+
+from bench_pipeline import load_handler  # Importing bench_pipeline sets the Lambda env vars
+from bench_utils import latency_summary, print_table, write_json
+from fakes import FakeBedrockRuntime, FakeDynamoTable, FakeS3, WithFaults
+from visionquest.resilience import CircuitBreaker, Retrier, RetryBudget, ServiceError
+
+LARGE, SMALL = "bench-large-model", "bench-small-model"
+PROMPTS = ("Audit this invoice for VAT compliance", "What is the invoice total?")
+SFN_RETRY = {"interval": 10.0, "rate": 2.0, "max_delay": 60.0}   # terraform/step_functions.tf
+
+
+def scenario_faults(name, args):
+    if name == "large-outage":
+        return [{"op": "invoke_model", "code": "ThrottlingException", "match": {"modelId": LARGE},
+                 "calls": (0, args.outage_calls)}]
+    if name == "transient":
+        return [{"op": "invoke_model", "code": "ModelTimeoutException", "rate": args.transient_rate}]
+    if name == "brownout":
+        return [{"op": "invoke_model", "code": "ThrottlingException", "rate": args.brownout_rate}]
+    return []
+
+
+def setup(processor, policy, scenario, args):
+    bedrock = FakeBedrockRuntime(base_latency=args.bedrock_base, per_output_token=args.bedrock_per_token,
+                                 output_tokens=args.output_tokens, seed=args.seed)
+    processor.bedrock = WithFaults(bedrock, scenario_faults(scenario, args), latency=args.fault_latency,
+                                   seed=args.seed)
+    processor.jobs_table = FakeDynamoTable("job_id", "bench-jobs")
+    processor.s3 = FakeS3()
+    breakers = {}
+    if policy == "none":
+        processor.bedrock_retrier = Retrier(attempts={"throttle": 1, "transient": 1})
+        processor.model_router.breakers = None
+    else:
+        processor.bedrock_retrier = Retrier(attempts={"throttle": 2, "transient": 3}, base=args.retry_base,
+                                            budget=RetryBudget())
+        processor.model_router.breakers = lambda name: breakers.setdefault(
+            name, CircuitBreaker(name, cooldown=args.cooldown))
+    return bedrock, breakers
+
+
+def run_job(processor, policy, index, args):
+    """One Brain task, replaying the state machine's Retry for the resilient policy."""
+    job_id = f"job-{index}"
+    processor.jobs_table.put_item(Item={"job_id": job_id, "status": "PROCESSING", "stage_timings": {}})
+    state = {"ocr_result": {"extracted_text": "فاتورة ضريبية\nالإجمالي: 1150 ريال\n" * 20},
+             "job_details": {"job_id": job_id, "user_prompt": PROMPTS[index % len(PROMPTS)]}}
+    attempts = processor.SFN_RETRY_ATTEMPTS if policy == "resilient" else 0
+    started = time.perf_counter()
+    for attempt in range(attempts + 1):
+        event = dict(state, attempt=attempt) if policy == "resilient" else state
+        try:
+            processor.lambda_handler(event, None)
+            break
+        except ServiceError:
+            if attempt == attempts:
+                break
+            # Step Functions JitterStrategy FULL: uniform(0, interval * rate^attempt)
+            delay = min(SFN_RETRY["max_delay"], SFN_RETRY["interval"] * SFN_RETRY["rate"] ** attempt)
+            time.sleep(processor.bedrock_retrier.rng.uniform(0, delay) * args.time_scale)
+        except Exception:
+            break
+    status = processor.jobs_table.get_item(Key={"job_id": job_id})["Item"]["status"]
+    return status, time.perf_counter() - started
+
+
+def run(args):
+    os.environ["SFN_RETRY_ATTEMPTS"] = "3"   # local.service_retry_attempts
+    processor = load_handler("vq_processor", "backend/processor/main.py")
+    rows = []
+    for scenario in args.scenarios:
+        for policy in args.policies:
+            bedrock, breakers = setup(processor, policy, scenario, args)
+            outcomes = [run_job(processor, policy, i, args) for i in range(args.jobs)]
+            statuses = [status for status, _ in outcomes]
+            latency = latency_summary([seconds for _, seconds in outcomes])
+            injected = sum(processor.bedrock.failures.values())
+            rows.append({
+                "scenario": scenario,
+                "policy": policy,
+                "success_pct": round(100.0 * statuses.count("SUCCESS") / len(statuses), 1),
+                "failed": statuses.count("FAILED"),
+                "bedrock_calls": bedrock.calls + injected,
+                "failed_calls": injected,
+                "retries": processor.bedrock_retrier.retries,
+                "skipped_open": sum(b.rejected for b in breakers.values()),
+                "breaker_opens": sum(b.opened for b in breakers.values()),
+                "p50_ms": latency["p50_ms"],
+                "p95_ms": latency["p95_ms"],
+            })
+
+    print(f"🧪 {args.jobs} jobs per run, Step Functions delays x{args.time_scale}, "
+          f"breaker cool-down {args.cooldown}s")
+    print_table(rows, list(rows[0].keys()))
+    if args.json:
+        write_json(args.json, {"config": vars(args), "results": rows})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=["healthy", "large-outage", "transient", "brownout"],
+                        choices=["healthy", "large-outage", "transient", "brownout"])
+    parser.add_argument("--policies", nargs="+", default=["none", "resilient"], choices=["none", "resilient"])
+    parser.add_argument("--jobs", type=int, default=100)
+    parser.add_argument("--outage-calls", type=int, default=40, help="Large-model calls that throttle")
+    parser.add_argument("--transient-rate", type=float, default=0.1)
+    parser.add_argument("--brownout-rate", type=float, default=0.6)
+    parser.add_argument("--bedrock-base", type=float, default=0.02, help="Seconds per successful call")
+    parser.add_argument("--bedrock-per-token", type=float, default=0.0002)
+    parser.add_argument("--output-tokens", type=int, default=100)
+    parser.add_argument("--fault-latency", type=float, default=0.01, help="Seconds a failed call takes")
+    parser.add_argument("--retry-base", type=float, default=0.01, help="Retrier backoff base (scaled down)")
+    parser.add_argument("--cooldown", type=float, default=0.5, help="Breaker cool-down seconds (scaled down)")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="Multiplier on Step Functions delays")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
@@ -0,0 +1,130 @@
+"""
+History/status response serialization: the old DecimalEncoder path vs
+visionquest.serialization (one pre-pass, or straight from the low-level
+client's typed output; stdlib json or orjson).
+
+Items look like ChatIndex query results: job records with an answer,
+timestamps and the stage_timings map. The "resource" paths include boto3's
+TypeDeserializer, which is what the resource layer runs on every item.
+
+    python benchmarks/bench_serialization.py --items 100 500 2000 --json serialization.json
+"""
+import argparse
+import json
+import random
+import time
+from decimal import Decimal
+
+import bench_utils  # noqa: F401  (puts visionquest on sys.path)
+from bench_utils import print_table, write_json
+from boto3.dynamodb.types import TypeDeserializer
+from visionquest import serialization
+
+
+class DecimalEncoder(json.JSONEncoder):
+    """The encoder backend/history/main.py used to define."""
+
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super(DecimalEncoder, self).default(obj)
+
+
+def typed_item(index, rng):
+    """One jobs-table item in the low-level client's format."""
+    start = 1718000000000 + index * 60000
+
+    def span(offset, ms, **extra):
+        fields = {"start": {"N": str(start + offset)}, "ms": {"N": str(ms)}}
+        fields.update({k: {"N": str(v)} for k, v in extra.items()})
+        return {"M": fields}
+
+    return {
+        "job_id": {"S": f"job-{1718000000 + index}-{rng.randrange(16 ** 8):08x}"},
+        "user_id": {"S": "user-1"},
+        "chat_id": {"S": "chat-1"},
+        "status": {"S": "SUCCESS"},
+        "created_at": {"N": str(1718000000 + index * 60)},
+        "file_name": {"S": f"invoice_{index:04d}.pdf"},
+        "user_prompt": {"S": "Check the VAT totals on this invoice."},
+        "answer": {"S": "الإجمالي مطابق لضريبة القيمة المضافة. " * rng.randint(20, 60)},
+        "stage_timings": {"M": {
+            "ingest": span(0, rng.randint(40, 200), file_bytes=rng.randint(50000, 900000)),
+            "kickoff": span(300, rng.randint(5, 40)),
+            "ocr_worker": span(400, rng.randint(200, 9000), pages=rng.randint(1, 30),
+                               cost_usd=round(rng.random() / 100, 6)),
+            "processor": span(9500, rng.randint(2000, 20000), input_tokens=rng.randint(500, 9000),
+                              output_tokens=rng.randint(100, 2000), cost_usd=round(rng.random() / 50, 6)),
+        }}
+    }
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(args):
+    deserializer = TypeDeserializer()
+    orjson = serialization.orjson
+    rows = []
+    for count in args.items:
+        rng = random.Random(args.seed)
+        typed = [typed_item(i, rng) for i in range(count)]
+
+        def resource_items():
+            return [{k: deserializer.deserialize(v) for k, v in item.items()} for item in typed]
+
+        def with_backend(backend, fn):
+            serialization.orjson = backend
+            try:
+                return fn()
+            finally:
+                serialization.orjson = orjson
+
+        paths = {
+            "resource + DecimalEncoder (old)": lambda: json.dumps(resource_items(), cls=DecimalEncoder),
+            "resource + plain + json": lambda: with_backend(None, lambda: serialization.dumps(resource_items())),
+            "typed + json": lambda: with_backend(None, lambda: serialization.dumps(
+                serialization.items_from_typed(typed), convert=False)),
+        }
+        if orjson is not None:
+            paths["resource + plain + orjson"] = lambda: with_backend(orjson, lambda: serialization.dumps(resource_items()))
+            paths["typed + orjson"] = lambda: with_backend(orjson, lambda: serialization.dumps(
+                serialization.items_from_typed(typed), convert=False))
+
+        baseline = None
+        reference = None
+        for name, fn in paths.items():
+            seconds, body = timed(fn, args.repeat)
+            parsed = json.loads(body)
+            if reference is None:
+                baseline, reference = seconds, parsed
+            rows.append({
+                "items": count,
+                "path": name,
+                "ms": round(seconds * 1000.0, 2),
+                "speedup": round(baseline / seconds, 2),
+                "body_kb": round(len(body.encode("utf-8")) / 1024.0, 1),
+                # Old path turned whole numbers into floats; compare numerically
+                "same_values": parsed == reference
+            })
+
+    print(f"🧮 orjson {'available' if orjson is not None else 'not installed'}; best of {args.repeat}")
+    print_table(rows, list(rows[0].keys()))
+    if args.json:
+        write_json(args.json, {"config": vars(args), "results": rows})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
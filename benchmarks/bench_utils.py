@@ -0,0 +1,50 @@
+"""
+Helpers shared by the offline benchmark scripts in this folder.
+Importing this module puts the shared `visionquest` package on sys.path.
+"""
+import json
+import math
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHARED_DIR = os.path.join(REPO_ROOT, "backend", "shared", "python")
+if SHARED_DIR not in sys.path:
+    sys.path.append(SHARED_DIR)
+
+
+def percentile(values, p):
+    """Nearest-rank percentile (p in 0..100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(seconds):
+    """p50/p95/p99/mean in milliseconds for a list of durations in seconds."""
+    ms = [s * 1000.0 for s in seconds]
+    return {
+        "count": len(ms),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0
+    }
+
+
+def print_table(rows, columns):
+    """Prints a list of dicts as an aligned text table."""
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    print("  ".join("-" * widths[c] for c in columns))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(widths[c]) for c in columns))
+
+
+def write_json(path, payload):
+    """Machine-readable results for trend tracking."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+    print(f"💾 Results written to {path}")
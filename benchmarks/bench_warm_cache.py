@@ -0,0 +1,121 @@
+"""
+Per-request overhead on the hot paths, before and after visionquest.warm_cache:
+  - load_text:       code/app.py reading assets/<lang>.json on every Streamlit
+                     rerun vs warm_cache.load_json (mtime-checked);
+  - processor:       building the prompt with an inline f-string vs a
+                     module-level PromptTemplate (dedented: the f-string's
+                     indentation was sent to the model on every call);
+  - request body:    json.dumps of the Bedrock payload per attempt (retry /
+                     fallback) vs once per request, with a base64 document.
+
+    python benchmarks/bench_warm_cache.py --iterations 20000 --json warm.json
+"""
+import argparse
+import base64
+import json
+import os
+import time
+
+import bench_utils
+from bench_utils import print_table, write_json
+from visionquest.warm_cache import PromptTemplate, cache, load_json
+
+ASSETS_DIR = os.path.join(bench_utils.REPO_ROOT, "code", "assets")
+
+
+# --- BEFORE: the code as it was ---
+def load_text_cold(lang_code):
+    try:
+        with open(os.path.join(ASSETS_DIR, f"{lang_code}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def processor_prompt_cold(user_prompt, extracted_text):
+    return f"""
+        You are an expert AI Data Analyst for Saudi SMEs.
+        User Question: {user_prompt}
+
+        Document Context:
+        {extracted_text}
+
+        Provide a professional, concise answer in Arabic (unless asked otherwise).
+        """
+
+
+# --- AFTER ---
+def load_text_warm(lang_code):
+    return load_json(os.path.join(ASSETS_DIR, f"{lang_code}.json"), default={})
+
+
+PROCESSOR_PROMPT = PromptTemplate("""
+    You are an expert AI Data Analyst for Saudi SMEs.
+    User Question: {user_prompt}
+
+    Document Context:
+    {extracted_text}
+
+    Provide a professional, concise answer in Arabic (unless asked otherwise).
+""")
+
+
+def processor_prompt_warm(user_prompt, extracted_text):
+    return PROCESSOR_PROMPT.render(user_prompt=user_prompt, extracted_text=extracted_text)
+
+
+def per_call_us(fn, iterations, *args):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(*args)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def run(args):
+    document = "فاتورة ضريبية مبسطة\nالإجمالي شامل الضريبة: 1150.00 ريال\n" * args.doc_lines
+    question = "What is the total amount including VAT?"
+    rows = []
+
+    def compare(path, before, after, fn_args, iterations, note=""):
+        before_us = per_call_us(before, iterations, *fn_args)
+        after_us = per_call_us(after, iterations, *fn_args)
+        rows.append({"path": path, "before_us": round(before_us, 2), "after_us": round(after_us, 2),
+                     "speedup": f"{before_us / after_us:.1f}x" if after_us else "", "note": note})
+
+    for lang in ("en", "ar"):
+        assert load_text_cold(lang) == load_text_warm(lang)
+        compare(f"load_text({lang})", load_text_cold, load_text_warm, (lang,), args.iterations)
+
+    saved = len(processor_prompt_cold(question, document)) - len(processor_prompt_warm(question, document))
+    compare("processor prompt", processor_prompt_cold, processor_prompt_warm, (question, document),
+            args.iterations, note=f"{saved} chars of indentation no longer sent")
+
+    media = base64.b64encode(os.urandom(args.doc_kb * 1024)).decode("ascii")
+    payload = {"anthropic_version": "bedrock-2023-05-31", "max_tokens": 4096,
+               "messages": [{"role": "user", "content": [
+                   {"type": "document", "source": {"type": "base64", "media_type": "application/pdf", "data": media}},
+                   {"type": "text", "text": question}]}]}
+
+    def body_per_attempt(payload):
+        return [json.dumps(payload) for _ in range(args.attempts)]
+
+    def body_once(payload):
+        body = json.dumps(payload)
+        return [body for _ in range(args.attempts)]
+    compare(f"request body ({args.doc_kb} KB doc, {args.attempts} attempts)", body_per_attempt, body_once,
+            (payload,), max(10, args.iterations // 1000))
+
+    print(f"🧪 {args.iterations} iterations; warm cache {cache.stats()}")
+    print_table(rows, list(rows[0].keys()))
+    if args.json:
+        write_json(args.json, {"config": vars(args), "results": rows})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--doc-lines", type=int, default=200, help="OCR text lines in the processor prompt")
+    parser.add_argument("--doc-kb", type=int, default=2048, help="Document size for the request body case")
+    parser.add_argument("--attempts", type=int, default=3, help="Bedrock attempts per request (retry + fallback)")
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
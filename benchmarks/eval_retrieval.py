@@ -0,0 +1,84 @@
+"""
+Offline retrieval evaluation: recall@k and latency for
+vector-only, BM25-only, hybrid (RRF) and hybrid + reranker.
+
+Uses the labeled set in benchmarks/data/ and the hashing embedder, so it
+runs without AWS and gives the same numbers on every machine.
+
+    python benchmarks/eval_retrieval.py --k 1 3 5 --json eval.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import bench_utils  # noqa: F401  (puts visionquest on the path)
+from bench_utils import latency_summary, print_table, write_json
+
+from visionquest.hybrid import HybridRetriever, result_key
+from visionquest.lexical import BM25Index, BM25Retriever
+from visionquest.retrievers import LocalIndexRetriever
+from visionquest.vector_index import HashingEmbedder, LocalVectorIndex, build_index
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "zatca_retrieval_eval.json")
+
+
+def evaluate(retriever, questions, key_to_id, ks, repeats):
+    recalls = {k: 0.0 for k in ks}
+    timings = []
+    for item in questions:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            results = retriever.retrieve(item["q"], k=max(ks))
+            timings.append(time.perf_counter() - started)
+        found = [key_to_id.get(result_key(r)) for r in results]
+        relevant = set(item["relevant"])
+        for k in ks:
+            recalls[k] += len(relevant & set(found[:k])) / float(len(relevant))
+    row = {"retriever": retriever.name}
+    for k in ks:
+        row[f"recall@{k}"] = round(recalls[k] / len(questions), 3)
+    summary = latency_summary(timings)
+    row["p50_ms"] = summary["p50_ms"]
+    row["p95_ms"] = summary["p95_ms"]
+    return row
+
+
+def run(args):
+    with open(args.dataset, "r", encoding="utf-8") as f:
+        dataset = json.load(f)
+    chunks = dataset["chunks"]
+    questions = dataset["questions"]
+    key_to_id = {
+        result_key({"content": {"text": c["text"]}, "location": {"s3Location": {"uri": c["uri"]}}}): c["id"]
+        for c in chunks
+    }
+
+    embedder = HashingEmbedder(args.dim)
+    with tempfile.TemporaryDirectory() as workdir:
+        build_index(chunks, embedder.embed([c["text"] for c in chunks]), workdir, embedder="hashing")
+        vector = LocalIndexRetriever(LocalVectorIndex.load(workdir), embedder)
+        vector.name = "vector"
+        lexical = BM25Retriever(BM25Index(chunks))
+        fused = HybridRetriever(vector, lexical, use_reranker=False)
+        fused.name = "hybrid-rrf"
+        reranked = HybridRetriever(vector, lexical)
+        reranked.name = "hybrid-rrf+rerank"
+
+        rows = [evaluate(r, questions, key_to_id, args.k, args.repeats) for r in (vector, lexical, fused, reranked)]
+
+    print(f"📊 {len(questions)} questions, {len(chunks)} chunks")
+    print_table(rows, list(rows[0].keys()))
+    if args.json:
+        write_json(args.json, {"dataset": args.dataset, "results": rows})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--repeats", type=int, default=20, help="Timed runs per question")
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
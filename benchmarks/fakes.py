@@ -0,0 +1,555 @@
+"""
+Offline stand-ins for AWS clients, used by the benchmark scripts.
+They mimic the response shapes (and errors) of the real boto3 calls
+with configurable latency, so pipelines can be measured without AWS.
+"""
+import copy
+import io
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import deque
+
+
+class FakeClientError(Exception):
+    """Looks like botocore's ClientError to code that reads error.response."""
+
+    def __init__(self, code, message=""):
+        super().__init__(f"An error occurred ({code}): {message}")
+        self.response = {"Error": {"Code": code, "Message": message}}
+
+
+class FakeVisionClient:
+    """
+    bedrock-runtime converse() for image audits.
+    - latency: base seconds per call (+ per extra page) with +/- jitter
+    - rps_limit: server-side quota; calls above it raise ThrottlingException
+    - error_rate: fraction of calls failing with ModelTimeoutException
+    Verdicts are deterministic per image (compliance_rate of them pass).
+    """
+
+    def __init__(self, latency=1.0, per_page=0.2, jitter=0.2, rps_limit=None, error_rate=0.0,
+                 compliance_rate=0.7, seed=0):
+        self.latency = latency
+        self.per_page = per_page
+        self.jitter = jitter
+        self.rps_limit = rps_limit
+        self.error_rate = error_rate
+        self.compliance_rate = compliance_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.throttled = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def _admit(self):
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 1.0:
+                self._recent.popleft()
+            if self.rps_limit is not None and len(self._recent) >= self.rps_limit:
+                self.throttled += 1
+                raise FakeClientError("ThrottlingException", "Too many requests, please wait before trying again.")
+            self._recent.append(now)
+            fail = self.rng.random() < self.error_rate
+            jitter = self.rng.uniform(-self.jitter, self.jitter)
+        return fail, jitter
+
+    def converse(self, modelId, messages, inferenceConfig=None, **kwargs):
+        fail, jitter = self._admit()
+        images = [block["image"]["source"]["bytes"] for block in messages[0]["content"] if "image" in block]
+        time.sleep(max(0.0, self.latency + self.per_page * (len(images) - 1)) * (1 + jitter))
+        if fail:
+            raise FakeClientError("ModelTimeoutException", "Model has timed out in processing the request.")
+
+        score = zlib.crc32(images[0][:4096]) % 1000 / 1000.0 if images else 0.0
+        if score < self.compliance_rate:
+            text = "✅ COMPLIANT\n- QR code present\n- VAT number present\n- Totals add up"
+        else:
+            text = "❌ VIOLATION\n- QR code missing\n- Total does not equal Subtotal + VAT"
+        return {
+            "output": {"message": {"role": "assistant", "content": [{"text": text}]}},
+            "usage": {"inputTokens": 1600 * max(1, len(images)), "outputTokens": len(text) // 4},
+            "stopReason": "end_turn"
+        }
+
+
+class FakeS3:
+    """In-memory S3: put/get/head/delete_object on (bucket, key), with user Metadata."""
+
+    def __init__(self):
+        self.objects = {}
+        self.metadata = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, Metadata=None, **kwargs):
+        with self._lock:
+            self.objects[(Bucket, Key)] = Body if isinstance(Body, bytes) else Body.encode("utf-8")
+            self.metadata[(Bucket, Key)] = dict(Metadata or {})
+        return {"ETag": f'"{zlib.crc32(self.objects[(Bucket, Key)]):08x}"'}
+
+    def _object(self, Bucket, Key):
+        with self._lock:
+            if (Bucket, Key) not in self.objects:
+                raise FakeClientError("NoSuchKey", f"{Key} does not exist")
+            return self.objects[(Bucket, Key)]
+
+    def get_object(self, Bucket, Key, **kwargs):
+        return {"Body": io.BytesIO(self._object(Bucket, Key)), "Metadata": self.metadata.get((Bucket, Key), {})}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        return {"ContentLength": len(self._object(Bucket, Key)), "Metadata": self.metadata.get((Bucket, Key), {})}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+            self.metadata.pop((Bucket, Key), None)
+        return {}
+
+
+class FakeTextract:
+    """
+    Async text detection over a FakeS3. A job finishes `base_latency +
+    per_page * pages` seconds after it starts; results come back 1000 blocks
+    per response with NextToken, like the real API. detect_document_text is
+    synchronous (single image).
+    """
+
+    def __init__(self, s3, base_latency=2.0, per_page=0.5, lines_per_page=30, start_tps=None):
+        self.s3 = s3
+        self.base_latency = base_latency
+        self.per_page = per_page
+        self.lines_per_page = lines_per_page
+        self.start_tps = start_tps
+        self.jobs = {}
+        self.started_jobs = 0
+        self.throttled = 0
+        self.pages_processed = 0
+        self._starts = deque()
+        self._lock = threading.Lock()
+
+    def _blocks(self, pages):
+        blocks = []
+        for page in range(1, pages + 1):
+            blocks.append({"BlockType": "PAGE", "Page": page})
+            for line in range(self.lines_per_page):
+                blocks.append({"BlockType": "LINE", "Page": page, "Text": f"page {page} line {line + 1}"})
+        return blocks
+
+    def start_document_text_detection(self, DocumentLocation, **kwargs):
+        import fitz
+        location = DocumentLocation["S3Object"]
+        data = self.s3.get_object(Bucket=location["Bucket"], Key=location["Name"])["Body"].read()
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            pages = doc.page_count
+        with self._lock:
+            now = time.monotonic()
+            while self._starts and now - self._starts[0] > 1.0:
+                self._starts.popleft()
+            if self.start_tps is not None and len(self._starts) >= self.start_tps:
+                self.throttled += 1
+                raise FakeClientError("ProvisionedThroughputExceededException", "Rate exceeded")
+            self._starts.append(now)
+            self.started_jobs += 1
+            self.pages_processed += pages
+            job_id = f"job-{self.started_jobs}"
+            self.jobs[job_id] = (now + self.base_latency + self.per_page * pages, self._blocks(pages), pages)
+        return {"JobId": job_id}
+
+    def get_document_text_detection(self, JobId, NextToken=None, MaxResults=1000, **kwargs):
+        ready_at, blocks, pages = self.jobs[JobId]
+        if time.monotonic() < ready_at:
+            return {"JobStatus": "IN_PROGRESS", "Blocks": []}
+        start = int(NextToken or 0)
+        response = {
+            "JobStatus": "SUCCEEDED",
+            "DocumentMetadata": {"Pages": pages},
+            "Blocks": blocks[start:start + MaxResults]
+        }
+        if start + MaxResults < len(blocks):
+            response["NextToken"] = str(start + MaxResults)
+        return response
+
+    def detect_document_text(self, Document, **kwargs):
+        time.sleep(self.base_latency / 4.0)
+        return {"Blocks": self._blocks(1)}
+
+
+# --- DYNAMODB ---
+def to_dynamo(value):
+    """What boto3's resource layer does on write: numbers become Decimal, floats are rejected."""
+    from decimal import Decimal
+    if isinstance(value, bool) or value is None or isinstance(value, (str, bytes, Decimal)):
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, float):
+        raise TypeError("Float types are not supported. Use Decimal types instead.")
+    if isinstance(value, dict):
+        return {k: to_dynamo(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_dynamo(v) for v in value]
+    if isinstance(value, set):
+        return {to_dynamo(v) for v in value}
+    return value
+
+
+def split_top_level(text, separator=","):
+    """Splits on separator outside parentheses."""
+    parts, depth, current = [], 0, ""
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == separator and depth == 0:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += ch
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+class FakeDynamoTable:
+    """
+    Enough of boto3's Table resource for the handlers: put_item, get_item,
+    update_item (SET / REMOVE / ADD with #names, :values, if_not_exists,
+    list_append, +/-, map paths a.b), simple ConditionExpressions and query
+    (string KeyConditionExpression and FilterExpression, Limit applied
+    before the filter, paging; indexes = {index name: range key}).
+    """
+
+    UPDATE_CLAUSE = re.compile(r"\b(SET|REMOVE|ADD|DELETE)\b", re.IGNORECASE)
+
+    def __init__(self, key_name, name="FakeTable", indexes=None):
+        self.key_name = key_name
+        self.name = name
+        self.indexes = indexes or {}
+        self.items = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _count(self, op):
+        self.calls[op] = self.calls.get(op, 0) + 1
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, **kwargs):
+        item = to_dynamo(copy.deepcopy(Item))
+        with self._lock:
+            self._count("put_item")
+            current = self.items.get(item[self.key_name])
+            self._check(ConditionExpression, current, ExpressionAttributeNames, ExpressionAttributeValues)
+            self.items[item[self.key_name]] = item
+        return {}
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        with self._lock:
+            self._count("get_item")
+            item = self.items.get(Key[self.key_name])
+            if item is None:
+                return {}
+            return {"Item": self._project(item, ProjectionExpression, ExpressionAttributeNames)}
+
+    def query(self, KeyConditionExpression, IndexName=None, ExpressionAttributeNames=None,
+              ExpressionAttributeValues=None, ProjectionExpression=None, ScanIndexForward=True, Limit=None,
+              FilterExpression=None, ExclusiveStartKey=None, **kwargs):
+        """Scans every item: fine for benchmark-sized tables."""
+        names = ExpressionAttributeNames or {}
+        values = to_dynamo(copy.deepcopy(ExpressionAttributeValues or {}))
+        range_key = self.indexes.get(IndexName, self.key_name)
+        with self._lock:
+            self._count("query")
+            matches = [item for item in self.items.values()
+                       if self._matches(KeyConditionExpression, item, names, values)]
+            matches.sort(key=lambda item: (item.get(range_key), item[self.key_name]), reverse=not ScanIndexForward)
+            if ExclusiveStartKey:
+                start = [item[self.key_name] for item in matches].index(ExclusiveStartKey[self.key_name]) + 1
+                matches = matches[start:]
+            # Like DynamoDB: Limit counts the items read, the filter runs afterwards
+            evaluated = matches[:Limit]
+            items = [self._project(item, ProjectionExpression, names) for item in evaluated
+                     if self._matches(FilterExpression, item, names, values)]
+            response = {"Items": items, "Count": len(items), "ScannedCount": len(evaluated)}
+            if Limit is not None and len(matches) > Limit:
+                last = evaluated[-1]
+                response["LastEvaluatedKey"] = {self.key_name: last[self.key_name], range_key: last.get(range_key)}
+        return response
+
+    def delete_item(self, Key, **kwargs):
+        with self._lock:
+            self._count("delete_item")
+            self.items.pop(Key[self.key_name], None)
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+                    ConditionExpression=None, ReturnValues="NONE", **kwargs):
+        names = ExpressionAttributeNames or {}
+        values = to_dynamo(copy.deepcopy(ExpressionAttributeValues or {}))
+        with self._lock:
+            self._count("update_item")
+            key = Key[self.key_name]
+            current = self.items.get(key)
+            self._check(ConditionExpression, current, names, values)
+            item = copy.deepcopy(current) if current is not None else dict(Key)
+
+            tokens = self.UPDATE_CLAUSE.split(UpdateExpression)
+            for clause, body in zip(tokens[1::2], tokens[2::2]):
+                for action in split_top_level(body):
+                    clause_name = clause.upper()
+                    if clause_name == "SET":
+                        path, expression = [p.strip() for p in action.split("=", 1)]
+                        self._set(item, self._path(path, names), self._eval(expression, item, names, values))
+                    elif clause_name == "REMOVE":
+                        self._remove(item, self._path(action, names))
+                    elif clause_name == "ADD":
+                        path, value = action.split()
+                        path = self._path(path, names)
+                        existing = self._get(item, path)
+                        added = values[value]
+                        if isinstance(added, set):
+                            self._set(item, path, (existing or set()) | added)
+                        else:
+                            self._set(item, path, (existing or 0) + added)
+                    else:  # DELETE (from a set)
+                        path, value = action.split()
+                        path = self._path(path, names)
+                        self._set(item, path, (self._get(item, path) or set()) - values[value])
+            self.items[key] = item
+            result = copy.deepcopy(item)
+        return {"Attributes": result} if ReturnValues in ("ALL_NEW", "UPDATED_NEW") else {}
+
+    # --- expression helpers ---
+    @staticmethod
+    def _path(path, names):
+        return [names.get(part, part) for part in path.strip().split(".")]
+
+    def _project(self, item, projection, names):
+        if projection:
+            wanted = {self._path(p, names or {})[0] for p in projection.split(",")}
+            item = {k: v for k, v in item.items() if k in wanted}
+        return copy.deepcopy(item)
+
+    @staticmethod
+    def _get(item, path):
+        for part in path:
+            if not isinstance(item, dict) or part not in item:
+                return None
+            item = item[part]
+        return item
+
+    @staticmethod
+    def _set(item, path, value):
+        for part in path[:-1]:
+            if part not in item:
+                raise FakeClientError("ValidationException",
+                                      "The document path provided in the update expression is invalid for update")
+            item = item[part]
+        item[path[-1]] = value
+
+    @staticmethod
+    def _remove(item, path):
+        for part in path[:-1]:
+            item = item.get(part, {})
+        item.pop(path[-1], None)
+
+    def _eval(self, expression, item, names, values):
+        expression = expression.strip()
+        match = re.match(r"^(if_not_exists|list_append)\((.*)\)$", expression)
+        if match:
+            first, second = split_top_level(match.group(2))
+            if match.group(1) == "if_not_exists":
+                existing = self._get(item, self._path(first, names))
+                return existing if existing is not None else self._eval(second, item, names, values)
+            return (self._eval(first, item, names, values) or []) + (self._eval(second, item, names, values) or [])
+        for operator in ("+", "-"):
+            parts = split_top_level(expression, operator)
+            if len(parts) == 2:
+                left, right = (self._eval(p, item, names, values) for p in parts)
+                return left + right if operator == "+" else left - right
+        if expression.startswith(":"):
+            return values[expression]
+        return self._get(item, self._path(expression, names))
+
+    def _matches(self, condition, item, names, values):
+        try:
+            self._check(condition, item, names, values)
+        except FakeClientError:
+            return False
+        return True
+
+    def _check(self, condition, item, names, values):
+        if not condition:
+            return
+        names = names or {}
+        values = values or {}
+        for clause in re.split(r"\s+AND\s+", condition, flags=re.IGNORECASE):
+            clause = clause.strip()
+            match = re.match(r"^(attribute_not_exists|attribute_exists)\((.+)\)$", clause)
+            if match:
+                exists = item is not None and self._get(item, self._path(match.group(2), names)) is not None
+                ok = exists if match.group(1) == "attribute_exists" else not exists
+            else:
+                match = re.match(r"^(.+?)\s*(<=|>=|<>|=|<|>)\s*(.+)$", clause)
+                if not match:
+                    raise NotImplementedError(f"Condition not supported by the fake: {clause}")
+                left = self._eval(match.group(1), item or {}, names, values)
+                right = self._eval(match.group(3), item or {}, names, values)
+                operator = match.group(2)
+                if left is None or right is None:
+                    ok = operator == "<>"
+                else:
+                    ok = {"=": left == right, "<>": left != right, "<": left < right, "<=": left <= right,
+                          ">": left > right, ">=": left >= right}[operator]
+            if not ok:
+                raise FakeClientError("ConditionalCheckFailedException", "The conditional request failed")
+
+
+# --- STEP FUNCTIONS / BEDROCK ---
+class FakeSFN:
+    """Records start_execution calls; the benchmark runs the states itself."""
+
+    def __init__(self):
+        self.executions = []
+        self._lock = threading.Lock()
+
+    def start_execution(self, stateMachineArn, input, name=None, **kwargs):
+        with self._lock:
+            self.executions.append({"name": name, "input": input})
+            arn = f"{stateMachineArn}:{name or len(self.executions)}"
+        return {"executionArn": arn, "startDate": time.time()}
+
+
+class FakeStreamingBody(io.BytesIO):
+    """invoke_model returns the body as a stream."""
+
+
+class FakeBedrockRuntime:
+    """
+    invoke_model (Anthropic messages shape) and converse. Latency grows with
+    input and output tokens: base + input_tokens * per_input_token +
+    output_tokens * per_output_token (seconds).
+    """
+
+    def __init__(self, base_latency=0.5, per_input_token=0.00002, per_output_token=0.01,
+                 output_tokens=300, error_rate=0.0, seed=0):
+        self.base_latency = base_latency
+        self.per_input_token = per_input_token
+        self.per_output_token = per_output_token
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.input_tokens = 0
+        self._lock = threading.Lock()
+
+    def _respond(self, prompt_bytes):
+        input_tokens = prompt_bytes // 4
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += input_tokens
+            fail = self.rng.random() < self.error_rate
+        time.sleep(self.base_latency + input_tokens * self.per_input_token + self.output_tokens * self.per_output_token)
+        if fail:
+            raise FakeClientError("ThrottlingException", "Too many requests, please wait before trying again.")
+        text = "تحليل: " + "نص " * (self.output_tokens - 2)
+        return text, input_tokens
+
+    def invoke_model(self, modelId, body, **kwargs):
+        text, input_tokens = self._respond(len(body.encode("utf-8") if isinstance(body, str) else body))
+        payload = {
+            "id": f"msg_{self.calls}", "type": "message", "role": "assistant", "model": modelId,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "usage": {"input_tokens": input_tokens, "output_tokens": self.output_tokens}
+        }
+        return {"body": FakeStreamingBody(json.dumps(payload).encode("utf-8")), "contentType": "application/json"}
+
+    def converse(self, modelId, messages, **kwargs):
+        prompt_bytes = sum(len(block.get("text", "").encode("utf-8")) for m in messages for block in m["content"])
+        text, input_tokens = self._respond(prompt_bytes)
+        return {
+            "output": {"message": {"role": "assistant", "content": [{"text": text}]}},
+            "usage": {"inputTokens": input_tokens, "outputTokens": self.output_tokens},
+            "stopReason": "end_turn"
+        }
+
+
+# --- LATENCY INJECTION ---
+class WithLatency:
+    """
+    Proxy that sleeps before selected calls: delays = {"put_object": 0.03, "*": 0.005}
+    (seconds, +/- jitter fraction). Call durations are kept per operation.
+    """
+
+    def __init__(self, target, delays, jitter=0.2, seed=0):
+        self._target = target
+        self._delays = delays
+        self._jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        delay = self._delays.get(name, self._delays.get("*", 0.0))
+        if not callable(attribute) or not delay:
+            return attribute
+
+        def call(*args, **kwargs):
+            with self._lock:
+                factor = 1 + self._rng.uniform(-self._jitter, self._jitter)
+            time.sleep(delay * factor)
+            return attribute(*args, **kwargs)
+        return call
+
+
+# --- FAULT INJECTION ---
+class WithFaults:
+    """
+    Proxy that fails selected calls before they reach the target:
+        faults = [{"op": "invoke_model", "code": "ThrottlingException", "rate": 1.0,
+                   "match": {"modelId": "bench-large-model"}, "calls": (0, 200)}]
+    "match" filters on call kwargs, "calls" limits a rule to a range of its
+    matching calls (an outage that ends), "rate" is the failure probability.
+    A failed call still costs `latency` seconds: the error is a round trip.
+    """
+
+    def __init__(self, target, faults, latency=0.0, seed=0):
+        self._target = target
+        self._faults = [dict(rule, seen=0) for rule in faults]
+        self._latency = latency
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.failures = {}
+
+    def _fault(self, name, kwargs):
+        with self._lock:
+            for rule in self._faults:
+                if rule.get("op", name) != name:
+                    continue
+                if any(kwargs.get(k) != v for k, v in (rule.get("match") or {}).items()):
+                    continue
+                start, end = rule.get("calls", (0, None))
+                index, rule["seen"] = rule["seen"], rule["seen"] + 1
+                if index >= start and (end is None or index < end) and self._rng.random() < rule.get("rate", 1.0):
+                    self.failures[rule["code"]] = self.failures.get(rule["code"], 0) + 1
+                    return rule["code"]
+        return None
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            code = self._fault(name, kwargs)
+            if code:
+                time.sleep(self._latency)
+                raise FakeClientError(code, "Injected fault")
+            return attribute(*args, **kwargs)
+        return call
@@ -0,0 +1,387 @@
+"""
+Synthetic load generator (replaces test_flood.py).
+
+Open-loop arrivals (constant, Poisson or burst) of a weighted file mix,
+sent either to the in-process local stack (real handlers + fakes, with
+per-stage Lambda concurrency limits) or to a deployed API. Measures ingest
+acknowledgement and end-to-end completion latency, and sweeps arrival rates
+to find where the pipeline, and each stage, saturates.
+
+    # Local stack, sweep 1..16 jobs/s for 20 s each
+    python benchmarks/load_generator.py --target local --sweep 1 2 4 8 16 --duration 20 --json load.json
+
+    # Deployed API, Poisson arrivals at 2 jobs/s
+    python benchmarks/load_generator.py --target https://xyz.execute-api.us-east-1.amazonaws.com \\
+        --arrival poisson --sweep 2 --duration 60 --history load_history.jsonl
+
+--mix is kind:pages:weight with kind in digital, scanned, image.
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bench_utils
+from bench_utils import latency_summary, print_table, write_json
+from bench_ocr import scanned_pdf
+from bench_pipeline import Harness, ingest_body
+from bench_rasterize import synthetic_invoice
+
+from visionquest.model_router import LATENCY_BUCKETS_MS, Histogram
+
+DONE_STATUSES = ("SUCCESS", "FAILED")
+PIPELINE_STAGES = ("kickoff", "ocr", "processor")
+SATURATION_THROUGHPUT_RATIO = 0.9   # Completions below 90% of offered load -> saturated
+SATURATION_LATENCY_FACTOR = 3.0     # ... or e2e p95 3x the lightest load's p95
+
+
+# --- ARRIVALS ---
+def arrival_times(process, rate, duration, burst_size=10, seed=0):
+    """Send offsets (seconds from start) for `rate` jobs/s on average."""
+    rng = random.Random(seed)
+    times = []
+    if process == "constant":
+        times = [i / rate for i in range(int(rate * duration))]
+    elif process == "poisson":
+        t = rng.expovariate(rate)
+        while t < duration:
+            times.append(t)
+            t += rng.expovariate(rate)
+    elif process == "burst":
+        period = burst_size / rate
+        t = 0.0
+        while t < duration:
+            times.extend([t] * burst_size)
+            t += period
+    else:
+        raise ValueError(f"Unknown arrival process: {process}")
+    return times
+
+
+# --- FILE MIX ---
+def parse_mix(spec):
+    mix = []
+    for part in spec.split(","):
+        kind, pages, weight = part.split(":")
+        if kind not in ("digital", "scanned", "image"):
+            raise ValueError(f"Unknown document kind: {kind}")
+        mix.append((kind, int(pages), float(weight)))
+    return mix
+
+
+def build_document(kind, pages):
+    import fitz
+    if kind == "digital":
+        return synthetic_invoice(pages, pages), "pdf"
+    if kind == "scanned":
+        return scanned_pdf(pages), "pdf"
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 1200, 1600), 0)
+    pix.clear_with(230)
+    return pix.tobytes("png"), "png"
+
+
+class DocumentMix:
+    def __init__(self, mix, seed=0):
+        self.mix = mix
+        self.rng = random.Random(seed)
+        self.cache = {}
+
+    def build_all(self):
+        """Renders every mix entry up front so document synthesis never lands in a measured send."""
+        for kind, pages, _ in self.mix:
+            if (kind, pages) not in self.cache:
+                self.cache[(kind, pages)] = build_document(kind, pages)
+
+    def pick(self, index):
+        kind, pages, _ = self.rng.choices(self.mix, weights=[w for _, _, w in self.mix])[0]
+        if (kind, pages) not in self.cache:
+            self.cache[(kind, pages)] = build_document(kind, pages)
+        data, extension = self.cache[(kind, pages)]
+        return {"name": f"load_{index:05d}_{kind}_{pages}p.{extension}", "data": data, "kind": kind, "pages": pages}
+
+
+# --- TARGETS ---
+class LocalTarget:
+    """
+    The real handlers on fakes (bench_pipeline.Harness). Each pipeline
+    stage gets its own worker pool, like a Lambda reserved-concurrency
+    limit, so queueing shows up where the capacity runs out.
+    """
+
+    def __init__(self, harness_args, stage_concurrency):
+        self.harness = Harness(harness_args)
+        self.pools = {stage: ThreadPoolExecutor(max_workers=stage_concurrency[stage]) for stage in PIPELINE_STAGES}
+        self.stage_waits = {stage: [] for stage in PIPELINE_STAGES}
+        self.stage_service = {stage: [] for stage in PIPELINE_STAGES}
+        self._lock = threading.Lock()
+
+    def submit(self, index, document):
+        job_id, key = self.harness.run_ingest(ingest_body(index, document))
+        self._enqueue("kickoff", lambda: self.harness.run_kickoff(job_id, key), self._after_kickoff)
+        return job_id
+
+    def _enqueue(self, stage, work, then=None):
+        queued = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            try:
+                result = work()
+            except Exception as e:
+                print(f"❌ {stage} failed: {e}")
+                return
+            finally:
+                with self._lock:
+                    self.stage_waits[stage].append(started - queued)
+                    self.stage_service[stage].append(time.perf_counter() - started)
+            if then:
+                then(result)
+        self.pools[stage].submit(run)
+
+    def _after_kickoff(self, state):
+        self._enqueue("ocr", lambda: self.harness.run_ocr(state), self._after_ocr)
+
+    def _after_ocr(self, state):
+        self._enqueue("processor", lambda: self.harness.run_processor(state))
+
+    def status(self, job_id):
+        return json.loads(self.harness.run_status(job_id)["body"])
+
+    def stage_report(self):
+        report = {}
+        for stage in PIPELINE_STAGES:
+            waits = latency_summary(self.stage_waits[stage])
+            service = latency_summary(self.stage_service[stage])
+            report[stage] = {"count": waits["count"], "queue_p95_ms": waits["p95_ms"],
+                             "service_p50_ms": service["p50_ms"], "service_p95_ms": service["p95_ms"]}
+        return report
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+class HttpTarget:
+    """A deployed API: POST /ingest, then POST /status until the job is done."""
+
+    def __init__(self, base_url, timeout=60):
+        import requests
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        self.timeout = timeout
+
+    def submit(self, index, document):
+        response = self.session.post(f"{self.base_url}/ingest", data=ingest_body(index, document),
+                                     headers={"Content-Type": "application/json"}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["job_id"]
+
+    def status(self, job_id):
+        response = self.session.post(f"{self.base_url}/status", json={"job_id": job_id}, timeout=10)
+        return response.json() if response.status_code == 200 else {"status": f"HTTP_{response.status_code}"}
+
+    def stage_report(self):
+        return {}
+
+    def close(self):
+        self.session.close()
+
+
+# --- ONE LOAD LEVEL ---
+def run_level(target, rate, args, mix):
+    schedule = arrival_times(args.arrival, rate, args.duration, args.burst_size, args.seed)
+    acks, completions, lags = [], [], []
+    outstanding = {}      # job_id -> send time
+    errors = {"ingest": 0, "rate_limited": 0, "failed": 0, "timeout": 0}
+    lock = threading.Lock()
+    sending_done = threading.Event()
+
+    def send(index, due):
+        sent = time.perf_counter()
+        document = mix.pick(index)
+        try:
+            job_id = target.submit(index, document)
+        except Exception as e:
+            # 429: the per-tenant admission bucket turned the upload away (not a failure)
+            limited = getattr(getattr(e, "response", None), "status_code", None) == 429
+            if not limited:
+                print(f"❌ Ingest error: {e}")
+            with lock:
+                errors["rate_limited" if limited else "ingest"] += 1
+            return
+        with lock:
+            lags.append(sent - due)
+            acks.append(time.perf_counter() - sent)
+            outstanding[job_id] = sent
+
+    def track():
+        """Polls every outstanding job until it finishes or times out."""
+        with ThreadPoolExecutor(max_workers=args.poll_workers) as pollers:
+            while not (sending_done.is_set() and not outstanding):
+                with lock:
+                    jobs = list(outstanding.items())
+                for (job_id, sent), status in zip(jobs, pollers.map(lambda j: target.status(j[0]), jobs)):
+                    now = time.perf_counter()
+                    state = status.get("status")
+                    if state in DONE_STATUSES or now - sent > args.job_timeout:
+                        with lock:
+                            outstanding.pop(job_id, None)
+                            if state == "SUCCESS":
+                                completions.append((now, now - sent))
+                            elif state == "FAILED":
+                                errors["failed"] += 1
+                            else:
+                                errors["timeout"] += 1
+                time.sleep(args.poll)
+
+    tracker = threading.Thread(target=track, daemon=True)
+    tracker.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as senders:
+        for index, offset in enumerate(schedule):
+            due = started + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            senders.submit(send, index, due)
+    sending_done.set()
+    tracker.join()
+    elapsed = time.perf_counter() - started
+
+    ack_hist, e2e_hist = Histogram(LATENCY_BUCKETS_MS), Histogram(LATENCY_BUCKETS_MS)
+    for value in acks:
+        ack_hist.observe(value * 1000.0)
+    for _, value in completions:
+        e2e_hist.observe(value * 1000.0)
+    ack = latency_summary(acks)
+    e2e = latency_summary([value for _, value in completions])
+    # Steady-state completion rate: completions between the first and the last one
+    # (excludes the pipeline fill at the start and the drain after sending stops)
+    finished = sorted(t for t, _ in completions)
+    span = finished[-1] - finished[0] if len(finished) > 1 else 0.0
+    return {
+        "offered_rps": rate,
+        "sent": len(schedule),
+        "completed": len(completions),
+        "achieved_rps": round((len(finished) - 1) / span, 3) if span else 0.0,
+        "ack_p50_ms": ack["p50_ms"], "ack_p95_ms": ack["p95_ms"], "ack_p99_ms": ack["p99_ms"],
+        "e2e_p50_ms": e2e["p50_ms"], "e2e_p95_ms": e2e["p95_ms"], "e2e_p99_ms": e2e["p99_ms"],
+        "send_lag_p95_ms": latency_summary(lags)["p95_ms"],
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "ack_histogram_ms": ack_hist.snapshot()["buckets"],
+        "e2e_histogram_ms": e2e_hist.snapshot()["buckets"],
+        "stages": target.stage_report()
+    }
+
+
+def find_saturation(levels):
+    """
+    Pipeline: first rate where completions fall behind the offered load or
+    the e2e p95 blows up. Stage: first rate where its queue wait p95 exceeds
+    its own p50 service time (requests wait longer than they run).
+    """
+    baseline_p95 = levels[0]["e2e_p95_ms"] or None
+    pipeline = None
+    for level in levels:
+        behind = level["achieved_rps"] < SATURATION_THROUGHPUT_RATIO * level["offered_rps"]
+        slow = baseline_p95 and level["e2e_p95_ms"] > SATURATION_LATENCY_FACTOR * baseline_p95
+        if behind or slow:
+            pipeline = level["offered_rps"]
+            break
+    stages = {}
+    for stage in levels[0]["stages"]:
+        stages[stage] = next((level["offered_rps"] for level in levels
+                              if level["stages"][stage]["queue_p95_ms"] > level["stages"][stage]["service_p50_ms"]),
+                             None)
+    return {"pipeline_rps": pipeline, "stages_rps": stages,
+            "max_sustained_rps": max([l["achieved_rps"] for l in levels if pipeline is None or l["offered_rps"] < pipeline],
+                                     default=None)}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=bench_utils.REPO_ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def run(args):
+    mix = DocumentMix(parse_mix(args.mix), args.seed)
+    mix.build_all()
+    stage_concurrency = {"kickoff": args.kickoff_concurrency, "ocr": args.ocr_concurrency,
+                         "processor": args.processor_concurrency}
+    levels = []
+    for rate in args.sweep:
+        target = LocalTarget(args, stage_concurrency) if args.target == "local" else HttpTarget(args.target)
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet:
+            level = run_level(target, rate, args, mix)
+        target.close()
+        levels.append(level)
+        print(f"🌊 {rate} jobs/s: {level['completed']}/{level['sent']} done, "
+              f"achieved {level['achieved_rps']} jobs/s, e2e p95 {level['e2e_p95_ms']} ms")
+
+    columns = ["offered_rps", "achieved_rps", "completed", "ack_p50_ms", "ack_p95_ms", "ack_p99_ms",
+               "e2e_p50_ms", "e2e_p95_ms", "e2e_p99_ms"]
+    print_table(levels, columns)
+    if levels[0]["stages"]:
+        stage_rows = [dict(rate=level["offered_rps"], stage=stage, **numbers)
+                      for level in levels for stage, numbers in level["stages"].items()]
+        print()
+        print_table(stage_rows, list(stage_rows[0].keys()))
+    saturation = find_saturation(levels)
+    print(f"\n🔥 Saturation: {json.dumps(saturation)}")
+
+    report = {
+        "timestamp": int(time.time()),
+        "revision": git_revision(),
+        "config": vars(args),
+        "levels": levels,
+        "saturation": saturation
+    }
+    if args.json:
+        write_json(args.json, report)
+    if args.history:
+        summary = {"timestamp": report["timestamp"], "revision": report["revision"], "target": args.target,
+                   "arrival": args.arrival, "mix": args.mix, "saturation": saturation,
+                   "levels": [{k: level[k] for k in columns} for level in levels]}
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="local", help="'local' or the API base URL")
+    parser.add_argument("--arrival", choices=("constant", "poisson", "burst"), default="poisson")
+    parser.add_argument("--sweep", type=float, nargs="+", default=[1, 2, 4, 8], help="Arrival rates (jobs/s)")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds of arrivals per rate")
+    parser.add_argument("--burst-size", type=int, default=10)
+    parser.add_argument("--mix", default="digital:1:5,digital:5:3,scanned:3:1,image:1:1")
+    parser.add_argument("--concurrency", type=int, default=32, help="Max in-flight ingest requests")
+    parser.add_argument("--poll", type=float, default=0.25, help="Status poll interval (seconds)")
+    parser.add_argument("--poll-workers", type=int, default=8)
+    parser.add_argument("--job-timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    # Local stack capacity and latencies (see bench_pipeline.py)
+    parser.add_argument("--kickoff-concurrency", type=int, default=10)
+    parser.add_argument("--ocr-concurrency", type=int, default=10)
+    parser.add_argument("--processor-concurrency", type=int, default=5)
+    parser.add_argument("--s3-latency", type=float, default=0.03)
+    parser.add_argument("--dynamo-latency", type=float, default=0.008)
+    parser.add_argument("--sfn-latency", type=float, default=0.03)
+    parser.add_argument("--textract-base", type=float, default=1.0)
+    parser.add_argument("--textract-per-page", type=float, default=0.05)
+    parser.add_argument("--bedrock-base", type=float, default=0.4)
+    parser.add_argument("--bedrock-per-token", type=float, default=0.002)
+    parser.add_argument("--output-tokens", type=int, default=300)
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--json", help="Write the full report to this file")
+    parser.add_argument("--history", help="Append a one-line summary to this JSONL file (trend tracking)")
+    run(parser.parse_args())
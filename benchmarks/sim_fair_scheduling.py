@@ -0,0 +1,168 @@
+"""
+Discrete-event simulation of kickoff's dispatcher with mixed tenants:
+steady interactive chat questions from many users, plus one noisy user who
+uploads a large batch at once. Compares dispatch policies on the same
+arrivals:
+  - fifo:        one global queue (the dispatcher before visionquest.scheduler);
+  - fair:        scheduler.FairScheduler (in memory);
+  - fair-dynamo: scheduler.FairQueue, the code kickoff runs, on FakeDynamoTable.
+
+Jobs hold one of --slots pipeline slots for their service time (OCR +
+Bedrock). Time is simulated, so minutes of traffic run in seconds.
+
+    python benchmarks/sim_fair_scheduling.py --flood 500 --slots 8 --json fair.json
+"""
+import argparse
+import heapq
+import random
+from collections import deque
+
+import bench_utils  # noqa: F401  (puts visionquest on sys.path)
+from bench_utils import latency_summary, print_table, write_json
+from fakes import FakeDynamoTable
+from visionquest.scheduler import FairQueue, FairScheduler
+
+NOISY_TENANT = "noisy"
+
+
+# --- QUEUES (one interface for every policy) ---
+class FifoQueue:
+    def __init__(self):
+        self.jobs = deque()
+
+    def push(self, job):
+        self.jobs.append(job)
+
+    def pop(self):
+        return self.jobs.popleft() if self.jobs else None
+
+
+class MemoryFairQueue:
+    def __init__(self, tier_weights):
+        self.scheduler = FairScheduler(tier_weights=tier_weights)
+
+    def push(self, job):
+        self.scheduler.push(job["tier"], job["tenant"], job)
+
+    def pop(self):
+        popped = self.scheduler.pop()
+        return popped[2] if popped else None
+
+
+class DynamoFairQueue:
+    def __init__(self, tier_weights):
+        self.table = FakeDynamoTable("pk", "sim-admission")
+        self.queue = FairQueue(self.table, tier_weights=tier_weights)
+        self.jobs = {}
+
+    def push(self, job):
+        self.jobs[job["id"]] = job
+        self.queue.enqueue(job["tier"], job["tenant"], job["id"], {"id": job["id"]})
+
+    def pop(self):
+        claimed = self.queue.claim()
+        return self.jobs.pop(claimed["job_id"]) if claimed else None
+
+
+POLICIES = {
+    "fifo": lambda args: FifoQueue(),
+    "fair": lambda args: MemoryFairQueue({"interactive": args.interactive_weight, "bulk": 1.0}),
+    "fair-dynamo": lambda args: DynamoFairQueue({"interactive": args.interactive_weight, "bulk": 1.0}),
+}
+
+
+# --- WORKLOAD ---
+def service_time(rng, mean):
+    """Lognormal around the mean: most jobs close to it, a tail of slow ones."""
+    return mean * rng.lognormvariate(0, 0.4) / 1.083  # E[lognormal(0, 0.4)] = 1.083
+
+
+def workload(args, scenario):
+    rng = random.Random(args.seed)
+    jobs = []
+    for t in range(args.tenants):
+        now = rng.expovariate(args.interactive_rate / 60.0)
+        while now < args.duration:
+            jobs.append({"tenant": f"user-{t}", "tier": "interactive", "arrival": now,
+                         "service": service_time(rng, args.interactive_service)})
+            now += rng.expovariate(args.interactive_rate / 60.0)
+    if scenario != "baseline":
+        tier = "bulk" if scenario == "bulk-flood" else "interactive"
+        for i in range(args.flood):
+            jobs.append({"tenant": NOISY_TENANT, "tier": tier, "arrival": args.flood_at + i * 0.01,
+                         "service": service_time(rng, args.bulk_service)})
+    jobs.sort(key=lambda job: job["arrival"])
+    for index, job in enumerate(jobs):
+        job["id"] = f"job-{index}"
+    return jobs
+
+
+def simulate(queue, jobs, slots):
+    events = [(job["arrival"], i, "arrive", job) for i, job in enumerate(jobs)]
+    heapq.heapify(events)
+    order = len(events)
+    free = slots
+    while events:
+        now, _, kind, job = heapq.heappop(events)
+        if kind == "arrive":
+            queue.push(job)
+        else:
+            job["done"] = now
+            free += 1
+        while free:
+            started = queue.pop()
+            if started is None:
+                break
+            started["start"] = now
+            free -= 1
+            order += 1
+            heapq.heappush(events, (now + started["service"], order, "done", started))
+    return jobs
+
+
+def run(args):
+    rows = []
+    for scenario in args.scenarios:
+        for policy in args.policies:
+            jobs = simulate(POLICIES[policy](args), workload(args, scenario), args.slots)
+            others = [job for job in jobs if job["tenant"] != NOISY_TENANT]
+            noisy = [job for job in jobs if job["tenant"] == NOISY_TENANT]
+            wait = latency_summary([job["start"] - job["arrival"] for job in others])
+            e2e = latency_summary([job["done"] - job["arrival"] for job in others])
+            rows.append({
+                "scenario": scenario,
+                "policy": policy,
+                "interactive_jobs": len(others),
+                "wait_p50_s": round(wait["p50_ms"] / 1000.0, 1),
+                "wait_p95_s": round(wait["p95_ms"] / 1000.0, 1),
+                "wait_p99_s": round(wait["p99_ms"] / 1000.0, 1),
+                "e2e_p95_s": round(e2e["p95_ms"] / 1000.0, 1),
+                "noisy_drain_s": round(max(job["done"] for job in noisy) - args.flood_at, 1) if noisy else "",
+                "makespan_s": round(max(job["done"] for job in jobs), 1),
+            })
+
+    busy = args.tenants * args.interactive_rate / 60.0 * args.interactive_service / args.slots
+    print(f"🧪 {args.tenants} users x {args.interactive_rate}/min interactive ({busy:.0%} of {args.slots} slots), "
+          f"{args.flood} jobs from '{NOISY_TENANT}' at t={args.flood_at:.0f}s")
+    print_table(rows, list(rows[0].keys()))
+    if args.json:
+        write_json(args.json, {"config": vars(args), "results": rows})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=["baseline", "bulk-flood", "interactive-flood"],
+                        choices=["baseline", "bulk-flood", "interactive-flood"])
+    parser.add_argument("--policies", nargs="+", default=list(POLICIES), choices=list(POLICIES))
+    parser.add_argument("--slots", type=int, default=8, help="Max jobs in flight (SlotPool limit)")
+    parser.add_argument("--tenants", type=int, default=20, help="Interactive users")
+    parser.add_argument("--interactive-rate", type=float, default=1.0, help="Questions per user per minute")
+    parser.add_argument("--interactive-service", type=float, default=8.0, help="Mean seconds per chat job")
+    parser.add_argument("--bulk-service", type=float, default=12.0, help="Mean seconds per batch invoice")
+    parser.add_argument("--flood", type=int, default=500, help="Jobs the noisy user uploads at once")
+    parser.add_argument("--flood-at", type=float, default=60.0)
+    parser.add_argument("--duration", type=float, default=900.0, help="Seconds of interactive arrivals")
+    parser.add_argument("--interactive-weight", type=float, default=8.0, help="Tier weight vs bulk = 1")
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--json", help="Write results to this file")
+    run(parser.parse_args())
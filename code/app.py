@@ -1,11 +1,15 @@
 import streamlit as st
 import boto3
 import time
-import json
 import os
+import sys
 import pandas as pd
 from dotenv import load_dotenv
 
+# Shared helpers live in backend/shared (a Lambda layer in AWS)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "shared", "python"))
+from visionquest.warm_cache import load_json
+
 # --- CONFIGURATION ---
 load_dotenv()
 BUCKET_NAME = "visionquest-kb-tarig-001"
@@ -26,11 +30,8 @@ current_dir = os.getcwd()
 
 # --- ASSETS LOADER ---
 def load_text(lang_code):
-    try:
-        with open(f"assets/{lang_code}.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-    except:
-        return {} # Fallback
+    # Parsed once and kept across reruns; re-read when the file changes on disk
+    return load_json(f"assets/{lang_code}.json", default={})
 
 # --- SESSION STATE (Memory) ---
 if "messages" not in st.session_state:
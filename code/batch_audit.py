@@ -0,0 +1,205 @@
+"""
+Batch invoice auditing (month-end folders of hundreds of invoices).
+
+Files are rasterized in parallel (the rasterizer's process pool) and
+audited with concurrent vision calls. Every Bedrock call passes through a
+shared token bucket that backs off when the model throttles; throttled or
+timed-out invoices are retried with jittered exponential backoff.
+Clear-cut invoices are settled by the local ZATCA pre-check without a
+model call. Verdicts are yielded as soon as each invoice finishes.
+
+    python code/batch_audit.py invoices/ --concurrency 8 --rps 2 --out verdicts.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "shared", "python"))
+from visionquest.ratelimit import TokenBucket, backoff_delay, is_retryable_error, is_throttle_error
+from visionquest.zatca import AMBIGUOUS, format_report
+import inspector
+
+# --- CONFIGURATION ---
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+VISION_RPS = float(os.environ.get("VISION_RPS", "2"))     # Bedrock converse requests/second for the account
+VISION_BURST = float(os.environ.get("VISION_BURST", "4"))
+MAX_RETRIES = int(os.environ.get("BATCH_MAX_RETRIES", "5"))
+SUPPORTED_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".webp")
+
+COMPLIANT_MARKERS = ("✅ COMPLIANT", "COMPLIANT", "متوافق")
+VIOLATION_MARKERS = ("❌ VIOLATION", "VIOLATION", "NON-COMPLIANT", "مخالف", "غير متوافق")
+
+
+class RateLimitedClient:
+    """Wraps a bedrock-runtime client: converse() waits for the bucket and reports throttles."""
+
+    def __init__(self, client, bucket):
+        self.client = client
+        self.bucket = bucket
+
+    def converse(self, **kwargs):
+        self.bucket.acquire()
+        try:
+            response = self.client.converse(**kwargs)
+        except Exception as e:
+            if is_throttle_error(e):
+                self.bucket.throttled()
+            raise
+        self.bucket.succeeded()
+        return response
+
+
+def parse_verdict(report):
+    """COMPLIANT / VIOLATION / UNCLEAR from the model's report (it is asked to lead with one)."""
+    head = (report or "").strip()[:200].upper()
+
+    def first(markers):
+        found = [head.find(m.upper()) for m in markers if m.upper() in head]
+        return min(found) if found else None
+
+    violation, compliant = first(VIOLATION_MARKERS), first(COMPLIANT_MARKERS)
+    if violation is None and compliant is None:
+        return "UNCLEAR"
+    if compliant is None or (violation is not None and violation <= compliant):
+        return "VIOLATION"
+    return "COMPLIANT"
+
+
+def iter_folder(folder):
+    """(name, path) for every supported file in a folder, sorted by name."""
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith(SUPPORTED_EXTENSIONS):
+            yield name, os.path.join(folder, name)
+
+
+class BatchAuditor:
+    def __init__(self, client=None, concurrency=BATCH_CONCURRENCY, requests_per_second=VISION_RPS,
+                 burst=VISION_BURST, max_retries=MAX_RETRIES, rasterizer=None, sleep=time.sleep):
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.client = RateLimitedClient(client or inspector.bedrock_runtime, self.bucket)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.rasterizer = rasterizer
+        self.sleep = sleep
+        self.summary = {}
+
+    def _load(self, source):
+        """source: bytes or a file path."""
+        if isinstance(source, (bytes, bytearray)):
+            return bytes(source)
+        with open(source, "rb") as f:
+            return f.read()
+
+    def audit_one(self, name, source, language="English"):
+        started = time.perf_counter()
+        verdict = {"file": name, "status": "ERROR", "report": None, "pages": 0,
+                   "model": None, "attempts": 0, "latency_ms": None, "error": None}
+        try:
+            data = self._load(source)
+            is_pdf = data[:5] == b"%PDF-"
+
+            # Clear-cut invoices never reach the model. Digital PDFs are
+            # checked from the text layer before anything is rendered.
+            text_layer, embedded = inspector.read_pdf_layers(data) if is_pdf else ("", [])
+            check = inspector.precheck_invoice([], text_layer, embedded) if is_pdf else None
+            if check is None or check["status"] == AMBIGUOUS:
+                pages = inspector.file_to_pages(data, is_pdf, self.rasterizer)
+                verdict["pages"] = len(pages)
+                check = inspector.precheck_invoice(pages, text_layer, embedded)
+            if check["status"] != AMBIGUOUS:
+                verdict.update(status=check["status"], report=format_report(check, language), model="precheck")
+                return self._finish(verdict, started)
+
+            for attempt in range(self.max_retries + 1):
+                verdict["attempts"] = attempt + 1
+                try:
+                    report, model = inspector.audit_pages(pages, language, client=self.client)
+                    verdict.update(status=parse_verdict(report), report=report, model=model.name)
+                    break
+                except Exception as e:
+                    if not is_retryable_error(e) or attempt == self.max_retries:
+                        raise
+                    self.sleep(backoff_delay(attempt))
+        except Exception as e:
+            verdict["error"] = f"{type(e).__name__}: {e}"
+        return self._finish(verdict, started)
+
+    def _finish(self, verdict, started):
+        verdict["latency_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        return verdict
+
+    def audit(self, files, language="English"):
+        """
+        files: iterable of (name, bytes or path).
+        Yields one verdict dict per invoice in completion order;
+        self.summary holds the aggregate once the generator is exhausted.
+        """
+        started = time.perf_counter()
+        counts = {"COMPLIANT": 0, "VIOLATION": 0, "UNCLEAR": 0, "ERROR": 0}
+        retries = 0
+        prechecked = 0
+        files = iter(files)
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            # Keep a bounded window in flight so a 300-file folder isn't all in memory at once
+            while True:
+                while len(in_flight) < self.concurrency * 2:
+                    item = next(files, None)
+                    if item is None:
+                        break
+                    in_flight.add(pool.submit(self.audit_one, item[0], item[1], language))
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    verdict = future.result()
+                    counts[verdict["status"]] += 1
+                    retries += max(0, verdict["attempts"] - 1)
+                    prechecked += verdict["model"] == "precheck"
+                    yield verdict
+
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        self.summary = {
+            "invoices": total,
+            "compliant": counts["COMPLIANT"],
+            "violation": counts["VIOLATION"],
+            "unclear": counts["UNCLEAR"],
+            "errors": counts["ERROR"],
+            "prechecked": prechecked,
+            "retries": retries,
+            "throttles": self.bucket.throttles,
+            "seconds": round(elapsed, 2),
+            "invoices_per_min": round(total / elapsed * 60.0, 1) if elapsed else None
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder")
+    parser.add_argument("--language", default="English")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--rps", type=float, default=VISION_RPS)
+    parser.add_argument("--out", help="Append verdicts to this JSONL file")
+    args = parser.parse_args()
+
+    auditor = BatchAuditor(concurrency=args.concurrency, requests_per_second=args.rps)
+    out = open(args.out, "a", encoding="utf-8") if args.out else None
+    try:
+        for verdict in auditor.audit(iter_folder(args.folder), args.language):
+            icon = {"COMPLIANT": "✅", "VIOLATION": "❌"}.get(verdict["status"], "⚠️")
+            print(f"{icon} {verdict['file']}: {verdict['status']} ({verdict['latency_ms']} ms, {verdict['attempts']} attempt(s))")
+            if out:
+                out.write(json.dumps(verdict, ensure_ascii=False) + "\n")
+                out.flush()
+    finally:
+        if out:
+            out.close()
+    print(f"📊 {json.dumps(auditor.summary)}")
+
+
+if __name__ == "__main__":
+    main()
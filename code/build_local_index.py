@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+
+import boto3
+import fitz  # PyMuPDF
+
+# Shared helpers live in backend/shared (a Lambda layer in AWS)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "shared", "python"))
+from visionquest.text import chunk_text
+from visionquest.vector_index import TitanEmbedder, HashingEmbedder, build_index
+
+# --- CONFIGURATION ---
+REGION = "us-east-1"
+DEFAULT_OUT_DIR = "local_index"
+
+
+def read_document(s3, bucket, key):
+    """Returns the plain text of one corpus object (.txt/.md/.pdf)."""
+    body = s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+    if key.lower().endswith('.pdf'):
+        with fitz.open(stream=body, filetype="pdf") as pdf:
+            return "\n".join(page.get_text() for page in pdf)
+    return body.decode('utf-8', errors='ignore')
+
+
+def load_corpus(bucket, prefix=""):
+    """
+    Pulls the same S3 corpus the Knowledge Base syncs from and chunks it.
+    Returns a list of {'text', 'uri'}.
+    """
+    s3 = boto3.client('s3', region_name=REGION)
+    chunks = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            key = obj['Key']
+            if not key.lower().endswith(('.txt', '.md', '.pdf')):
+                continue
+            print(f"📄 {key}")
+            uri = f"s3://{bucket}/{key}"
+            for text in chunk_text(read_document(s3, bucket, key)):
+                chunks.append({"text": text, "uri": uri})
+    return chunks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the local vector index from the KB corpus bucket.")
+    parser.add_argument("bucket", help="e.g. visionquest-kb-clean-<project_id>")
+    parser.add_argument("--prefix", default="")
+    parser.add_argument("--out", default=DEFAULT_OUT_DIR)
+    parser.add_argument("--ivf-lists", type=int, default=0, help="> 0 enables IVF (e.g. 2*sqrt(chunks))")
+    parser.add_argument("--quantize", action="store_true", help="Store int8 vectors (4x smaller)")
+    parser.add_argument("--offline", action="store_true", help="Hashing embedder instead of Titan (no Bedrock)")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.bucket, args.prefix)
+    print(f"🧩 {len(corpus)} chunks. Embedding...")
+    if args.offline:
+        embedder = HashingEmbedder()
+    else:
+        embedder = TitanEmbedder(boto3.client("bedrock-runtime", region_name=REGION))
+    vectors = embedder.embed([c["text"] for c in corpus])
+
+    embedder_name = "hashing" if args.offline else "titan"
+    build_index(corpus, vectors, args.out, ivf_lists=args.ivf_lists, quantize=args.quantize, embedder=embedder_name)
+    print(f"✅ Index written to {args.out}/ (embedder: {embedder_name})")
@@ -1,45 +1,104 @@
 import boto3
 import fitz  # PyMuPDF
 import io
+import os
+import sys
+
+# Shared helpers live in backend/shared (a Lambda layer in AWS)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "shared", "python"))
+from visionquest.context import estimate_tokens
+from visionquest.model_router import ModelRouter, llama_catalog, load_catalog
+from visionquest.zatca import AMBIGUOUS, decode_qr_images, format_report, precheck
+from rasterizer import RenderedPage, default_rasterizer, render_image
 
 # --- CONFIGURATION ---
-VISION_MODEL_ID = "us.meta.llama3-2-11b-instruct-v1:0"
+# Vision model (Llama 3.2 11B, or 90B when the SLO allows) is picked by the Model Router
+LATENCY_SLO_MS = int(os.environ.get("LATENCY_SLO_MS", "6000"))
+IMAGE_TOKENS = 1600  # Rough prompt cost of one invoice page image
+MAX_QR_CANDIDATE_IMAGES = 10  # Embedded PDF images tried for the QR code
 REGION = "us-east-1"
 
 # Setup Client
 bedrock_runtime = boto3.client("bedrock-runtime", region_name=REGION)
+model_router = ModelRouter(load_catalog(llama_catalog()))
 
 def process_file(uploaded_file):
     """
     Takes a Streamlit UploadedFile (PDF or Image).
-    Returns: Bytes of the image (PNG) ready for the AI.
+    Returns: list of RenderedPage (page_index, data, image_format, width, height)
+    sized for the vision model. PDFs get their first pages plus the last one.
     """
-    file_content = uploaded_file.getvalue()
-    
-    # 1. If it's a PDF, convert first page to Image
-    if uploaded_file.type == "application/pdf":
-        try:
-            print("📄 Processing PDF...")
-            pdf_document = fitz.open(stream=file_content, filetype="pdf")
-            page = pdf_document.load_page(0)  # Get first page
-            pix = page.get_pixmap()
-            return pix.tobytes("png")
-        except Exception as e:
-            print(f"❌ PDF Error: {e}")
-            return None
+    try:
+        return file_to_pages(uploaded_file.getvalue(), uploaded_file.type == "application/pdf")
+    except Exception as e:
+        print(f"❌ PDF Error: {e}")
+        return None
+
+def file_to_pages(file_content, is_pdf, rasterizer=None):
+    """Raw upload bytes -> RenderedPage list. Raises if a PDF can't be rendered."""
+    # 1. If it's a PDF, rasterize the selected pages (process pool + render cache)
+    if is_pdf:
+        print("📄 Processing PDF...")
+        pages = (rasterizer or default_rasterizer).render(file_content)
+        print(f"🖼️ Rendered {len(pages)} page(s): {sum(len(p.data) for p in pages) // 1024} KB")
+        return pages
             
-    # 2. If it's already an image, just return bytes
-    return file_content
+    # 2. If it's already an image, downscale/recompress it to the same budget
+    try:
+        return [render_image(file_content)]
+    except Exception as e:
+        print(f"⚠️ Image resize failed ({e}), sending original")
+        return [RenderedPage(0, file_content, image_format(file_content), None, None)]
 
-def analyze_invoice(image_bytes, language="English"):
+def read_pdf_layers(file_content, max_images=MAX_QR_CANDIDATE_IMAGES):
     """
-    Sends the image to Llama 3.2 Vision for auditing.
+    Text layer of every page plus the embedded images (where the QR code
+    lives) at native resolution. Cheap compared to rendering.
+    Returns (text, [image bytes]).
     """
-    print("🕵️‍♂️ Sending to Vision Model...")
-    
+    texts = []
+    images = []
+    with fitz.open(stream=file_content, filetype="pdf") as doc:
+        for page in doc:
+            texts.append(page.get_text("text"))
+            for image in page.get_images(full=True):
+                if len(images) < max_images:
+                    images.append(doc.extract_image(image[0])["image"])
+    return "\n".join(texts), images
+
+def precheck_invoice(pages, text_layer="", embedded_images=None):
+    """
+    Deterministic ZATCA checks (QR TLV, VAT number, totals) before the model.
+    QR codes are read from embedded images first, then from the rendered pages.
+    """
+    payloads = decode_qr_images(embedded_images or [])
+    if not payloads:
+        from_pages = decode_qr_images([p.data for p in pages])
+        payloads = from_pages if from_pages is not None else payloads
+    return precheck(text_layer or "", payloads)
+
+def image_format(data):
+    """Bedrock image block format from the file signature."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[:3] == b"GIF":
+        return "gif"
+    return "png"
+
+def audit_pages(pages, language="English", client=None):
+    """
+    One routed vision call for an invoice (list of RenderedPage).
+    Raises on failure; returns (report, model).
+    """
+    client = client or bedrock_runtime
     prompt_text = f"""
     Role: You are a strict ZATCA Tax Auditor.
-    Task: Check this invoice image for compliance violations.
+    Task: Check this invoice for compliance violations. The images are its pages in order;
+    the QR code and totals may be on any page.
     
     Checklist:
     1. Is there a QR Code? (Critical)
@@ -54,18 +113,52 @@ def analyze_invoice(image_bytes, language="English"):
         {
             "role": "user",
             "content": [
-                {"image": {"format": "png", "source": {"bytes": image_bytes}}},
-                {"text": prompt_text}
-            ]
+                {"image": {"format": page.image_format, "source": {"bytes": page.data}}}
+                for page in pages
+            ] + [{"text": prompt_text}]
         }
     ]
 
-    try:
-        response = bedrock_runtime.converse(
-            modelId=VISION_MODEL_ID,
+    def call_model(model):
+        response = client.converse(
+            modelId=model.model_id,
             messages=messages,
             inferenceConfig={"maxTokens": 1024, "temperature": 0.1}
         )
-        return response['output']['message']['content'][0]['text']
+        usage = response.get('usage', {})
+        return response['output']['message']['content'][0]['text'], {
+            "input_tokens": usage.get('inputTokens'),
+            "output_tokens": usage.get('outputTokens')
+        }
+
+    candidates = model_router.route(
+        modality="image",
+        input_tokens=IMAGE_TOKENS * len(pages) + estimate_tokens(prompt_text),
+        question_class="audit",
+        latency_slo_ms=LATENCY_SLO_MS,
+        output_tokens=1024
+    )
+    return model_router.invoke(candidates, call_model)
+
+def analyze_invoice(pages, language="English", text_layer=None, embedded_images=None):
+    """
+    Sends the invoice page images to Llama 3.2 Vision for auditing.
+    `pages` is the list from process_file() (raw image bytes also accepted).
+    `text_layer` / `embedded_images` (see read_pdf_layers) enable the local
+    pre-check: clear-cut invoices are answered without calling the model.
+    """
+    if isinstance(pages, (bytes, bytearray)):
+        pages = [RenderedPage(0, bytes(pages), image_format(pages), None, None)]
+
+    check = precheck_invoice(pages, text_layer, embedded_images)
+    if check["status"] != AMBIGUOUS:
+        print(f"⚡ Pre-check verdict: {check['status']} (vision model skipped)")
+        return format_report(check, language)
+    print(f"🕵️‍♂️ Sending {len(pages)} page(s) to Vision Model...")
+
+    try:
+        report, model = audit_pages(pages, language)
+        print(f"🤖 Audited by {model.name}")
+        return report
     except Exception as e:
-        return f"❌ Vision API Error: {str(e)}"
\ No newline at end of file
+        return f"❌ Vision API Error: {str(e)}"
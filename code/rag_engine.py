@@ -1,17 +1,73 @@
 import boto3
 import json
+import os
+import sys
+
+# Shared helpers live in backend/shared (a Lambda layer in AWS)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "shared", "python"))
+from visionquest.retrieval_cache import RetrievalCache, ingestion_version_fn
+from visionquest.retrievers import BedrockKBRetriever, LocalIndexRetriever
+from visionquest.lexical import BM25Index, BM25Retriever
+from visionquest.hybrid import HybridRetriever
+from visionquest.context import assemble_context, estimate_tokens
+from visionquest.model_router import ModelRouter, classify_question, llama_catalog, load_catalog
+from visionquest.zatca import AMBIGUOUS, decode_qr_images, format_report, precheck
 
 # --- CONFIGURATION ---
 KB_ID = "ND3AZR5QZN" 
-# Text Model (Llama 3 8B) - Fast & Cheap for chat
-TEXT_MODEL_ID = "meta.llama3-8b-instruct-v1:0"
-# Vision Model (Llama 3.2 11B) - Smart & Multimodal for images
-VISION_MODEL_ID = "meta.llama3-2-11b-instruct-v1:0" 
+# Models are picked per request by the Model Router:
+#   Text:   Llama 3 8B (fast & cheap for chat)  -> Llama 3 70B (audits, long context)
+#   Vision: Llama 3.2 11B (multimodal)          -> Llama 3.2 90B
+# Override the catalog with MODEL_CATALOG (JSON), see visionquest/model_router.py
+LATENCY_SLO_MS = int(os.environ.get("LATENCY_SLO_MS", "6000"))
+IMAGE_TOKENS = 1600  # Rough prompt cost of one invoice image
 REGION = "us-east-1"
+# Retrieval cache: repeated questions skip the vector search round trip
+RETRIEVAL_CACHE_TTL = 900  # seconds
+# Data source of KB_ID. When set, the cache is cleared after every KB re-sync.
+KB_DATA_SOURCE_ID = os.environ.get("KB_DATA_SOURCE_ID")
+# Retriever backend: "bedrock" (managed KB), "local" (in-process vector index,
+# built with build_local_index.py from the same S3 corpus) or "hybrid"
+# (BM25 over the local corpus + HYBRID_VECTOR_BACKEND, fused and reranked)
+RETRIEVER_BACKEND = os.environ.get("RETRIEVER_BACKEND", "bedrock")
+HYBRID_VECTOR_BACKEND = os.environ.get("HYBRID_VECTOR_BACKEND", "bedrock")
+NUMBER_OF_RESULTS = 3  # Chunks that go into the prompt
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "1500"))
+LOCAL_INDEX_PATH = os.environ.get("LOCAL_INDEX_PATH", "local_index")
 
 # 1. Setup Clients
 bedrock_agent_runtime = boto3.client("bedrock-agent-runtime", region_name=REGION)
 bedrock_runtime = boto3.client("bedrock-runtime", region_name=REGION)
+model_router = ModelRouter(load_catalog(llama_catalog()))
+
+# 2. Retrieval Cache (survives Streamlit reruns / warm Lambdas)
+kb_version_fn = None
+if KB_DATA_SOURCE_ID:
+    bedrock_agent = boto3.client("bedrock-agent", region_name=REGION)
+    kb_version_fn = ingestion_version_fn(bedrock_agent, KB_DATA_SOURCE_ID)
+retrieval_cache = RetrievalCache(ttl_seconds=RETRIEVAL_CACHE_TTL, version_fn=kb_version_fn)
+
+# 3. Retriever (built once, on first question)
+_retriever = None
+
+def build_vector_retriever(backend):
+    if backend == "local":
+        # numpy is only needed for the local backend
+        from visionquest.vector_index import LocalVectorIndex, make_embedder
+        index = LocalVectorIndex.load(LOCAL_INDEX_PATH)
+        embedder = make_embedder(index.embedder, bedrock_runtime, dim=index.vectors.shape[1])
+        return LocalIndexRetriever(index, embedder, cache=retrieval_cache)
+    return BedrockKBRetriever(bedrock_agent_runtime, KB_ID, cache=retrieval_cache)
+
+def get_retriever():
+    global _retriever
+    if _retriever is None:
+        if RETRIEVER_BACKEND == "hybrid":
+            lexical = BM25Retriever(BM25Index.from_index_dir(LOCAL_INDEX_PATH))
+            _retriever = HybridRetriever(build_vector_retriever(HYBRID_VECTOR_BACKEND), lexical)
+        else:
+            _retriever = build_vector_retriever(RETRIEVER_BACKEND)
+    return _retriever
 
 def retrieve_from_kb(query):
     """
@@ -19,14 +75,7 @@ def retrieve_from_kb(query):
     """
     print(f"🔎 Scanning Knowledge Base for: '{query}'...")
     try:
-        response = bedrock_agent_runtime.retrieve(
-            knowledgeBaseId=KB_ID,
-            retrievalQuery={'text': query},
-            retrievalConfiguration={
-                'vectorSearchConfiguration': {'numberOfResults': 3}
-            }
-        )
-        return response.get('retrievalResults', [])
+        return get_retriever().retrieve(query, k=NUMBER_OF_RESULTS)
     except Exception as e:
         print(f"❌ Retrieval Error: {str(e)}")
         return []
@@ -35,14 +84,25 @@ def generate_answer(query, retrieved_docs, language="English"):
     """
     Step 2: Send Text Context to Llama 3 (Text Model).
     """
+    answer, _ = generate_answer_with_citations(query, retrieved_docs, language)
+    return answer
+
+def generate_answer_with_citations(query, retrieved_docs, language="English"):
+    """
+    Same as generate_answer, but also returns the citations ([n] -> source)
+    of the chunks that actually made it into the prompt.
+    """
     if not retrieved_docs:
-        return "Sorry, I couldn't find any documents to answer that."
+        return "Sorry, I couldn't find any documents to answer that.", []
 
-    context_text = ""
-    for doc in retrieved_docs:
-        context_text += f"{doc['content']['text']}\n"
+    # Dedupe overlapping chunks, best first, within the token budget
+    context = assemble_context(retrieved_docs, token_budget=CONTEXT_TOKEN_BUDGET)
+    context_text = context['text']
+    print(f"🧩 Context: {context['tokens']} tokens (from {context['input_tokens']}), "
+          f"{context['dropped_duplicates']} duplicates dropped")
 
-    system_instruction = f"You are an expert on Saudi ZATCA regulations. Answer in {language}."
+    system_instruction = (f"You are an expert on Saudi ZATCA regulations. Answer in {language}. "
+                          "Cite the context passages you use as [n].")
     
     formatted_prompt = f"""<|begin_of_text|><|start_header_id|>system<|end_header_id|>
 {system_instruction}
@@ -58,17 +118,39 @@ Question: {query}
         "top_p": 0.9
     })
 
-    try:
-        response = bedrock_runtime.invoke_model(modelId=TEXT_MODEL_ID, body=body)
+    def call_model(model):
+        response = bedrock_runtime.invoke_model(modelId=model.model_id, body=body)
         response_body = json.loads(response.get("body").read())
-        return response_body['generation']
+        usage = {
+            "input_tokens": response_body.get("prompt_token_count"),
+            "output_tokens": response_body.get("generation_token_count")
+        }
+        return response_body['generation'], usage
+
+    try:
+        candidates = model_router.route(
+            modality="text",
+            input_tokens=estimate_tokens(formatted_prompt),
+            question_class=classify_question(query),
+            latency_slo_ms=LATENCY_SLO_MS
+        )
+        answer, model = model_router.invoke(candidates, call_model)
+        print(f"🤖 Answered by {model.name}")
+        return answer, context['citations']
     except Exception as e:
-        return f"❌ Text Generation Error: {str(e)}"
+        return f"❌ Text Generation Error: {str(e)}", []
 
-def analyze_invoice_image(image_bytes, language="English"):
+def analyze_invoice_image(image_bytes, language="English", text_layer=None):
     """
     Step 3: The 'Inspector' - Sends Image to Llama 3.2 Vision.
+    A local ZATCA pre-check (QR TLV, VAT number, totals on `text_layer`)
+    answers clear-cut invoices without the model.
     """
+    check = precheck(text_layer or "", decode_qr_images([image_bytes]))
+    if check["status"] != AMBIGUOUS:
+        print(f"⚡ Pre-check verdict: {check['status']} (vision model skipped)")
+        return format_report(check, language)
+
     print("🕵️‍♂️ Inspecting Invoice Image...")
     
     # Prompt for the Vision Model
@@ -85,12 +167,26 @@ def analyze_invoice_image(image_bytes, language="English"):
         }
     ]
 
-    try:
+    def call_model(model):
         response = bedrock_runtime.converse(
-            modelId=VISION_MODEL_ID,
+            modelId=model.model_id,
             messages=messages,
             inferenceConfig={"maxTokens": 512, "temperature": 0.1}
         )
-        return response['output']['message']['content'][0]['text']
+        usage = response.get('usage', {})
+        return response['output']['message']['content'][0]['text'], {
+            "input_tokens": usage.get('inputTokens'),
+            "output_tokens": usage.get('outputTokens')
+        }
+
+    try:
+        candidates = model_router.route(
+            modality="image",
+            input_tokens=IMAGE_TOKENS + estimate_tokens(prompt_text),
+            question_class="audit",
+            latency_slo_ms=LATENCY_SLO_MS
+        )
+        answer, _ = model_router.invoke(candidates, call_model)
+        return answer
     except Exception as e:
         return f"❌ Vision Error: {str(e)}"
\ No newline at end of file
@@ -0,0 +1,211 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+try:
+    from PIL import Image  # Optional: palette PNG quantization (ships with Streamlit)
+except ImportError:
+    Image = None
+
+# --- CONFIGURATION ---
+# Llama 3.2 Vision works on tiles up to 1120 px; anything bigger is wasted upload.
+RENDER_DPI = 110          # A4 @ 110 dpi ~ 910 x 1290 px: totals and QR stay legible
+MAX_SIDE_PX = 1120
+PAGE_BYTE_BUDGET = 300_000
+MAX_PAGES = 4             # Per invoice: first pages + the last page (totals / QR)
+JPEG_QUALITIES = (85, 70, 55, 40)
+MIN_SIDE_PX = 480         # Stop shrinking below this (text becomes unreadable)
+RASTER_WORKERS = int(os.environ.get("RASTER_WORKERS", str(min(4, os.cpu_count() or 1))))
+RASTER_CACHE_DIR = os.environ.get("RASTER_CACHE_DIR")  # Optional on-disk cache
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+RenderedPage = namedtuple("RenderedPage", "page_index data image_format width height")
+
+
+def select_pages(page_count, pages=None, max_pages=MAX_PAGES):
+    """
+    Which pages to send to the vision model.
+    Explicit `pages` win; otherwise the first pages plus the last page,
+    because invoice totals and the QR code usually sit at the end.
+    """
+    if pages is not None:
+        return [p for p in pages if 0 <= p < page_count][:max_pages]
+    if page_count <= max_pages:
+        return list(range(page_count))
+    return list(range(max_pages - 1)) + [page_count - 1]
+
+
+def encode_to_budget(pix, byte_budget=PAGE_BYTE_BUDGET):
+    """
+    Smallest acceptable encoding of a pixmap:
+    PNG -> quantized PNG (Pillow) -> JPEG at falling quality -> shrink and retry.
+    Returns (data, image_format, width, height).
+    """
+    while True:
+        png = pix.tobytes("png")
+        if len(png) <= byte_budget:
+            return png, "png", pix.width, pix.height
+
+        if Image is not None:
+            quantized = quantize_png(pix)
+            if len(quantized) <= byte_budget:
+                return quantized, "png", pix.width, pix.height
+
+        jpeg = None
+        for quality in JPEG_QUALITIES:
+            jpeg = pix.tobytes("jpeg", jpg_quality=quality)
+            if len(jpeg) <= byte_budget:
+                return jpeg, "jpeg", pix.width, pix.height
+
+        if min(pix.width, pix.height) * 0.75 < MIN_SIDE_PX:
+            return jpeg, "jpeg", pix.width, pix.height  # Best effort
+        pix = fitz.Pixmap(pix, int(pix.width * 0.75), int(pix.height * 0.75), None)
+
+
+def quantize_png(pix):
+    import io
+    image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    buffer = io.BytesIO()
+    image.quantize(colors=64).save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def render_page(doc, page_index, dpi=RENDER_DPI, max_side=MAX_SIDE_PX, byte_budget=PAGE_BYTE_BUDGET):
+    page = doc.load_page(page_index)
+    zoom = dpi / 72.0
+    longest = max(page.rect.width, page.rect.height) * zoom
+    if longest > max_side:
+        zoom *= max_side / longest
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+    data, image_format, width, height = encode_to_budget(pix, byte_budget)
+    return RenderedPage(page_index, data, image_format, width, height)
+
+
+def render_pages_worker(pdf_bytes, page_indices, dpi, max_side, byte_budget):
+    """Process-pool entry point: opens the PDF once per batch of pages."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return [render_page(doc, i, dpi, max_side, byte_budget) for i in page_indices]
+
+
+def render_image(image_bytes, max_side=MAX_SIDE_PX, byte_budget=PAGE_BYTE_BUDGET):
+    """Downscale + recompress an uploaded photo/scan to the same budget."""
+    pix = fitz.Pixmap(image_bytes)
+    if pix.alpha or pix.colorspace is None or pix.colorspace.n != 3:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+        if pix.alpha:
+            pix = fitz.Pixmap(pix, 0)
+    longest = max(pix.width, pix.height)
+    if longest > max_side:
+        scale = max_side / float(longest)
+        pix = fitz.Pixmap(pix, int(pix.width * scale), int(pix.height * scale), None)
+    data, image_format, width, height = encode_to_budget(pix, byte_budget)
+    return RenderedPage(0, data, image_format, width, height)
+
+
+class Rasterizer:
+    """
+    Renders selected PDF pages in a process pool (PyMuPDF rendering is
+    CPU bound and holds the GIL) and caches renders by
+    (document hash, page, dpi, max side, byte budget).
+    """
+
+    def __init__(self, workers=RASTER_WORKERS, dpi=RENDER_DPI, max_side=MAX_SIDE_PX,
+                 byte_budget=PAGE_BYTE_BUDGET, cache_dir=RASTER_CACHE_DIR, cache_max_bytes=CACHE_MAX_BYTES):
+        self.workers = max(1, workers)
+        self.dpi = dpi
+        self.max_side = max_side
+        self.byte_budget = byte_budget
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_lock = threading.Lock()  # batch_audit renders from several threads
+
+    # --- cache ---
+    def cache_key(self, doc_hash, page_index):
+        return f"{doc_hash}-p{page_index}-d{self.dpi}-m{self.max_side}-b{self.byte_budget}"
+
+    def _cache_get(self, key):
+        with self._lock:
+            page = self._cache.get(key)
+            if page is not None:
+                self._cache.move_to_end(key)
+                return page
+        if self.cache_dir:
+            for image_format in ("png", "jpeg"):
+                path = os.path.join(self.cache_dir, f"{key}.{image_format}")
+                if os.path.exists(path):
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    page_index = int(key.split("-p")[1].split("-")[0])
+                    page = RenderedPage(page_index, data, image_format, None, None)
+                    self._cache_put(key, page, persist=False)
+                    return page
+        return None
+
+    def _cache_put(self, key, page, persist=True):
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = page
+                self._cache_bytes += len(page.data)
+            while self._cache_bytes > self.cache_max_bytes and self._cache:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted.data)
+        if persist and self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(os.path.join(self.cache_dir, f"{key}.{page.image_format}"), "wb") as f:
+                f.write(page.data)
+
+    # --- rendering ---
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def render(self, pdf_bytes, pages=None, max_pages=MAX_PAGES):
+        """Returns RenderedPage list (page order) for the selected pages."""
+        doc_hash = hashlib.sha256(pdf_bytes).hexdigest()[:32]
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            selected = select_pages(doc.page_count, pages, max_pages)
+
+        results = {}
+        missing = []
+        for page_index in selected:
+            cached = self._cache_get(self.cache_key(doc_hash, page_index))
+            if cached is not None:
+                results[page_index] = cached
+            else:
+                missing.append(page_index)
+
+        if missing:
+            if self.workers == 1 or len(missing) == 1:
+                rendered = render_pages_worker(pdf_bytes, missing, self.dpi, self.max_side, self.byte_budget)
+            else:
+                # One batch per worker: the PDF bytes are pickled once per batch, not per page
+                batches = [missing[i::self.workers] for i in range(self.workers) if missing[i::self.workers]]
+                futures = [self._executor().submit(render_pages_worker, pdf_bytes, batch,
+                                                   self.dpi, self.max_side, self.byte_budget)
+                           for batch in batches]
+                rendered = [page for future in futures for page in future.result()]
+            for page in rendered:
+                self._cache_put(self.cache_key(doc_hash, page.page_index), page)
+                results[page.page_index] = page
+
+        return [results[i] for i in selected]
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+# Module-level instance: the pool and cache survive Streamlit reruns
+default_rasterizer = Rasterizer()
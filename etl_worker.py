@@ -1,21 +1,30 @@
 import boto3
 import uuid
 import json
+import os
+import sys
 import urllib.parse
 from datetime import datetime
 
+# Shared helpers are copied into the image (Dockerfile); fall back to the repo copy locally
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend", "shared", "python"))
+from visionquest.logs import get_logger
+from visionquest.telemetry import Span
+
 # --- CONFIGURATION ---
 REGION = "us-east-1"
 DYNAMO_TABLE = "VisionQuest_Ingestion_Logs"
+TRANSLATE_PRICE_PER_CHAR = 0.000015  # USD, standard real-time translation
 
 # --- CLIENTS ---
 s3 = boto3.client("s3", region_name=REGION)
 translate = boto3.client("translate", region_name=REGION)
 dynamodb = boto3.resource("dynamodb", region_name=REGION)
 table = dynamodb.Table(DYNAMO_TABLE)
+log = get_logger("etl_worker")
 
 def log_status(file_id, filename, status, details=None):
-    print(f"📝 [LOG] {filename}: {status}")
+    log.info("📝 %s: %s", filename, status, file_id=file_id)
     try:
         table.put_item(
             Item={
@@ -27,7 +36,7 @@ def log_status(file_id, filename, status, details=None):
             }
         )
     except Exception as e:
-        print(f"⚠️ DynamoDB Error: {e}")
+        log.warning("⚠️ DynamoDB Error: %s", e)
 
 def process_file(bucket, key):
     """
@@ -36,12 +45,18 @@ def process_file(bucket, key):
     filename = key.split('/')[-1]
     file_id = str(uuid.uuid4())
     log_status(file_id, filename, "STARTED")
+    # Pipeline uploads live under user/chat/job_id/...; correlate on the job when there is one
+    parts = key.split('/')
+    span = Span("etl_worker", parts[2] if len(parts) > 2 else file_id, file_id=file_id).start()
 
     try:
         # 1. EXTRACT
-        print(f"⬇️ Downloading {key}...")
-        response = s3.get_object(Bucket=bucket, Key=key)
-        raw_text = response['Body'].read().decode('utf-8')
+        log.info("⬇️ Downloading %s...", key)
+        with span.phase("s3_read"):
+            response = s3.get_object(Bucket=bucket, Key=key)
+            raw_bytes = response['Body'].read()
+        raw_text = raw_bytes.decode('utf-8')
+        span.add(file_bytes=len(raw_bytes), text_chars=len(raw_text))
 
         # 2. TRANSFORM
         # Check first 100 chars for Arabic
@@ -49,40 +64,48 @@ def process_file(bucket, key):
         
         if is_arabic:
             source, target = "ar", "en"
-            print("🌍 Detected Arabic -> Translating to English")
+            log.info("🌍 Detected Arabic -> Translating to English")
         else:
             source, target = "en", "ar"
-            print("🌍 Detected English -> Translating to Arabic")
+            log.info("🌍 Detected English -> Translating to Arabic")
 
         # Call AWS Translate
-        result = translate.translate_text(
-            Text=raw_text[:5000], # Limit for demo
-            SourceLanguageCode=source,
-            TargetLanguageCode=target
-        )
+        with span.phase("translate"):
+            result = translate.translate_text(
+                Text=raw_text[:5000], # Limit for demo
+                SourceLanguageCode=source,
+                TargetLanguageCode=target
+            )
         translated_text = result.get('TranslatedText')
+        span.tag(source=source, target=target)
+        span.add(translated_chars=len(translated_text),
+                 cost_usd=len(raw_text[:5000]) * TRANSLATE_PRICE_PER_CHAR)
 
         # 3. LOAD
         new_key = f"processed/{target}/{filename}"
-        s3.put_object(
-            Bucket=bucket,
-            Key=new_key,
-            Body=translated_text.encode('utf-8')
-        )
+        with span.phase("s3_write"):
+            s3.put_object(
+                Bucket=bucket,
+                Key=new_key,
+                Body=translated_text.encode('utf-8')
+            )
         
-        log_status(file_id, filename, "COMPLETED", f"Translated {source}->{target}")
+        timing = span.finish()
+        log_status(file_id, filename, "COMPLETED", f"Translated {source}->{target} in {timing['ms']} ms")
         return True
 
     except Exception as e:
+        span.finish(type(e).__name__)
         log_status(file_id, filename, "FAILED", str(e))
-        print(f"❌ Error: {e}")
+        log.error("❌ Error: %s", e)
         raise e # Raise so SQS knows to retry
 
 def handler(event, context):
     """
     THE LISTENER: Unwraps SQS messages and triggers processing.
     """
-    print("⚡ Lambda Handler Triggered")
+    log.begin(event, context)
+    log.info("⚡ Lambda Handler Triggered", records=len(event.get('Records', [])))
     
     # Loop through SQS Messages
     for record in event['Records']:
@@ -97,11 +120,11 @@ def handler(event, context):
                     # Decode URL (e.g., 'file%20name.txt' -> 'file name.txt')
                     key = urllib.parse.unquote_plus(s3_record['s3']['object']['key'])
                     
-                    print(f"📨 Processing Event for: {key}")
+                    log.info("📨 Processing Event for: %s", key)
                     process_file(bucket, key)
             else:
-                print("⚠️ No S3 records found in SQS message (Test Event?)")
+                log.warning("⚠️ No S3 records found in SQS message (Test Event?)")
                 
         except Exception as e:
-            print(f"💥 Handler Error: {e}")
+            log.error("💥 Handler Error: %s", e)
             raise e # Triggers DLQ Logic
\ No newline at end of file
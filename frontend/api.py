@@ -1,24 +1,51 @@
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+
+# --- CONFIGURATION ---
+POOL_SIZE = 10          # Keep-alive connections per host, shared by every session of this server
+CACHE_TTL_SECONDS = 300  # Chat list / history: also cleared explicitly when a job is submitted or finishes
+HISTORY_PAGE_SIZE = 10   # Jobs (question + answer) per history page
 
 def clean_url(base_url, endpoint):
     """Prevents double slashes in URL."""
     return f"{base_url.rstrip('/')}/{endpoint.lstrip('/')}"
 
+@st.cache_resource
+def get_session():
+    """
+    One pooled HTTP session per Streamlit server process. Reruns reuse its
+    keep-alive connections instead of paying a new TCP + TLS handshake per call.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def post(base_url, endpoint, payload, timeout):
+    return get_session().post(clean_url(base_url, endpoint), json=payload, timeout=timeout)
+
 def submit_job(base_url, payload):
-    url = clean_url(base_url, "ingest")
     try:
         # 60s Timeout for large files/cold starts
-        response = requests.post(url, json=payload, timeout=60)
-        
+        response = post(base_url, "ingest", payload, timeout=60)
+
         if response.status_code == 413:
             st.error("❌ File too large. AWS Lambda limit is 6MB (approx 4MB PDF).")
             return None
-            
+
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After", "a few")
+            st.warning(f"🚦 Too many uploads. Please try again in {retry_after} seconds.")
+            return None
+
         if response.status_code != 200:
             st.error(f"Server Error ({response.status_code}): {response.text}")
             return None
-            
+
+        # The chat list changes with the first job of a chat
+        fetch_user_chats.clear(base_url, payload.get('user_id'))
         return response.json().get('job_id')
 
     except Exception as e:
@@ -26,9 +53,8 @@ def submit_job(base_url, payload):
         return None
 
 def check_status(base_url, job_id):
-    url = clean_url(base_url, "status")
     try:
-        response = requests.post(url, json={'job_id': job_id}, timeout=10)
+        response = post(base_url, "status", {'job_id': job_id}, timeout=10)
         if response.status_code == 200:
             return response.json()
         else:
@@ -36,13 +62,36 @@ def check_status(base_url, job_id):
     except Exception as e:
         return {"status": "ERROR", "error_msg": str(e)}
 
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def fetch_user_chats(base_url, user_id):
+    """Chat list, newest first. Cached per user across reruns; errors raise (and are not cached)."""
+    response = post(base_url, "history", {'user_id': user_id, 'action': 'list_chats'}, timeout=5)
+    response.raise_for_status()
+    return sorted(response.json(), key=lambda c: c.get('updated_at', 0), reverse=True)
+
 def get_user_chats(base_url, user_id):
     """Fetches chat history."""
-    url = clean_url(base_url, "history")
     try:
-        response = requests.post(url, json={'user_id': user_id}, timeout=5)
-        if response.status_code == 200:
-            return response.json().get('chats', [])
+        return fetch_user_chats(base_url, user_id)
+    except Exception as e:
+        print(f"History Error: {e}")
         return []
-    except:
-        return []
\ No newline at end of file
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def get_chat_page(base_url, user_id, chat_id, before=None, limit=HISTORY_PAGE_SIZE):
+    """
+    One page of a chat's jobs (oldest first within the page), newest page
+    first: {"messages": [...], "before": cursor of the older page or None}.
+    Cached per page across reruns.
+    """
+    payload = {'user_id': user_id, 'chat_id': chat_id, 'limit': limit}
+    if before:
+        payload['before'] = before
+    response = post(base_url, "history", payload, timeout=10)
+    response.raise_for_status()  # Not cached: the next click retries
+    return response.json()
+
+def invalidate_chat(base_url, user_id, chat_id):
+    """A job in this chat finished: its newest page (and the chat list order) changed."""
+    get_chat_page.clear(base_url, user_id, chat_id, before=None)  # Same arguments as load_chat_page passes
+    fetch_user_chats.clear(base_url, user_id)
@@ -1,13 +1,13 @@
 import streamlit as st
-import time
 import base64
+import os
 import uuid
 # from streamlit_mic_recorder import mic_recorder # Uncomment if you installed this
-import requests
 
 # --- MODULE IMPORTS ---
 import auth
 import api
+import preprocess
 
 # --- PAGE CONFIG ---
 st.set_page_config(page_title="VisionQuest SaaS", page_icon="💎", layout="wide")
@@ -15,11 +15,43 @@ st.set_page_config(page_title="VisionQuest SaaS", page_icon="💎", layout="wide
 # ==============================================================================
 # 🚨 HARDCODED CONFIGURATION (The "Ease Our Life" Section)
 # ==============================================================================
-API_URL = "https://r79hipbsdc.execute-api.us-east-1.amazonaws.com"
+API_URL = os.environ.get("VISIONQUEST_API_URL", "https://r79hipbsdc.execute-api.us-east-1.amazonaws.com")
 COGNITO_CLIENT_ID = "5cqcsg20lv1i8nivk7im1am7q7"
 AWS_REGION = "us-east-1"
+POLL_SECONDS = 2        # Status checks of a running job (in a fragment: the page stays usable)
+POLL_MAX_CHECKS = 40    # Give up after ~80 seconds
+RENDER_WINDOW = 20      # Messages rendered per rerun; "Load older" adds another window
 # ==============================================================================
 
+# Same file picked again (another question, a rerun) -> no second recompression
+prepare_upload = st.cache_data(max_entries=8, show_spinner=False)(preprocess.prepare_upload)
+
+def to_messages(jobs):
+    """History jobs -> chat messages: the question, then the answer if the job succeeded."""
+    messages = []
+    for item in jobs:
+        messages.append({"role": "user", "content": item.get('user_prompt', '📝 Previous Query')})
+        if item.get('status') == 'SUCCESS':
+            messages.append({
+                "role": "assistant", 
+                "content": item.get('answer'),
+                "citations": item.get('citations'),
+                "id": item.get('job_id')
+            })
+    return messages
+
+def load_chat_page(chat_id, before=None):
+    """Prepends one history page (api.get_chat_page) to the messages. False if it failed."""
+    try:
+        page = api.get_chat_page(API_URL, st.session_state.user['email'], chat_id, before=before)
+    except Exception as e:
+        print(f"History Error: {e}")
+        return False
+    older = to_messages(page.get('messages', []))
+    st.session_state.messages = older + (st.session_state.messages if before else [])
+    st.session_state.older_cursor = page.get('before')
+    return True
+
 # --- SESSION STATE INITIALIZATION ---
 
 # 🚧 DEV MODE: Auto-Login as Developer
@@ -31,7 +63,9 @@ if "user" not in st.session_state:
 
 if "messages" not in st.session_state: st.session_state.messages = []
 if "current_chat_id" not in st.session_state: st.session_state.current_chat_id = str(uuid.uuid4())
-if "chat_list" not in st.session_state: st.session_state.chat_list = []
+if "pending_job" not in st.session_state: st.session_state.pending_job = None
+if "older_cursor" not in st.session_state: st.session_state.older_cursor = None  # More history on the server
+if "window" not in st.session_state: st.session_state.window = RENDER_WINDOW
 
 # ==============================================================================
 # 1. AUTHENTICATION VIEW (Skipped if User Exists)
@@ -63,50 +97,27 @@ else:
         if st.button("➕ New Chat", use_container_width=True):
             st.session_state.current_chat_id = str(uuid.uuid4())
             st.session_state.messages = []
+            st.session_state.older_cursor = None
+            st.session_state.window = RENDER_WINDOW
             st.rerun()
 
         st.divider()
         st.caption("📜 **History**")
         
-        # --- SAFE HISTORY LOADER ---
-        # We wrap this in try/except so the app doesn't crash if api.py is out of sync
-        if not st.session_state.chat_list:
-            try:
-                if hasattr(api, 'get_user_chats'):
-                    st.session_state.chat_list = api.get_user_chats(API_URL, st.session_state.user['email'])
-                else:
-                    st.warning("API update pending...")
-            except Exception as e:
-                print(f"History Error: {e}")
+        # --- HISTORY LOADER ---
+        # Cached per user (api.fetch_user_chats): a rerun costs no request until a new job clears it
+        chat_list = api.get_user_chats(API_URL, st.session_state.user['email'])
 
         # Display History Items
-        for chat in st.session_state.chat_list:
-            label = f"Chat {chat.get('chat_id', 'Unknown')[:8]}..."
+        for chat in chat_list:
+            label = chat.get('title') or f"Chat {chat.get('chat_id', 'Unknown')[:8]}..."
             if st.button(label, key=chat.get('chat_id')):
                 st.session_state.current_chat_id = chat['chat_id']
                 
-                # Fetch messages
-                try:
-                    # Note: We assume get_chat_history is implemented or we skip
-                    if hasattr(api, 'get_chat_history'):
-                        history = api.get_chat_history(API_URL, chat['chat_id'])
-                        
-                        reconstructed = []
-                        for item in history:
-                            # User Question
-                            reconstructed.append({"role": "user", "content": item.get('user_prompt', '📝 Previous Query')})
-                            
-                            # AI Answer (CHECKING FOR 'SUCCESS' NOW)
-                            if item.get('status') == 'SUCCESS':
-                                reconstructed.append({
-                                    "role": "assistant", 
-                                    "content": item.get('answer'),
-                                    "citations": item.get('citations')
-                                })
-                        st.session_state.messages = reconstructed
-                        st.rerun()
-                except:
-                    pass
+                # Fetch the newest page only; older pages load on demand
+                if load_chat_page(chat['chat_id']):
+                    st.session_state.window = RENDER_WINDOW
+                    st.rerun()
 
         st.divider()
         if st.button("Log Out"):
@@ -116,83 +127,114 @@ else:
     # --- MAIN CHAT AREA ---
     st.title("💎 VisionQuest AI")
 
-    # Render Messages
-    for msg in st.session_state.messages:
+    # Render Messages: the newest window only, so a rerun costs the same however long the chat is
+    messages = st.session_state.messages
+    hidden = max(0, len(messages) - st.session_state.window)
+    if hidden or st.session_state.older_cursor:
+        if st.button("⬆️ Load older messages", key="load_older"):
+            if hidden < RENDER_WINDOW and st.session_state.older_cursor:
+                load_chat_page(st.session_state.current_chat_id, before=st.session_state.older_cursor)
+            st.session_state.window += RENDER_WINDOW
+            st.rerun()
+
+    for index, msg in enumerate(messages[hidden:], start=hidden):
         with st.chat_message(msg["role"]):
             st.write(msg["content"])
             if msg.get("citations"):
-                with st.expander("📚 Sources"):
-                    st.json(msg["citations"])
+                # An expander would still build and send the JSON on every rerun
+                if st.toggle("📚 Sources", key=f"sources-{msg.get('id') or index}"):
+                    st.json(msg["citations"], expanded=False)
 
     # --- INPUTS ---
     prompt = st.chat_input("Ask VisionQuest...")
     
     # File Uploader
-    uploaded_file = st.file_uploader("Upload Document", type=['png', 'jpg', 'pdf'])
+    uploaded_file = st.file_uploader("Upload Document", type=['png', 'jpg', 'jpeg', 'pdf'])
     
     payload = None
     display_msg = ""
 
     # 1. File + Text
     if uploaded_file and prompt:
-        with st.spinner("Encoding file..."):
-            bytes_data = uploaded_file.getvalue()
-            b64_file = base64.b64encode(bytes_data).decode('utf-8')
+        with st.spinner("Optimizing file..."):
+            # Downscaled / recompressed before upload (frontend/preprocess.py)
+            prepared = prepare_upload(uploaded_file.name, uploaded_file.getvalue())
+            b64_file = base64.b64encode(prepared.data).decode('utf-8')
             payload = {
                 "file_content": b64_file, # Updated key name to match backend
-                "file_name": uploaded_file.name, 
+                "file_name": prepared.file_name, 
                 "question": prompt,
                 "user_id": st.session_state.user['email'],
                 "chat_id": st.session_state.current_chat_id
             }
             display_msg = f"📄 *{uploaded_file.name}* - {prompt}"
+            if len(prepared.data) < prepared.original_bytes:
+                st.caption(f"🗜️ {prepared.original_bytes / 1e6:.1f} MB → {len(prepared.data) / 1e6:.1f} MB")
 
     # 2. Text Only
     elif prompt:
-        # For now, text-only might not work if backend expects a file, 
-        # but let's keep the logic for future V2
-        st.warning("Please upload a document to ask a question.")
+        # Follow-up: the backend answers from this chat's earlier turns and document
+        payload = {
+            "question": prompt,
+            "user_id": st.session_state.user['email'],
+            "chat_id": st.session_state.current_chat_id
+        }
+        display_msg = prompt
 
     # --- SUBMIT & PROCESS ---
     if payload:
         # Add User Message to UI immediately
         st.session_state.messages.append({"role": "user", "content": display_msg})
         
-        # Show Status Container
-        with st.status("🚀 VisionQuest Activated...", expanded=True) as status:
-            status.write("📤 Uploading to Cloud...")
+        with st.spinner("📤 Uploading to Cloud..."):
             job_id = api.submit_job(API_URL, payload)
-            
-            if job_id:
-                status.write(f"🎫 Job ID: `{job_id}`")
-                status.write("🧠 AI Processing...")
-                
-                # Poll for Results
-                progress = status.progress(0)
-                for i in range(40): # Wait up to 80 seconds
-                    res = api.check_status(API_URL, job_id)
-                    current_status = res.get("status")
-                    
-                    if current_status == "SUCCESS":
-                        progress.progress(100)
-                        status.update(label="✅ Complete!", state="complete", expanded=False)
-                        
-                        # Add AI Response
-                        st.session_state.messages.append({
-                            "role": "assistant", 
-                            "content": res.get("answer"),
-                            "citations": res.get("citations")
-                        })
-                        st.rerun()
-                        break
-                    
-                    elif current_status == "FAILED":
-                        status.update(label="❌ Failed", state="error")
-                        st.error(f"Backend Error: {res.get('error_msg')}")
-                        break
-                    
-                    # Still Processing
-                    status.write(f"⏳ Status: {current_status}...")
-                    time.sleep(2)
+        if job_id:
+            # Polled by job_watcher below: the rest of the page stays interactive meanwhile
+            st.session_state.pending_job = {"job_id": job_id, "chat_id": st.session_state.current_chat_id, "checks": 0}
+        else:
+            st.error("❌ Connection Failed")
+
+    @st.fragment(run_every=POLL_SECONDS)
+    def job_watcher():
+        """
+        Checks the pending job once per tick. Only this fragment reruns;
+        the full page reruns once, when the answer is in.
+        """
+        job = st.session_state.pending_job
+        if not job:
+            return
+
+        with st.status("🚀 VisionQuest Activated...", expanded=True) as status:
+            status.write(f"🎫 Job ID: `{job['job_id']}`")
+            res = api.check_status(API_URL, job['job_id'])
+            current_status = res.get("status")
+            job['checks'] += 1
+
+            if current_status == "SUCCESS":
+                status.update(label="✅ Complete!", state="complete", expanded=False)
+                st.session_state.messages.append({
+                    "role": "assistant", 
+                    "content": res.get("answer"),
+                    "citations": res.get("citations"),
+                    "id": job['job_id']
+                })
+                st.session_state.pending_job = None
+                api.invalidate_chat(API_URL, st.session_state.user['email'], job['chat_id'])
+                st.rerun()
+
+            elif current_status == "FAILED":
+                status.update(label="❌ Failed", state="error")
+                st.error(f"Backend Error: {res.get('error_msg')}")
+                st.session_state.pending_job = None
+
+            elif job['checks'] >= POLL_MAX_CHECKS:
+                status.update(label="⌛ Still running. Open the chat from History later.", state="error")
+                st.session_state.pending_job = None
+
+            # Still Processing
+            elif current_status == "QUEUED" and res.get("queue_position"):
+                status.write(f"🕒 Queued: position {res['queue_position']}...")
             else:
-                status.update(label="❌ Connection Failed", state="error")
\ No newline at end of file
+                status.write(f"🧠 AI Processing... ({current_status})")
+
+    job_watcher()
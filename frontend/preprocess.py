@@ -0,0 +1,88 @@
+import hashlib
+import io
+import os
+from collections import namedtuple
+
+try:
+    from PIL import Image, ImageOps  # Ships with Streamlit
+except ImportError:
+    Image = None
+
+try:
+    import fitz  # PyMuPDF (optional): PDF image downsampling and cleanup
+except ImportError:
+    fitz = None
+
+# --- CONFIGURATION ---
+# Textract reads printed text reliably from ~150 dpi: an A4 page at 2000 px
+# on its long side is ~170 dpi. A 12 MP phone photo (4032 px) is 4x the pixels.
+MAX_IMAGE_SIDE_PX = 2000
+JPEG_QUALITY = 80
+GRAYSCALE = True          # OCR ignores color; a gray JPEG is ~1/3 smaller
+PDF_IMAGE_DPI = 200       # Embedded scans above PDF_IMAGE_MAX_DPI are resampled to this
+PDF_IMAGE_MAX_DPI = 250
+MIME_TYPES = {".pdf": "application/pdf", ".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg"}
+
+Prepared = namedtuple("Prepared", "data file_name mime_type content_hash original_bytes")
+
+
+def content_hash(data):
+    """SHA-256 of the file as picked: the same document always has the same hash."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def prepare_upload(file_name, data):
+    """
+    Shrinks a document before upload: photos are downscaled and recompressed,
+    PDFs lose oversized image resolution and assets OCR never reads. Anything
+    that fails or does not get smaller is uploaded as picked.
+    """
+    digest = content_hash(data)
+    extension = os.path.splitext(file_name)[1].lower()
+    prepared = None
+    try:
+        if extension in (".png", ".jpg", ".jpeg"):
+            prepared = shrink_image(data)
+        elif extension == ".pdf":
+            prepared = shrink_pdf(data)
+    except Exception as e:
+        print(f"Preprocess Error: {e}")
+
+    if prepared is not None and len(prepared[0]) < len(data):
+        new_data, new_extension = prepared
+        new_name = os.path.splitext(file_name)[0] + new_extension
+        return Prepared(new_data, new_name, MIME_TYPES[new_extension], digest, len(data))
+    return Prepared(data, file_name, MIME_TYPES.get(extension, "application/octet-stream"), digest, len(data))
+
+
+def shrink_image(data, max_side=MAX_IMAGE_SIDE_PX, quality=JPEG_QUALITY, grayscale=GRAYSCALE):
+    """Upright, downscaled, metadata-free JPEG. Returns (bytes, extension)."""
+    if Image is None:
+        return None
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)  # Phone photos are stored sideways + an EXIF flag
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        image = image.convert("L" if grayscale else "RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue(), ".jpg"
+
+
+def shrink_pdf(data, dpi=PDF_IMAGE_DPI, max_dpi=PDF_IMAGE_MAX_DPI, quality=JPEG_QUALITY):
+    """
+    Resamples embedded images above max_dpi, drops attachments, thumbnails,
+    JavaScript and metadata. Text (including an invisible OCR layer, which
+    the OCR agent reads instead of calling Textract) is kept.
+    Returns (bytes, extension).
+    """
+    if fitz is None:
+        return None
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        if doc.needs_pass:
+            return None
+        if hasattr(doc, "rewrite_images"):  # PyMuPDF >= 1.24.11
+            doc.rewrite_images(dpi_threshold=max_dpi, dpi_target=dpi, quality=quality)
+        doc.scrub(attached_files=True, embedded_files=True, javascript=True, metadata=True,
+                  thumbnails=True, xml_metadata=True, clean_pages=False, hidden_text=False,
+                  redactions=False, remove_links=False, reset_fields=False, reset_responses=False)
+        return doc.tobytes(garbage=3, deflate=True), ".pdf"
@@ -61,6 +61,13 @@ resource "aws_apigatewayv2_route" "ingest_route" {
   target    = "integrations/${aws_apigatewayv2_integration.ingest_integration.id}"
 }
 
+# Same Lambda; ingest queues these jobs in the bulk tier (batch audits, backfills)
+resource "aws_apigatewayv2_route" "ingest_bulk_route" {
+  api_id    = aws_apigatewayv2_api.visionquest_api.id
+  route_key = "POST /ingest/bulk"
+  target    = "integrations/${aws_apigatewayv2_integration.ingest_integration.id}"
+}
+
 resource "aws_apigatewayv2_route" "status_route" {
   api_id    = aws_apigatewayv2_api.visionquest_api.id
   route_key = "POST /status"
@@ -1,22 +1,63 @@
 import json
 import boto3
 import os
+import sys
 import base64
 import time
 import uuid
 import urllib.request
 
+# Shared helpers come from the Lambda layer; fall back to the repo copy locally.
+# DEPLOYMENT: this RAG API function is not managed by compute.tf. Deploy it
+# with the VisionQuest_Shared layer (aws_lambda_layer_version.shared_layer)
+# attached, or zip backend/shared/python/visionquest next to app.py:
+# without either, every cold start fails with ImportError: visionquest.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "shared", "python"))
+from visionquest.retrieval_cache import RetrievalCache, cached_retrieve, ingestion_version_fn
+from visionquest.context import assemble_context, estimate_tokens
+from visionquest.model_router import ModelRouter, claude_catalog, classify_question, load_catalog
+from visionquest.logs import get_logger
+from visionquest.resilience import breaker
+from visionquest.telemetry import Span
+from visionquest.warm_cache import PromptTemplate
+
 # --- CONFIGURATION ---
 REGION = "us-east-1"
 KB_ID = os.environ.get('KB_ID')
-MODEL_ARN = os.environ.get('MODEL_ARN')
+MODEL_ARN = os.environ.get('MODEL_ARN')              # Large model
+SMALL_MODEL_ARN = os.environ.get('SMALL_MODEL_ARN')  # Optional cheaper model for short questions
+LATENCY_SLO_MS = int(os.environ.get('LATENCY_SLO_MS', '15000'))
 BUCKET_NAME = os.environ.get('BUCKET_NAME')
+KB_DATA_SOURCE_ID = os.environ.get('KB_DATA_SOURCE_ID') # Enables cache reset on KB re-sync
+RETRIEVAL_CACHE_TTL = int(os.environ.get('RETRIEVAL_CACHE_TTL', '900'))
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', '1500'))
 
 # --- CLIENTS ---
 bedrock_agent_runtime = boto3.client('bedrock-agent-runtime', region_name=REGION)
 bedrock_runtime = boto3.client('bedrock-runtime', region_name=REGION)
 transcribe = boto3.client('transcribe', region_name=REGION)
 s3 = boto3.client('s3', region_name=REGION)
+# Interactive: a model with an open circuit is skipped for the fallback instead of retried
+model_router = ModelRouter(load_catalog(claude_catalog(MODEL_ARN, SMALL_MODEL_ARN)), breakers=breaker)
+log = get_logger("rag_api")
+
+# --- PROMPTS (built once per container, see visionquest/warm_cache.py) ---
+MEDIA_PROMPT = PromptTemplate("""
+    You are an expert ZATCA Consultant.
+    Review the provided document/image and answer the user's question.
+
+    OFFICIAL REGULATIONS context (cite passages as [n]):
+    {context_text}
+
+    User Question: {question}
+""")
+
+# --- RETRIEVAL CACHE (Lives across warm invocations) ---
+kb_version_fn = None
+if KB_DATA_SOURCE_ID:
+    bedrock_agent = boto3.client('bedrock-agent', region_name=REGION)
+    kb_version_fn = ingestion_version_fn(bedrock_agent, KB_DATA_SOURCE_ID)
+retrieval_cache = RetrievalCache(ttl_seconds=RETRIEVAL_CACHE_TTL, version_fn=kb_version_fn)
 
 def transcribe_audio(base64_audio):
     """
@@ -26,14 +67,14 @@ def transcribe_audio(base64_audio):
     file_name = f"audio_temp/{job_name}.webm"
     
     # 1. Decode and Upload to S3
-    print(f"🎙️ Uploading audio to {BUCKET_NAME}/{file_name}")
+    log.info("🎙️ Uploading audio to %s/%s", BUCKET_NAME, file_name)
     audio_data = base64.b64decode(base64_audio)
     s3.put_object(Bucket=BUCKET_NAME, Key=file_name, Body=audio_data)
     
     media_uri = f"s3://{BUCKET_NAME}/{file_name}"
     
     # 2. Start Transcription Job
-    print(f"⏳ Starting Transcribe Job: {job_name}")
+    log.info("⏳ Starting Transcribe Job: %s", job_name)
     transcribe.start_transcription_job(
         TranscriptionJobName=job_name,
         Media={'MediaFileUri': media_uri},
@@ -59,32 +100,36 @@ def transcribe_audio(base64_audio):
         with urllib.request.urlopen(transcript_uri) as response:
             data = json.loads(response.read())
             text = data['results']['transcripts'][0]['transcript']
-            print(f"✅ Transcribed: {text}")
+            log.info("✅ Transcribed.", chars=len(text))
             return text
     else:
-        print("❌ Transcription Failed or Timed Out")
+        log.error("❌ Transcription Failed or Timed Out")
         return None
 
-def analyze_media_with_rag(question, base64_data, media_type):
+def estimate_media_tokens(base64_data, media_type):
+    """Rough prompt cost of an attachment: ~1.6k tokens per image / PDF page (~100 KB)."""
+    if "pdf" not in media_type:
+        return 1600
+    pdf_bytes = len(base64_data) * 3 // 4
+    return max(1600, pdf_bytes // 100000 * 1600)
+
+def analyze_media_with_rag(question, base64_data, media_type, span):
     """
     Handles BOTH Images (Vision) and PDFs (Document API).
     """
-    print(f"📂 Processing Media: {media_type}")
+    log.info("📂 Processing Media: %s", media_type)
+    span.add(file_bytes=len(base64_data) * 3 // 4)
     
     # 1. Retrieve Rules from KB
-    retrieval = bedrock_agent_runtime.retrieve(
-        knowledgeBaseId=KB_ID,
-        retrievalQuery={'text': question}
-    )
+    with span.phase("retrieve"):
+        retrieval_results = cached_retrieve(bedrock_agent_runtime, retrieval_cache, KB_ID, question)
     
-    context_text = ""
+    # Dedupe overlapping chunks and cap the prompt size; only cite what we send
+    context = assemble_context(retrieval_results, token_budget=CONTEXT_TOKEN_BUDGET)
+    context_text = context['text']
     citations_list = []
-    if 'retrievalResults' in retrieval:
-        for result in retrieval['retrievalResults']:
-            text_chunk = result['content']['text']
-            uri = result['location']['s3Location']['uri']
-            context_text += f"- {text_chunk}\n"
-            citations_list.append({'retrievedReferences': [{'content': {'text': text_chunk}, 'location': {'s3Location': {'uri': uri}}}]})
+    for citation in context['citations']:
+        citations_list.append({'retrievedReferences': [{'content': {'text': citation['text']}, 'location': {'s3Location': {'uri': citation['uri']}}}]})
 
     # 2. Prepare Payload based on Type
     # PDF uses "document" block. Images use "image" block.
@@ -110,15 +155,7 @@ def analyze_media_with_rag(question, base64_data, media_type):
             }
         }
 
-    prompt_text = f"""
-    You are an expert ZATCA Consultant.
-    Review the provided document/image and answer the user's question.
-    
-    OFFICIAL REGULATIONS context:
-    {context_text}
-    
-    User Question: {question}
-    """
+    prompt_text = MEDIA_PROMPT.render(context_text=context_text, question=question)
 
     # 3. Call Claude
     payload = {
@@ -134,20 +171,47 @@ def analyze_media_with_rag(question, base64_data, media_type):
             }
         ]
     }
+    body = json.dumps(payload)  # The base64 document is MBs: serialize once, not per fallback
+
+    def call_model(model):
+        with span.phase("bedrock"):
+            response = bedrock_runtime.invoke_model(
+                modelId=model.model_id,
+                body=body
+            )
+            result = json.loads(response['body'].read())
+        usage = result.get('usage', {})
+        input_tokens, output_tokens = usage.get('input_tokens', 0), usage.get('output_tokens', 0)
+        span.add(input_tokens=input_tokens, output_tokens=output_tokens,
+                 cost_usd=model.expected_cost(input_tokens, output_tokens))
+        return result['content'][0]['text'], usage
 
-    response = bedrock_runtime.invoke_model(
-        modelId=MODEL_ARN,
-        body=json.dumps(payload)
+    candidates = model_router.route(
+        modality="document" if "pdf" in media_type else "image",
+        input_tokens=estimate_media_tokens(base64_data, media_type) + estimate_tokens(prompt_text),
+        question_class=classify_question(question),
+        latency_slo_ms=LATENCY_SLO_MS,
+        output_tokens=4096
     )
-    
-    result = json.loads(response['body'].read())
-    return result['content'][0]['text'], citations_list
+    answer, model = model_router.invoke(candidates, call_model)
+    log.info("🤖 Answered by %s", model.name)
+    span.tag(model=model.name)
+    return answer, citations_list
 
 def lambda_handler(event, context):
-    print("Received Event:", json.dumps(event))
-    
+    log.begin(event, context)
+    span = Span("rag_api", getattr(context, 'aws_request_id', None)).start()
+    response = handle_request(event, span)
+    span.tag(status_code=response['statusCode']).add(response_bytes=len(response['body']))
+    span.finish(None if response['statusCode'] < 500 else "ServerError")
+    return response
+
+def handle_request(event, span):
     try:
         body = json.loads(event.get('body', '{}'))
+        # Correlate with the pipeline job when the caller passes one
+        span.job_id = body.get('job_id') or span.job_id
+        log.bind(job_id=body.get('job_id'))
         question = body.get('question')
         audio_data = body.get('audio')
         file_data = body.get('file_data') # Unified file field
@@ -155,7 +219,8 @@ def lambda_handler(event, context):
         
         # 1. Voice Handling
         if audio_data:
-            transcribed_text = transcribe_audio(audio_data)
+            with span.phase("transcribe"):
+                transcribed_text = transcribe_audio(audio_data)
             if not transcribed_text: return {"statusCode": 500, "body": json.dumps({"error": "Transcription failed"})}
             question = transcribed_text 
 
@@ -165,7 +230,7 @@ def lambda_handler(event, context):
         # 2. File Handling (PDF or Image)
         if file_data and media_type:
             if not question: question = "Analyze this file."
-            answer, citations = analyze_media_with_rag(question, file_data, media_type)
+            answer, citations = analyze_media_with_rag(question, file_data, media_type, span)
             
             return {
                 "statusCode": 200,
@@ -178,17 +243,29 @@ def lambda_handler(event, context):
             }
 
         # 3. Text Handling (Standard)
-        print(f"🧠 Text Mode: '{question}'")
-        response = bedrock_agent_runtime.retrieve_and_generate(
-            input={'text': question},
-            retrieveAndGenerateConfiguration={
-                'type': 'KNOWLEDGE_BASE',
-                'knowledgeBaseConfiguration': {
-                    'knowledgeBaseId': KB_ID,
-                    'modelArn': MODEL_ARN
-                }
-            }
+        log.info("🧠 Text Mode", question=question)
+
+        def call_model(model):
+            with span.phase("retrieve_and_generate"):
+                response = bedrock_agent_runtime.retrieve_and_generate(
+                    input={'text': question},
+                    retrieveAndGenerateConfiguration={
+                        'type': 'KNOWLEDGE_BASE',
+                        'knowledgeBaseConfiguration': {
+                            'knowledgeBaseId': KB_ID,
+                            'modelArn': model.model_id
+                        }
+                    }
+                )
+            return response, None
+
+        candidates = model_router.route(
+            modality="text",
+            input_tokens=estimate_tokens(question) + CONTEXT_TOKEN_BUDGET,
+            question_class=classify_question(question),
+            latency_slo_ms=LATENCY_SLO_MS
         )
+        response, _ = model_router.invoke(candidates, call_model)
         return {
             "statusCode": 200,
             "headers": {"Content-Type": "application/json", "Access-Control-Allow-Origin": "*"},
@@ -200,5 +277,5 @@ def lambda_handler(event, context):
         }
 
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
+        log.error("❌ Error: %s", e)
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
\ No newline at end of file
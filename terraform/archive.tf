@@ -0,0 +1,142 @@
+# -----------------------------------------------------------------------------
+# JOB ARCHIVE: expired jobs (DynamoDB TTL) -> stream -> archiver -> S3
+# Partitioned as jobs/dt=YYYY-MM-DD/ for Athena / Glue.
+# -----------------------------------------------------------------------------
+resource "aws_s3_bucket" "job_archive" {
+  bucket_prefix = "visionquest-archive-"
+  force_destroy = true
+}
+
+resource "aws_s3_bucket_public_access_block" "job_archive" {
+  bucket = aws_s3_bucket.job_archive.id
+
+  block_public_acls       = true
+  block_public_policy     = true
+  ignore_public_acls      = true
+  restrict_public_buckets = true
+}
+
+# Archive files are written once and rarely read
+resource "aws_s3_bucket_lifecycle_configuration" "job_archive_tiering" {
+  bucket = aws_s3_bucket.job_archive.id
+
+  rule {
+    id     = "archive-to-glacier-ir"
+    status = "Enabled"
+
+    filter {
+      prefix = "jobs/"
+    }
+
+    transition {
+      days          = 90
+      storage_class = "GLACIER_IR"
+    }
+  }
+}
+
+resource "aws_iam_role" "archiver_role" {
+  name = "VisionQuest_Archiver_Role"
+
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Action = "sts:AssumeRole"
+      Effect = "Allow"
+      Principal = { Service = "lambda.amazonaws.com" }
+    }]
+  })
+}
+
+resource "aws_iam_role_policy" "archiver_policy" {
+  name = "VisionQuest_Archiver_Permissions"
+  role = aws_iam_role.archiver_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = ["logs:CreateLogGroup", "logs:CreateLogStream", "logs:PutLogEvents"]
+        Resource = "arn:aws:logs:*:*:*"
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:DescribeStream",
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:ListStreams"
+        ]
+        Resource = aws_dynamodb_table.jobs_table.stream_arn
+      },
+      {
+        Effect = "Allow"
+        Action = ["s3:PutObject"]
+        Resource = "${aws_s3_bucket.job_archive.arn}/*"
+      },
+      {
+        # Answers too large for the item were overflowed here
+        Effect = "Allow"
+        Action = ["s3:GetObject"]
+        Resource = "${aws_s3_bucket.data_lake.arn}/_overflow/*"
+      }
+    ]
+  })
+}
+
+data "archive_file" "archiver_zip" {
+  type        = "zip"
+  source_dir  = "../backend/archiver"
+  output_path = "archiver.zip"
+}
+
+resource "aws_lambda_function" "archiver_lambda" {
+  filename         = "archiver.zip"
+  function_name    = "VisionQuest_Archiver"
+  role             = aws_iam_role.archiver_role.arn
+  handler          = "main.lambda_handler"
+  runtime          = "python3.9"
+  timeout          = 120
+  memory_size      = 1024
+  source_code_hash = data.archive_file.archiver_zip.output_base64sha256
+  # pyarrow (optional) switches the output from gzip JSONL to Parquet
+  layers           = compact([aws_lambda_layer_version.shared_layer.arn, var.pyarrow_layer_arn])
+
+  environment {
+    variables = {
+      ARCHIVE_BUCKET = aws_s3_bucket.job_archive.id
+    }
+  }
+}
+
+resource "aws_lambda_event_source_mapping" "jobs_stream_to_archiver" {
+  event_source_arn  = aws_dynamodb_table.jobs_table.stream_arn
+  function_name     = aws_lambda_function.archiver_lambda.arn
+  starting_position = "TRIM_HORIZON"
+
+  # Few, large files: up to 1000 expired jobs or 5 minutes per invocation
+  batch_size                         = 1000
+  maximum_batching_window_in_seconds = 300
+
+  # A bad record is isolated instead of blocking the shard
+  bisect_batch_on_function_error = true
+  maximum_retry_attempts         = 10
+
+  # Only TTL deletions invoke the function (inserts / status updates never do)
+  filter_criteria {
+    filter {
+      pattern = jsonencode({
+        eventName    = ["REMOVE"]
+        userIdentity = {
+          type        = ["Service"]
+          principalId = ["dynamodb.amazonaws.com"]
+        }
+      })
+    }
+  }
+}
+
+output "job_archive_bucket" {
+  value = aws_s3_bucket.job_archive.id
+}
@@ -1,3 +1,17 @@
+# --- 0. SHARED LAYER (backend/shared/python -> /opt/python/visionquest) ---
+data "archive_file" "shared_layer_zip" {
+  type        = "zip"
+  source_dir  = "../backend/shared"
+  output_path = "shared_layer.zip"
+}
+
+resource "aws_lambda_layer_version" "shared_layer" {
+  filename            = "shared_layer.zip"
+  layer_name          = "VisionQuest_Shared"
+  compatible_runtimes = ["python3.9"]
+  source_code_hash    = data.archive_file.shared_layer_zip.output_base64sha256
+}
+
 # --- 1. ARCHIVE THE CODE ---
 data "archive_file" "ingest_zip" {
   type        = "zip"
@@ -38,12 +52,18 @@ resource "aws_lambda_function" "ingest_lambda" {
   handler          = "main.lambda_handler"
   runtime          = "python3.9"
   source_code_hash = data.archive_file.ingest_zip.output_base64sha256
+  layers           = [aws_lambda_layer_version.shared_layer.arn]
 
   environment {
     variables = {
       JOBS_TABLE_NAME  = aws_dynamodb_table.jobs_table.name
       CHATS_TABLE_NAME = aws_dynamodb_table.chats_table.name
       s3_bucket_name   = aws_s3_bucket.data_lake.id
+      JOB_PENDING_TTL_HOURS = "48" # Jobs that never finish are dropped after this
+      JOB_RETENTION_DAYS    = tostring(var.job_retention_days) # Chat row TTL, same as the jobs'
+      ADMISSION_TABLE_NAME   = aws_dynamodb_table.admission_table.name
+      TENANT_RATE_PER_MINUTE = tostring(var.tenant_rate_per_minute)
+      TENANT_BURST           = tostring(var.tenant_burst)
     }
   }
 }
@@ -58,12 +78,23 @@ resource "aws_lambda_function" "processor_lambda" {
   runtime          = "python3.9"
   timeout          = 300 # 5 Minutes for deep thinking
   source_code_hash = data.archive_file.processor_zip.output_base64sha256
+  layers           = [aws_lambda_layer_version.shared_layer.arn]
 
   environment {
     variables = {
       JOBS_TABLE_NAME = aws_dynamodb_table.jobs_table.name
+      s3_bucket_name  = aws_s3_bucket.data_lake.id # Overflow for answers past the item size limit
+      # Rolling chat summary and the chat's document for follow-ups (visionquest.memory)
+      CHATS_TABLE_NAME    = aws_dynamodb_table.chats_table.name
+      MEMORY_TOKEN_BUDGET = "1500" # Earlier turns kept verbatim; older ones are summarized
       # Using the specific Inference Profile ARN provided
       MODEL_ARN       = "arn:aws:bedrock:us-east-1:${data.aws_caller_identity.current.account_id}:inference-profile/us.anthropic.claude-sonnet-4-20250514-v1:0"
+      # Cheaper model the router uses for short questions (and as throttling fallback)
+      SMALL_MODEL_ARN = "arn:aws:bedrock:us-east-1:${data.aws_caller_identity.current.account_id}:inference-profile/us.anthropic.claude-3-5-haiku-20241022-v1:0"
+      LATENCY_SLO_MS  = "20000"
+      # Retryable errors only mark the job FAILED on the state machine's last attempt
+      SFN_RETRY_ATTEMPTS = tostring(local.service_retry_attempts)
+      JOB_RETENTION_DAYS = tostring(var.job_retention_days) # Completion extends the TTL
     }
   }
 }
@@ -76,10 +107,14 @@ resource "aws_lambda_function" "status_lambda" {
   handler          = "main.lambda_handler"
   runtime          = "python3.9"
   source_code_hash = data.archive_file.status_zip.output_base64sha256
+  layers           = compact([aws_lambda_layer_version.shared_layer.arn, var.orjson_layer_arn])
 
   environment {
     variables = {
       JOBS_TABLE_NAME = aws_dynamodb_table.jobs_table.name
+      # The frontend polls status every few seconds per job: keep 1 in 10 info logs (errors always)
+      LOG_SAMPLE_RATE = "0.1"
+      ADMISSION_TABLE_NAME = aws_dynamodb_table.admission_table.name # Queue position
     }
   }
 }
@@ -92,6 +127,7 @@ resource "aws_lambda_function" "history_lambda" {
   handler          = "main.lambda_handler"
   runtime          = "python3.9"
   source_code_hash = data.archive_file.history_zip.output_base64sha256
+  layers           = compact([aws_lambda_layer_version.shared_layer.arn, var.orjson_layer_arn])
 
   environment {
     variables = {
@@ -109,15 +145,70 @@ resource "aws_lambda_function" "kickoff_lambda" {
   handler          = "main.lambda_handler"
   runtime          = "python3.9"
   source_code_hash = data.archive_file.kickoff_zip.output_base64sha256
+  layers           = [aws_lambda_layer_version.shared_layer.arn]
+  timeout          = 30 # Starts up to MAX_DISPATCH_PER_CALL executions
 
   environment {
-    variables = {
+    variables = merge(local.dispatcher_env, {
       # Links to the State Machine defined in step_functions.tf
       STATE_MACHINE_ARN = aws_sfn_state_machine.visionquest_pipeline.arn
-    }
+    })
+  }
+}
+
+# --- 6b. DISPATCHER (same code: frees slots, starts queued jobs) ---
+# Invoked by the state machine's Release Slot step and by a 1-minute schedule
+locals {
+  dispatcher_env = {
+    # Built from the name: the state machine invokes this function, so its ARN would be a cycle
+    STATE_MACHINE_ARN        = "arn:aws:states:us-east-1:${data.aws_caller_identity.current.account_id}:stateMachine:VisionQuest-Orchestrator"
+    JOBS_TABLE_NAME          = aws_dynamodb_table.jobs_table.name
+    ADMISSION_TABLE_NAME     = aws_dynamodb_table.admission_table.name
+    # In flight = min(textract / OCR fan-out, bedrock); see visionquest.admission
+    TEXTRACT_MAX_CONCURRENCY = tostring(var.textract_max_concurrency)
+    OCR_MAX_PARALLEL         = "8" # Must match the OCR agent (knowledge.tf)
+    BEDROCK_MAX_CONCURRENCY  = tostring(var.bedrock_max_concurrency)
+    SLOT_LEASE_SECONDS       = "1800" # State machine TimeoutSeconds + margin
+    # Fair scheduling across users (visionquest.scheduler)
+    TIER_WEIGHTS             = jsonencode(var.tier_weights)
+    TENANT_WEIGHTS           = jsonencode(var.tenant_weights)
+  }
+}
+
+resource "aws_lambda_function" "dispatcher_lambda" {
+  filename         = "kickoff.zip"
+  function_name    = "VisionQuest_Dispatcher"
+  role             = aws_iam_role.backend_role.arn
+  handler          = "main.dispatch_handler"
+  runtime          = "python3.9"
+  timeout          = 30
+  source_code_hash = data.archive_file.kickoff_zip.output_base64sha256
+  layers           = [aws_lambda_layer_version.shared_layer.arn]
+
+  environment {
+    variables = local.dispatcher_env
   }
 }
 
+resource "aws_cloudwatch_event_rule" "dispatch_sweep" {
+  name                = "VisionQuest_Dispatch_Sweep"
+  description         = "Reclaims expired slots and drains the job queue"
+  schedule_expression = "rate(1 minute)"
+}
+
+resource "aws_cloudwatch_event_target" "dispatch_sweep" {
+  rule = aws_cloudwatch_event_rule.dispatch_sweep.name
+  arn  = aws_lambda_function.dispatcher_lambda.arn
+}
+
+resource "aws_lambda_permission" "allow_events_dispatcher" {
+  statement_id  = "AllowEventBridgeInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.dispatcher_lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.dispatch_sweep.arn
+}
+
 # --- 7. S3 TRIGGER (S3 -> Kickoff Only) ---
 resource "aws_s3_bucket_notification" "trigger_kickoff" {
   bucket = aws_s3_bucket.data_lake.id
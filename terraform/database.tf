@@ -22,12 +22,17 @@ resource "aws_dynamodb_table" "jobs_table" {
   }
   # --------------------------------------------------
 
-  # Automatically delete old job records after 24 hours (Cost savings)
+  # Ingest sets expiration_time (JOB_PENDING_TTL_HOURS) and the processor extends
+  # it on completion (JOB_RETENTION_DAYS); expired jobs are archived (archive.tf)
   ttl {
     attribute_name = "expiration_time"
     enabled        = true
   }
 
+  # The archiver only needs the deleted item
+  stream_enabled   = true
+  stream_view_type = "OLD_IMAGE"
+
   # --- NEW: The Index (Lookup by Chat ID) ---
   global_secondary_index {
     name               = "ChatIndex"
@@ -59,11 +64,41 @@ resource "aws_dynamodb_table" "chats_table" {
     type = "S"
   }
 
+  # Set to the chat's last job's retention (visionquest.retention): the chat
+  # list entry, rolling summary and document text expire with its history
+  ttl {
+    attribute_name = "expiration_time"
+    enabled        = true
+  }
+
   tags = {
     Name = "VisionQuest Chat History"
   }
 }
 
+# 3. ADMISSION TABLE (Tenant rate buckets, job queue, in-flight slots)
+# Single-key items only; see backend/shared/python/visionquest/admission.py
+resource "aws_dynamodb_table" "admission_table" {
+  name           = "VisionQuest_Admission"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "pk"
+
+  attribute {
+    name = "pk"
+    type = "S"
+  }
+
+  # Idle tenant buckets and queue tombstones
+  ttl {
+    attribute_name = "expiration_time"
+    enabled        = true
+  }
+
+  tags = {
+    Name = "VisionQuest Admission Control"
+  }
+}
+
 # OUTPUTS (Required for Lambda Environment Variables)
 output "jobs_table_name" {
   value = aws_dynamodb_table.jobs_table.name
@@ -48,6 +48,12 @@ resource "aws_iam_role_policy" "ocr_policy" {
           "${aws_s3_bucket.data_lake.arn}/*"
         ]
       },
+      {
+        # Scanned-page subsets sent to Textract are removed after OCR
+        Effect = "Allow"
+        Action = ["s3:DeleteObject"]
+        Resource = "${aws_s3_bucket.data_lake.arn}/_ocr_tmp/*"
+      },
       {
         Effect = "Allow"
         Action = [
@@ -81,12 +87,17 @@ resource "aws_lambda_function" "ocr_cleaner" {
   timeout          = 300
   memory_size      = 512
   source_code_hash = data.archive_file.ocr_zip.output_base64sha256
+  # PyMuPDF enables the native text-layer fast path; without it every PDF goes to Textract
+  layers           = compact([aws_lambda_layer_version.shared_layer.arn, var.pymupdf_layer_arn])
 
   # REMOVED: vpc_config block (Public Access enabled for reliability)
 
   environment {
     variables = {
-      CLEAN_BUCKET = aws_s3_bucket.clean_knowledge.bucket
+      CLEAN_BUCKET     = aws_s3_bucket.clean_knowledge.bucket
+      # Scanned pages are OCR'd as parallel Textract jobs of this many pages
+      OCR_CHUNK_PAGES  = "20"
+      OCR_MAX_PARALLEL = "8" # The dispatcher budgets Textract concurrency with this (compute.tf)
     }
   }
 }
\ No newline at end of file
@@ -25,7 +25,8 @@ resource "aws_iam_role_policy" "sfn_policy" {
         Action = "lambda:InvokeFunction"
         Resource = [
           aws_lambda_function.ocr_cleaner.arn,
-          aws_lambda_function.processor_lambda.arn
+          aws_lambda_function.processor_lambda.arn,
+          aws_lambda_function.dispatcher_lambda.arn
         ]
       },
       {
@@ -41,36 +42,82 @@ resource "aws_iam_role_policy" "sfn_policy" {
 }
 
 # 3. THE STATE MACHINE DEFINITION
+# Agents raise these (visionquest.resilience) once their own backoff is spent.
+# Only they and Lambda service hiccups are retried; bad input fails at once.
+locals {
+  service_retry_attempts = 3 # Processor gets this as SFN_RETRY_ATTEMPTS (compute.tf)
+  service_retry = jsonencode([
+    {
+      ErrorEquals     = ["ThrottledError", "CircuitOpenError"]
+      IntervalSeconds = 10
+      BackoffRate     = 2
+      MaxDelaySeconds = 60
+      MaxAttempts     = local.service_retry_attempts
+      JitterStrategy  = "FULL"
+    },
+    {
+      ErrorEquals     = ["TransientServiceError", "Lambda.ServiceException", "Lambda.AWSLambdaException", "Lambda.SdkClientException", "Lambda.TooManyRequestsException"]
+      IntervalSeconds = 2
+      BackoffRate     = 2
+      MaxAttempts     = local.service_retry_attempts
+      JitterStrategy  = "FULL"
+    }
+  ])
+}
+
 resource "aws_sfn_state_machine" "visionquest_pipeline" {
   name     = "VisionQuest-Orchestrator"
   role_arn = aws_iam_role.sfn_role.arn
 
   definition = <<EOF
 {
-  "Comment": "Orchestrates OCR -> Brain",
+  "Comment": "Orchestrates OCR -> Brain, then frees the job's admission slot",
   "StartAt": "Agent: The Accountant (OCR)",
+  "TimeoutSeconds": 1500,
   "States": {
     "Agent: The Accountant (OCR)": {
       "Type": "Task",
       "Resource": "${aws_lambda_function.ocr_cleaner.arn}",
       "Parameters": {
         "bucket.$": "$.bucket",
-        "key.$": "$.key"
+        "key.$": "$.key",
+        "job_id.$": "$.job_details.job_id"
       },
       "ResultPath": "$.ocr_result",
       "Next": "Agent: The Brain (Bedrock)",
-      "Retry": [ { "ErrorEquals": ["States.ALL"], "IntervalSeconds": 2, "MaxAttempts": 3 } ],
-      "Catch": [ { "ErrorEquals": ["States.ALL"], "Next": "Job Failed" } ]
+      "Retry": ${local.service_retry},
+      "Catch": [ { "ErrorEquals": ["States.ALL"], "ResultPath": "$.error", "Next": "Release Slot (Failed)" } ]
     },
     "Agent: The Brain (Bedrock)": {
       "Type": "Task",
       "Resource": "${aws_lambda_function.processor_lambda.arn}",
       "Parameters": {
         "ocr_result.$": "$.ocr_result",
-        "job_details.$": "$.job_details"
+        "job_details.$": "$.job_details",
+        "attempt.$": "$$.State.RetryCount"
       },
+      "ResultPath": "$.result",
+      "Next": "Release Slot",
+      "Retry": ${local.service_retry},
+      "Catch": [ { "ErrorEquals": ["States.ALL"], "ResultPath": "$.error", "Next": "Release Slot (Failed)" } ]
+    },
+    "Release Slot": {
+      "Type": "Task",
+      "Resource": "${aws_lambda_function.dispatcher_lambda.arn}",
+      "Parameters": { "slot.$": "$.admission.slot" },
+      "ResultPath": null,
       "Next": "Job Success",
-      "Catch": [ { "ErrorEquals": ["States.ALL"], "Next": "Job Failed" } ]
+      "Retry": [ { "ErrorEquals": ["States.ALL"], "IntervalSeconds": 2, "MaxAttempts": 3 } ],
+      "Catch": [ { "ErrorEquals": ["States.ALL"], "ResultPath": "$.release_error", "Next": "Job Success" } ]
+    },
+    "Release Slot (Failed)": {
+      "Type": "Task",
+      "Resource": "${aws_lambda_function.dispatcher_lambda.arn}",
+      "Parameters": { "slot.$": "$.admission.slot" },
+      "ResultPath": null,
+      "Next": "Job Failed",
+      "Retry": [ { "ErrorEquals": ["States.ALL"], "IntervalSeconds": 2, "MaxAttempts": 3 } ],
+      "Catch": [ { "ErrorEquals": ["States.ALL"], "ResultPath": "$.release_error", "Next": "Job Failed" } ]
     },
     "Job Success": {
       "Type": "Succeed"
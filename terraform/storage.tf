@@ -14,6 +14,55 @@ resource "aws_s3_bucket_public_access_block" "block_public" {
   restrict_public_buckets = true
 }
 
+# 3. SCRATCH CLEANUP (OCR page subsets left behind by a crashed run)
+resource "aws_s3_bucket_lifecycle_configuration" "ocr_scratch_expiry" {
+  bucket = aws_s3_bucket.data_lake.id
+
+  rule {
+    id     = "expire-ocr-scratch"
+    status = "Enabled"
+
+    filter {
+      prefix = "_ocr_tmp/"
+    }
+
+    expiration {
+      days = 1
+    }
+  }
+
+  # Oversized answers (visionquest.compression) outlive their job item long
+  # enough for the archiver to copy them
+  rule {
+    id     = "expire-answer-overflow"
+    status = "Enabled"
+
+    filter {
+      prefix = "_overflow/"
+    }
+
+    expiration {
+      days = var.job_retention_days + 7
+    }
+  }
+
+  # OCR results reused when the same document is uploaded again
+  # (backend/ingest/ocr_worker.py). Not refreshed on a hit: a document
+  # re-uploaded after expiry is simply OCR'd again.
+  rule {
+    id     = "expire-ocr-cache"
+    status = "Enabled"
+
+    filter {
+      prefix = "_ocr_cache/"
+    }
+
+    expiration {
+      days = var.job_retention_days
+    }
+  }
+}
+
 # OUTPUT (Backend needs this to know where to upload)
 output "s3_bucket_name" {
   value = aws_s3_bucket.data_lake.id
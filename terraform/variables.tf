@@ -1,4 +1,64 @@
 variable "project_id" {
   description = "Unique identifier to make S3 bucket names globally unique"
   type        = string
-}
\ No newline at end of file
+}
+
+variable "pymupdf_layer_arn" {
+  description = "Optional Lambda layer with PyMuPDF (python3.9) for the OCR agent's native PDF text path"
+  type        = string
+  default     = ""
+}
+
+variable "pyarrow_layer_arn" {
+  description = "Optional Lambda layer with pyarrow (python3.9, e.g. AWS SDK for pandas) so the archiver writes Parquet instead of gzip JSONL"
+  type        = string
+  default     = ""
+}
+
+variable "job_retention_days" {
+  description = "Days a finished job stays in the jobs table (and chat history) before it is archived"
+  type        = number
+  default     = 30
+}
+
+variable "textract_max_concurrency" {
+  description = "Concurrent Textract async jobs the pipeline may hold (keep under the account quota)"
+  type        = number
+  default     = 50
+}
+
+variable "bedrock_max_concurrency" {
+  description = "Concurrent Bedrock invocations the pipeline may hold (keep under the account quota)"
+  type        = number
+  default     = 10
+}
+
+variable "tier_weights" {
+  description = "Share of dispatch turns per priority tier while both are backlogged"
+  type        = map(number)
+  default     = { interactive = 8, bulk = 1 }
+}
+
+variable "tenant_weights" {
+  description = "Optional per-user weights for fair scheduling (user_id -> weight, default 1)"
+  type        = map(number)
+  default     = {}
+}
+
+variable "tenant_rate_per_minute" {
+  description = "Sustained uploads per user per minute accepted by ingest (bursts up to tenant_burst)"
+  type        = number
+  default     = 12
+}
+
+variable "tenant_burst" {
+  description = "Uploads a user may send back to back before being rate limited"
+  type        = number
+  default     = 10
+}
+
+variable "orjson_layer_arn" {
+  description = "Optional Lambda layer with orjson (python3.9) for faster status/history JSON responses"
+  type        = string
+  default     = ""
+}
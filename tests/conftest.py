@@ -0,0 +1,11 @@
+"""
+The shared layer and the offline AWS stand-ins (benchmarks/fakes.py) on
+sys.path, like the benchmarks. No AWS account or boto3 needed.
+"""
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.join(REPO_ROOT, "backend", "shared", "python"), os.path.join(REPO_ROOT, "benchmarks")):
+    if path not in sys.path:
+        sys.path.append(path)
@@ -0,0 +1,61 @@
+import hashlib
+
+import pytest
+from boto3.dynamodb.types import Binary
+
+from fakes import FakeS3
+from visionquest.compression import (GZIP_MAGIC, ZSTD_MAGIC, pack, unpack, unpack_fields,
+                                     unpack_typed_fields)
+
+ANSWER = "The invoice total matches the line items; VAT is 15%. " * 200
+
+
+def incompressible(size):
+    """Hex digests: hardly compress, so the frame stays large."""
+    return "".join(hashlib.sha256(str(i).encode()).hexdigest() for i in range(size // 64 + 1))[:size]
+
+
+def test_short_text_is_stored_plain():
+    assert pack("Short answer.", min_bytes=2048) == "Short answer."
+    assert pack(None) is None and unpack(None) is None
+
+
+def test_long_text_round_trips_compressed():
+    frame = pack(ANSWER, min_bytes=2048)
+    assert isinstance(frame, bytes) and (frame[:4] == ZSTD_MAGIC or frame[:2] == GZIP_MAGIC)
+    assert len(frame) < len(ANSWER) // 10
+    assert unpack(frame) == ANSWER
+    assert unpack(Binary(frame)) == ANSWER   # As the boto3 resource layer returns it
+
+
+def test_oversized_frame_overflows_to_s3():
+    s3, text = FakeS3(), incompressible(20000)
+    pointer = pack(text, s3, "bucket", "_overflow/job-1/answer", min_bytes=2048, overflow_bytes=4096)
+    assert pointer["s3_bucket"] == "bucket" and pointer["s3_key"] == "_overflow/job-1/answer"
+    assert pointer["bytes"] == len(s3.objects[("bucket", "_overflow/job-1/answer")])
+    assert unpack(pointer, s3) == text
+    with pytest.raises(ValueError):
+        unpack(pointer)
+    with pytest.raises(ValueError):
+        pack(text, min_bytes=2048, overflow_bytes=4096)   # Nowhere to overflow to
+
+
+def test_unpack_fields_only_touches_the_given_fields():
+    s3 = FakeS3()
+    item = {"job_id": "job-1", "answer": pack(ANSWER, min_bytes=2048),
+            "user_prompt": pack(incompressible(8000), s3, "bucket", "_overflow/job-1/prompt",
+                                min_bytes=2048, overflow_bytes=1024),
+            "ocr_text": pack(ANSWER, min_bytes=2048)}
+    unpack_fields(item, ["answer", "user_prompt", "missing"], s3)
+    assert item["answer"] == ANSWER and item["user_prompt"] == incompressible(8000)
+    assert isinstance(item["ocr_text"], bytes) and "missing" not in item
+
+
+def test_unpack_typed_fields_reads_client_items():
+    s3 = FakeS3()
+    pointer = pack(incompressible(8000), s3, "bucket", "_overflow/job-1/prompt", min_bytes=2048, overflow_bytes=1024)
+    item = {"answer": {"B": pack(ANSWER, min_bytes=2048)}, "title": {"S": "plain"},
+            "user_prompt": {"M": {"s3_bucket": {"S": pointer["s3_bucket"]}, "s3_key": {"S": pointer["s3_key"]},
+                                  "bytes": {"N": str(pointer["bytes"])}}}}
+    unpack_typed_fields(item, ["answer", "title", "user_prompt"], s3)
+    assert item == {"answer": {"S": ANSWER}, "title": {"S": "plain"}, "user_prompt": {"S": incompressible(8000)}}
@@ -0,0 +1,31 @@
+from visionquest.context import assemble_context, estimate_tokens, truncate_to_tokens
+
+
+def doc(text, score, uri="s3://kb/vat-law.pdf"):
+    return {"content": {"text": text}, "score": score, "location": {"s3Location": {"uri": uri}}}
+
+
+def test_truncation_marker_stays_within_the_budget():
+    text = " ".join("word%03d" % i for i in range(200))   # No sentence end to cut at
+    for max_tokens in (20, 21, 22, 23, 100):
+        cut = truncate_to_tokens(text, max_tokens)
+        assert cut.endswith(" ...")
+        assert estimate_tokens(cut) <= max_tokens
+
+
+def test_truncation_prefers_a_sentence_end():
+    text = "The standard VAT rate is fifteen percent. " * 10
+    cut = truncate_to_tokens(text, 30)
+    assert cut.endswith("percent.") and estimate_tokens(cut) <= 30
+
+
+def test_context_fits_the_budget_and_drops_duplicates():
+    first = " ".join("alpha%03d" % i for i in range(150))
+    second = " ".join("beta%03d" % i for i in range(400))
+    docs = [doc(second, 0.5, "s3://kb/b.pdf"), doc(first, 0.9), doc(first, 0.8)]
+    for budget in range(300, 700, 7):
+        context = assemble_context(docs, token_budget=budget)
+        assert context["tokens"] <= budget
+    assert context["dropped_duplicates"] == 1
+    assert [c["uri"] for c in context["citations"]] == ["s3://kb/vat-law.pdf", "s3://kb/b.pdf"]
+    assert context["text"].startswith("[1] (vat-law.pdf) alpha000")
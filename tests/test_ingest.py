@@ -0,0 +1,24 @@
+import argparse
+import json
+
+from bench_pipeline import Harness
+
+
+def harness():
+    return Harness(argparse.Namespace(s3_latency=0.0, dynamo_latency=0.0, sfn_latency=0.0, textract_base=0.0,
+                                      textract_per_page=0.0, bedrock_base=0.0, bedrock_per_token=0.0,
+                                      output_tokens=10))
+
+
+def ingest_tier(harness, route_key, body_tier):
+    body = json.dumps({"user_id": "alice", "chat_id": "c1", "question": "Total?", "tier": body_tier})
+    response = harness.ingest.lambda_handler({"routeKey": route_key, "body": body}, None)
+    assert response["statusCode"] == 200
+    return harness.jobs_table.items[json.loads(response["body"])["job_id"]]["tier"]
+
+
+def test_tier_comes_from_the_route_not_the_body():
+    h = harness()
+    assert ingest_tier(h, "POST /ingest/bulk", "interactive") == "bulk"
+    assert ingest_tier(h, "POST /ingest", "bulk") == "interactive"
+    assert ingest_tier(h, None, "bulk") == "interactive"
@@ -0,0 +1,35 @@
+import base64
+import json
+
+from visionquest.logs import Logger, redact, summarize_string
+
+SENTENCE = ("What is the VAT rate on residential rent in Saudi Arabia and which invoices "
+            "must show the seller's VAT registration number? ") * 8
+
+
+def test_long_prose_is_shortened_not_hidden():
+    summary = summarize_string(SENTENCE, max_chars=100)
+    assert summary.startswith("What is the VAT rate")
+    assert "base64" not in summary
+
+
+def test_base64_uploads_are_summarized():
+    payload = base64.b64encode(bytes(range(256)) * 40).decode("ascii")
+    assert summarize_string(payload, max_chars=100) == f"<base64 {len(payload)} chars>"
+    data_uri = "data:image/png;base64," + payload
+    assert summarize_string(data_uri, max_chars=100) == f"<base64 {len(data_uri)} chars>"
+
+
+def test_secrets_are_masked_and_bytes_summarized():
+    redacted = redact({"Authorization": "Bearer abc", "body": {"password": "x"}, "file": b"\x00" * 10})
+    assert redacted == {"Authorization": "[REDACTED]", "body": {"password": "[REDACTED]"}, "file": "<10 bytes>"}
+
+
+def test_sampled_out_invocations_keep_warnings():
+    lines = []
+    log = Logger("status", sample_rate=0.0, write=lines.append)
+    log.begin(job_id="job-1")
+    log.info("dropped")
+    log.warning("kept %s", "warning")
+    assert [json.loads(line)["msg"] for line in lines] == ["kept warning"]
+    assert json.loads(lines[0])["job_id"] == "job-1"
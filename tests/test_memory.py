@@ -0,0 +1,73 @@
+from fakes import FakeDynamoTable, FakeS3
+from visionquest.memory import ChatMemory, render_conversation
+
+
+def make_memory(**kwargs):
+    jobs = FakeDynamoTable("job_id", "jobs", indexes={"ChatIndex": "created_at"})
+    chats = FakeDynamoTable("chat_id", "chats")  # (user_id, chat_id): chat ids are unique here
+    return ChatMemory(jobs, chats, FakeS3(), "bucket", **kwargs), jobs, chats
+
+
+def add_job(jobs, job_id, user_id, chat_id, created_at, question="Q", answer="A", status="SUCCESS"):
+    jobs.put_item(Item={"job_id": job_id, "user_id": user_id, "chat_id": chat_id, "created_at": created_at,
+                        "user_prompt": question, "answer": answer, "status": status})
+
+
+def test_load_returns_own_successful_turns_oldest_first():
+    memory, jobs, _ = make_memory()
+    add_job(jobs, "j1", "alice", "c1", 1, "first?", "one")
+    add_job(jobs, "j2", "alice", "c1", 2, "second?", "two")
+    add_job(jobs, "j3", "alice", "c1", 3, status="FAILED")
+    add_job(jobs, "j4", "alice", "c1", 4)   # The job being answered
+    state = memory.load("alice", "c1", job_id="j4")
+    assert [t.job_id for t in state["turns"]] == ["j1", "j2"]
+    assert state["turns"][0].question == "first?"
+
+
+def test_load_never_returns_another_users_turns_in_a_shared_chat_id():
+    memory, jobs, _ = make_memory(max_turns=2)
+    add_job(jobs, "a1", "alice", "default", 1, "alice's secret", "alice's answer")
+    # Enough of bob's newer jobs to fill more than one page of the index
+    for i in range(10):
+        add_job(jobs, f"b{i}", "bob", "default", 10 + i, "bob's question", "bob's answer")
+    state = memory.load("alice", "default")
+    assert [t.job_id for t in state["turns"]] == ["a1"]
+    assert "bob" not in render_conversation(state["summary"], state["turns"])
+
+    state = memory.load("bob", "default")
+    assert len(state["turns"]) == 2
+    assert all(t.job_id.startswith("b") for t in state["turns"])
+
+
+def test_fit_folds_old_turns_into_a_saved_summary():
+    memory, jobs, chats = make_memory(token_budget=50)
+    for i in range(6):
+        add_job(jobs, f"j{i}", "alice", "c1", i + 1, f"question {i} " * 5, f"answer {i} " * 10)
+    state = memory.load("alice", "c1")
+    summary, turns = memory.fit(state, "alice", "c1", summarize=lambda s, t: "SUMMARY")
+    assert summary == "SUMMARY"
+    assert len(turns) < 6
+    row = chats.items["c1"]
+    assert row["summary"] == "SUMMARY"
+    assert row["expiration_time"] > 0
+    # The next job only reads the turns after the summary
+    assert [t.job_id for t in memory.load("alice", "c1")["turns"]] == [t.job_id for t in turns]
+
+
+def test_fit_falls_back_to_an_extractive_summary():
+    memory, jobs, _ = make_memory(token_budget=50)
+    for i in range(6):
+        add_job(jobs, f"j{i}", "alice", "c1", i + 1, f"question {i} " * 5, f"answer {i} " * 10)
+
+    def broken(summary, turns):
+        raise RuntimeError("model down")
+    summary, _ = memory.fit(memory.load("alice", "c1"), "alice", "c1", summarize=broken)
+    assert "question 0" in summary
+
+
+def test_document_round_trips_through_the_chat_row():
+    memory, _, chats = make_memory()
+    chats.put_item(Item={"user_id": "alice", "chat_id": "c1"})
+    memory.save_document("alice", "c1", "j1", "Invoice total 1150.00 SAR\n" * 5000)
+    state = memory.load("alice", "c1")
+    assert memory.document(state) == "Invoice total 1150.00 SAR\n" * 5000
@@ -0,0 +1,43 @@
+import pytest
+
+from fakes import FakeClientError
+from visionquest.model_router import ModelRouter, claude_catalog, is_fallback_error
+
+
+class ResponseNone(Exception):
+    response = None
+
+
+def router():
+    return ModelRouter(claude_catalog("large-model", "small-model"))
+
+
+def test_fallback_errors():
+    assert is_fallback_error(FakeClientError("ThrottlingException", "slow down"))
+    assert not is_fallback_error(FakeClientError("ValidationException", "bad request"))
+    assert not is_fallback_error(ResponseNone())
+    assert not is_fallback_error(ValueError("no response attribute"))
+
+
+def test_short_lookups_go_to_the_small_model_and_audits_to_the_large():
+    assert router().route(input_tokens=200, question_class="lookup")[0].tier == "small"
+    assert router().route(input_tokens=200, question_class="audit")[0].tier == "large"
+
+
+def test_throttled_model_falls_back_and_other_errors_raise():
+    models = router()
+    candidates = models.route(input_tokens=200)
+    calls = []
+
+    def throttled_first(model):
+        calls.append(model.name)
+        if len(calls) == 1:
+            raise FakeClientError("ThrottlingException", "slow down")
+        return "answer", {"input_tokens": 10, "output_tokens": 5}
+    result, model = models.invoke(candidates, throttled_first)
+    assert result == "answer" and model is candidates[1]
+
+    def response_none(model):
+        raise ResponseNone("broken connection")
+    with pytest.raises(ResponseNone):
+        models.invoke(candidates, response_none)
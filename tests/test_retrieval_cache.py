@@ -0,0 +1,77 @@
+from visionquest.retrieval_cache import RetrievalCache, cached_retrieve
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeAgentRuntime:
+    """bedrock-agent-runtime retrieve(), counting calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def retrieve(self, **request):
+        self.calls += 1
+        return {"retrievalResults": [{"content": {"text": f"passage {self.calls}"}, "score": 0.9}]}
+
+
+def test_entries_expire_after_the_ttl():
+    clock = Clock()
+    cache = RetrievalCache(ttl_seconds=10, clock=clock)
+    cache.put("kb", "What is the VAT rate?", ["15%"])
+    clock.now = 9.9
+    assert cache.get("kb", "what is the vat rate") == ["15%"]
+    clock.now = 10.0
+    assert cache.get("kb", "What is the VAT rate?") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_resync_drops_only_that_knowledge_base():
+    clock, versions = Clock(), {"kb": "sync-1", "other": "sync-1"}
+    cache = RetrievalCache(version_fn=versions.get, version_check_seconds=60, clock=clock)
+    cache.put("kb", "q", ["old"])
+    cache.put("other", "q", ["kept"])
+    assert cache.get("kb", "q") == ["old"] and cache.get("other", "q") == ["kept"]
+
+    versions["kb"] = "sync-2"
+    clock.now = 30.0
+    assert cache.get("kb", "q") == ["old"]   # Not re-checked before version_check_seconds
+    clock.now = 61.0
+    assert cache.get("kb", "q") is None
+    assert cache.get("other", "q") == ["kept"]
+
+
+def test_failed_version_check_keeps_serving():
+    def broken(kb_id):
+        raise RuntimeError("bedrock-agent unavailable")
+    cache = RetrievalCache(version_fn=broken)
+    cache.put("kb", "q", ["cached"])
+    assert cache.get("kb", "q") == ["cached"]
+
+
+def test_callers_cannot_change_the_cached_results():
+    cache, client = RetrievalCache(), FakeAgentRuntime()
+    first = cached_retrieve(client, cache, "kb", "q", number_of_results=3)
+    first[0]["score"] = 0.0
+    first.append({"content": {"text": "injected"}})
+
+    second = cached_retrieve(client, cache, "kb", "q", number_of_results=3)
+    assert client.calls == 1
+    assert second == [{"content": {"text": "passage 1"}, "score": 0.9}]
+    second.clear()
+    assert len(cache.get("kb", "q", k=3)) == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = RetrievalCache(max_entries=2)
+    cache.put("kb", "a", [1])
+    cache.put("kb", "b", [2])
+    cache.get("kb", "a")
+    cache.put("kb", "c", [3])
+    assert cache.get("kb", "b") is None
+    assert cache.get("kb", "a") == [1] and cache.get("kb", "c") == [3]
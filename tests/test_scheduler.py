@@ -0,0 +1,53 @@
+from fakes import FakeDynamoTable
+from visionquest.scheduler import FairQueue
+
+
+def make_queue():
+    return FairQueue(FakeDynamoTable("pk", "admission"))
+
+
+def test_tiers_share_8_to_1_and_tenants_take_turns():
+    queue = make_queue()
+    for i in range(10):
+        queue.enqueue("bulk", "batch-user", f"bulk-{i}", {})
+    for i in range(20):
+        queue.enqueue("interactive", "alice", f"alice-{i}", {})   # Alice's whole backlog first
+    for i in range(20):
+        queue.enqueue("interactive", "bob", f"bob-{i}", {})
+    order = [queue.claim()["job_id"].split("-")[0] for _ in range(18)]
+    assert order.count("bulk") == 2
+    interactive = [owner for owner in order if owner != "bulk"]
+    assert interactive.count("alice") == interactive.count("bob") == 8
+    # FIFO within a lane
+    assert queue.claim()["job_id"] in ("alice-8", "bob-8", "bulk-2")
+
+
+def test_enqueue_survives_prune_between_state_read_and_count():
+    table = FakeDynamoTable("pk", "admission")
+    queue, sweeper = FairQueue(table), FairQueue(table)
+    queue.enqueue("interactive", "alice", "job-1", {})
+    assert queue.claim()["job_id"] == "job-1"   # The lane is idle now (n == 0)
+
+    update = queue._update
+    pruned = []
+
+    def prune_before_count(expression, *args, **kwargs):
+        if expression.startswith("ADD lanes.#l.n :one") and not pruned:
+            pruned.extend(sweeper.prune())   # The 1-minute sweep runs right here
+        return update(expression, *args, **kwargs)
+    queue._update = prune_before_count
+
+    lane, _ = queue.enqueue("interactive", "alice", "job-2", {})
+    assert pruned == [lane]
+    assert queue.state()["lanes"][lane]["n"] == 1
+    assert queue.claim()["job_id"] == "job-2"
+    assert queue.claim() is None
+
+
+def test_prune_keeps_backlogged_lanes():
+    queue = make_queue()
+    queue.enqueue("interactive", "alice", "job-1", {})
+    queue.enqueue("interactive", "bob", "job-2", {})
+    assert queue.claim()["job_id"] == "job-1"
+    assert queue.prune() == ["interactive|alice"]
+    assert queue.claim()["job_id"] == "job-2"